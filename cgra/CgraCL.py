@@ -0,0 +1,299 @@
+"""
+=========================================================================
+CgraCL.py
+=========================================================================
+Cycle-approximate model of CgraRTL on native Python ints. It consumes the
+same mk_intra_cgra_pkt stream (CMD_CONFIG/CMD_CONST/CMD_LAUNCH/...) as
+CgraRTL and models the tiles with TileCL, the ctrl ring with a fixed
+per-hop latency, and DataMemWithCrossbarRTL with one read and one write
+port per bank (lower tile ids win on conflicts). Accesses that fall
+outside the local banks (i.e., would go to the NoC) stall.
+
+CgraLockstepChecker runs a CgraRTL harness and a CgraCL side by side and
+compares the sequence of retired FU operations of each tile, as well as
+the final data memory content.
+
+Author : agent
+  Date : Oct 18, 2026
+"""
+
+from collections import deque
+
+from ..lib.cmd_type import *
+from ..lib.opt_type import *
+from ..lib.util.common import *
+from ..tile.TileCL import TileCL
+
+#-------------------------------------------------------------------------
+# SpmCL
+#-------------------------------------------------------------------------
+# Multi-bank scratchpad shared by the tiles on the west boundary. Unlike
+# mem/data/DataMemCL, it is ticked by CgraCL rather than simulated as a
+# PyMTL3 component.
+
+class SpmCL:
+
+  def __init__( s, data_nbits, data_mem_size_per_bank, num_banks,
+                preload_data = None ):
+    s.mask        = ( 1 << data_nbits ) - 1
+    s.bank_nbits  = ( data_mem_size_per_bank - 1 ).bit_length()
+    s.bank_size   = data_mem_size_per_bank
+    s.num_banks   = num_banks
+    s.banks       = [ [ ( 0, 0 ) ] * data_mem_size_per_bank
+                      for _ in range( num_banks ) ]
+    s.rd_busy     = [ False ] * num_banks
+    s.wr_busy     = [ False ] * num_banks
+    if preload_data is not None:
+      for b, bank in enumerate( preload_data ):
+        for i, data in enumerate( bank ):
+          s.banks[b][i] = ( int( data.payload ) & s.mask,
+                            int( data.predicate ) )
+
+  def new_cycle( s ):
+    s.rd_busy = [ False ] * s.num_banks
+    s.wr_busy = [ False ] * s.num_banks
+
+  def locate( s, addr ):
+    bank = addr >> s.bank_nbits
+    if bank >= s.num_banks:
+      return None, None
+    return bank, addr & ( s.bank_size - 1 )
+
+  def load( s, tile, addr ):
+    bank, offset = s.locate( addr )
+    if bank is None or s.rd_busy[bank]:
+      return None
+    s.rd_busy[bank] = True
+    return s.banks[bank][offset]
+
+  def store( s, tile, addr, data ):
+    bank, offset = s.locate( addr )
+    if bank is None or s.wr_busy[bank]:
+      return False
+    s.wr_busy[bank] = True
+    s.banks[bank][offset] = ( data[0] & s.mask, data[1] )
+    return True
+
+  # Reads the old data and writes back modify( old data ) in the same
+  # cycle, which takes both the read and the write port of the bank as
+  # in DataMemWithCrossbarRTL.
+  def atomic( s, tile, addr, modify ):
+    bank, offset = s.locate( addr )
+    if bank is None or s.rd_busy[bank] or s.wr_busy[bank]:
+      return None
+    s.rd_busy[bank] = True
+    s.wr_busy[bank] = True
+    old = s.banks[bank][offset]
+    new = modify( old )
+    s.banks[bank][offset] = ( new[0] & s.mask, new[1] )
+    return old
+
+  def read( s, addr ):
+    bank, offset = s.locate( addr )
+    return s.banks[bank][offset]
+
+#-------------------------------------------------------------------------
+# CgraCL
+#-------------------------------------------------------------------------
+
+class CgraCL:
+
+  def __init__( s, data_nbits, width, height, ctrl_mem_size,
+                data_mem_size_global, data_mem_size_per_bank,
+                num_banks_per_cgra, num_registers_per_reg_bank, num_ctrl,
+                total_steps, cgra_topology = "Mesh", preload_data = None,
+                open_boundary = False, channel_depth = 2,
+                ctrl_hop_latency = 1, record = False ):
+
+    assert( cgra_topology == "Mesh" or cgra_topology == "KingMesh" )
+    num_mesh_ports = 4 if cgra_topology == "Mesh" else 8
+
+    s.width     = width
+    s.height    = height
+    s.num_tiles = width * height
+    s.cycle     = 0
+    s.ctrl_hop_latency = ctrl_hop_latency
+
+    s.tile = [ TileCL( data_nbits, ctrl_mem_size, num_ctrl, total_steps,
+                       4, 2, num_mesh_ports, num_mesh_ports,
+                       num_registers_per_reg_bank, data_mem_size_global,
+                       channel_depth, id = i )
+               for i in range( s.num_tiles ) ]
+    s.data_mem = SpmCL( data_nbits, data_mem_size_per_bank,
+                        num_banks_per_cgra, preload_data )
+
+    # Packets waiting in the controller and packets on the ctrl ring
+    # as ( arrival cycle, pkt ).
+    s.ctrl_pkt_queue = deque()
+    s.ctrl_ring      = deque()
+
+    # Data leaving the array through the boundary, if not blocked.
+    s.boundary = { d: [ [] if open_boundary else None
+                        for _ in range( width if d in ( PORT_NORTH,
+                                                        PORT_SOUTH )
+                                        else height ) ]
+                   for d in ( PORT_NORTH, PORT_SOUTH, PORT_WEST,
+                              PORT_EAST ) }
+
+    for i, tile in enumerate( s.tile ):
+      tile.record = record
+      x, y = i % width, i // width
+      if y > 0:
+        tile.send_to[PORT_SOUTH] = ( s.tile[i - width], PORT_NORTH )
+      else:
+        tile.send_to[PORT_SOUTH] = s.boundary[PORT_SOUTH][x]
+      if y < height - 1:
+        tile.send_to[PORT_NORTH] = ( s.tile[i + width], PORT_SOUTH )
+      else:
+        tile.send_to[PORT_NORTH] = s.boundary[PORT_NORTH][x]
+      if x > 0:
+        tile.send_to[PORT_WEST] = ( s.tile[i - 1], PORT_EAST )
+      else:
+        tile.send_to[PORT_WEST] = s.boundary[PORT_WEST][y]
+      if x < width - 1:
+        tile.send_to[PORT_EAST] = ( s.tile[i + 1], PORT_WEST )
+      else:
+        tile.send_to[PORT_EAST] = s.boundary[PORT_EAST][y]
+
+      if cgra_topology == "KingMesh":
+        if x > 0 and y < height - 1:
+          tile.send_to[PORT_NORTHWEST] = ( s.tile[i + width - 1],
+                                           PORT_SOUTHEAST )
+          s.tile[i + width - 1].send_to[PORT_SOUTHEAST] = \
+              ( tile, PORT_NORTHWEST )
+        if x < width - 1 and y < height - 1:
+          tile.send_to[PORT_NORTHEAST] = ( s.tile[i + width + 1],
+                                           PORT_SOUTHWEST )
+          s.tile[i + width + 1].send_to[PORT_SOUTHWEST] = \
+              ( tile, PORT_NORTHEAST )
+
+      if x == 0:
+        tile.mem = s.data_mem
+
+  #-----------------------------------------------------------------------
+  # Control packets
+  #-----------------------------------------------------------------------
+
+  def send_ctrl_pkts( s, pkts ):
+    s.ctrl_pkt_queue.extend( pkts )
+
+  def ctrl_latency( s, dst ):
+    # Controller queue plus the shortest way around the ring.
+    hops = min( dst, s.num_tiles - dst )
+    return 2 + hops * s.ctrl_hop_latency
+
+  #-----------------------------------------------------------------------
+  # Simulation
+  #-----------------------------------------------------------------------
+
+  def tick( s ):
+    s.data_mem.new_cycle()
+    for tile in s.tile:
+      tile.snapshot_channels()
+    for tile in s.tile:
+      tile.tick( s.cycle )
+    for tile in s.tile:
+      tile.commit_channels()
+      tile.update_ctrl()
+
+    # The ring delivers packets in order, one per cycle from the
+    # controller.
+    while s.ctrl_ring and s.ctrl_ring[0][0] <= s.cycle:
+      _, pkt = s.ctrl_ring.popleft()
+      s.tile[int( pkt.dst )].recv_ctrl_pkt( pkt )
+    if s.ctrl_pkt_queue:
+      pkt = s.ctrl_pkt_queue.popleft()
+      arrival = s.cycle + s.ctrl_latency( int( pkt.dst ) )
+      if s.ctrl_ring:
+        arrival = max( arrival, s.ctrl_ring[-1][0] )
+      s.ctrl_ring.append( ( arrival, pkt ) )
+    s.cycle += 1
+
+  def sim( s, num_cycles ):
+    for _ in range( num_cycles ):
+      s.tick()
+
+  def ctrl_done( s ):
+    return not s.ctrl_pkt_queue and not s.ctrl_ring and \
+           all( not tile.pkt_queue for tile in s.tile )
+
+  def line_trace( s ):
+    return "\n".join( tile.line_trace() for tile in s.tile )
+
+#-------------------------------------------------------------------------
+# CgraLockstepChecker
+#-------------------------------------------------------------------------
+# Simulates a CgraRTL harness (anything exposing `dut` as a CgraRTL and
+# `sim_tick()`, e.g., the TestHarness in cgra/test/CgraRTL_test.py) and a
+# CgraCL in lockstep. As the CL model is only cycle-approximate, the
+# retired FU operations are compared per tile in program order rather
+# than per cycle; a tile may lag behind by at most `max_skew` operations.
+
+class CgraLockstepChecker:
+
+  def __init__( s, th, cl, max_skew = 64 ):
+    s.th       = th
+    s.cl       = cl
+    s.max_skew = max_skew
+    s.cycle    = 0
+    s.rtl_ops  = [ deque() for _ in cl.tile ]
+    s.cl_ops   = [ deque() for _ in cl.tile ]
+    s.checked  = [ 0 ] * len( cl.tile )
+    for tile in cl.tile:
+      tile.record = True
+
+  def sample_rtl( s ):
+    for i, tile in enumerate( s.th.dut.tile ):
+      opt = tile.element.recv_opt
+      if opt.val & opt.rdy:
+        op = int( opt.msg.ctrl )
+        if op == int( OPT_NAH ):
+          continue
+        outs = tuple( ( int( x.msg.payload ), int( x.msg.predicate ) )
+                      for x in tile.element.send_out if x.val )
+        s.rtl_ops[i].append( ( s.cycle, op, outs ) )
+
+  def compare( s ):
+    for i, tile in enumerate( s.cl.tile ):
+      s.cl_ops[i].extend( tile.fired )
+      tile.fired.clear()
+      rtl, cl = s.rtl_ops[i], s.cl_ops[i]
+      while rtl and cl:
+        rtl_cycle, rtl_op, rtl_outs = rtl.popleft()
+        cl_cycle, cl_op, cl_outs = cl.popleft()
+        n = s.checked[i]
+        assert rtl_op == cl_op, \
+          f"tile {i} op #{n}: RTL retired {OPT_SYMBOL_DICT[Bits6(rtl_op)]}" \
+          f" @{rtl_cycle}, CL retired {OPT_SYMBOL_DICT[Bits6(cl_op)]}" \
+          f" @{cl_cycle}"
+        # Only the outputs the RTL FU presented in the same cycle are
+        # comparable (e.g., loads may respond later).
+        for ( rp, rpred ), ( cp, cpred ) in zip( rtl_outs, cl_outs ):
+          assert ( rp, rpred ) == ( cp, cpred ), \
+            f"tile {i} op #{n} ({OPT_SYMBOL_DICT[Bits6(rtl_op)]}): " \
+            f"RTL out {(rp, rpred)} @{rtl_cycle} != CL out " \
+            f"{(cp, cpred)} @{cl_cycle}"
+        s.checked[i] += 1
+      assert len( rtl ) <= s.max_skew and len( cl ) <= s.max_skew, \
+        f"tile {i}: RTL and CL diverged by more than {s.max_skew} ops"
+
+  def tick( s ):
+    s.th.sim_eval_combinational()
+    s.sample_rtl()
+    s.th.sim_tick()
+    s.cl.tick()
+    s.cycle += 1
+    s.compare()
+
+  def run( s, num_cycles ):
+    for _ in range( num_cycles ):
+      s.tick()
+    return s.checked
+
+  def check_data_mem( s ):
+    for b, bank in enumerate( s.th.dut.data_mem.reg_file ):
+      for i, data in enumerate( bank.regs ):
+        assert ( int( data.payload ), int( data.predicate ) ) == \
+               s.cl.data_mem.banks[b][i], \
+          f"data mem bank {b} entry {i}: RTL {data}, " \
+          f"CL {s.cl.data_mem.banks[b][i]}"
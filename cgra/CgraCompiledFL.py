@@ -0,0 +1,370 @@
+"""
+=========================================================================
+CgraCompiledFL.py
+=========================================================================
+CgraCompiledFL -- compiles a DFG (see lib/util/dfg_helper.py) once into
+a flat op program and evaluates it either on native Python ints or, in
+batch mode, on NumPy arrays with one lane per (data_spm, src_const) set.
+
+The evaluation order and the token semantics (constants go in first,
+rotating input slots, predicate propagation of branches, live-out
+handling) follow CgraFL exactly, so both engines produce bit-identical
+results. Opcodes that CgraFL does not model (e.g., STR, SEL, DIV, fused
+multiply, atomic, vector and floating-point operations) follow the
+semantics of the corresponding FU RTL models. Floating-point payloads are interpreted
+as IEEE-754 half/single/double depending on the payload width, which is
+what the HardFloat-based FUs implement for the default configurations.
+
+Author : agent
+  Date : Oct 18, 2026
+"""
+
+from ..fu.flexible.FuFL import IntOps, NumpyOps, OPT_SEMANTICS
+from ..lib.opt_type import *
+
+#------------------------------------------------------------------------
+# Op kinds of the compiled program
+#------------------------------------------------------------------------
+
+KIND_ALU       = 0
+KIND_PHI       = 1
+KIND_LD        = 2
+KIND_STR       = 3
+KIND_BRH       = 4
+KIND_BRH_START = 5
+KIND_NOP       = 6
+KIND_ATOMIC    = 7
+
+_KIND = {
+  OPT_START     : KIND_NOP,
+  OPT_NAH       : KIND_NOP,
+  OPT_PHI       : KIND_PHI,
+  OPT_PHI_CONST : KIND_PHI,
+  OPT_LD        : KIND_LD,
+  OPT_LD_CONST  : KIND_LD,
+  OPT_STR       : KIND_STR,
+  OPT_STR_CONST : KIND_STR,
+  OPT_BRH       : KIND_BRH,
+  OPT_BRH_START : KIND_BRH_START,
+  OPT_ATOMIC_ADD: KIND_ATOMIC,
+  OPT_ATOMIC_MIN: KIND_ATOMIC,
+  OPT_ATOMIC_MAX: KIND_ATOMIC,
+}
+_KIND = { int( opt ): kind for opt, kind in _KIND.items() }
+
+_SYMBOL = { int( opt ): sym for opt, sym in OPT_SYMBOL_DICT.items() }
+
+# Opcodes that are neither listed above nor have ALU semantics are not
+# modeled, which is reported when compiling the DFG rather than silently
+# evaluating them as no-ops.
+def _kind( node ):
+  opt = int( node.opt )
+  if opt in _KIND:
+    return _KIND[opt]
+  if opt in OPT_SEMANTICS:
+    return KIND_ALU
+  raise NotImplementedError( f"node {node.id}: opcode "
+                             f"{_SYMBOL.get( opt, opt )} is not supported "
+                             f"by CgraCompiledFL" )
+
+#------------------------------------------------------------------------
+# CompiledOp
+#------------------------------------------------------------------------
+
+class CompiledOp:
+
+  __slots__ = ( 'id', 'index', 'opt', 'kind', 'alu', 'opt_predicate',
+                'const_index', 'num_input', 'slot_base', 'val_succs',
+                'true_succs', 'false_succs', 'live_out_ctrl',
+                'live_out_val', 'num_output' )
+
+  def __str__( s ):
+    return f"{s.index}: node {s.id} {_SYMBOL[s.opt]} " \
+           f"const{list(s.const_index)} -> {[ i for i, _ in s.val_succs ]}"
+
+#------------------------------------------------------------------------
+# CompiledDFG
+#------------------------------------------------------------------------
+
+class CompiledDFG:
+
+  def __init__( s, FuDFG, payload_nbits = 16, num_lanes = 4,
+                max_iterations = 1 << 20 ):
+
+    s.nbits          = payload_nbits
+    s.num_lanes      = num_lanes
+    s.max_iterations = max_iterations
+    s.num_const      = 0
+    s.ops            = []
+
+    index = { node.id: i for i, node in enumerate( FuDFG.nodes ) }
+
+    # Every node owns num_input consecutive slots in a flat input buffer.
+    slot_base = 0
+    for i, node in enumerate( FuDFG.nodes ):
+      op               = CompiledOp()
+      op.id            = node.id
+      op.index         = i
+      op.opt           = int( node.opt )
+      op.kind          = _kind( node )
+      op.alu           = OPT_SEMANTICS.get( op.opt )
+      op.opt_predicate = node.opt_predicate == 1
+      op.const_index   = tuple( node.const_index )
+      op.num_input     = node.num_input
+      op.num_output    = len( node.num_output )
+      op.slot_base     = slot_base
+      op.live_out_ctrl = node.live_out_ctrl
+      op.live_out_val  = node.live_out_val
+      slot_base       += node.num_input
+      if op.const_index:
+        s.num_const = max( s.num_const, max( op.const_index ) + 1 )
+      s.ops.append( op )
+    s.num_slots = slot_base
+
+    for op, node in zip( s.ops, FuDFG.nodes ):
+      # ( successor index, output group ) in CgraFL push order.
+      op.val_succs = tuple( ( index[succ], group )
+                            for group, succs in enumerate( node.output_node )
+                            for succ in succs )
+      groups = list( node.output_node ) + [ [], [] ]
+      op.true_succs  = tuple( index[succ] for succ in groups[0] )
+      op.false_succs = tuple( index[succ] for succ in groups[1] )
+
+  def __str__( s ):
+    return "\n".join( str( op ) for op in s.ops )
+
+  #----------------------------------------------------------------------
+  # Scalar evaluation on Python ints
+  #----------------------------------------------------------------------
+
+  def run( s, src_const, data_spm ):
+    """Evaluates the program once.
+
+    src_const holds ints or data messages (payload/predicate), data_spm
+    is a list of ints which is copied, not modified. Returns the
+    live-out payload, the live-out predicate, the final data SPM and the
+    number of executed iterations."""
+
+    x    = IntOps( s.nbits )
+    mask = x.mask
+    lanes = s.num_lanes
+    spm  = [ int( v ) for v in data_spm ]
+
+    const_pay  = []
+    const_pred = []
+    for c in src_const:
+      if hasattr( c, 'payload' ):
+        const_pay.append( int( c.payload ) & mask )
+        const_pred.append( int( c.predicate ) )
+      else:
+        const_pay.append( int( c ) & mask )
+        const_pred.append( 1 )
+
+    in_pay    = [ 0 ] * s.num_slots
+    in_pred   = [ 0 ] * s.num_slots
+    rotation  = [ 0 ] * len( s.ops )
+    node_pred = [ 1 ] * len( s.ops )
+
+    live_out_val  = 0
+    live_out_pred = 0
+    done          = False
+    iteration     = 0
+
+    while not done:
+      if iteration >= s.max_iterations:
+        raise RuntimeError( f"DFG did not terminate within "
+                            f"{s.max_iterations} iterations" )
+      for op in s.ops:
+        base = op.slot_base
+        v = [ const_pay[i]  for i in op.const_index ] + \
+            in_pay[base:base + op.num_input]
+        p = [ const_pred[i] for i in op.const_index ] + \
+            in_pred[base:base + op.num_input]
+        cip = node_pred[op.index] if op.opt_predicate else 0
+
+        pay  = 0
+        pred = 1
+        kind = op.kind
+        if kind == KIND_ALU:
+          pay = op.alu( x, v, lanes ) & mask
+        elif kind == KIND_PHI:
+          pay = v[1] if len( v ) > 1 and p[1] == 1 else v[0]
+        elif kind == KIND_LD:
+          pay = spm[v[0]] & mask
+        elif kind == KIND_STR:
+          spm[v[0]] = v[1]
+        elif kind == KIND_ATOMIC:
+          pay = spm[v[0]] & mask
+          spm[v[0]] = op.alu( x, [ pay, v[1] ], lanes ) & mask
+        elif kind == KIND_BRH or kind == KIND_BRH_START:
+          cond = ( v[0] == 0 ) if kind == KIND_BRH else ( iteration == 0 )
+          pred = 1 if cond else 0
+          for succ in op.true_succs:
+            node_pred[succ] = pred
+          for succ in op.false_succs:
+            node_pred[succ] = 1 - pred
+
+        if op.live_out_ctrl:
+          if op.opt_predicate:
+            pred = pred & cip
+          ctrl = 0 if pred == 1 else 1
+          if op.opt_predicate:
+            ctrl = ctrl & cip
+          done = ctrl == 1
+
+        if op.live_out_val:
+          live_out_val  = pay
+          live_out_pred = pred
+
+        if op.opt_predicate:
+          pred = pred & cip
+
+        if kind != KIND_BRH and kind != KIND_BRH_START:
+          for succ, _ in op.val_succs:
+            dst = s.ops[succ]
+            slot = dst.slot_base + rotation[succ]
+            in_pay[slot]  = pay
+            in_pred[slot] = pred
+            rotation[succ] = ( rotation[succ] + 1 ) % dst.num_input
+
+        if done:
+          break
+      iteration += 1
+
+    return live_out_val, live_out_pred, spm, iteration
+
+  #----------------------------------------------------------------------
+  # Batched evaluation on NumPy arrays
+  #----------------------------------------------------------------------
+
+  def run_batch( s, src_const, data_spm ):
+    """Evaluates the program for a batch of independent inputs.
+
+    src_const is a ( batch, num_const ) array of const payloads (all
+    consts are valid) and data_spm a ( batch, spm_size ) array; a 1-D
+    array or list is broadcast to every lane of the batch. Returns the
+    per-lane live-out payloads, live-out predicates, final data SPMs and
+    executed iteration counts."""
+
+    import numpy as np
+
+    x     = NumpyOps( s.nbits )
+    mask  = x.mask
+    lanes = s.num_lanes
+
+    consts = np.asarray( src_const, dtype = np.uint64 )
+    spm    = np.asarray( data_spm,  dtype = np.uint64 )
+    batch  = max( consts.shape[0] if consts.ndim == 2 else 1,
+                  spm.shape[0]    if spm.ndim    == 2 else 1 )
+    if consts.ndim == 1:
+      consts = np.broadcast_to( consts, ( batch, consts.shape[0] ) )
+    if spm.ndim == 1:
+      spm = np.broadcast_to( spm, ( batch, spm.shape[0] ) )
+    assert consts.shape[0] == batch and spm.shape[0] == batch, \
+      "src_const and data_spm must have the same batch size"
+    consts = consts.T & mask
+    spm    = spm.copy()
+    size   = np.uint64( spm.shape[1] )
+    rows   = np.arange( batch )
+
+    one       = np.ones ( batch, dtype = np.uint64 )
+    zero      = np.zeros( batch, dtype = np.uint64 )
+    in_pay    = np.zeros( ( s.num_slots, batch ), dtype = np.uint64 )
+    in_pred   = np.zeros( ( s.num_slots, batch ), dtype = np.uint64 )
+    node_pred = np.ones ( ( len( s.ops ), batch ), dtype = np.uint64 )
+    rotation  = [ 0 ] * len( s.ops )
+
+    live_out_val  = np.zeros( batch, dtype = np.uint64 )
+    live_out_pred = np.zeros( batch, dtype = np.uint64 )
+    active        = np.ones ( batch, dtype = bool )
+    iterations    = np.zeros( batch, dtype = np.int64 )
+    iteration     = 0
+
+    while active.any():
+      if iteration >= s.max_iterations:
+        raise RuntimeError( f"DFG did not terminate within "
+                            f"{s.max_iterations} iterations" )
+      iterations[active] += 1
+      for op in s.ops:
+        base = op.slot_base
+        v = [ consts[i] for i in op.const_index ] + \
+            [ in_pay[base + i] for i in range( op.num_input ) ]
+        p = [ one for _ in op.const_index ] + \
+            [ in_pred[base + i] for i in range( op.num_input ) ]
+        cip = node_pred[op.index] if op.opt_predicate else zero
+
+        pay  = zero
+        pred = one
+        kind = op.kind
+        if kind == KIND_ALU:
+          pay = op.alu( x, v, lanes ) & mask
+        elif kind == KIND_PHI:
+          pay = np.where( p[1] == 1, v[1], v[0] ) if len( v ) > 1 else v[0]
+        elif kind == KIND_LD:
+          # Only the addresses of the active lanes are checked (and
+          # raise as in CgraFL), the done ones may hold any value.
+          if ( v[0][active] >= size ).any():
+            raise IndexError( "data SPM address out of range" )
+          pay = spm[rows, np.where( active, v[0], 0 )] & mask
+        elif kind == KIND_STR:
+          spm[rows[active], v[0][active]] = v[1][active]
+        elif kind == KIND_ATOMIC:
+          if ( v[0][active] >= size ).any():
+            raise IndexError( "data SPM address out of range" )
+          pay = spm[rows, np.where( active, v[0], 0 )] & mask
+          res = op.alu( x, [ pay, v[1] ], lanes ) & mask
+          spm[rows[active], v[0][active]] = res[active]
+        elif kind == KIND_BRH or kind == KIND_BRH_START:
+          if kind == KIND_BRH:
+            pred = x.bool( v[0] == 0 )
+          else:
+            pred = one if iteration == 0 else zero
+          for succ in op.true_succs:
+            node_pred[succ] = pred
+          for succ in op.false_succs:
+            node_pred[succ] = 1 - pred
+
+        if op.live_out_ctrl:
+          if op.opt_predicate:
+            pred = pred & cip
+          ctrl = 1 - pred
+          if op.opt_predicate:
+            ctrl = ctrl & cip
+          fired = active & ( ctrl == 1 )
+        else:
+          fired = None
+
+        if op.live_out_val:
+          live_out_val  = np.where( active, pay,  live_out_val )
+          live_out_pred = np.where( active, pred, live_out_pred )
+
+        if op.opt_predicate:
+          pred = pred & cip
+
+        if kind != KIND_BRH and kind != KIND_BRH_START:
+          for succ, _ in op.val_succs:
+            dst = s.ops[succ]
+            slot = dst.slot_base + rotation[succ]
+            in_pay[slot]  = pay
+            in_pred[slot] = pred
+            rotation[succ] = ( rotation[succ] + 1 ) % dst.num_input
+
+        # Lanes whose live-out control fired stop right here, exactly
+        # like the break in the scalar loop.
+        if fired is not None and fired.any():
+          active = active & ~fired
+          if not active.any():
+            break
+      iteration += 1
+
+    return live_out_val, live_out_pred, spm, iterations
+
+#------------------------------------------------------------------------
+# Drop-in replacement for CgraFL
+#------------------------------------------------------------------------
+
+def CgraCompiledFL( FuDFG, DataType, CtrlType, src_const ):
+  nbits   = DataType.get_field_type( 'payload' ).nbits
+  program = CompiledDFG( FuDFG, nbits )
+  live_out_val, _, data_spm, _ = program.run( src_const, FuDFG.data_spm )
+  return live_out_val, data_spm
@@ -15,6 +15,7 @@ from ..fu.single.AdderRTL import AdderRTL
 from ..lib.util.common import *
 from ..lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ..lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
+from ..lib.cmd_type import *
 from ..lib.opt_type import *
 from ..mem.data.DataMemWithCrossbarRTL import DataMemWithCrossbarRTL
 from ..noc.PyOCN.pymtl3_net.ocnlib.ifcs.positions import mk_ring_pos
@@ -30,7 +31,16 @@ class CgraRTL(Component):
                 data_mem_size_per_bank, num_banks_per_cgra,
                 num_registers_per_reg_bank, num_ctrl,
                 total_steps, FunctionUnit, FuList, cgra_topology,
-                controller2addr_map, idTo2d_map, preload_data = None):
+                controller2addr_map, idTo2d_map, preload_data = None,
+                perf_counters = False, mem_interleave = "high_order",
+                mem_interleave_block_size = 1, num_mshr_entries = 0,
+                dma = False, mem_read_combining = False,
+                mem_rd_ports_per_bank = 1, mem_wr_ports_per_bank = 1,
+                mem_read_latency = 0, mem_sram_macro = None,
+                mem_store_buffer_entries = 0, mem_atomics = False,
+                mem_double_buffered = False, ctrl_multicast = False,
+                shadow_ctrl = False, num_ctrl_contexts = 1,
+                loop_ctrl = False, ctrl_dict_size = 0):
 
     # Other topology can simply modify the tiles connections, or
     # leverage the template for modeling.
@@ -50,6 +60,7 @@ class CgraRTL(Component):
 
     # Interfaces
     s.recv_from_cpu_ctrl_pkt = RecvIfcRTL(CtrlPktType)
+    s.send_to_cpu_ctrl_pkt = SendIfcRTL(CtrlPktType)
     s.recv_from_noc = RecvIfcRTL(NocPktType)
     s.send_to_noc = SendIfcRTL(NocPktType)
 
@@ -70,45 +81,119 @@ class CgraRTL(Component):
                       data_mem_size_global, num_ctrl,
                       total_steps, 4, 2, s.num_mesh_ports,
                       s.num_mesh_ports, num_registers_per_reg_bank,
-                      FuList = FuList, id = i)
-              for i in range(s.num_tiles)]
+                      FuList = FuList, perf_counters = perf_counters,
+                      shadow_ctrl = shadow_ctrl,
+                      num_ctrl_contexts = num_ctrl_contexts,
+                      loop_ctrl = loop_ctrl,
+                      ctrl_dict_size = ctrl_dict_size)
+              for _ in range(s.num_tiles)]
     s.data_mem = DataMemWithCrossbarRTL(NocPktType, DataType,
                                         data_mem_size_global,
                                         data_mem_size_per_bank,
                                         num_banks_per_cgra,
                                         height, height,
-                                        preload_data)
+                                        preload_data, mem_interleave,
+                                        mem_interleave_block_size,
+                                        num_mshr_entries, mem_read_combining,
+                                        mem_rd_ports_per_bank,
+                                        mem_wr_ports_per_bank,
+                                        mem_read_latency, mem_sram_macro,
+                                        mem_store_buffer_entries, mem_atomics,
+                                        mem_double_buffered)
     s.controller = ControllerRTL(ControllerIdType, CmdType, CtrlPktType,
                                  NocPktType, DataType, DataAddrType,
                                  multi_cgra_rows, multi_cgra_columns,
                                  controller_id, controller2addr_map,
-                                 idTo2d_map)
+                                 idTo2d_map, num_mshr_entries, dma,
+                                 mem_double_buffered, ctrl_multicast,
+                                 num_ctrl_contexts, s.num_tiles)
     s.ctrl_ring = RingNetworkRTL(CtrlPktType, CtrlRingPos, s.num_tiles, 1)
 
     # Connections
     # Connects data memory with controller.
     s.data_mem.recv_raddr[height] //= s.controller.send_to_tile_load_request_addr
+    s.data_mem.recv_atomic_op[height] //= s.controller.send_to_tile_atomic_op
+    s.data_mem.recv_atomic_data[height] //= s.controller.send_to_tile_atomic_data
     s.data_mem.recv_waddr[height] //= s.controller.send_to_tile_store_request_addr
     s.data_mem.recv_wdata[height] //= s.controller.send_to_tile_store_request_data
     s.data_mem.recv_from_noc_rdata //= s.controller.send_to_tile_load_response_data
+    s.data_mem.recv_from_noc_load_response_pkt //= s.controller.send_to_tile_load_response_pkt
     s.data_mem.send_to_noc_load_request_pkt //= s.controller.recv_from_tile_load_request_pkt
     s.data_mem.send_to_noc_load_response_pkt //= s.controller.recv_from_tile_load_response_pkt
     s.data_mem.send_to_noc_store_pkt //= s.controller.recv_from_tile_store_request_pkt
+    s.data_mem.swap_buffer //= s.controller.send_to_mem_swap
 
     s.recv_from_noc //= s.controller.recv_from_noc
     s.send_to_noc //= s.controller.send_to_noc
 
     # Connects the ctrl interface between CPU and controller.
     s.recv_from_cpu_ctrl_pkt //= s.controller.recv_from_cpu_ctrl_pkt
+    s.send_to_cpu_ctrl_pkt //= s.controller.send_to_cpu_ctrl_pkt
 
     # Connects ring with each control memory.
-    for i in range(s.num_tiles):
+    for i in range(1, s.num_tiles):
       s.ctrl_ring.send[i] //= s.tile[i].recv_ctrl_pkt
 
-    s.ctrl_ring.recv[0] //= s.controller.send_to_ctrl_ring_ctrl_pkt
-    for i in range(1, s.num_tiles):
-      s.ctrl_ring.recv[i].val //= 0
-      s.ctrl_ring.recv[i].msg //= CtrlPktType()
+    if perf_counters:
+      # The tiles send their perf counter responses over the ring towards
+      # router 0, which is shared by the controller and tile 0.
+      for i in range(1, s.num_tiles):
+        s.ctrl_ring.recv[i] //= s.tile[i].send_ctrl_pkt
+
+      @update
+      def update_ctrl_ring_port0():
+        # Tile 0's responses take priority over the packets from the
+        # controller, so that the responses always drain.
+        s.ctrl_ring.recv[0].val @= s.tile[0].send_ctrl_pkt.val | \
+                                   s.controller.send_to_ctrl_ring_ctrl_pkt.val
+        if s.tile[0].send_ctrl_pkt.val:
+          s.ctrl_ring.recv[0].msg @= s.tile[0].send_ctrl_pkt.msg
+        else:
+          s.ctrl_ring.recv[0].msg @= s.controller.send_to_ctrl_ring_ctrl_pkt.msg
+        s.tile[0].send_ctrl_pkt.rdy @= s.ctrl_ring.recv[0].rdy
+        s.controller.send_to_ctrl_ring_ctrl_pkt.rdy @= \
+            s.ctrl_ring.recv[0].rdy & ~s.tile[0].send_ctrl_pkt.val
+
+        # The responses ejected at router 0 go to the controller, the
+        # others to tile 0.
+        s.tile[0].recv_ctrl_pkt.msg @= s.ctrl_ring.send[0].msg
+        s.controller.recv_from_ctrl_ring_ctrl_pkt.msg @= s.ctrl_ring.send[0].msg
+        if s.ctrl_ring.send[0].msg.ctrl_action == CMD_PERF_READ_RESPONSE:
+          s.tile[0].recv_ctrl_pkt.val @= 0
+          s.controller.recv_from_ctrl_ring_ctrl_pkt.val @= s.ctrl_ring.send[0].val
+          s.ctrl_ring.send[0].rdy @= s.controller.recv_from_ctrl_ring_ctrl_pkt.rdy
+        else:
+          s.tile[0].recv_ctrl_pkt.val @= s.ctrl_ring.send[0].val
+          s.controller.recv_from_ctrl_ring_ctrl_pkt.val @= 0
+          s.ctrl_ring.send[0].rdy @= s.tile[0].recv_ctrl_pkt.rdy
+
+    else:
+      s.ctrl_ring.send[0] //= s.tile[0].recv_ctrl_pkt
+      s.ctrl_ring.recv[0] //= s.controller.send_to_ctrl_ring_ctrl_pkt
+      for i in range(1, s.num_tiles):
+        s.ctrl_ring.recv[i].val //= 0
+        s.ctrl_ring.recv[i].msg //= CtrlPktType()
+      for i in range(s.num_tiles):
+        s.tile[i].send_ctrl_pkt.rdy //= 0
+      s.controller.recv_from_ctrl_ring_ctrl_pkt.val //= 0
+      s.controller.recv_from_ctrl_ring_ctrl_pkt.msg //= CtrlPktType()
+
+    if loop_ctrl:
+      # The early exit raised by any tile ends the hardware loop of all
+      # the tiles, each of which finishes its current iteration first.
+      s.loop_exit = Wire(b1)
+
+      @update
+      def update_loop_exit():
+        s.loop_exit @= 0
+        for i in range(s.num_tiles):
+          s.loop_exit @= s.loop_exit | s.tile[i].send_loop_exit
+
+      for i in range(s.num_tiles):
+        s.tile[i].recv_loop_exit //= s.loop_exit
+    else:
+      for i in range(s.num_tiles):
+        s.tile[i].recv_loop_exit //= 0
 
     for i in range(s.num_tiles):
 
@@ -191,6 +276,8 @@ class CgraRTL(Component):
         s.tile[i].from_mem_rdata //= s.data_mem.send_rdata[i//width]
         s.tile[i].to_mem_waddr   //= s.data_mem.recv_waddr[i//width]
         s.tile[i].to_mem_wdata   //= s.data_mem.recv_wdata[i//width]
+        s.tile[i].to_mem_atomic_op   //= s.data_mem.recv_atomic_op[i//width]
+        s.tile[i].to_mem_atomic_data //= s.data_mem.recv_atomic_data[i//width]
       else:
         s.tile[i].to_mem_raddr.rdy   //= 0
         s.tile[i].from_mem_rdata.val //= 0
@@ -198,6 +285,27 @@ class CgraRTL(Component):
         s.tile[i].to_mem_waddr.rdy   //= 0
         s.tile[i].to_mem_wdata.rdy   //= 0
 
+  # Simulation-only loader that skips the delivery of the ctrl packets
+  # through the controller and the ctrl ring: CMD_CONFIG/CMD_CONST/
+  # CMD_LAUNCH packets are applied directly onto the ctrl/const memory of
+  # their dst tiles (in order), and the data memory preload is completed
+  # at once. It is expected to be invoked right after sim_reset(),
+  # followed by sim_eval_combinational() on the top-level component, so
+  # that the kernel starts in the very next cycle.
+  def backdoor_load(s, ctrl_pkts, preload_data = None):
+    s.data_mem.backdoor_preload()
+    if preload_data != None:
+      for addr, data in preload_data.items():
+        s.data_mem.backdoor_write(addr, data)
+    for pkt in ctrl_pkts:
+      # The multicast packets are applied onto each of their tiles.
+      if getattr(pkt, 'dst_mask', 0) != 0:
+        for i in range(s.num_tiles):
+          if pkt.dst_mask[i]:
+            s.tile[i].backdoor_ctrl_pkt(pkt)
+      else:
+        s.tile[int(pkt.dst)].backdoor_ctrl_pkt(pkt)
+
   # Line trace
   def line_trace(s):
     res = "||\n".join([(("[tile"+str(i)+"]: ") + x.line_trace() + x.ctrl_mem.line_trace())
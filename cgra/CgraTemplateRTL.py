@@ -66,8 +66,8 @@ class CgraTemplateRTL(Component):
                       total_steps, 4, 2, s.num_mesh_ports,
                       s.num_mesh_ports,
                       num_registers_per_reg_bank,
-                      FuList = FuList, id = i)
-              for i in range(s.num_tiles)]
+                      FuList = FuList)
+              for _ in range(s.num_tiles)]
     # FIXME: Need to enrish data-SPM-related user-controlled parameters, e.g., number of banks.
     s.data_mem = DataMemWithCrossbarRTL(NocPktType, DataType,
                                         data_mem_size_global,
@@ -88,6 +88,7 @@ class CgraTemplateRTL(Component):
     s.data_mem.recv_waddr[dataSPM.getNumOfValidWritePorts()] //= s.controller.send_to_tile_store_request_addr
     s.data_mem.recv_wdata[dataSPM.getNumOfValidWritePorts()] //= s.controller.send_to_tile_store_request_data
     s.data_mem.recv_from_noc_rdata //= s.controller.send_to_tile_load_response_data
+    s.data_mem.recv_from_noc_load_response_pkt //= s.controller.send_to_tile_load_response_pkt
     s.data_mem.send_to_noc_load_request_pkt //= s.controller.recv_from_tile_load_request_pkt
     s.data_mem.send_to_noc_load_response_pkt //= s.controller.recv_from_tile_load_response_pkt
     s.data_mem.send_to_noc_store_pkt //= s.controller.recv_from_tile_store_request_pkt
@@ -107,6 +108,17 @@ class CgraTemplateRTL(Component):
       s.ctrl_ring.recv[i].val //= 0
       s.ctrl_ring.recv[i].msg //= CtrlPktType()
 
+    # The tiles are built without perf counters, so no ctrl packet goes
+    # back to the controller.
+    for i in range(s.num_tiles):
+      s.tile[i].send_ctrl_pkt.rdy //= 0
+    # Nor the hardware loop (i.e., the early exit) is used.
+    for i in range(s.num_tiles):
+      s.tile[i].recv_loop_exit //= 0
+    s.controller.recv_from_ctrl_ring_ctrl_pkt.val //= 0
+    s.controller.recv_from_ctrl_ring_ctrl_pkt.msg //= CtrlPktType()
+    s.controller.send_to_cpu_ctrl_pkt.rdy //= 0
+
     for link in LinkList:
 
       if link.isFromMem():
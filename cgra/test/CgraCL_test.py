@@ -0,0 +1,199 @@
+"""
+==========================================================================
+CgraCL_test.py
+==========================================================================
+Test cases for the cycle-approximate CGRA model, and its lockstep check
+against CgraRTL.
+
+Author : agent
+  Date : Oct 18, 2026
+"""
+
+import pytest
+
+from pymtl3 import *
+from ..CgraCL import CgraCL
+from ...lib.cmd_type import *
+from ...lib.messages import *
+from ...lib.opt_type import *
+from ...lib.util.common import *
+
+num_tile_ports = 4
+num_fu_inports = 4
+num_fu_outports = 2
+ctrl_mem_size = 6
+data_mem_size_global = 64
+data_mem_size_per_bank = 16
+num_banks_per_cgra = 2
+num_registers_per_reg_bank = 16
+data_bitwidth = 32
+
+DataType = mk_data(data_bitwidth, 1)
+CtrlPktType = mk_intra_cgra_pkt(4, 6, ctrl_mem_size, 64, num_fu_inports,
+                                num_fu_outports, num_tile_ports,
+                                num_tile_ports, num_registers_per_reg_bank,
+                                data_bitwidth)
+
+def mk_pkt(dst, action, addr = 0, opt = OPT_START, data = 0,
+           fu_in = [], routing = {}, fu_out = {}, PktType = CtrlPktType):
+  # The fields are typed (rather than plain ints), so the packets can
+  # also be sent to CgraRTL (whose PktType may have a wider ctrl_action).
+  pkt = PktType(dst = dst, ctrl_action = action, ctrl_addr = addr,
+                    ctrl_operation = opt, data = data)
+  for i, x in enumerate(fu_in):
+    pkt.ctrl_fu_in[i] = type(pkt.ctrl_fu_in[i])(x)
+  # routing/fu_out: {routing outport: 1-based source port}
+  for o, x in routing.items():
+    pkt.ctrl_routing_xbar_outport[o] = type(pkt.ctrl_routing_xbar_outport[o])(x)
+  for o, x in fu_out.items():
+    pkt.ctrl_fu_xbar_outport[o] = type(pkt.ctrl_fu_xbar_outport[o])(x)
+  return pkt
+
+# Tile 0 loads mem[a] and sends it east; tile 1 adds k and sends it back
+# west; tile 0 stores the sum to mem[b].
+def mk_load_add_store(a, b, k, PktType = CtrlPktType):
+  return [
+    mk_pkt(0, CMD_CONST, data = a, PktType = PktType),
+    mk_pkt(0, CMD_CONST, data = b, PktType = PktType),
+    mk_pkt(1, CMD_CONST, data = k, PktType = PktType),
+    mk_pkt(0, CMD_CONFIG, 0, OPT_LD_CONST, fu_out = {PORT_EAST: 1},
+           PktType = PktType),
+    mk_pkt(0, CMD_CONFIG, 1, OPT_STR_CONST, fu_in = [1],
+           routing = {num_tile_ports + 0: PORT_EAST + 1}, PktType = PktType),
+    mk_pkt(1, CMD_CONFIG, 0, OPT_ADD_CONST, fu_in = [1],
+           routing = {num_tile_ports + 0: PORT_WEST + 1},
+           fu_out = {PORT_WEST: 1}, PktType = PktType),
+    mk_pkt(1, CMD_CONFIG, 1, OPT_NAH, PktType = PktType),
+    mk_pkt(0, CMD_LAUNCH, PktType = PktType),
+    mk_pkt(1, CMD_LAUNCH, PktType = PktType),
+  ]
+
+# Tile 0 loads mem[a] and sends it east; tile 1 adds k and sends it back
+# west; tile 0 performs the atomic `opt` with the sum as both the address
+# and the operand, and drops the old data into its register bank.
+def mk_load_add_atomic(a, k, opt, PktType = CtrlPktType):
+  return [
+    mk_pkt(0, CMD_CONST, data = a, PktType = PktType),
+    mk_pkt(1, CMD_CONST, data = k, PktType = PktType),
+    mk_pkt(0, CMD_CONFIG, 0, OPT_LD_CONST, fu_out = {PORT_EAST: 1},
+           PktType = PktType),
+    mk_pkt(0, CMD_CONFIG, 1, opt, fu_in = [1, 2],
+           routing = {num_tile_ports + 0: PORT_EAST + 1,
+                      num_tile_ports + 1: PORT_EAST + 1},
+           fu_out = {num_tile_ports + 0: 1}, PktType = PktType),
+    mk_pkt(1, CMD_CONFIG, 0, OPT_ADD_CONST, fu_in = [1],
+           routing = {num_tile_ports + 0: PORT_WEST + 1},
+           fu_out = {PORT_WEST: 1}, PktType = PktType),
+    mk_pkt(1, CMD_CONFIG, 1, OPT_NAH, PktType = PktType),
+    mk_pkt(0, CMD_LAUNCH, PktType = PktType),
+    mk_pkt(1, CMD_LAUNCH, PktType = PktType),
+  ]
+
+def mk_cgra(preload_data = None, total_steps = 100, record = False):
+  return CgraCL(data_bitwidth, 2, 1, ctrl_mem_size, data_mem_size_global,
+                data_mem_size_per_bank, num_banks_per_cgra,
+                num_registers_per_reg_bank, 2, total_steps,
+                preload_data = preload_data, record = record)
+
+def test_load_add_store():
+  preload = [[DataType(i * 10, 1) for i in range(data_mem_size_per_bank)]
+             for _ in range(num_banks_per_cgra)]
+  cgra = mk_cgra(preload, record = True)
+  cgra.send_ctrl_pkts(mk_load_add_store(3, 20, 7))
+  cgra.sim(60)
+  assert cgra.ctrl_done()
+  # Bank 1 entry 4 holds address 20.
+  assert cgra.data_mem.read(20) == (37, 1)
+  # Both tiles keep iterating over their two ctrl signals.
+  ops = [opt for _, opt, _ in cgra.tile[1].fired]
+  assert len(ops) > 5 and all(opt == int(OPT_ADD_CONST) for opt in ops)
+  assert cgra.tile[1].fired[0][2] == ((37, 1),)
+
+def test_load_add_atomic():
+  preload = [[DataType(i * 10, 1) for i in range(data_mem_size_per_bank)]
+             for _ in range(num_banks_per_cgra)]
+  cgra = mk_cgra(preload, record = True)
+  cgra.send_ctrl_pkts(mk_load_add_atomic(0, 5, OPT_ATOMIC_ADD))
+  cgra.sim(60)
+  # Each atomic sends out the old data of mem[5] and adds 5 to it.
+  outs = [out for _, opt, out in cgra.tile[0].fired
+          if opt == int(OPT_ATOMIC_ADD)]
+  assert outs[:3] == [((50, 1),), ((55, 1),), ((60, 1),)]
+  assert cgra.data_mem.read(5) == (50 + 5 * len(outs), 1)
+
+def test_total_steps_stop():
+  cgra = mk_cgra(total_steps = 10, record = True)
+  cgra.send_ctrl_pkts(mk_load_add_store(0, 1, 1))
+  cgra.sim(100)
+  fired = len(cgra.tile[0].fired)
+  cgra.sim(100)
+  assert len(cgra.tile[0].fired) == fired
+  assert all(tile.times == 10 for tile in cgra.tile)
+
+def test_unconfigured_tiles_stall():
+  cgra = mk_cgra(record = True)
+  cgra.send_ctrl_pkts([mk_pkt(0, CMD_LAUNCH), mk_pkt(1, CMD_LAUNCH)])
+  cgra.sim(20)
+  assert all(tile.pc == 0 and not tile.fired for tile in cgra.tile)
+
+def run_lockstep(cmdline_opts, pkts, preload, mem_atomics = False):
+  # Imports the RTL side lazily so that the CL tests above do not depend
+  # on the full RTL build environment.
+  from .CgraRTL_test import init_param
+  from ...fu.single.AdderRTL import AdderRTL
+  from ...fu.single.MemUnitRTL import MemUnitRTL
+  from ...lib.util.build_cache import config_model_with_cmdline_opts
+  from ...lib.util.mem_image import preload_sim_memories
+  from ..CgraCL import CgraLockstepChecker
+
+  # The kernel runs on the bottom row of the 2x2 CgraRTL.
+  th = init_param("Mesh", [MemUnitRTL, AdderRTL], src_ctrl_pkt = pkts,
+                  ctrl_steps = 2, total_steps = 100, preload_data = preload,
+                  mem_atomics = mem_atomics)
+  th.elaborate()
+  th = config_model_with_cmdline_opts(th, cmdline_opts, duts = ['dut'])
+  th.apply(DefaultPassGroup())
+  th.sim_reset()
+  preload_sim_memories(th)
+
+  cl = CgraCL(32, 2, 2, 6, 512, len(preload[0]), len(preload), 16, 2, 100,
+              preload_data = preload)
+  cl.send_ctrl_pkts(pkts)
+  checker = CgraLockstepChecker(th, cl)
+  checked = checker.run(200)
+  checker.check_data_mem()
+  return th, cl, checked
+
+def test_lockstep_with_rtl(cmdline_opts):
+  bank_size = 32
+  preload = [[DataType(i * 10, 1) for i in range(bank_size)]
+             for _ in range(num_banks_per_cgra)]
+  th, cl, checked = run_lockstep(cmdline_opts, mk_load_add_store(3, 20, 7),
+                                 preload)
+  # Tile 0 retires the loads/stores and tile 1 the additions, which are
+  # compared op by op, while only mem[20] is written.
+  assert checked[0] > 0 and checked[1] > 0
+  golden = [word for bank in preload for word in bank]
+  assert th.dut.data_mem.diff_array(golden) == [20]
+  assert cl.data_mem.read(20) == (37, 1)
+
+@pytest.mark.parametrize('opt', [OPT_ATOMIC_ADD, OPT_ATOMIC_MIN,
+                                 OPT_ATOMIC_MAX])
+def test_lockstep_atomics(cmdline_opts, opt):
+  bank_size = 32
+  preload = [[DataType(i * 10, 1) for i in range(bank_size)]
+             for _ in range(num_banks_per_cgra)]
+  th, cl, checked = run_lockstep(cmdline_opts, mk_load_add_atomic(0, 5, opt),
+                                 preload, mem_atomics = True)
+  # The atomics and the old data they send out are compared op by op,
+  # while mem[5] (50 initially) is updated with 5 each time.
+  assert checked[0] > 0 and checked[1] > 0
+  golden = [word for bank in preload for word in bank]
+  payload, predicate = cl.data_mem.read(5)
+  if opt == OPT_ATOMIC_ADD:
+    assert payload > 50 and payload % 5 == 0
+  else:
+    assert payload == (5 if opt == OPT_ATOMIC_MIN else 50)
+  assert predicate == 1
+  assert list(th.dut.data_mem.diff_array(golden)) == \
+         ([] if payload == 50 else [5])
@@ -0,0 +1,158 @@
+"""
+==========================================================================
+CgraCompiledFL_test.py
+==========================================================================
+Test cases for the compiled/vectorized FL engine against CgraFL.
+
+Author : agent
+  Date : Oct 18, 2026
+
+"""
+
+import json
+import os
+import random
+
+import pytest
+
+from pymtl3 import *
+from ...lib.messages import *
+from ...lib.opt_type import *
+from ..CgraFL import CgraFL
+from ..CgraCompiledFL import CgraCompiledFL, CompiledDFG
+from ...fu.flexible.FuFL import OPT_SEMANTICS
+from ...lib.util.dfg_helper import *
+
+script_dir = os.path.dirname( __file__ )
+fir_json   = os.path.join( script_dir, "dfg_fir.json" )
+
+DataType = mk_data( 16, 1 )
+CtrlType = mk_ctrl()
+
+def mk_const( values ):
+  return [ DataType( v, 1 ) for v in values ]
+
+def test_fir_matches_fl():
+  rng = random.Random( 0 )
+  for _ in range( 4 ):
+    const_data = mk_const( [ 0, 1, 2, 3, rng.randint( 2, 8 ), 5 ] )
+    data_spm   = [ rng.randint( 0, 255 ) for _ in range( 100 ) ]
+    ref, _ = CgraFL( DFG( fir_json, const_data, list( data_spm ) ),
+                     DataType, CtrlType, const_data )
+    res, spm = CgraCompiledFL( DFG( fir_json, const_data, list( data_spm ) ),
+                               DataType, CtrlType, const_data )
+    assert res == int( ref )
+    assert spm == data_spm
+
+def test_fir_batch_matches_scalar():
+  import numpy as np
+  rng      = random.Random( 1 )
+  batch    = 16
+  program  = CompiledDFG( DFG( fir_json, mk_const( range( 6 ) ),
+                               [ 0 ] * 100 ), 16 )
+  consts   = np.array( [ [ 0, 1, 2, 3, rng.randint( 2, 9 ), 5 ]
+                         for _ in range( batch ) ] )
+  spms     = np.array( [ [ rng.randint( 0, 1 << 16 ) for _ in range( 100 ) ]
+                         for _ in range( batch ) ] )
+  vals, preds, out_spms, iters = program.run_batch( consts, spms )
+  for b in range( batch ):
+    val, pred, spm, it = program.run( list( consts[b] ), list( spms[b] ) )
+    assert int( vals[b] ) == val
+    assert int( preds[b] ) == pred
+    assert int( iters[b] ) == it
+    assert [ int( v ) for v in out_spms[b] ] == spm
+
+def test_opcodes( tmp_path ):
+  import numpy as np
+  # n0 = const0 <op> const1 is stored to spm[const2]; the branch on
+  # const3 terminates after the first iteration.
+  dfg = [
+    { 'fu': 'Adder', 'id': 0, 'opt': 'OPT_ADD', 'opt_predicate': 0,
+      'in_const': [ 0, 1 ], 'in': [], 'in_predicate': [], 'out': [ [ 1 ] ] },
+    { 'fu': 'MemUnit', 'id': 1, 'opt': 'OPT_STR', 'opt_predicate': 0,
+      'in_const': [ 2 ], 'in': [ 0 ], 'in_predicate': [], 'out': [ [ 2 ] ] },
+    { 'fu': 'Branch', 'id': 2, 'opt': 'OPT_BRH', 'opt_predicate': 0,
+      'in_const': [ 3 ], 'in': [ 1 ], 'in_predicate': [], 'out': [ [], [] ],
+      'live_out_ctrl': [] },
+  ]
+  path = tmp_path / "dfg_str.json"
+  path.write_text( json.dumps( dfg ) )
+  program = CompiledDFG( DFG( str( path ), mk_const( range( 4 ) ), [ 0 ] ),
+                         16 )
+  # Patches the opcode of node 0 to exercise each ALU op.
+  cases = [
+    ( OPT_ADD,   7, 9, 16 ),
+    ( OPT_SUB,   7, 9, 0xfffe ),
+    ( OPT_MUL,   300, 300, ( 300 * 300 ) & 0xffff ),
+    ( OPT_DIV,   9, 0, 0 ),
+    ( OPT_DIV,   9, 2, 4 ),
+    ( OPT_LLS,   1, 15, 0x8000 ),
+    ( OPT_LLS,   1, 16, 0 ),
+    ( OPT_LRS,   0x8000, 3, 0x1000 ),
+    ( OPT_XOR,   0xf0f0, 0xff00, 0x0ff0 ),
+    ( OPT_NOT,   0x00ff, 0, 0xff00 ),
+    ( OPT_LT,    3, 4, 1 ),
+    ( OPT_GTE,   3, 4, 0 ),
+    ( OPT_FADD,  0x3c00, 0x4000, 0x4200 ), # 1.0 + 2.0 = 3.0 in half
+    ( OPT_FMUL,  0x4000, 0x4200, 0x4600 ), # 2.0 * 3.0 = 6.0 in half
+    ( OPT_VEC_ADD, 0xffff, 0x1111, 0x0000 ),
+    ( OPT_VEC_REDUCE_ADD, 0x1234, 0, 10 ),
+  ]
+  for opt, a, b, expected in cases:
+    program.ops[0].opt = int( opt )
+    program.ops[0].alu = OPT_SEMANTICS[int( opt )]
+    _, _, spm, _ = program.run( [ a, b, 0, 1 ], [ 0 ] )
+    assert spm[0] == expected, OPT_SYMBOL_DICT[opt]
+    _, _, spms, _ = program.run_batch( np.array( [ [ a, b, 0, 1 ] ] ),
+                                       np.array( [ [ 0 ] ] ) )
+    assert int( spms[0][0] ) == expected, OPT_SYMBOL_DICT[opt]
+
+  # An out-of-range address raises (as indexing the SPM of CgraFL does)
+  # rather than wrapping around.
+  with pytest.raises( IndexError ):
+    program.run( [ 7, 9, 1, 1 ], [ 0 ] )
+  with pytest.raises( IndexError ):
+    program.run_batch( np.array( [ [ 7, 9, 1, 1 ] ] ), np.array( [ [ 0 ] ] ) )
+
+def test_unsupported_opcode():
+  # An opcode without semantics is rejected at compile time instead of
+  # being evaluated as a no-op.
+  dfg = DFG( fir_json, mk_const( range( 6 ) ), [ 0 ] * 100 )
+  dfg.nodes[0].opt = Bits6( 15 )
+  with pytest.raises( NotImplementedError ):
+    CompiledDFG( dfg, 16 )
+
+def test_atomics( tmp_path ):
+  import numpy as np
+  # n0 atomically updates spm[const0] with const1, and its old value is
+  # stored to spm[const2].
+  dfg = [
+    { 'fu': 'MemUnit', 'id': 0, 'opt': 'OPT_NAH', 'opt_predicate': 0,
+      'in_const': [ 0, 1 ], 'in': [], 'in_predicate': [], 'out': [ [ 1 ] ] },
+    { 'fu': 'MemUnit', 'id': 1, 'opt': 'OPT_STR', 'opt_predicate': 0,
+      'in_const': [ 2 ], 'in': [ 0 ], 'in_predicate': [], 'out': [ [ 2 ] ] },
+    { 'fu': 'Branch', 'id': 2, 'opt': 'OPT_BRH', 'opt_predicate': 0,
+      'in_const': [ 3 ], 'in': [ 1 ], 'in_predicate': [], 'out': [ [], [] ],
+      'live_out_ctrl': [] },
+  ]
+  path = tmp_path / "dfg_atomic.json"
+  path.write_text( json.dumps( dfg ) )
+  cases = [
+    ( OPT_ATOMIC_ADD, 3,      8 ),
+    ( OPT_ATOMIC_ADD, 0xffff, 4 ),
+    ( OPT_ATOMIC_MIN, 3,      3 ),
+    ( OPT_ATOMIC_MIN, 7,      5 ),
+    ( OPT_ATOMIC_MAX, 7,      7 ),
+    # Unsigned comparison, i.e., 0xffff is not -1.
+    ( OPT_ATOMIC_MAX, 0xffff, 0xffff ),
+  ]
+  for opt, operand, expected in cases:
+    fu_dfg = DFG( str( path ), mk_const( range( 4 ) ), [ 0, 0 ] )
+    fu_dfg.nodes[0].opt = opt
+    program = CompiledDFG( fu_dfg, 16 )
+    _, _, spm, _ = program.run( [ 0, operand, 1, 1 ], [ 5, 9 ] )
+    assert spm == [ expected, 5 ], OPT_SYMBOL_DICT[opt]
+    _, _, spms, _ = program.run_batch( np.array( [ [ 0, operand, 1, 1 ] ] ),
+                                       np.array( [ [ 5, 9 ] ] ) )
+    assert [ int( v ) for v in spms[0] ] == [ expected, 5 ], \
+      OPT_SYMBOL_DICT[opt]
@@ -10,8 +10,6 @@ Author : Cheng Tan
 """
 
 from pymtl3 import *
-from pymtl3.stdlib.test_utils import (run_sim,
-                                      config_model_with_cmdline_opts)
 from pymtl3.passes.backends.verilog import (VerilogTranslationPass,
                                             VerilogVerilatorImportPass)
 from ..CgraRTL import CgraRTL
@@ -32,6 +30,12 @@ from ...lib.messages import *
 from ...lib.cmd_type import *
 from ...lib.opt_type import *
 from ...lib.basic.val_rdy.SourceRTL import SourceRTL as TestSrcRTL
+from ...lib.util.build_cache import config_model_with_cmdline_opts
+from ...lib.util.ctrl_helper import (compress_ctrl_pkts,
+                                     merge_multicast_ctrl_pkts)
+from ...lib.util.mem_image import preload_sim_memories
+from ...lib.util.sim_trace import run_sim
+from .CgraCL_test import mk_load_add_store
 
 #-------------------------------------------------------------------------
 # Test harness
@@ -46,9 +50,13 @@ class TestHarness(Component):
                 data_mem_size_per_bank, num_banks_per_cgra,
                 num_registers_per_reg_bank,
                 src_ctrl_pkt, ctrl_steps, topology, controller2addr_map,
-                idTo2d_map):
+                idTo2d_map, perf_counters = False, ctrl_multicast = False,
+                loop_ctrl = False, ctrl_dict_size = 0, total_steps = None,
+                preload_data = None, mem_atomics = False):
 
     s.num_tiles = width * height
+    if total_steps is None:
+      total_steps = ctrl_steps
     s.src_ctrl_pkt = TestSrcRTL(CtrlPktType, src_ctrl_pkt)
     s.dut = DUT(DataType, PredicateType, CtrlPktType, CtrlSignalType,
                 NocPktType, CmdType, ControllerIdType,
@@ -58,11 +66,18 @@ class TestHarness(Component):
                 controller_id, width, height, ctrl_mem_size,
                 data_mem_size_global, data_mem_size_per_bank,
                 num_banks_per_cgra, num_registers_per_reg_bank,
-                ctrl_steps, ctrl_steps, FunctionUnit,
-                FuList, topology, controller2addr_map, idTo2d_map)
+                ctrl_steps, total_steps, FunctionUnit,
+                FuList, topology, controller2addr_map, idTo2d_map,
+                preload_data = preload_data,
+                perf_counters = perf_counters,
+                ctrl_multicast = ctrl_multicast,
+                loop_ctrl = loop_ctrl,
+                ctrl_dict_size = ctrl_dict_size,
+                mem_atomics = mem_atomics)
 
     # Connections
     s.src_ctrl_pkt.send //= s.dut.recv_from_cpu_ctrl_pkt
+    s.dut.send_to_cpu_ctrl_pkt.rdy //= 1
 
     s.dut.send_to_noc.rdy //= 0
     s.dut.recv_from_noc.val //= 0
@@ -92,7 +107,15 @@ class TestHarness(Component):
   def line_trace(s):
     return s.dut.line_trace()
 
-def init_param(topology, FuList = [MemUnitRTL, AdderRTL], data_bitwidth = 32):
+def init_param(topology, FuList = [MemUnitRTL, AdderRTL], data_bitwidth = 32,
+               perf_counters = False, ctrl_multicast = False,
+               loop_ctrl = False, ctrl_dict_size = 0, src_ctrl_pkt = None,
+               ctrl_steps = None, total_steps = None, preload_data = None,
+               mem_atomics = False):
+  # The given `src_ctrl_pkt` (e.g., a kernel that fires the FUs) is sent
+  # instead of the default one below, whose tiles iterate over
+  # `ctrl_steps` ctrl signals for `total_steps` steps on the data memory
+  # preloaded with `preload_data` (see mem/data/DataMemWithCrossbarRTL.py).
   tile_ports = 4
   assert(topology == "Mesh" or topology == "KingMesh")
   if topology == "Mesh":
@@ -111,7 +134,10 @@ def init_param(topology, FuList = [MemUnitRTL, AdderRTL], data_bitwidth = 32):
   width = 2
   height = 2
   num_terminals = 4
-  num_ctrl_actions = 6
+  # The perf counter commands need a 4-bit ctrl_action, and the loop
+  # descriptor and dictionary ones a 5-bit one.
+  num_ctrl_actions = 32 if loop_ctrl or ctrl_dict_size else \
+                     16 if perf_counters else 6
   num_ctrl_operations = 64
   num_registers_per_reg_bank = 16
   TileInType = mk_bits(clog2(num_tile_inports + 1))
@@ -153,7 +179,8 @@ def init_param(topology, FuList = [MemUnitRTL, AdderRTL], data_bitwidth = 32):
                                num_tile_inports,
                                num_tile_outports,
                                num_registers_per_reg_bank,
-                               data_bitwidth)
+                               data_bitwidth,
+                               multicast = ctrl_multicast)
   CtrlSignalType = \
       mk_separate_reg_ctrl(num_ctrl_operations,
                            num_fu_inports,
@@ -200,9 +227,23 @@ def init_param(topology, FuList = [MemUnitRTL, AdderRTL], data_bitwidth = 32):
                   pick_register, tile_in_code, fu_out_code)
       ] for i in range(num_tiles)]
   
-  src_ctrl_pkt = []
-  for opt_per_tile in src_opt_per_tile:
-    src_ctrl_pkt.extend(opt_per_tile)
+  if loop_ctrl:
+    # The first 3 ctrl signals form the steady state, which runs twice.
+    for i, opt_per_tile in enumerate(src_opt_per_tile):
+      opt_per_tile[-1:-1] = [
+          CtrlPktType(0, i, 0, 0, CMD_LOOP_STEADY, data = 3),
+          CtrlPktType(0, i, 0, 0, CMD_LOOP_TRIP_COUNT, 0, data = 2)]
+
+  if src_ctrl_pkt is None:
+    src_ctrl_pkt = []
+    for opt_per_tile in src_opt_per_tile:
+      src_ctrl_pkt.extend(opt_per_tile)
+  if ctrl_steps is None:
+    ctrl_steps = ctrl_mem_size
+  if ctrl_dict_size:
+    src_ctrl_pkt = compress_ctrl_pkts(src_ctrl_pkt, ctrl_dict_size)
+  if ctrl_multicast:
+    src_ctrl_pkt = merge_multicast_ctrl_pkts(src_ctrl_pkt)
 
   th = TestHarness(DUT, FunctionUnit, FuList, DataType, PredicateType,
                    CtrlPktType, CtrlSignalType, NocPktType, CmdType,
@@ -210,8 +251,10 @@ def init_param(topology, FuList = [MemUnitRTL, AdderRTL], data_bitwidth = 32):
                    ctrl_mem_size, data_mem_size_global,
                    data_mem_size_per_bank, num_banks_per_cgra,
                    num_registers_per_reg_bank,
-                   src_ctrl_pkt, ctrl_mem_size, topology,
-                   controller2addr_map, idTo2d_map)
+                   src_ctrl_pkt, ctrl_steps, topology,
+                   controller2addr_map, idTo2d_map, perf_counters,
+                   ctrl_multicast, loop_ctrl, ctrl_dict_size, total_steps,
+                   preload_data, mem_atomics)
   return th
 
 def test_homogeneous_2x2(cmdline_opts):
@@ -270,3 +313,195 @@ def test_vector_king_mesh_2x2(cmdline_opts):
   th = config_model_with_cmdline_opts(th, cmdline_opts, duts = ['dut'])
   run_sim(th)
 
+
+def test_backdoor_load(cmdline_opts):
+  topology = "Mesh"
+  th_ring = init_param(topology)
+  th_ring.elaborate()
+  th_ring = config_model_with_cmdline_opts(th_ring, cmdline_opts, duts = ['dut'])
+  th_ring.apply(DefaultPassGroup())
+  th_ring.sim_reset()
+  # Delivers the ctrl packets through the controller and the ctrl ring.
+  ncycles = 0
+  while not (th_ring.done() and \
+             all(tile.ctrl_mem.start_iterate_ctrl for tile in th_ring.dut.tile)):
+    th_ring.sim_tick()
+    ncycles += 1
+    assert ncycles < 100
+
+  th = init_param(topology)
+  th.elaborate()
+  pkts = th.src_ctrl_pkt.msgs
+  th.src_ctrl_pkt.msgs = []
+  th = config_model_with_cmdline_opts(th, cmdline_opts, duts = ['dut'])
+  th.apply(DefaultPassGroup())
+  th.sim_reset()
+  th.dut.backdoor_load(pkts)
+  th.sim_eval_combinational()
+
+  for tile, tile_ring in zip(th.dut.tile, th_ring.dut.tile):
+    assert tile.ctrl_mem.start_iterate_ctrl == 1
+    assert tile.ctrl_mem.reg_file.regs == tile_ring.ctrl_mem.reg_file.regs
+    assert tile.const_mem.wr_cur == tile_ring.const_mem.wr_cur
+  assert th.dut.data_mem.init_mem_done == 1
+
+  # The kernel proceeds right away.
+  th.sim_tick()
+  assert any(tile.ctrl_mem.times == 1 for tile in th.dut.tile)
+
+def test_snapshot_restore(cmdline_opts):
+  from ...lib.util.sim_snapshot import snapshot, restore
+  topology = "Mesh"
+  th = init_param(topology)
+  th.elaborate()
+  th = config_model_with_cmdline_opts(th, cmdline_opts, duts = ['dut'])
+  th.apply(DefaultPassGroup())
+  th.sim_reset()
+  while not th.done():
+    th.sim_tick()
+  snap = snapshot(th)
+  for _ in range(20):
+    th.sim_tick()
+
+  fresh = init_param(topology)
+  fresh.elaborate()
+  fresh = config_model_with_cmdline_opts(fresh, cmdline_opts, duts = ['dut'])
+  fresh.apply(DefaultPassGroup())
+  fresh.sim_reset()
+  restore(fresh, snap)
+  assert fresh.done()
+  for _ in range(20):
+    fresh.sim_tick()
+  assert snapshot(fresh) == snapshot(th)
+
+def test_perf_counters(cmdline_opts):
+  # Tile 0 loads/stores and tile 1 adds (see CgraCL_test.py) for 10 steps,
+  # while tiles 2 and 3 stay idle.
+  CtrlPktType = mk_intra_cgra_pkt(4, 16, 6, 64, 4, 2, 4, 4, 16, 32)
+  DataType = mk_data(32, 1)
+  preload = [[DataType(i * 10, 1) for i in range(32)] for _ in range(2)]
+  th = init_param("Mesh", perf_counters = True,
+                  src_ctrl_pkt = mk_load_add_store(3, 20, 7, CtrlPktType),
+                  ctrl_steps = 2, total_steps = 10, preload_data = preload)
+  th.elaborate()
+  th = config_model_with_cmdline_opts(th, cmdline_opts, duts = ['dut'])
+  th.apply(DefaultPassGroup())
+  th.sim_reset()
+  preload_sim_memories(th)
+  while not th.done():
+    th.sim_tick()
+  for _ in range(40):
+    th.sim_tick()
+
+  # Reads all the counters of every tile through the controller, one at
+  # a time.
+  counters = []
+  for i in range(th.dut.num_tiles):
+    counters.append([])
+    for counter in range(NUM_PERF_COUNTERS):
+      th.src_ctrl_pkt.msgs.append(
+          CtrlPktType(0, i, ctrl_action = CMD_PERF_READ_REQUEST,
+                      data = counter))
+      ncycles = 0
+      while not th.dut.send_to_cpu_ctrl_pkt.val:
+        th.sim_tick()
+        ncycles += 1
+        assert ncycles < 50
+      pkt = th.dut.send_to_cpu_ctrl_pkt.msg
+      assert pkt.ctrl_action == CMD_PERF_READ_RESPONSE
+      assert pkt.src == i
+      counters[i].append(int(pkt.data))
+      th.sim_tick()
+
+  # Each of the 10 steps is fired unless the FU waits for its operands
+  # (the ADD for the loaded value and the STR for the sum), and the
+  # memory serves the single load and store without stalls.
+  #            CTRL_VALID, ELEMENT_FIRED, OPT_STALL, XBAR_BP, MEM_STALL
+  expected = [[10,         6,             4,         0,       0],
+              [10,         6,             4,         0,       0],
+              [0,          0,             0,         0,       0],
+              [0,          0,             0,         0,       0]]
+  assert counters == expected
+  assert th.dut.data_mem.diff_array(
+      [word for bank in preload for word in bank]) == [20]
+
+def test_ctrl_multicast(cmdline_opts):
+  th = init_param("Mesh", ctrl_multicast = True)
+  th.elaborate()
+  # The same configs of the 4 tiles are sent once for all of them.
+  assert len(th.src_ctrl_pkt.msgs) == 7
+  assert all(pkt.dst_mask == 0b1111 for pkt in th.src_ctrl_pkt.msgs)
+
+  th = config_model_with_cmdline_opts(th, cmdline_opts, duts = ['dut'])
+  run_sim(th)
+
+def test_loop_ctrl(cmdline_opts):
+  th = init_param("Mesh", loop_ctrl = True)
+  th.elaborate()
+  th = config_model_with_cmdline_opts(th, cmdline_opts, duts = ['dut'])
+  th.apply(DefaultPassGroup())
+  th.sim_reset()
+  ncycles = 0
+  while not (th.done() and \
+             all(tile.ctrl_mem.start_iterate_ctrl for tile in th.dut.tile)):
+    th.sim_tick()
+    ncycles += 1
+    assert ncycles < 100
+
+  # The loop descriptor is delivered to the ctrl memory of every tile
+  # along with the ctrl signals.
+  for tile in th.dut.tile:
+    assert tile.ctrl_mem.loop_steady == 3
+    assert tile.ctrl_mem.loop_trip_count[0] == 2
+    assert tile.ctrl_mem.loop_trip_count[1] == 0
+
+def test_ctrl_dict(cmdline_opts):
+  th = init_param("Mesh", ctrl_multicast = True, ctrl_dict_size = 4)
+  th.elaborate()
+  # The 3 distinct ctrl signals and the 4 runs of the 6 ctrl addresses
+  # are sent once for all the tiles.
+  assert [pkt.ctrl_action for pkt in th.src_ctrl_pkt.msgs] == \
+         [CMD_CONFIG_DICT] * 3 + [CMD_CONFIG_RUN] * 4 + [CMD_LAUNCH]
+  assert all(pkt.dst_mask == 0b1111 for pkt in th.src_ctrl_pkt.msgs)
+
+  th = config_model_with_cmdline_opts(th, cmdline_opts, duts = ['dut'])
+  th.apply(DefaultPassGroup())
+  th.sim_reset()
+  ncycles = 0
+  while not (th.done() and \
+             all(tile.ctrl_mem.start_iterate_ctrl for tile in th.dut.tile)):
+    th.sim_tick()
+    ncycles += 1
+    assert ncycles < 100
+
+  # Every tile looks up the same ctrl signals as the uncompressed ones.
+  for tile in th.dut.tile:
+    assert list(tile.ctrl_mem.to_array()['ctrl']) == \
+           [OPT_INC, OPT_INC, OPT_ADD, OPT_STR, OPT_ADD, OPT_ADD]
+
+def test_translation_shares_tile_modules():
+  # Tiles of the same parameterization are translated into one module.
+  th = init_param("Mesh")
+  th.elaborate()
+  th.dut.set_metadata(VerilogTranslationPass.enable, True)
+  th.apply(VerilogTranslationPass())
+  with open(th.dut.get_metadata(VerilogTranslationPass.translated_filename)) as fd:
+    src = fd.read()
+  assert src.count("module TileRTL") == 1
+
+  # While the heterogeneous tile gets its own one.
+  th = init_param("KingMesh")
+  th.set_param("top.dut.tile[1].construct", FuList=[ShifterRTL])
+  th.elaborate()
+  th.dut.set_metadata(VerilogTranslationPass.enable, True)
+  th.apply(VerilogTranslationPass())
+  with open(th.dut.get_metadata(VerilogTranslationPass.translated_filename)) as fd:
+    src = fd.read()
+  assert src.count("module TileRTL") == 2
+
+  # The multicast ctrl packets (of an extra dst_mask field) translate too.
+  th = init_param("Mesh", ctrl_multicast = True)
+  th.elaborate()
+  th.dut.set_metadata(VerilogTranslationPass.enable, True)
+  th.apply(VerilogTranslationPass())
+  assert th.dut.get_metadata(VerilogTranslationPass.translated)
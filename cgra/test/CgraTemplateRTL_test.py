@@ -12,14 +12,14 @@ Author : Cheng Tan
 from pymtl3 import *
 from pymtl3.passes.backends.verilog import (VerilogTranslationPass,
                                             VerilogVerilatorImportPass)
-from pymtl3.stdlib.test_utils import (run_sim,
-                                      config_model_with_cmdline_opts)
 from ..CgraTemplateRTL import CgraTemplateRTL
 from ...lib.basic.val_rdy.SourceRTL import SourceRTL as TestSrcRTL
 from ...lib.messages import *
 from ...lib.cmd_type import *
 from ...lib.opt_type import *
 from ...lib.util.common import *
+from ...lib.util.build_cache import config_model_with_cmdline_opts
+from ...lib.util.sim_trace import run_sim
 from ...fu.flexible.FlexibleFuRTL import FlexibleFuRTL
 from ...fu.single.AdderRTL import AdderRTL
 from ...fu.single.BranchRTL import BranchRTL
@@ -0,0 +1,17 @@
+"""
+==========================================================================
+conftest.py
+==========================================================================
+Reports the hits/misses of the translation/Verilator build cache (see
+lib/util/build_cache.py) at the end of the session.
+
+Author : agent
+  Date : Oct 18, 2026
+"""
+
+def pytest_terminal_summary( terminalreporter ):
+  from .lib.util import build_cache
+  cache = build_cache._default_cache
+  if cache is not None and ( cache.hits or cache.misses ):
+    terminalreporter.write_sep( "=", "build cache" )
+    terminalreporter.write_line( cache.report() )
@@ -4,6 +4,47 @@ ControllerRTL.py
 ==========================================================================
 Simple controller for CGRA.
 
+If the data memory has MSHR entries (i.e., non-blocking remote loads),
+`num_mshr_entries` > 0 and the loads are tagged: the MSHR entry carried
+by the opaque field of a load request is echoed by its response, which
+is routed back to the requesting CGRA and handed over to the data
+memory as a packet (instead of the data only).
+
+If `dma` is set, the controller consumes the CMD_DMA_* ctrl packets from
+CPU (see lib/cmd_type.py) and performs the block transfer on its own:
+the words are read from the local memory one per cycle through the
+controller's port of the data memory, and each of them is sent out as a
+CMD_STORE_REQUEST towards the destination address.
+
+The atomic requests (see lib/cmd_type.py) of the local tiles are sent
+out as they are, and the ones from NoC are served by the port of the data
+memory for the load requests from NoC, whose atomic operation and operand
+(`send_to_tile_atomic_*`) are queued along with the address.
+
+If `mem_swap` is set, the controller consumes the CMD_SWAP_BUFFER ctrl
+packets from CPU and swaps the halves of the double-buffered data memory
+(`send_to_mem_swap`), once its ongoing DMA transfer (if any) is issued.
+
+If `ctrl_multicast` is set, the ctrl packets from CPU with a non-zero
+`dst_mask` (see mk_intra_cgra_pkt) are expanded into one packet per
+selected tile over the ctrl ring, one per cycle (from the lowest tile id),
+so that the CPU sends the packet shared by the tiles once. Each tile still
+receives its packets in order, as they all take the same path from the
+controller.
+
+If the tiles hold `num_ctrl_contexts` > 1 named ctrl contexts, the
+controller keeps the table of the contexts loaded by the CMD_CONFIG
+packets from CPU, and consumes the CMD_SWITCH_CONTEXT packets by sending
+the CMD_LAUNCH packets of the (loaded) context to its `num_tiles` tiles
+over the ctrl ring, one per cycle. The ones towards the contexts not
+loaded yet are sent back to CPU. A context is loaded once each of the
+tiles received a CMD_CONFIG packet of it (so the idle tiles of a kernel
+take one as well, e.g., of OPT_NAH), and the first CMD_CONFIG packet of
+a context that has been switched to since it was loaded starts loading
+another kernel into it, i.e., the context is not loaded until each tile
+received its part again. As the tiles are not tracked per ctrl signal,
+the CPU sends the CMD_SWITCH_CONTEXT packet after the whole kernel.
+
 Author : Cheng Tan
   Date : Dec 2, 2024
 """
@@ -23,13 +64,36 @@ class ControllerRTL(Component):
   def construct(s, ControllerIdType, CmdType, CtrlPktType, NocPktType,
                 CGRADataType, CGRAAddrType, multi_cgra_rows,
                 multi_cgra_columns, controller_id, controller2addr_map,
-                idTo2d_map):
+                idTo2d_map, num_mshr_entries = 0, dma = False,
+                mem_swap = False, ctrl_multicast = False,
+                num_ctrl_contexts = 1, num_tiles = 1):
 
     assert(multi_cgra_columns >= multi_cgra_rows)
 
     # Used for calculating the x/y position.
     XType = mk_bits(max(clog2(multi_cgra_columns), 1))
     YType = mk_bits(max(clog2(multi_cgra_rows), 1))
+    tagged_load = num_mshr_entries > 0
+    # The load requests from NoC are tracked (in order) if their responses
+    # need the tags or are interleaved with the ones of the DMA reads.
+    track_noc_load = tagged_load or dma
+    CtrlActionType = CtrlPktType.get_field_type('ctrl_action')
+    AtomicOpType = mk_bits(ATOMIC_OP_NBITS)
+    if dma:
+      assert CtrlActionType.nbits >= clog2(CMD_DMA_LAUNCH + 1), \
+             "DMA requires a ctrl_action field of at least 4 bits"
+      assert CtrlPktType.get_field_type('data').nbits >= CGRAAddrType.nbits
+    if mem_swap:
+      assert CtrlActionType.nbits >= clog2(CMD_SWAP_BUFFER + 1), \
+             "Swapping requires a ctrl_action field of at least 5 bits"
+    ctx_table = num_ctrl_contexts > 1
+    if ctx_table:
+      assert CtrlActionType.nbits >= clog2(CMD_SWITCH_CONTEXT + 1), \
+             "Switching requires a ctrl_action field of at least 5 bits"
+    CtxType = mk_bits(max(clog2(num_ctrl_contexts), 1))
+    TileIdType = CtrlPktType.get_field_type('dst')
+    TileCountType = mk_bits(clog2(num_tiles + 1))
+    TileMaskType = mk_bits(num_tiles)
 
     # Interface
     # Request from/to other CGRA via NoC.
@@ -39,23 +103,38 @@ class ControllerRTL(Component):
     s.recv_from_cpu_ctrl_pkt = RecvIfcRTL(CtrlPktType)
     s.send_to_ctrl_ring_ctrl_pkt = SendIfcRTL(CtrlPktType)
 
+    # Responses from tiles (e.g., perf counters) towards CPU.
+    s.recv_from_ctrl_ring_ctrl_pkt = RecvIfcRTL(CtrlPktType)
+    s.send_to_cpu_ctrl_pkt = SendIfcRTL(CtrlPktType)
+
     # Request from/to tiles.
     s.recv_from_tile_load_request_pkt = RecvIfcRTL(NocPktType)
     s.recv_from_tile_load_response_pkt = RecvIfcRTL(NocPktType)
     s.recv_from_tile_store_request_pkt = RecvIfcRTL(NocPktType)
 
     s.send_to_tile_load_request_addr = SendIfcRTL(CGRAAddrType)
+    # The atomic operation along with the above.
+    s.send_to_tile_atomic_op = OutPort(AtomicOpType)
+    s.send_to_tile_atomic_data = OutPort(CGRADataType)
     s.send_to_tile_load_response_data = SendIfcRTL(CGRADataType)
+    # Tagged load response, used instead of the above if the loads are tagged.
+    s.send_to_tile_load_response_pkt = SendIfcRTL(NocPktType)
     s.send_to_tile_store_request_addr = SendIfcRTL(CGRAAddrType)
     s.send_to_tile_store_request_data = SendIfcRTL(CGRADataType)
 
+    # Swaps the halves of the double-buffered data memory.
+    s.send_to_mem_swap = OutPort(b1)
+
     # Component
     s.recv_from_tile_load_request_pkt_queue = ChannelRTL(NocPktType, latency = 1)
     s.recv_from_tile_load_response_pkt_queue = ChannelRTL(NocPktType, latency = 1)
     s.recv_from_tile_store_request_pkt_queue = ChannelRTL(NocPktType, latency = 1)
 
     s.send_to_tile_load_request_addr_queue = ChannelRTL(CGRAAddrType, latency = 1)
+    s.send_to_tile_atomic_op_queue = ChannelRTL(AtomicOpType, latency = 1)
+    s.send_to_tile_atomic_data_queue = ChannelRTL(CGRADataType, latency = 1)
     s.send_to_tile_load_response_data_queue = ChannelRTL(CGRADataType, latency = 1)
+    s.send_to_tile_load_response_pkt_queue = ChannelRTL(NocPktType, latency = 1)
     s.send_to_tile_store_request_addr_queue = ChannelRTL(CGRAAddrType, latency = 1)
     s.send_to_tile_store_request_data_queue = ChannelRTL(CGRADataType, latency = 1)
 
@@ -71,6 +150,33 @@ class ControllerRTL(Component):
     s.crossbar = XbarBypassQueueRTL(NocPktType, 3, 1)
 
     s.recv_ctrl_pkt_queue = NormalQueueRTL(CtrlPktType)
+    # The load requests from NoC (or the DMA reads) being served by the
+    # local memory in order, which are needed by the responses if the
+    # loads are tracked. The entries cover the round trip of the local
+    # memory, so that the DMA reads are issued one per cycle.
+    s.noc_load_request_pkt_queue = NormalQueueRTL(NocPktType, 4)
+
+    # DMA descriptor, where a non-zero `dma_remaining` indicates the
+    # ongoing transfer.
+    s.dma_src_addr = Wire(CGRAAddrType)
+    s.dma_dst_addr = Wire(CGRAAddrType)
+    s.dma_stride = Wire(CGRAAddrType)
+    s.dma_remaining = Wire(CGRAAddrType)
+    s.dma_cmd = Wire(b1)
+    s.dma_issue = Wire(b1)
+    s.swap_cmd = Wire(b1)
+    s.send_to_cpu_ctrl_pkt_queue = NormalQueueRTL(CtrlPktType)
+
+    # The switch of the ctrl contexts, where a non-zero
+    # `ctx_switch_remaining` indicates the CMD_LAUNCH packets being sent
+    # out (based on the latched `ctx_switch_pkt`).
+    s.ctx_switch_cmd = Wire(b1)
+    s.ctx_switch_resident = Wire(b1)
+    s.ctx_switch_pkt = Wire(CtrlPktType)
+    s.ctx_switch_dst = Wire(TileIdType)
+    s.ctx_switch_remaining = Wire(TileCountType)
+    s.ctx_switch_busy = Wire(b1)
+    s.ctx_bounce = Wire(b1)
 
     # # TODO: below ifcs should be connected through another NoC within
     # # one CGRA, instead of per-tile and performing like a bus.
@@ -120,7 +226,13 @@ class ControllerRTL(Component):
 
     # Requests towards local from others, 1 cycle delay to improve timing.
     s.send_to_tile_load_request_addr_queue.send //= s.send_to_tile_load_request_addr
+    # The atomic operation is enqueued/dequeued along with the address.
+    s.send_to_tile_atomic_op_queue.send.msg //= s.send_to_tile_atomic_op
+    s.send_to_tile_atomic_op_queue.send.rdy //= s.send_to_tile_load_request_addr.rdy
+    s.send_to_tile_atomic_data_queue.send.msg //= s.send_to_tile_atomic_data
+    s.send_to_tile_atomic_data_queue.send.rdy //= s.send_to_tile_load_request_addr.rdy
     s.send_to_tile_load_response_data_queue.send //= s.send_to_tile_load_response_data
+    s.send_to_tile_load_response_pkt_queue.send //= s.send_to_tile_load_response_pkt
     s.send_to_tile_store_request_addr_queue.send //= s.send_to_tile_store_request_addr
     s.send_to_tile_store_request_data_queue.send //= s.send_to_tile_store_request_data
 
@@ -132,7 +244,238 @@ class ControllerRTL(Component):
     # format can be in a universal fashion to support both data and config. Later
     # on, the format can be packet-based or flit-based.
     s.recv_from_cpu_ctrl_pkt //= s.recv_ctrl_pkt_queue.recv
-    s.recv_ctrl_pkt_queue.send //= s.send_to_ctrl_ring_ctrl_pkt
+
+    # The multicast packet at the head of the queue, where `multicast_sent`
+    # indicates the tiles it has been sent to. `ring_ctrl_pkt` is the
+    # packet towards the ring, i.e., its copy towards `multicast_dst` (the
+    # lowest of the remaining tiles) if it is a multicast one.
+    s.multicast_cmd = Wire(b1)
+    s.multicast_sent = Wire(TileMaskType)
+    s.multicast_remaining = Wire(TileMaskType)
+    s.multicast_next = Wire(TileMaskType)
+    s.multicast_dst = Wire(TileIdType)
+    s.multicast_last = Wire(b1)
+    s.ring_ctrl_pkt = Wire(CtrlPktType)
+
+    if ctrl_multicast:
+      @update
+      def update_multicast_cmd():
+        s.multicast_cmd @= s.recv_ctrl_pkt_queue.send.msg.dst_mask != 0
+        for t in range(num_tiles):
+          s.multicast_remaining[t] @= s.recv_ctrl_pkt_queue.send.msg.dst_mask[t] & \
+                                      ~s.multicast_sent[t]
+        s.multicast_next @= s.multicast_remaining & (TileMaskType(0) - s.multicast_remaining)
+        s.multicast_last @= s.multicast_next == s.multicast_remaining
+        s.multicast_dst @= 0
+        for t in range(num_tiles):
+          if s.multicast_next[t]:
+            s.multicast_dst @= TileIdType(t)
+
+        s.ring_ctrl_pkt @= s.recv_ctrl_pkt_queue.send.msg
+        if s.multicast_cmd:
+          s.ring_ctrl_pkt.dst @= s.multicast_dst
+          s.ring_ctrl_pkt.dst_mask @= 0
+
+      @update_ff
+      def update_multicast_sent():
+        if s.reset | (s.recv_ctrl_pkt_queue.send.val & s.recv_ctrl_pkt_queue.send.rdy):
+          s.multicast_sent <<= 0
+        elif s.multicast_cmd & ~s.ctx_switch_busy & \
+             s.send_to_ctrl_ring_ctrl_pkt.val & s.send_to_ctrl_ring_ctrl_pkt.rdy:
+          s.multicast_sent <<= s.multicast_sent | s.multicast_next
+
+    else:
+      s.multicast_cmd //= 0
+      s.multicast_sent //= 0
+      s.multicast_remaining //= 0
+      s.multicast_next //= 0
+      s.multicast_dst //= 0
+      s.multicast_last //= 1
+      s.ring_ctrl_pkt //= s.recv_ctrl_pkt_queue.send.msg
+
+    if ctx_table:
+      # The tiles each of the contexts is loaded into, whether it is
+      # loaded into all of them, and whether it has been switched to
+      # since then.
+      s.ctx_loaded = [Wire(TileMaskType) for _ in range(num_ctrl_contexts)]
+      s.ctx_resident = [Wire(b1) for _ in range(num_ctrl_contexts)]
+      s.ctx_launched = [Wire(b1) for _ in range(num_ctrl_contexts)]
+      # The tiles the packet from CPU is sent to.
+      s.config_tiles = Wire(TileMaskType)
+
+      @update
+      def update_ctx_resident():
+        for c in range(num_ctrl_contexts):
+          s.ctx_resident[c] @= s.ctx_loaded[c] == TileMaskType((1 << num_tiles) - 1)
+
+      if ctrl_multicast:
+        @update
+        def update_config_tiles():
+          for t in range(num_tiles):
+            s.config_tiles[t] @= s.recv_ctrl_pkt_queue.send.msg.dst == TileIdType(t)
+            if s.multicast_cmd:
+              s.config_tiles[t] @= s.recv_ctrl_pkt_queue.send.msg.dst_mask[t]
+      else:
+        @update
+        def update_config_tiles():
+          for t in range(num_tiles):
+            s.config_tiles[t] @= s.recv_ctrl_pkt_queue.send.msg.dst == TileIdType(t)
+
+      @update
+      def update_ctx_switch_cmd():
+        s.ctx_switch_cmd @= s.recv_ctrl_pkt_queue.send.msg.ctrl_action == \
+                            CtrlActionType(CMD_SWITCH_CONTEXT)
+        s.ctx_switch_resident @= 0
+        for c in range(num_ctrl_contexts):
+          if trunc(s.recv_ctrl_pkt_queue.send.msg.data, CtxType) == CtxType(c):
+            s.ctx_switch_resident @= s.ctx_resident[c]
+        s.ctx_switch_busy @= s.ctx_switch_remaining != TileCountType(0)
+        s.ctx_bounce @= s.recv_ctrl_pkt_queue.send.val & s.ctx_switch_cmd & \
+                        ~s.ctx_switch_resident
+
+      @update_ff
+      def update_ctx_table():
+        if s.reset:
+          s.ctx_switch_dst <<= 0
+          s.ctx_switch_remaining <<= 0
+          for c in range(num_ctrl_contexts):
+            s.ctx_loaded[c] <<= 0
+            s.ctx_launched[c] <<= 0
+        else:
+          if s.recv_ctrl_pkt_queue.send.val & s.recv_ctrl_pkt_queue.send.rdy & \
+             s.ctx_switch_cmd & s.ctx_switch_resident:
+            s.ctx_switch_pkt <<= s.recv_ctrl_pkt_queue.send.msg
+            s.ctx_switch_dst <<= 0
+            s.ctx_switch_remaining <<= TileCountType(num_tiles)
+            for c in range(num_ctrl_contexts):
+              if trunc(s.recv_ctrl_pkt_queue.send.msg.data, CtxType) == CtxType(c):
+                s.ctx_launched[c] <<= 1
+          elif s.ctx_switch_busy & s.send_to_ctrl_ring_ctrl_pkt.rdy:
+            s.ctx_switch_dst <<= s.ctx_switch_dst + TileIdType(1)
+            s.ctx_switch_remaining <<= s.ctx_switch_remaining - TileCountType(1)
+          if s.recv_ctrl_pkt_queue.send.val & s.recv_ctrl_pkt_queue.send.rdy & \
+             (s.recv_ctrl_pkt_queue.send.msg.ctrl_action == CtrlActionType(CMD_CONFIG)):
+            for c in range(num_ctrl_contexts):
+              if trunc(s.recv_ctrl_pkt_queue.send.msg.data, CtxType) == CtxType(c):
+                if s.ctx_launched[c]:
+                  # Overwritten by another kernel.
+                  s.ctx_loaded[c] <<= s.config_tiles
+                  s.ctx_launched[c] <<= 0
+                else:
+                  s.ctx_loaded[c] <<= s.ctx_loaded[c] | s.config_tiles
+
+      # The switches towards the contexts not loaded yet are sent back to
+      # CPU along with the responses from the tiles (which go first).
+      @update
+      def update_send_to_cpu_ctrl_pkt():
+        s.send_to_cpu_ctrl_pkt_queue.recv.val @= s.recv_from_ctrl_ring_ctrl_pkt.val | \
+                                                 s.ctx_bounce
+        s.send_to_cpu_ctrl_pkt_queue.recv.msg @= s.recv_from_ctrl_ring_ctrl_pkt.msg
+        if ~s.recv_from_ctrl_ring_ctrl_pkt.val:
+          s.send_to_cpu_ctrl_pkt_queue.recv.msg @= s.recv_ctrl_pkt_queue.send.msg
+        s.recv_from_ctrl_ring_ctrl_pkt.rdy @= s.send_to_cpu_ctrl_pkt_queue.recv.rdy
+
+    else:
+      s.ctx_switch_cmd //= 0
+      s.ctx_switch_resident //= 0
+      s.ctx_switch_pkt //= CtrlPktType()
+      s.ctx_switch_dst //= 0
+      s.ctx_switch_remaining //= 0
+      s.ctx_switch_busy //= 0
+      s.ctx_bounce //= 0
+      # The CMD_PERF_READ_REQUEST packets are forwarded over the ctrl ring
+      # as above, and the CMD_PERF_READ_RESPONSE packets ejected from the
+      # ctrl ring are handed over to CPU.
+      s.recv_from_ctrl_ring_ctrl_pkt //= s.send_to_cpu_ctrl_pkt_queue.recv
+
+    # The DMA and swap commands are only decoded (and translated) if
+    # enabled, as they may not fit a narrower ctrl_action field otherwise.
+    if dma:
+      @update
+      def decode_dma_cmd():
+        s.dma_cmd @= (s.recv_ctrl_pkt_queue.send.msg.ctrl_action >= CtrlActionType(CMD_DMA_SRC_ADDR)) & \
+                     (s.recv_ctrl_pkt_queue.send.msg.ctrl_action <= CtrlActionType(CMD_DMA_LAUNCH))
+
+      @update_ff
+      def update_dma():
+        if s.reset:
+          s.dma_src_addr <<= 0
+          s.dma_dst_addr <<= 0
+          s.dma_stride <<= 0
+          s.dma_remaining <<= 0
+        elif s.recv_ctrl_pkt_queue.send.val & s.recv_ctrl_pkt_queue.send.rdy & s.dma_cmd:
+          if s.recv_ctrl_pkt_queue.send.msg.ctrl_action == CtrlActionType(CMD_DMA_SRC_ADDR):
+            s.dma_src_addr <<= trunc(s.recv_ctrl_pkt_queue.send.msg.data, CGRAAddrType)
+          elif s.recv_ctrl_pkt_queue.send.msg.ctrl_action == CtrlActionType(CMD_DMA_DST_ADDR):
+            s.dma_dst_addr <<= trunc(s.recv_ctrl_pkt_queue.send.msg.data, CGRAAddrType)
+          elif s.recv_ctrl_pkt_queue.send.msg.ctrl_action == CtrlActionType(CMD_DMA_STRIDE):
+            s.dma_stride <<= trunc(s.recv_ctrl_pkt_queue.send.msg.data, CGRAAddrType)
+          else:
+            s.dma_remaining <<= trunc(s.recv_ctrl_pkt_queue.send.msg.data, CGRAAddrType)
+        elif s.dma_issue:
+          s.dma_src_addr <<= s.dma_src_addr + s.dma_stride
+          s.dma_dst_addr <<= s.dma_dst_addr + CGRAAddrType(1)
+          s.dma_remaining <<= s.dma_remaining - CGRAAddrType(1)
+
+    else:
+      s.dma_cmd //= 0
+      s.dma_src_addr //= 0
+      s.dma_dst_addr //= 0
+      s.dma_stride //= 0
+      s.dma_remaining //= 0
+
+    if mem_swap:
+      @update
+      def decode_swap_cmd():
+        s.swap_cmd @= s.recv_ctrl_pkt_queue.send.msg.ctrl_action == CtrlActionType(CMD_SWAP_BUFFER)
+    else:
+      s.swap_cmd //= 0
+
+    if dma or mem_swap or ctrl_multicast or ctx_table:
+      @update
+      def update_dma_cmd():
+        # The DMA descriptor, the swap and the switch are consumed here,
+        # and the others go to the ring (once the CMD_LAUNCH packets of a
+        # switch are sent), where a multicast packet leaves the queue once
+        # its last copy is sent.
+        s.send_to_ctrl_ring_ctrl_pkt.msg @= s.ring_ctrl_pkt
+        s.send_to_ctrl_ring_ctrl_pkt.val @= s.recv_ctrl_pkt_queue.send.val & \
+                                            ~s.dma_cmd & ~s.swap_cmd & \
+                                            ~s.ctx_switch_cmd & ~s.ctx_switch_busy
+        if s.ctx_switch_busy:
+          s.send_to_ctrl_ring_ctrl_pkt.msg @= s.ctx_switch_pkt
+          s.send_to_ctrl_ring_ctrl_pkt.msg.dst @= s.ctx_switch_dst
+          s.send_to_ctrl_ring_ctrl_pkt.msg.ctrl_action @= CtrlActionType(CMD_LAUNCH)
+          s.send_to_ctrl_ring_ctrl_pkt.val @= 1
+
+        if s.dma_cmd:
+          # The descriptor is not touched during the ongoing transfer.
+          s.recv_ctrl_pkt_queue.send.rdy @= s.dma_remaining == CGRAAddrType(0)
+        elif s.swap_cmd:
+          # The reads of the ongoing transfer enter the memory before it is
+          # swapped.
+          s.recv_ctrl_pkt_queue.send.rdy @= (s.dma_remaining == CGRAAddrType(0)) & \
+                                            ~s.send_to_tile_load_request_addr_queue.send.val
+        elif s.ctx_switch_cmd:
+          if s.ctx_switch_resident:
+            s.recv_ctrl_pkt_queue.send.rdy @= ~s.ctx_switch_busy
+          else:
+            s.recv_ctrl_pkt_queue.send.rdy @= s.send_to_cpu_ctrl_pkt_queue.recv.rdy & \
+                                              ~s.recv_from_ctrl_ring_ctrl_pkt.val
+        elif s.multicast_cmd:
+          s.recv_ctrl_pkt_queue.send.rdy @= s.send_to_ctrl_ring_ctrl_pkt.rdy & \
+                                            ~s.ctx_switch_busy & s.multicast_last
+        else:
+          s.recv_ctrl_pkt_queue.send.rdy @= s.send_to_ctrl_ring_ctrl_pkt.rdy & \
+                                            ~s.ctx_switch_busy
+        s.send_to_mem_swap @= s.recv_ctrl_pkt_queue.send.val & \
+                              s.recv_ctrl_pkt_queue.send.rdy & s.swap_cmd
+
+    else:
+      s.recv_ctrl_pkt_queue.send //= s.send_to_ctrl_ring_ctrl_pkt
+      s.send_to_mem_swap //= 0
+
+    s.send_to_cpu_ctrl_pkt_queue.send //= s.send_to_cpu_ctrl_pkt
 
     @update
     def update_received_msg():
@@ -150,12 +493,14 @@ class ControllerRTL(Component):
                      s.idTo2d_y_lut[controller_id], # src_y
                      0, # dst_x
                      0, # dst_y
+                     # The MSHR entry (if any) of the request.
+                     s.recv_from_tile_load_request_pkt_queue.send.msg.opaque,
                      0,
-                     0,
-                     CMD_LOAD_REQUEST,
+                     # Either a load or an atomic request with its operand.
+                     s.recv_from_tile_load_request_pkt_queue.send.msg.cmd,
                      s.recv_from_tile_load_request_pkt_queue.send.msg.addr,
-                     0,
-                     1,
+                     s.recv_from_tile_load_request_pkt_queue.send.msg.data,
+                     s.recv_from_tile_load_request_pkt_queue.send.msg.predicate,
                      0)
 
 
@@ -183,6 +528,19 @@ class ControllerRTL(Component):
       s.crossbar.recv[kLoadResponseInportIdx].val @= \
           s.recv_from_tile_load_response_pkt_queue.send.val
       s.recv_from_tile_load_response_pkt_queue.send.rdy @= s.crossbar.recv[kLoadResponseInportIdx].rdy
+      s.noc_load_request_pkt_queue.send.rdy @= 0
+      if track_noc_load:
+        # The response is paired with the (oldest) load request being
+        # served.
+        s.crossbar.recv[kLoadResponseInportIdx].val @= \
+            s.recv_from_tile_load_response_pkt_queue.send.val & \
+            s.noc_load_request_pkt_queue.send.val
+        s.recv_from_tile_load_response_pkt_queue.send.rdy @= \
+            s.crossbar.recv[kLoadResponseInportIdx].rdy & \
+            s.noc_load_request_pkt_queue.send.val
+        s.noc_load_request_pkt_queue.send.rdy @= \
+            s.crossbar.recv[kLoadResponseInportIdx].rdy & \
+            s.recv_from_tile_load_response_pkt_queue.send.val
       s.crossbar.recv[kLoadResponseInportIdx].msg @= \
           NocPktType(controller_id,
                      0,
@@ -199,6 +557,20 @@ class ControllerRTL(Component):
                      s.recv_from_tile_load_response_pkt_queue.send.msg.data,
                      s.recv_from_tile_load_response_pkt_queue.send.msg.predicate,
                      0)
+      if tagged_load:
+        # The tagged response goes back to the requester, which is carried
+        # by the src field through the crossbar (whose only outport is
+        # selected by the dst field).
+        s.crossbar.recv[kLoadResponseInportIdx].msg.src @= \
+            s.noc_load_request_pkt_queue.send.msg.src
+        s.crossbar.recv[kLoadResponseInportIdx].msg.opaque @= \
+            s.noc_load_request_pkt_queue.send.msg.opaque
+      if dma:
+        # The response of a DMA read is stored to its destination instead.
+        if s.noc_load_request_pkt_queue.send.msg.cmd == CMD_STORE_REQUEST:
+          s.crossbar.recv[kLoadResponseInportIdx].msg.cmd @= CMD_STORE_REQUEST
+          s.crossbar.recv[kLoadResponseInportIdx].msg.addr @= \
+              s.noc_load_request_pkt_queue.send.msg.addr
 
       # TODO: For the other cmd types.
 
@@ -211,17 +583,43 @@ class ControllerRTL(Component):
       s.send_to_tile_store_request_addr_queue.recv.val @= 0
       s.send_to_tile_store_request_data_queue.recv.val @= 0
       s.send_to_tile_load_response_data_queue.recv.val @= 0
+      s.send_to_tile_load_response_pkt_queue.recv.val @= 0
+      s.noc_load_request_pkt_queue.recv.val @= 0
       s.send_to_tile_load_request_addr_queue.recv.msg @= CGRAAddrType()
+      s.send_to_tile_atomic_op_queue.recv.msg @= AtomicOpType(ATOMIC_NONE)
+      s.send_to_tile_atomic_data_queue.recv.msg @= CGRADataType()
       s.send_to_tile_store_request_addr_queue.recv.msg @= CGRAAddrType()
       s.send_to_tile_store_request_data_queue.recv.msg @= CGRADataType()
       s.send_to_tile_load_response_data_queue.recv.msg @= CGRADataType()
+      s.send_to_tile_load_response_pkt_queue.recv.msg @= s.recv_from_noc.msg
+      s.noc_load_request_pkt_queue.recv.msg @= s.recv_from_noc.msg
       s.recv_from_noc.rdy @= 0
 
       # For the load request from NoC.
       received_pkt = s.recv_from_noc.msg
       if s.recv_from_noc.val:
-        if s.recv_from_noc.msg.cmd == CMD_LOAD_REQUEST:
-          if s.send_to_tile_load_request_addr_queue.recv.rdy:
+        if (s.recv_from_noc.msg.cmd == CMD_LOAD_REQUEST) | \
+           (s.recv_from_noc.msg.cmd == CMD_ATOMIC_ADD_REQUEST) | \
+           (s.recv_from_noc.msg.cmd == CMD_ATOMIC_MIN_REQUEST) | \
+           (s.recv_from_noc.msg.cmd == CMD_ATOMIC_MAX_REQUEST):
+          if s.recv_from_noc.msg.cmd == CMD_ATOMIC_ADD_REQUEST:
+            s.send_to_tile_atomic_op_queue.recv.msg @= AtomicOpType(ATOMIC_ADD)
+          elif s.recv_from_noc.msg.cmd == CMD_ATOMIC_MIN_REQUEST:
+            s.send_to_tile_atomic_op_queue.recv.msg @= AtomicOpType(ATOMIC_MIN)
+          elif s.recv_from_noc.msg.cmd == CMD_ATOMIC_MAX_REQUEST:
+            s.send_to_tile_atomic_op_queue.recv.msg @= AtomicOpType(ATOMIC_MAX)
+          s.send_to_tile_atomic_data_queue.recv.msg @= \
+              CGRADataType(received_pkt.data, received_pkt.predicate, 0, 0)
+          if track_noc_load:
+            # Keeps the request for its response.
+            if s.send_to_tile_load_request_addr_queue.recv.rdy & \
+               s.noc_load_request_pkt_queue.recv.rdy:
+              s.recv_from_noc.rdy @= 1
+              s.send_to_tile_load_request_addr_queue.recv.msg @= \
+                  CGRAAddrType(received_pkt.addr)
+              s.send_to_tile_load_request_addr_queue.recv.val @= 1
+              s.noc_load_request_pkt_queue.recv.val @= 1
+          elif s.send_to_tile_load_request_addr_queue.recv.rdy:
             s.recv_from_noc.rdy @= 1
             s.send_to_tile_load_request_addr_queue.recv.msg @= \
                 CGRAAddrType(received_pkt.addr)
@@ -239,7 +637,12 @@ class ControllerRTL(Component):
             s.send_to_tile_store_request_data_queue.recv.val @= 1
 
         elif s.recv_from_noc.msg.cmd == CMD_LOAD_RESPONSE:
-          if s.send_to_tile_load_response_data_queue.recv.rdy:
+          if tagged_load:
+            # Forwards the whole packet, i.e., including the tag.
+            if s.send_to_tile_load_response_pkt_queue.recv.rdy:
+              s.recv_from_noc.rdy @= 1
+              s.send_to_tile_load_response_pkt_queue.recv.val @= 1
+          elif s.send_to_tile_load_response_data_queue.recv.rdy:
             s.recv_from_noc.rdy @= 1
             s.send_to_tile_load_response_data_queue.recv.msg @= \
                 CGRADataType(received_pkt.data, received_pkt.predicate, 0, 0)
@@ -249,14 +652,55 @@ class ControllerRTL(Component):
         #   # TODO: Handle other cmd types.
         #   assert(False)
 
+      # Issues the next read of the DMA transfer, unless the port towards
+      # the local memory is taken by a load request from NoC.
+      s.dma_issue @= 0
+      if dma:
+        if (s.dma_remaining != CGRAAddrType(0)) & \
+           ~s.send_to_tile_load_request_addr_queue.recv.val & \
+           s.send_to_tile_load_request_addr_queue.recv.rdy & \
+           s.noc_load_request_pkt_queue.recv.rdy:
+          s.send_to_tile_load_request_addr_queue.recv.msg @= s.dma_src_addr
+          s.send_to_tile_load_request_addr_queue.recv.val @= 1
+          s.send_to_tile_atomic_op_queue.recv.msg @= AtomicOpType(ATOMIC_NONE)
+          # Marks the read, whose response is turned into the store.
+          s.noc_load_request_pkt_queue.recv.msg @= \
+              NocPktType(controller_id,
+                         0,
+                         s.idTo2d_x_lut[controller_id], # src_x
+                         s.idTo2d_y_lut[controller_id], # src_y
+                         0, # dst_x
+                         0, # dst_y
+                         0,
+                         0,
+                         CMD_STORE_REQUEST,
+                         s.dma_dst_addr,
+                         0,
+                         1,
+                         0)
+          s.noc_load_request_pkt_queue.recv.val @= 1
+          s.dma_issue @= 1
+
+      s.send_to_tile_atomic_op_queue.recv.val @= \
+          s.send_to_tile_load_request_addr_queue.recv.val
+      s.send_to_tile_atomic_data_queue.recv.val @= \
+          s.send_to_tile_load_request_addr_queue.recv.val
+
 
     @update
     def update_sending_to_noc_msg():
       s.send_to_noc.val @= s.crossbar.send[0].val
       s.crossbar.send[0].rdy @= s.send_to_noc.rdy
       addr_dst_id = s.addr2controller_lut[trunc(s.crossbar.send[0].msg.addr >> addr_offset_nbits, ControllerIdType)]
+      src_id = s.crossbar.send[0].msg.src
+      # The tagged load response already knows its destination, i.e., the
+      # requester, which may not own the address.
+      if tagged_load:
+        if s.crossbar.send[0].msg.cmd == CMD_LOAD_RESPONSE:
+          addr_dst_id = s.crossbar.send[0].msg.src
+          src_id = ControllerIdType(controller_id)
       s.send_to_noc.msg @= \
-          NocPktType(s.crossbar.send[0].msg.src,
+          NocPktType(src_id,
                      addr_dst_id,
                      s.crossbar.send[0].msg.src_x,
                      s.crossbar.send[0].msg.src_y,
@@ -38,7 +38,14 @@ class TestHarness(Component):
                 from_noc_pkts,
                 expected_to_noc_pkts,
                 controller2addr_map,
-                idTo2d_map, num_terminals):
+                idTo2d_map, num_terminals,
+                from_cpu_ctrl_pkts = [], dma = False, mem_swap = False,
+                ctrl_multicast = False, num_ctrl_contexts = 1, num_tiles = 1,
+                expected_to_ctrl_ring_pkts = None,
+                expected_to_cpu_ctrl_pkts = None,
+                num_mshr_entries = 0,
+                expected_to_tile_load_response_pkts = None,
+                expected_to_tile_atomic_msgs = None):
 
     cmp_func = lambda a, b : a == b # a.data == b.data
 
@@ -52,6 +59,7 @@ class TestHarness(Component):
     s.sink_to_tile_store_request_data_en_rdy = TestSinkRTL(MsgType, expected_to_tile_store_request_data_msgs)
 
     s.src_from_noc_val_rdy = TestSrcRTL(PktType, from_noc_pkts)
+    s.src_from_cpu_ctrl_pkt = TestSrcRTL(CtrlPktType, from_cpu_ctrl_pkts)
     s.sink_to_noc_val_rdy = TestNetSinkRTL(PktType, expected_to_noc_pkts, cmp_fn = cmp_func)
 
     s.dut = ControllerRTL(ControllerIdType, CmdType, CtrlPktType,
@@ -60,7 +68,11 @@ class TestHarness(Component):
                           1, num_terminals,
                           controller_id,
                           controller2addr_map,
-                          idTo2d_map)
+                          idTo2d_map, num_mshr_entries = num_mshr_entries,
+                          dma = dma, mem_swap = mem_swap,
+                          ctrl_multicast = ctrl_multicast,
+                          num_ctrl_contexts = num_ctrl_contexts,
+                          num_tiles = num_tiles)
 
     # Connections
     s.src_from_tile_load_request_pkt_en_rdy.send //= s.dut.recv_from_tile_load_request_pkt
@@ -75,9 +87,52 @@ class TestHarness(Component):
     s.src_from_noc_val_rdy.send //= s.dut.recv_from_noc
     s.dut.send_to_noc //= s.sink_to_noc_val_rdy.recv
 
-    s.dut.recv_from_cpu_ctrl_pkt.val //= 0
-    s.dut.recv_from_cpu_ctrl_pkt.msg //= CtrlPktType()
-    s.dut.send_to_ctrl_ring_ctrl_pkt.rdy //= 0
+    s.src_from_cpu_ctrl_pkt.send //= s.dut.recv_from_cpu_ctrl_pkt
+    # The ctrl packets towards the ring/CPU and the tagged load responses
+    # are only checked if expected.
+    s.optional_sinks = []
+    if expected_to_ctrl_ring_pkts is None:
+      s.dut.send_to_ctrl_ring_ctrl_pkt.rdy //= 0
+    else:
+      s.sink_to_ctrl_ring_ctrl_pkt = TestSinkRTL(CtrlPktType, expected_to_ctrl_ring_pkts)
+      s.dut.send_to_ctrl_ring_ctrl_pkt //= s.sink_to_ctrl_ring_ctrl_pkt.recv
+      s.optional_sinks.append(s.sink_to_ctrl_ring_ctrl_pkt)
+    s.dut.recv_from_ctrl_ring_ctrl_pkt.val //= 0
+    s.dut.recv_from_ctrl_ring_ctrl_pkt.msg //= CtrlPktType()
+    if expected_to_cpu_ctrl_pkts is None:
+      s.dut.send_to_cpu_ctrl_pkt.rdy //= 0
+    else:
+      s.sink_to_cpu_ctrl_pkt = TestSinkRTL(CtrlPktType, expected_to_cpu_ctrl_pkts)
+      s.dut.send_to_cpu_ctrl_pkt //= s.sink_to_cpu_ctrl_pkt.recv
+      s.optional_sinks.append(s.sink_to_cpu_ctrl_pkt)
+    if expected_to_tile_load_response_pkts is None:
+      s.dut.send_to_tile_load_response_pkt.rdy //= 0
+    else:
+      s.sink_to_tile_load_response_pkt = \
+          TestSinkRTL(PktType, expected_to_tile_load_response_pkts)
+      s.dut.send_to_tile_load_response_pkt //= s.sink_to_tile_load_response_pkt.recv
+      s.optional_sinks.append(s.sink_to_tile_load_response_pkt)
+    # The atomic operation and operand go along with each load request
+    # towards the local memory, i.e., (op, data) per address.
+    if expected_to_tile_atomic_msgs is not None:
+      AtomicOpType = mk_bits(ATOMIC_OP_NBITS)
+      s.sink_to_tile_atomic_op = \
+          TestSinkRTL(AtomicOpType, [op for op, _ in expected_to_tile_atomic_msgs])
+      s.sink_to_tile_atomic_data = \
+          TestSinkRTL(MsgType, [data for _, data in expected_to_tile_atomic_msgs])
+      s.sink_to_tile_atomic_op.recv.msg //= s.dut.send_to_tile_atomic_op
+      s.sink_to_tile_atomic_data.recv.msg //= s.dut.send_to_tile_atomic_data
+      s.optional_sinks.append(s.sink_to_tile_atomic_op)
+      s.optional_sinks.append(s.sink_to_tile_atomic_data)
+
+      @update
+      def update_atomic_sinks():
+        s.sink_to_tile_atomic_op.recv.val @= \
+            s.dut.send_to_tile_load_request_addr.val & \
+            s.sink_to_tile_load_request_addr_en_rdy.recv.rdy
+        s.sink_to_tile_atomic_data.recv.val @= \
+            s.dut.send_to_tile_load_request_addr.val & \
+            s.sink_to_tile_load_request_addr_en_rdy.recv.rdy
 
   def done(s):
     return s.src_from_tile_load_request_pkt_en_rdy.done() and \
@@ -88,7 +143,9 @@ class TestHarness(Component):
            s.sink_to_tile_store_request_addr_en_rdy.done() and \
            s.sink_to_tile_store_request_data_en_rdy.done() and \
            s.src_from_noc_val_rdy.done() and \
-           s.sink_to_noc_val_rdy.done()
+           s.src_from_cpu_ctrl_pkt.done() and \
+           s.sink_to_noc_val_rdy.done() and \
+           all(sink.done() for sink in s.optional_sinks)
 
   def line_trace(s):
     return s.dut.line_trace()
@@ -254,3 +311,246 @@ def test_simple():
                    controller2addr_map, idTo2d_map,
                    nterminals)
   run_sim(th)
+
+def test_dma():
+  # The DMA descriptor requires ctrl_actions of 4 bits and the data field.
+  DmaCtrlPktType = mk_intra_cgra_pkt(nterminals, 16, ctrl_mem_size,
+                                     num_ctrl_operations, num_fu_inports,
+                                     num_fu_outports, num_tile_inports,
+                                     num_tile_outports, 16, data_nbits)
+  # Copies the words at addresses 4 and 6 (stride 2) of this CGRA to the
+  # addresses 9 and 10, i.e., owned by controller 2.
+  from_cpu_ctrl_pkts = [
+      DmaCtrlPktType(0, 0, ctrl_action = CMD_DMA_SRC_ADDR, data = 4),
+      DmaCtrlPktType(0, 0, ctrl_action = CMD_DMA_DST_ADDR, data = 9),
+      DmaCtrlPktType(0, 0, ctrl_action = CMD_DMA_STRIDE,   data = 2),
+      DmaCtrlPktType(0, 0, ctrl_action = CMD_DMA_LAUNCH,   data = 2),
+  ]
+  expected_to_tile_load_request_addr_msgs = [AddrType(4), AddrType(6)]
+  from_tile_load_response_pkts = [
+      #   src  dst src_x src_y dst_x dst_y opq vc cmd                addr data predicate
+      Pkt(0,   0,  0,    0,    0,    0,    0,  0, CMD_LOAD_RESPONSE, 4,   40,  1),
+      Pkt(0,   0,  0,    0,    0,    0,    0,  0, CMD_LOAD_RESPONSE, 6,   60,  1),
+  ]
+  expected_to_noc_pkts = [
+      #   src  dst src_x src_y dst_x dst_y opq vc cmd                addr data predicate
+      Pkt(1,   2,  1,    0,    2,    0,    0,  0, CMD_STORE_REQUEST, 9,   40,  1),
+      Pkt(1,   2,  1,    0,    2,    0,    0,  0, CMD_STORE_REQUEST, 10,  60,  1),
+  ]
+  th = TestHarness(ControllerIdType, DmaCtrlPktType,
+                   CmdType, DataType,
+                   AddrType, Pkt, controller_id,
+                   [], from_tile_load_response_pkts, [],
+                   expected_to_tile_load_request_addr_msgs,
+                   [], [], [], [],
+                   expected_to_noc_pkts,
+                   controller2addr_map, idTo2d_map,
+                   nterminals, from_cpu_ctrl_pkts, dma = True)
+  run_sim(th)
+
+def test_mem_swap():
+  # CMD_SWAP_BUFFER requires ctrl_actions of 5 bits.
+  SwapCtrlPktType = mk_intra_cgra_pkt(nterminals, 32, ctrl_mem_size,
+                                      num_ctrl_operations, num_fu_inports,
+                                      num_fu_outports, num_tile_inports,
+                                      num_tile_outports, 16, data_nbits)
+  # The results at addresses 4 and 5 are copied out before swapping the
+  # memory, where the swap is consumed by the controller (the ctrl ring
+  # never accepts any packet here).
+  from_cpu_ctrl_pkts = [
+      SwapCtrlPktType(0, 0, ctrl_action = CMD_DMA_SRC_ADDR, data = 4),
+      SwapCtrlPktType(0, 0, ctrl_action = CMD_DMA_DST_ADDR, data = 9),
+      SwapCtrlPktType(0, 0, ctrl_action = CMD_DMA_STRIDE,   data = 1),
+      SwapCtrlPktType(0, 0, ctrl_action = CMD_DMA_LAUNCH,   data = 2),
+      SwapCtrlPktType(0, 0, ctrl_action = CMD_SWAP_BUFFER),
+  ]
+  expected_to_tile_load_request_addr_msgs = [AddrType(4), AddrType(5)]
+  from_tile_load_response_pkts = [
+      #   src  dst src_x src_y dst_x dst_y opq vc cmd                addr data predicate
+      Pkt(0,   0,  0,    0,    0,    0,    0,  0, CMD_LOAD_RESPONSE, 4,   40,  1),
+      Pkt(0,   0,  0,    0,    0,    0,    0,  0, CMD_LOAD_RESPONSE, 5,   50,  1),
+  ]
+  expected_to_noc_pkts = [
+      #   src  dst src_x src_y dst_x dst_y opq vc cmd                addr data predicate
+      Pkt(1,   2,  1,    0,    2,    0,    0,  0, CMD_STORE_REQUEST, 9,   40,  1),
+      Pkt(1,   2,  1,    0,    2,    0,    0,  0, CMD_STORE_REQUEST, 10,  50,  1),
+  ]
+  th = TestHarness(ControllerIdType, SwapCtrlPktType,
+                   CmdType, DataType,
+                   AddrType, Pkt, controller_id,
+                   [], from_tile_load_response_pkts, [],
+                   expected_to_tile_load_request_addr_msgs,
+                   [], [], [], [],
+                   expected_to_noc_pkts,
+                   controller2addr_map, idTo2d_map,
+                   nterminals, from_cpu_ctrl_pkts, dma = True,
+                   mem_swap = True)
+  run_sim(th)
+
+def test_ctrl_contexts():
+  # CMD_SWITCH_CONTEXT requires ctrl_actions of 5 bits.
+  CtxCtrlPktType = mk_intra_cgra_pkt(nterminals, 32, ctrl_mem_size,
+                                     num_ctrl_operations, num_fu_inports,
+                                     num_fu_outports, num_tile_inports,
+                                     num_tile_outports, 16, data_nbits)
+  # Context 1 of the 2 tiles is loaded, and then switched to with a
+  # single packet, while context 0 is not loaded yet.
+  from_cpu_ctrl_pkts = [
+      CtxCtrlPktType(0, 0, ctrl_action = CMD_CONFIG, ctrl_addr = 0, data = 1),
+      CtxCtrlPktType(0, 1, ctrl_action = CMD_CONFIG, ctrl_addr = 0, data = 1),
+      CtxCtrlPktType(0, 0, ctrl_action = CMD_SWITCH_CONTEXT, data = 1),
+      CtxCtrlPktType(0, 0, ctrl_action = CMD_SWITCH_CONTEXT, data = 0),
+  ]
+  expected_to_ctrl_ring_pkts = from_cpu_ctrl_pkts[:2] + [
+      CtxCtrlPktType(0, 0, ctrl_action = CMD_LAUNCH, data = 1),
+      CtxCtrlPktType(0, 1, ctrl_action = CMD_LAUNCH, data = 1),
+  ]
+  expected_to_cpu_ctrl_pkts = from_cpu_ctrl_pkts[3:]
+  th = TestHarness(ControllerIdType, CtxCtrlPktType,
+                   CmdType, DataType,
+                   AddrType, Pkt, controller_id,
+                   [], [], [], [], [], [], [], [], [],
+                   controller2addr_map, idTo2d_map,
+                   nterminals, from_cpu_ctrl_pkts,
+                   num_ctrl_contexts = 2, num_tiles = 2,
+                   expected_to_ctrl_ring_pkts = expected_to_ctrl_ring_pkts,
+                   expected_to_cpu_ctrl_pkts = expected_to_cpu_ctrl_pkts)
+  run_sim(th)
+
+def test_ctrl_context_residency():
+  CtxCtrlPktType = mk_intra_cgra_pkt(nterminals, 32, ctrl_mem_size,
+                                     num_ctrl_operations, num_fu_inports,
+                                     num_fu_outports, num_tile_inports,
+                                     num_tile_outports, 16, data_nbits)
+  config = lambda dst, addr: CtxCtrlPktType(0, dst, ctrl_action = CMD_CONFIG,
+                                            ctrl_addr = addr, data = 1)
+  switch = CtxCtrlPktType(0, 0, ctrl_action = CMD_SWITCH_CONTEXT, data = 1)
+  launch = lambda dst: CtxCtrlPktType(0, dst, ctrl_action = CMD_LAUNCH,
+                                      data = 1)
+  # Context 1 is only loaded once both tiles got part of it, and is
+  # overwritten by the kernel loaded after switching to it, whose switch
+  # bounces back to CPU until tile 1 got its part as well.
+  from_cpu_ctrl_pkts = [
+      config(0, 0), config(0, 1), switch,
+      config(1, 0), switch,
+      config(0, 0), switch,
+      config(1, 0), switch,
+  ]
+  expected_to_ctrl_ring_pkts = [
+      config(0, 0), config(0, 1), config(1, 0), launch(0), launch(1),
+      config(0, 0), config(1, 0), launch(0), launch(1),
+  ]
+  expected_to_cpu_ctrl_pkts = [switch, switch]
+  th = TestHarness(ControllerIdType, CtxCtrlPktType,
+                   CmdType, DataType,
+                   AddrType, Pkt, controller_id,
+                   [], [], [], [], [], [], [], [], [],
+                   controller2addr_map, idTo2d_map,
+                   nterminals, from_cpu_ctrl_pkts,
+                   num_ctrl_contexts = 2, num_tiles = 2,
+                   expected_to_ctrl_ring_pkts = expected_to_ctrl_ring_pkts,
+                   expected_to_cpu_ctrl_pkts = expected_to_cpu_ctrl_pkts)
+  run_sim(th)
+
+def test_ctrl_multicast():
+  McCtrlPktType = mk_intra_cgra_pkt(nterminals, num_ctrl_actions,
+                                    ctrl_mem_size, num_ctrl_operations,
+                                    num_fu_inports, num_fu_outports,
+                                    num_tile_inports, num_tile_outports,
+                                    multicast = True)
+  config = lambda dst, mask: McCtrlPktType(0, dst, ctrl_action = CMD_CONFIG,
+                                           data = 1, dst_mask = mask)
+  # The multicast packets are sent over the ring as one packet per
+  # selected tile (from the lowest one), in order with the others.
+  from_cpu_ctrl_pkts = [config(0, 0b1010), config(1, 0), config(0, 0b1111)]
+  expected_to_ctrl_ring_pkts = [
+      config(1, 0), config(3, 0), config(1, 0),
+      config(0, 0), config(1, 0), config(2, 0), config(3, 0),
+  ]
+  th = TestHarness(ControllerIdType, McCtrlPktType,
+                   CmdType, DataType,
+                   AddrType, Pkt, controller_id,
+                   [], [], [], [], [], [], [], [], [],
+                   controller2addr_map, idTo2d_map,
+                   nterminals, from_cpu_ctrl_pkts,
+                   ctrl_multicast = True, num_tiles = 4,
+                   expected_to_ctrl_ring_pkts = expected_to_ctrl_ring_pkts)
+  run_sim(th)
+
+def test_tagged_load():
+  # Both directions of the tagged (i.e., non-blocking) remote loads: the
+  # request of controller 3 for address 5 is served by the local memory,
+  # and its response echoes the MSHR entry (opaque 3) back to controller 3
+  # instead of the owner of the address. The local tile's request for
+  # address 9 (MSHR entry 2) is sent to controller 2, whose response is
+  # handed over to the data memory as a whole packet.
+  from_tile_load_request_pkts = [
+      #   src  dst src_x src_y dst_x dst_y opq vc cmd                addr data predicate
+      Pkt(0,   0,  0,    0,    0,    0,    2,  0, CMD_LOAD_REQUEST,  9,   0,   1),
+  ]
+  from_tile_load_response_pkts = [
+      #   src  dst src_x src_y dst_x dst_y opq vc cmd                addr data predicate
+      Pkt(0,   0,  0,    0,    0,    0,    0,  0, CMD_LOAD_RESPONSE, 5,   50,  1),
+  ]
+  expected_to_tile_load_request_addr_msgs = [AddrType(5)]
+  from_noc_pkts = [
+      #   src  dst src_x src_y dst_x dst_y opq vc cmd                addr data predicate
+      Pkt(3,   1,  3,    0,    1,    0,    3,  0, CMD_LOAD_REQUEST,  5,   0,   1),
+      Pkt(2,   1,  2,    0,    1,    0,    2,  0, CMD_LOAD_RESPONSE, 9,   90,  1),
+  ]
+  expected_to_noc_pkts = [
+      #   src  dst src_x src_y dst_x dst_y opq vc cmd                addr data predicate
+      Pkt(1,   2,  1,    0,    2,    0,    2,  0, CMD_LOAD_REQUEST,  9,   0,   1),
+      Pkt(1,   3,  1,    0,    3,    0,    3,  0, CMD_LOAD_RESPONSE, 5,   50,  1),
+  ]
+  expected_to_tile_load_response_pkts = from_noc_pkts[1:]
+  th = TestHarness(ControllerIdType, CtrlPktType,
+                   CmdType, DataType,
+                   AddrType, Pkt, controller_id,
+                   from_tile_load_request_pkts,
+                   from_tile_load_response_pkts, [],
+                   expected_to_tile_load_request_addr_msgs,
+                   [], [], [],
+                   from_noc_pkts,
+                   expected_to_noc_pkts,
+                   controller2addr_map, idTo2d_map,
+                   nterminals, num_mshr_entries = 4,
+                   expected_to_tile_load_response_pkts =
+                       expected_to_tile_load_response_pkts)
+  run_sim(th)
+
+def test_atomic():
+  # The atomic requests from NoC are served by the local memory, which
+  # gets the operation and operand along with the address, while the one
+  # of the local tile is sent out as it is.
+  from_tile_load_request_pkts = [
+      #   src  dst src_x src_y dst_x dst_y opq vc cmd                     addr data predicate
+      Pkt(0,   0,  0,    0,    0,    0,    0,  0, CMD_ATOMIC_MIN_REQUEST, 9,   4,   1),
+  ]
+  from_noc_pkts = [
+      #   src  dst src_x src_y dst_x dst_y opq vc cmd                     addr data predicate
+      Pkt(2,   1,  2,    0,    1,    0,    0,  0, CMD_ATOMIC_ADD_REQUEST, 6,   7,   1),
+      Pkt(3,   1,  3,    0,    1,    0,    0,  0, CMD_LOAD_REQUEST,       4,   0,   1),
+      Pkt(0,   1,  0,    0,    1,    0,    0,  0, CMD_ATOMIC_MAX_REQUEST, 5,   3,   1),
+  ]
+  expected_to_tile_load_request_addr_msgs = [AddrType(6), AddrType(4),
+                                             AddrType(5)]
+  expected_to_tile_atomic_msgs = [(ATOMIC_ADD,  DataType(7, 1)),
+                                  (ATOMIC_NONE, DataType(0, 1)),
+                                  (ATOMIC_MAX,  DataType(3, 1))]
+  expected_to_noc_pkts = [
+      #   src  dst src_x src_y dst_x dst_y opq vc cmd                     addr data predicate
+      Pkt(1,   2,  1,    0,    2,    0,    0,  0, CMD_ATOMIC_MIN_REQUEST, 9,   4,   1),
+  ]
+  th = TestHarness(ControllerIdType, CtrlPktType,
+                   CmdType, DataType,
+                   AddrType, Pkt, controller_id,
+                   from_tile_load_request_pkts, [], [],
+                   expected_to_tile_load_request_addr_msgs,
+                   [], [], [],
+                   from_noc_pkts,
+                   expected_to_noc_pkts,
+                   controller2addr_map, idTo2d_map,
+                   nterminals,
+                   expected_to_tile_atomic_msgs = expected_to_tile_atomic_msgs)
+  run_sim(th)
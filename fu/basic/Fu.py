@@ -12,6 +12,7 @@ Author : Cheng Tan
 from pymtl3 import *
 from ...lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ...lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
+from ...lib.cmd_type import *
 from ...lib.opt_type import *
 
 class Fu(Component):
@@ -43,6 +44,8 @@ class Fu(Component):
     s.from_mem_rdata = RecvIfcRTL(DataType)
     s.to_mem_waddr = SendIfcRTL(DataAddrType)
     s.to_mem_wdata = SendIfcRTL(DataType)
+    s.to_mem_atomic_op = OutPort(mk_bits(ATOMIC_OP_NBITS))
+    s.to_mem_atomic_data = OutPort(DataType)
 
     # Components
     s.vector_factor_power = Wire(VectorFactorPowerType)
@@ -72,6 +75,8 @@ class Fu(Component):
       s.to_mem_raddr.msg @= DataAddrType(0)
       s.to_mem_raddr.val @= b1(0)
       s.from_mem_rdata.rdy @= b1(0)
+      s.to_mem_atomic_op @= ATOMIC_NONE
+      s.to_mem_atomic_data @= s.const_zero
 
     @update_ff
     def proceed_latency():
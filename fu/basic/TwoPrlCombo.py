@@ -11,6 +11,7 @@ Author : Cheng Tan
 from pymtl3 import *
 from ...lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ...lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
+from ...lib.cmd_type import *
 from ...lib.opt_type import *
 
 class TwoPrlCombo(Component):
@@ -34,6 +35,8 @@ class TwoPrlCombo(Component):
     s.from_mem_rdata = RecvIfcRTL( DataType )
     s.to_mem_waddr   = SendIfcRTL( AddrType )
     s.to_mem_wdata   = SendIfcRTL( DataType )
+    s.to_mem_atomic_op = OutPort( mk_bits( ATOMIC_OP_NBITS ) )
+    s.to_mem_atomic_data = OutPort( DataType )
 
     # Components
     s.Fu0 = Fu0( DataType, PredicateType, CtrlType, 2, 1, data_mem_size )
@@ -48,6 +51,9 @@ class TwoPrlCombo(Component):
     s.Fu0.send_out[0].msg //= s.send_out[0].msg
     s.Fu1.send_out[0].msg //= s.send_out[1].msg
 
+    s.to_mem_atomic_op    //= s.Fu0.to_mem_atomic_op
+    s.to_mem_atomic_data  //= s.Fu0.to_mem_atomic_data
+
     @update
     def update_signal():
 
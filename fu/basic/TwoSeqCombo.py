@@ -11,6 +11,7 @@ Author : Cheng Tan
 from pymtl3 import *
 from ...lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ...lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
+from ...lib.cmd_type import *
 from ...lib.opt_type import *
 
 class TwoSeqCombo(Component):
@@ -36,6 +37,8 @@ class TwoSeqCombo(Component):
     s.from_mem_rdata = RecvIfcRTL(DataType)
     s.to_mem_waddr   = SendIfcRTL(AddrType)
     s.to_mem_wdata   = SendIfcRTL(DataType)
+    s.to_mem_atomic_op = OutPort(mk_bits(ATOMIC_OP_NBITS))
+    s.to_mem_atomic_data = OutPort(DataType)
 
     # Components
     s.Fu0 = Fu0(DataType, PredicateType, CtrlType, 4, 2, data_mem_size)
@@ -96,6 +99,8 @@ class TwoSeqCombo(Component):
       s.to_mem_raddr.msg   @= AddrType(0)
       s.to_mem_raddr.val   @= b1(0)
       s.from_mem_rdata.rdy @= b1(0)
+      s.to_mem_atomic_op @= ATOMIC_NONE
+      s.to_mem_atomic_data @= s.const_zero
 
   def line_trace(s):
     return s.Fu0.line_trace() + " ; " + s.Fu1.line_trace() + " ; s.recv_predicate.msg: " + str(s.recv_predicate.msg)
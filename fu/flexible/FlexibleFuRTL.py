@@ -15,6 +15,8 @@ from ...fu.single.AdderRTL  import AdderRTL
 from ...fu.single.NahRTL  import NahRTL
 from ...lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ...lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
+from ...lib.cmd_type import *
+from ...lib.messages import intern_msg
 from ...lib.opt_type import *
 
 
@@ -30,6 +32,7 @@ class FlexibleFuRTL(Component):
     s.fu_list_size = len(FuList)
     CountType = mk_bits(clog2(num_entries + 1))
     AddrType = mk_bits(clog2(data_mem_size))
+    AtomicOpType = mk_bits(ATOMIC_OP_NBITS)
 
     # Interface
     s.recv_in = [RecvIfcRTL(DataType) for _ in range(num_inports)]
@@ -42,6 +45,8 @@ class FlexibleFuRTL(Component):
     s.from_mem_rdata = [RecvIfcRTL(DataType) for _ in range(s.fu_list_size)]
     s.to_mem_waddr = [SendIfcRTL(AddrType) for _ in range(s.fu_list_size)]
     s.to_mem_wdata = [SendIfcRTL(DataType) for _ in range(s.fu_list_size)]
+    s.to_mem_atomic_op = [OutPort(AtomicOpType) for _ in range(s.fu_list_size)]
+    s.to_mem_atomic_data = [OutPort(DataType) for _ in range(s.fu_list_size)]
 
     # Components
     s.fu = [FuList[i](DataType, PredicateType, CtrlType, num_inports, num_outports,
@@ -58,13 +63,17 @@ class FlexibleFuRTL(Component):
       s.from_mem_rdata[i] //= s.fu[i].from_mem_rdata
       s.to_mem_waddr[i] //= s.fu[i].to_mem_waddr
       s.to_mem_wdata[i] //= s.fu[i].to_mem_wdata
+      s.to_mem_atomic_op[i] //= s.fu[i].to_mem_atomic_op
+      s.to_mem_atomic_data[i] //= s.fu[i].to_mem_atomic_data
+
+    default_data = intern_msg(DataType)
 
     @update
     def comb_logic():
 
       for j in range(num_outports):
         s.send_out[j].val @= b1(0)
-        s.send_out[j].msg @= DataType()
+        s.send_out[j].msg @= default_data
 
       for i in range(s.fu_list_size):
 
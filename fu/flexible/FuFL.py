@@ -10,6 +10,8 @@ Author : Cheng Tan
 """
 
 
+import struct
+
 from pymtl3 import *
 from ...lib.opt_type import *
 from ...lib.messages import *
@@ -30,3 +32,167 @@ def FuFL( DataType, input_a, input_b, opt ):
       out_list.append(DataType(input_a[i].payload * input_b[i].payload))
   return out_list
 
+#------------------------------------------------------------------------
+# Backends for scalar (int) and batched (NumPy) evaluation of payloads
+#------------------------------------------------------------------------
+
+class IntOps:
+
+  def __init__( s, nbits ):
+    s.nbits = nbits
+    s.mask  = ( 1 << nbits ) - 1
+    s.fmt   = { 16: 'e', 32: 'f', 64: 'd' }.get( nbits )
+    s.ufmt  = { 16: 'H', 32: 'I', 64: 'Q' }.get( nbits )
+
+  def bool( s, cond ):
+    return 1 if cond else 0
+
+  def select( s, cond, a, b ):
+    return a if cond else b
+
+  def div( s, a, b ):
+    return a // b if b != 0 else 0
+
+  def shl( s, a, b ):
+    return ( a << b ) & s.mask if b < s.nbits else 0
+
+  def shr( s, a, b ):
+    return a >> b if b < s.nbits else 0
+
+  def fp( s, op, *args ):
+    assert s.fmt is not None, \
+      f"floating-point ops need a 16/32/64-bit payload, got {s.nbits}"
+    vals = [ struct.unpack( s.fmt, struct.pack( s.ufmt, a ) )[0]
+             for a in args ]
+    try:
+      res = struct.pack( s.fmt, op( *vals ) )
+    except OverflowError:
+      res = struct.pack( s.fmt, float( 'inf' ) * op( *vals ) )
+    return struct.unpack( s.ufmt, res )[0]
+
+class NumpyOps:
+
+  def __init__( s, nbits ):
+    import numpy as np
+    assert nbits <= 64, "batch mode supports payloads up to 64 bits"
+    s.np    = np
+    s.nbits = nbits
+    s.mask  = np.uint64( ( 1 << nbits ) - 1 )
+    s.fdt   = { 16: np.float16, 32: np.float32, 64: np.float64 }.get( nbits )
+    s.udt   = { 16: np.uint16,  32: np.uint32,  64: np.uint64  }.get( nbits )
+
+  def bool( s, cond ):
+    return cond.astype( s.np.uint64 )
+
+  def select( s, cond, a, b ):
+    return s.np.where( cond, a, b )
+
+  def div( s, a, b ):
+    np = s.np
+    safe = np.where( b == 0, np.uint64( 1 ), b )
+    return np.where( b == 0, np.uint64( 0 ), a // safe )
+
+  def shl( s, a, b ):
+    np = s.np
+    amt = np.minimum( b, np.uint64( 63 ) )
+    return np.where( b < s.nbits, ( a << amt ) & s.mask, np.uint64( 0 ) )
+
+  def shr( s, a, b ):
+    np = s.np
+    amt = np.minimum( b, np.uint64( 63 ) )
+    return np.where( b < s.nbits, a >> amt, np.uint64( 0 ) )
+
+  def fp( s, op, *args ):
+    assert s.fdt is not None, \
+      f"floating-point ops need a 16/32/64-bit payload, got {s.nbits}"
+    np = s.np
+    vals = [ a.astype( s.udt ).view( s.fdt ) for a in args ]
+    with np.errstate( all = 'ignore' ):
+      res = np.asarray( op( *vals ), dtype = s.fdt )
+    return res.view( s.udt ).astype( np.uint64 )
+
+#------------------------------------------------------------------------
+# Opcode semantics
+#------------------------------------------------------------------------
+# Payload semantics shared by the compiled FL engine and the CL models.
+# Each entry maps an opcode (as int) to a function of ( backend, operand
+# payloads, number of vector lanes ) that returns the (unmasked) output
+# payload. The const operand, if any, always comes first, e.g., SUB_CONST
+# computes v[1] - v[0], i.e., input minus const as in AdderRTL.
+#
+# The atomics are a load-modify-store on the data memory: their entry is
+# the modify step, which maps [ old data, operand ] to the value written
+# back (min/max compare unsigned as in DataMemWithCrossbarRTL), while the
+# op itself sends out the old data.
+
+def _lanes( x, v, num_lanes, fn ):
+  sub_bw   = x.nbits // num_lanes
+  sub_mask = ( 1 << sub_bw ) - 1
+  res = 0
+  for i in range( num_lanes ):
+    lane = fn( *[ ( a >> ( i * sub_bw ) ) & sub_mask for a in v ] )
+    res = res | ( ( lane & sub_mask ) << ( i * sub_bw ) )
+  return res
+
+def _reduce( x, v, num_lanes, fn ):
+  sub_bw   = x.nbits // num_lanes
+  sub_mask = ( 1 << sub_bw ) - 1
+  res = v[0] & sub_mask
+  for i in range( 1, num_lanes ):
+    res = fn( res, ( v[0] >> ( i * sub_bw ) ) & sub_mask ) & x.mask
+  return res
+
+OPT_SEMANTICS = {
+  OPT_ADD          : lambda x, v, l: v[0] + v[1],
+  OPT_ADD_CONST    : lambda x, v, l: v[0] + v[1],
+  OPT_INC          : lambda x, v, l: v[0] + 1,
+  OPT_SUB          : lambda x, v, l: v[0] - v[1],
+  OPT_SUB_CONST    : lambda x, v, l: v[1] - v[0],
+  OPT_PAS          : lambda x, v, l: v[0],
+  OPT_RET          : lambda x, v, l: v[0],
+  OPT_MUL          : lambda x, v, l: v[0] * v[1],
+  OPT_MUL_CONST    : lambda x, v, l: v[0] * v[1],
+  OPT_DIV          : lambda x, v, l: x.div( v[0], v[1] ),
+  OPT_LLS          : lambda x, v, l: x.shl( v[0], v[1] ),
+  OPT_LRS          : lambda x, v, l: x.shr( v[0], v[1] ),
+  OPT_OR           : lambda x, v, l: v[0] | v[1],
+  OPT_XOR          : lambda x, v, l: v[0] ^ v[1],
+  OPT_AND          : lambda x, v, l: v[0] & v[1],
+  OPT_NOT          : lambda x, v, l: ~v[0],
+  OPT_EQ           : lambda x, v, l: x.bool( v[0] == v[1] ),
+  OPT_EQ_CONST     : lambda x, v, l: x.bool( v[0] == v[1] ),
+  OPT_LT           : lambda x, v, l: x.bool( v[0] < v[1] ),
+  OPT_GTE          : lambda x, v, l: x.bool( v[0] >= v[1] ),
+  OPT_GT           : lambda x, v, l: x.bool( v[0] > v[1] ),
+  OPT_LTE          : lambda x, v, l: x.bool( v[0] <= v[1] ),
+  OPT_SEL          : lambda x, v, l: x.select( v[0] == 1, v[1], v[2] ),
+  OPT_MUL_ADD      : lambda x, v, l: v[0] * v[1] + v[2],
+  OPT_MUL_SUB      : lambda x, v, l: v[0] * v[1] - v[2],
+  OPT_MUL_CONST_ADD: lambda x, v, l: v[0] * v[1] + v[2],
+  OPT_MUL_LLS      : lambda x, v, l: x.shl( ( v[0] * v[1] ) & x.mask, v[2] ),
+  OPT_MUL_LRS      : lambda x, v, l: x.shr( ( v[0] * v[1] ) & x.mask, v[2] ),
+  OPT_MUL_ADD_LLS  : lambda x, v, l:
+                       x.shl( ( v[0] * v[1] + v[2] ) & x.mask, v[3] ),
+  OPT_MUL_SUB_LLS  : lambda x, v, l:
+                       x.shl( ( v[0] * v[1] - v[2] ) & x.mask, v[3] ),
+  OPT_MUL_SUB_LRS  : lambda x, v, l:
+                       x.shr( ( v[0] * v[1] - v[2] ) & x.mask, v[3] ),
+  OPT_FADD         : lambda x, v, l: x.fp( lambda a, b: a + b, v[0], v[1] ),
+  OPT_FADD_CONST   : lambda x, v, l: x.fp( lambda a, b: a + b, v[0], v[1] ),
+  OPT_FSUB         : lambda x, v, l: x.fp( lambda a, b: a - b, v[0], v[1] ),
+  OPT_FINC         : lambda x, v, l: x.fp( lambda a: a + 1.0, v[0] ),
+  OPT_FMUL         : lambda x, v, l: x.fp( lambda a, b: a * b, v[0], v[1] ),
+  OPT_FMUL_CONST   : lambda x, v, l: x.fp( lambda a, b: a * b, v[0], v[1] ),
+  OPT_ATOMIC_ADD   : lambda x, v, l: v[0] + v[1],
+  OPT_ATOMIC_MIN   : lambda x, v, l: x.select( v[0] < v[1], v[0], v[1] ),
+  OPT_ATOMIC_MAX   : lambda x, v, l: x.select( v[0] > v[1], v[0], v[1] ),
+  OPT_VEC_ADD      : lambda x, v, l: _lanes( x, v[:2], l, lambda a, b: a + b ),
+  OPT_VEC_ADD_CONST: lambda x, v, l: _lanes( x, v[:2], l, lambda a, b: a + b ),
+  OPT_VEC_INC      : lambda x, v, l: _lanes( x, v[:1], l, lambda a: a + 1 ),
+  OPT_VEC_SUB      : lambda x, v, l: _lanes( x, v[:2], l, lambda a, b: a - b ),
+  OPT_VEC_SUB_CONST: lambda x, v, l: _lanes( x, v[:2], l, lambda a, b: b - a ),
+  OPT_VEC_MUL      : lambda x, v, l: _lanes( x, v[:2], l, lambda a, b: a * b ),
+  OPT_VEC_REDUCE_ADD: lambda x, v, l: _reduce( x, v, l, lambda a, b: a + b ),
+  OPT_VEC_REDUCE_MUL: lambda x, v, l: _reduce( x, v, l, lambda a, b: a * b ),
+}
+OPT_SEMANTICS = { int( opt ): fn for opt, fn in OPT_SEMANTICS.items() }
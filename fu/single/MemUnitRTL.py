@@ -4,6 +4,12 @@ MemUnitRTL.py
 ==========================================================================
 Scratchpad memory access unit for CGRA tiles.
 
+The OPT_ATOMIC_* operations take the address from the first input and
+the operand from the second one. They are issued as a load tagged with
+`to_mem_atomic_op` and `to_mem_atomic_data` (valid along with
+`to_mem_raddr`), and send out the old data, whereas the data memory
+writes back the result (see lib/cmd_type.py).
+
 Author : Cheng Tan
   Date : November 29, 2019
 """
@@ -11,6 +17,7 @@ Author : Cheng Tan
 from pymtl3 import *
 from ..basic.Fu import Fu
 from ...lib.basic.val_rdy.ifcs import ValRdySendIfcRTL, ValRdyRecvIfcRTL
+from ...lib.cmd_type import *
 from ...lib.opt_type import *
 
 class MemUnitRTL(Component):
@@ -26,6 +33,7 @@ class MemUnitRTL(Component):
     # 3 indicates at most 7, i.e., 2^7 vectorization factor -> 128
     VectorFactorPowerType = mk_bits(3)
     VectorFactorType = mk_bits(8)
+    AtomicOpType = mk_bits(ATOMIC_OP_NBITS)
 
     # Interface
     s.recv_in = [ValRdyRecvIfcRTL(DataType) for _ in range(num_inports)]
@@ -40,6 +48,8 @@ class MemUnitRTL(Component):
     s.from_mem_rdata = ValRdyRecvIfcRTL(DataType)
     s.to_mem_waddr = ValRdySendIfcRTL(AddrType)
     s.to_mem_wdata = ValRdySendIfcRTL(DataType)
+    s.to_mem_atomic_op = OutPort(AtomicOpType)
+    s.to_mem_atomic_data = OutPort(DataType)
 
     s.in0 = Wire(FuInType)
     s.in1 = Wire(FuInType)
@@ -90,6 +100,8 @@ class MemUnitRTL(Component):
       s.to_mem_raddr.val @= 0
       s.to_mem_raddr.msg @= AddrType()
       s.from_mem_rdata.rdy @= 0
+      s.to_mem_atomic_op @= AtomicOpType(ATOMIC_NONE)
+      s.to_mem_atomic_data @= DataType()
 
       if s.recv_opt.val:
         if s.recv_opt.msg.ctrl == OPT_LD:
@@ -191,6 +203,41 @@ class MemUnitRTL(Component):
           if s.recv_opt.msg.predicate == 1:
             s.recv_predicate.rdy @= s.recv_all_val
 
+        elif (s.recv_opt.msg.ctrl == OPT_ATOMIC_ADD) | \
+             (s.recv_opt.msg.ctrl == OPT_ATOMIC_MIN) | \
+             (s.recv_opt.msg.ctrl == OPT_ATOMIC_MAX):
+          s.recv_all_val @= s.recv_in[s.in0_idx].val & \
+                            s.recv_in[s.in1_idx].val & \
+                            ((s.recv_opt.msg.predicate == b1(0)) | s.recv_predicate.val)
+          s.recv_in[s.in0_idx].rdy @= s.recv_all_val & s.to_mem_raddr.rdy
+          s.recv_in[s.in1_idx].rdy @= s.recv_all_val & s.to_mem_raddr.rdy
+          s.to_mem_raddr.msg @= AddrType(s.recv_in[s.in0_idx].msg.payload[0:AddrType.nbits])
+          s.to_mem_raddr.val @= s.recv_all_val
+          if s.recv_opt.msg.ctrl == OPT_ATOMIC_ADD:
+            s.to_mem_atomic_op @= AtomicOpType(ATOMIC_ADD)
+          elif s.recv_opt.msg.ctrl == OPT_ATOMIC_MIN:
+            s.to_mem_atomic_op @= AtomicOpType(ATOMIC_MIN)
+          else:
+            s.to_mem_atomic_op @= AtomicOpType(ATOMIC_MAX)
+          s.to_mem_atomic_data @= s.recv_in[s.in1_idx].msg
+          s.to_mem_atomic_data.predicate @= s.recv_in[s.in0_idx].msg.predicate & \
+                                            s.recv_in[s.in1_idx].msg.predicate & \
+                                            (~s.recv_opt.msg.predicate | \
+                                             s.recv_predicate.msg.predicate) & \
+                                            s.reached_vector_factor
+          # Sends out the old data.
+          s.from_mem_rdata.rdy @= s.send_out[0].rdy
+          s.send_out[0].val @= s.from_mem_rdata.val
+          s.send_out[0].msg @= s.from_mem_rdata.msg
+          s.send_out[0].msg.predicate @= s.recv_in[s.in0_idx].msg.predicate & \
+                                         s.from_mem_rdata.msg.predicate & \
+                                         (~s.recv_opt.msg.predicate | \
+                                          s.recv_predicate.msg.predicate) & \
+                                         s.reached_vector_factor
+          s.recv_opt.rdy @= s.send_out[0].rdy & s.from_mem_rdata.val
+          if s.recv_opt.msg.predicate == 1:
+            s.recv_predicate.rdy @= s.from_mem_rdata.val & s.send_out[0].rdy
+
         else:
           for j in range(num_outports):
             s.send_out[j].val @= b1(0)
@@ -11,6 +11,7 @@ Author : Cheng Tan
 from pymtl3 import *
 from ...lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ...lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
+from ...lib.cmd_type import *
 from ...lib.opt_type import *
 
 class SelRTL(Component):
@@ -42,6 +43,8 @@ class SelRTL(Component):
     s.from_mem_rdata = RecvIfcRTL(DataType)
     s.to_mem_waddr = SendIfcRTL(AddrType)
     s.to_mem_wdata = SendIfcRTL(DataType)
+    s.to_mem_atomic_op = OutPort(mk_bits(ATOMIC_OP_NBITS))
+    s.to_mem_atomic_data = OutPort(DataType)
 
     s.in0 = Wire(FuInType)
     s.in1 = Wire(FuInType)
@@ -73,6 +76,8 @@ class SelRTL(Component):
       s.to_mem_raddr.msg @= AddrType(0)
       s.to_mem_raddr.val @= b1(0)
       s.from_mem_rdata.rdy @= b1(0)
+      s.to_mem_atomic_op @= ATOMIC_NONE
+      s.to_mem_atomic_data @= s.const_zero
 
     @update
     def comb_logic():
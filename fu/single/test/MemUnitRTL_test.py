@@ -11,6 +11,7 @@ Author : Cheng Tan
 from pymtl3 import *
 
 from ..MemUnitRTL import MemUnitRTL
+from ....lib.cmd_type import *
 from ....lib.messages import *
 from ....lib.opt_type import *
 from ....lib.basic.val_rdy.SourceRTL import SourceRTL as TestSrcRTL
@@ -134,3 +135,37 @@ def test_PseudoMem():
                    src_in1, src_const, src_predicate, src_opt, sink_out)
   run_sim(th)
 
+
+def test_atomic():
+  DataType = mk_data(16, 1)
+  PredicateType = mk_predicate(1, 1)
+  ConfigType = mk_ctrl()
+  num_inports = 2
+  FuInType = mk_bits(clog2(num_inports + 1))
+  pickRegister = [FuInType(x + 1) for x in range(num_inports)]
+  dut = MemUnitRTL(DataType, PredicateType, ConfigType, num_inports, 1, 8)
+  dut.elaborate()
+  dut.apply(DefaultPassGroup())
+  dut.sim_reset()
+
+  dut.recv_opt.msg @= ConfigType(OPT_ATOMIC_MAX, b1(0), pickRegister)
+  dut.recv_opt.val @= 1
+  dut.recv_in[0].msg @= DataType(3, 1) # addr
+  dut.recv_in[0].val @= 1
+  dut.recv_in[1].msg @= DataType(9, 1) # operand
+  dut.recv_in[1].val @= 1
+  dut.to_mem_raddr.rdy @= 1
+  dut.send_out[0].rdy @= 1
+  dut.sim_eval_combinational()
+  # The atomic operation is issued along with the read request.
+  assert dut.to_mem_raddr.val & (dut.to_mem_raddr.msg == 3)
+  assert dut.to_mem_atomic_op == ATOMIC_MAX
+  assert dut.to_mem_atomic_data == DataType(9, 1)
+  assert ~dut.to_mem_waddr.val & ~dut.recv_opt.rdy
+
+  # The old data is sent out once back.
+  dut.from_mem_rdata.msg @= DataType(7, 1)
+  dut.from_mem_rdata.val @= 1
+  dut.sim_eval_combinational()
+  assert dut.send_out[0].val & (dut.send_out[0].msg == DataType(7, 1))
+  assert dut.recv_opt.rdy
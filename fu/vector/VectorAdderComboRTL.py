@@ -16,6 +16,7 @@ from pymtl3 import *
 from .VectorAdderRTL import VectorAdderRTL
 from ...lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ...lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
+from ...lib.cmd_type import *
 from ...lib.opt_type import *
 
 class VectorAdderComboRTL(Component):
@@ -62,6 +63,8 @@ class VectorAdderComboRTL(Component):
     s.from_mem_rdata = RecvIfcRTL( DataType )
     s.to_mem_waddr   = SendIfcRTL( AddrType )
     s.to_mem_wdata   = SendIfcRTL( DataType )
+    s.to_mem_atomic_op = OutPort( mk_bits( ATOMIC_OP_NBITS ) )
+    s.to_mem_atomic_data = OutPort( DataType )
 
     @update
     def update_signal():
@@ -141,6 +144,8 @@ class VectorAdderComboRTL(Component):
       s.to_mem_raddr.msg   @= AddrType( 0 )
       s.to_mem_raddr.val   @= b1( 0 )
       s.from_mem_rdata.rdy @= b1( 0 )
+      s.to_mem_atomic_op @= ATOMIC_NONE
+      s.to_mem_atomic_data @= s.const_zero
 
   def line_trace(s):
     return str(s.recv_in[0].msg) + OPT_SYMBOL_DICT[s.recv_opt.msg.ctrl] + str(s.recv_in[1].msg) + " -> " + str(s.send_out[0].msg)
@@ -15,6 +15,7 @@ from .VectorMulRTL import VectorMulRTL
 from ..basic.SumUnit import SumUnit
 from ...lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ...lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
+from ...lib.cmd_type import *
 from ...lib.opt_type import *
 
 class VectorMulComboRTL(Component):
@@ -62,6 +63,8 @@ class VectorMulComboRTL(Component):
     s.from_mem_rdata = RecvIfcRTL( DataType )
     s.to_mem_waddr   = SendIfcRTL( AddrType )
     s.to_mem_wdata   = SendIfcRTL( DataType )
+    s.to_mem_atomic_op = OutPort( mk_bits( ATOMIC_OP_NBITS ) )
+    s.to_mem_atomic_data = OutPort( DataType )
 
     # Reduction units
     s.reduce_add = SumUnit( TempDataType, num_lanes )
@@ -176,6 +179,8 @@ class VectorMulComboRTL(Component):
       s.to_mem_raddr.msg   @= AddrType( 0 )
       s.to_mem_raddr.val   @= b1( 0 )
       s.from_mem_rdata.rdy @= b1( 0 )
+      s.to_mem_atomic_op @= ATOMIC_NONE
+      s.to_mem_atomic_data @= s.const_zero
 
   def line_trace(s):
     return str(s.recv_in[0].msg) + OPT_SYMBOL_DICT[s.recv_opt.msg.ctrl] + str(s.recv_in[1].msg) + " -> " + str(s.send_out[0].msg)
@@ -12,24 +12,200 @@
 
 from pymtl3 import *
 
-CMD_LAUNCH        = 0
-CMD_PAUSE         = 1
-CMD_TERMINATE     = 2
-CMD_CONFIG        = 3
-CMD_LOAD_REQUEST  = 4
-CMD_LOAD_RESPONSE = 5
-CMD_STORE_REQUEST = 6
-CMD_CONST         = 7
-
+CMD_LAUNCH             = 0
+CMD_PAUSE              = 1
+CMD_TERMINATE          = 2
+CMD_CONFIG             = 3
+CMD_LOAD_REQUEST       = 4
+CMD_LOAD_RESPONSE      = 5
+CMD_STORE_REQUEST      = 6
+CMD_CONST              = 7
+# Requires a ctrl_action field of at least 4 bits (i.e., ctrl_actions >= 16).
+CMD_PERF_READ_REQUEST  = 8
+CMD_PERF_READ_RESPONSE = 9
+# DMA (block transfer) descriptor, handled by the controller, see below.
+CMD_DMA_SRC_ADDR       = 10
+CMD_DMA_DST_ADDR       = 11
+CMD_DMA_STRIDE         = 12
+CMD_DMA_LAUNCH         = 13
+# Atomic read-modify-write requests towards remote memory, see below.
+CMD_ATOMIC_ADD_REQUEST = 14
+CMD_ATOMIC_MIN_REQUEST = 15
+CMD_ATOMIC_MAX_REQUEST = 16
+# Swaps the halves of the double-buffered data memory, see below.
+CMD_SWAP_BUFFER        = 17
+# Swaps the contexts of the shadowed ctrl memory, see below.
+CMD_SWAP_CTRL          = 18
+# Launches a resident ctrl context on all the tiles, see below.
+CMD_SWITCH_CONTEXT     = 19
+# Hardware loop descriptor of the ctrl memory, see below.
+CMD_LOOP_PROLOGUE      = 20
+CMD_LOOP_STEADY        = 21
+CMD_LOOP_EPILOGUE      = 22
+CMD_LOOP_TRIP_COUNT    = 23
+# Dictionary-compressed ctrl signals of the ctrl memory, see below.
+CMD_CONFIG_DICT        = 24
+CMD_CONFIG_RUN         = 25
 
 CMD_SYMBOL_DICT = {
-  CMD_LAUNCH:        "(LAUNCH_KERNEL)",
-  CMD_PAUSE:         "(PAUSE_EXECUTION)",
-  CMD_TERMINATE:     "(TERMINATE_EXECUTION)",
-  CMD_CONFIG:        "(PRELOADING_KERNEL_CONFIG)",
-  CMD_LOAD_REQUEST:  "(LOAD_REQUEST)",
-  CMD_LOAD_RESPONSE: "(LOAD_RESPONSE)",
-  CMD_STORE_REQUEST: "(STORE_REQUEST)",
-  CMD_CONST:         "(CONST_DATA)"
+  CMD_LAUNCH:             "(LAUNCH_KERNEL)",
+  CMD_PAUSE:              "(PAUSE_EXECUTION)",
+  CMD_TERMINATE:          "(TERMINATE_EXECUTION)",
+  CMD_CONFIG:             "(PRELOADING_KERNEL_CONFIG)",
+  CMD_LOAD_REQUEST:       "(LOAD_REQUEST)",
+  CMD_LOAD_RESPONSE:      "(LOAD_RESPONSE)",
+  CMD_STORE_REQUEST:      "(STORE_REQUEST)",
+  CMD_CONST:              "(CONST_DATA)",
+  CMD_PERF_READ_REQUEST:  "(PERF_READ_REQUEST)",
+  CMD_PERF_READ_RESPONSE: "(PERF_READ_RESPONSE)",
+  CMD_DMA_SRC_ADDR:       "(DMA_SRC_ADDR)",
+  CMD_DMA_DST_ADDR:       "(DMA_DST_ADDR)",
+  CMD_DMA_STRIDE:         "(DMA_STRIDE)",
+  CMD_DMA_LAUNCH:         "(DMA_LAUNCH)",
+  CMD_ATOMIC_ADD_REQUEST: "(ATOMIC_ADD_REQUEST)",
+  CMD_ATOMIC_MIN_REQUEST: "(ATOMIC_MIN_REQUEST)",
+  CMD_ATOMIC_MAX_REQUEST: "(ATOMIC_MAX_REQUEST)",
+  CMD_SWAP_BUFFER:        "(SWAP_BUFFER)",
+  CMD_SWAP_CTRL:          "(SWAP_CTRL_CONTEXT)",
+  CMD_SWITCH_CONTEXT:     "(SWITCH_CONTEXT)",
+  CMD_LOOP_PROLOGUE:      "(LOOP_PROLOGUE)",
+  CMD_LOOP_STEADY:        "(LOOP_STEADY)",
+  CMD_LOOP_EPILOGUE:      "(LOOP_EPILOGUE)",
+  CMD_LOOP_TRIP_COUNT:    "(LOOP_TRIP_COUNT)",
+  CMD_CONFIG_DICT:        "(PRELOADING_KERNEL_CONFIG_DICT)",
+  CMD_CONFIG_RUN:         "(PRELOADING_KERNEL_CONFIG_RUN)"
+}
+
+#-------------------------------------------------------------------------
+# Atomic read-modify-write operations in the data memory
+#-------------------------------------------------------------------------
+# A memory unit performs OPT_ATOMIC_* (see lib/opt_type.py) as a load of
+# the address tagged with one of the ATOMIC_* below and the operand, and
+# receives the old data, while the bank writes back op(old, operand) in
+# the same access. The ones towards remote memory are sent as the
+# CMD_ATOMIC_*_REQUEST packets, whose data field carries the operand,
+# and are answered by CMD_LOAD_RESPONSE packets. The min/max compare the
+# payloads as unsigned integers (as OPT_LT/OPT_GT do).
+
+ATOMIC_NONE     = 0
+ATOMIC_ADD      = 1
+ATOMIC_MIN      = 2
+ATOMIC_MAX      = 3
+ATOMIC_OP_NBITS = 2
+
+ATOMIC_SYMBOL_DICT = {
+  ATOMIC_NONE: "(none)",
+  ATOMIC_ADD:  "(atomic+)",
+  ATOMIC_MIN:  "(atomic_min)",
+  ATOMIC_MAX:  "(atomic_max)"
+}
+
+#-------------------------------------------------------------------------
+# DMA (block transfer) between CGRA scratchpads
+#-------------------------------------------------------------------------
+# The descriptor is set up by ctrl packets from CPU towards the
+# controller, whose data field carries:
+#   CMD_DMA_SRC_ADDR: the first source address, within the CGRA.
+#   CMD_DMA_DST_ADDR: the first (global) destination address, i.e., the
+#                     destination CGRA is the one owning the address.
+#   CMD_DMA_STRIDE:   the stride between the source addresses (the
+#                     destination addresses are consecutive).
+#   CMD_DMA_LAUNCH:   the number of words, which starts the transfer.
+# The controller then reads one word per cycle from its data memory and
+# sends it out as a CMD_STORE_REQUEST without involving the tiles.
+
+#-------------------------------------------------------------------------
+# Double-buffered (ping-pong) data memory
+#-------------------------------------------------------------------------
+# The local memory is split into two halves by its top address bit, one
+# of which is computed on by the tiles while the other is accessed by
+# the controller's port (i.e., the NoC requests and the DMA reads). Both
+# sides address their own half as the lower half of the local memory
+# (and the other one as the upper half), so a kernel streams over the
+# same addresses in every phase. A CMD_SWAP_BUFFER ctrl packet from CPU
+# exchanges the halves, once the kernel and the transfers of the phase
+# are done, which requires a ctrl_action field of at least 5 bits.
+
+#-------------------------------------------------------------------------
+# Shadowed (double-buffered) ctrl memory
+#-------------------------------------------------------------------------
+# Once a kernel is launched (even if paused or terminated since then), the
+# CMD_CONFIG packets of a tile write into its shadow ctrl context instead
+# of the iterated one. A CMD_SWAP_CTRL packet towards the tile makes the
+# shadow context the active one at the end of the current iteration (or
+# right away if the kernel is paused or done), and the next kernel starts
+# without being paused/reloaded (see mem/ctrl/CtrlMemDynamicRTL.py), which
+# requires a ctrl_action field of at least 5 bits.
+
+#-------------------------------------------------------------------------
+# Named ctrl contexts
+#-------------------------------------------------------------------------
+# The ctrl memory of a tile can also hold several named contexts (e.g.,
+# kernels run in rotation), where the data field of a CMD_CONFIG packet
+# indicates the context it writes into, and the one of a CMD_LAUNCH
+# packet the context to be iterated. The controller keeps track of the
+# contexts loaded via the CMD_CONFIG packets from CPU, and consumes a
+# CMD_SWITCH_CONTEXT packet (whose data field is the context) by sending
+# the CMD_LAUNCH packets of the context to all of its tiles, so a switch
+# between the resident kernels takes a single packet from CPU. The one
+# towards a context that is not loaded yet is sent back to CPU instead.
+
+#-------------------------------------------------------------------------
+# Hardware loop descriptor
+#-------------------------------------------------------------------------
+# The ctrl signals of a kernel can be split into a prologue, a steady
+# state and an epilogue, which take the ctrl addresses one after another
+# and whose lengths are carried by the data field of the
+# CMD_LOOP_PROLOGUE/CMD_LOOP_STEADY/CMD_LOOP_EPILOGUE packets. The steady
+# state repeats for the trip count of the innermost level, and the whole
+# prologue/steady/epilogue sequence for the ones of the outer levels,
+# each of which is set by a CMD_LOOP_TRIP_COUNT packet whose ctrl_addr
+# field indicates the level (0 is the innermost one) and data field the
+# trip count. A trip count of 0 leaves the innermost level running until
+# the early exit (or total_ctrl_steps) and the outer ones not repeating.
+# The early exit, raised once a tile performs OPT_RET with a true
+# predicate, ends the loop after the current steady-state iteration and
+# the epilogue, instead of padding to the worst-case step count (see
+# mem/ctrl/CtrlMemDynamicRTL.py). These require a ctrl_action field of at
+# least 5 bits.
+
+#-------------------------------------------------------------------------
+# Dictionary-compressed ctrl signals
+#-------------------------------------------------------------------------
+# Most ctrl signals of a kernel repeat (e.g., the NAH ones and the same
+# routing at every cycle), so the ctrl memory of a tile can also keep
+# the distinct ctrl signals once in a dictionary and only a dictionary
+# index per ctrl address. A CMD_CONFIG_DICT packet carries a ctrl signal
+# (as a CMD_CONFIG packet does) and writes it into the dictionary entry
+# indicated by its ctrl_addr field. A CMD_CONFIG_RUN packet writes one
+# dictionary index into consecutive ctrl addresses starting from its
+# ctrl_addr field, whose data field carries the index in its lower
+# clog2(ctrl_dict_size) bits and the number of addresses minus one in
+# the next clog2(ctrl_mem_size) bits. So a run of the same ctrl signal
+# takes a single packet, and the ones shared by the tiles are merged into
+# multicast packets (see compress_ctrl_pkts() in lib/util/ctrl_helper.py).
+# These require a ctrl_action field of at least 5 bits.
+
+#-------------------------------------------------------------------------
+# Per-tile performance counters
+#-------------------------------------------------------------------------
+# The counter to be read is indicated by the data field of a
+# CMD_PERF_READ_REQUEST packet, and its value is carried back to the
+# controller by the data field of the CMD_PERF_READ_RESPONSE packet
+# (whose src is the tile).
+
+PERF_CTRL_VALID        = 0
+PERF_ELEMENT_FIRED     = 1
+PERF_OPT_STALL         = 2
+PERF_XBAR_BACKPRESSURE = 3
+PERF_MEM_STALL         = 4
+NUM_PERF_COUNTERS      = 5
+
+PERF_SYMBOL_DICT = {
+  PERF_CTRL_VALID:        "(CTRL_VALID_CYCLES)",
+  PERF_ELEMENT_FIRED:     "(ELEMENT_FIRED_CYCLES)",
+  PERF_OPT_STALL:         "(OPT_STALL_CYCLES)",
+  PERF_XBAR_BACKPRESSURE: "(XBAR_BACKPRESSURE_CYCLES)",
+  PERF_MEM_STALL:         "(MEM_STALL_CYCLES)"
 }
 
@@ -10,12 +10,62 @@ Convention: The fields/constructor arguments should appear in the order
 Author : Cheng Tan
   Date : Dec 3, 2019
 """
+import functools
+import inspect
+
 from pymtl3 import *
 
+#=========================================================================
+# Type factory cache and interned constants
+#=========================================================================
+# Every mk_* factory below is memoized on its full (default-filled)
+# parameter tuple, so that building the same message type again (e.g.,
+# per tile, per DFG node) returns the very same bitstruct class instead
+# of generating a new one.
+
+_msg_type_cache = {}
+
+def memoize_msg_type( factory ):
+  signature = inspect.signature( factory )
+
+  @functools.wraps( factory )
+  def cached_factory( *args, **kwargs ):
+    bound = signature.bind( *args, **kwargs )
+    bound.apply_defaults()
+    key = ( factory.__name__, ) + tuple( bound.arguments.values() )
+    try:
+      return _msg_type_cache[ key ]
+    except KeyError:
+      MsgType = _msg_type_cache[ key ] = factory( *args, **kwargs )
+      return MsgType
+    except TypeError:
+      # Unhashable parameters are not cached.
+      return factory( *args, **kwargs )
+
+  return cached_factory
+
+# Pool of shared message constants, e.g., the all-zero CtrlPktType()
+# used as the default value in update blocks. The returned instance is
+# shared, so it must only be read (e.g., `s.msg @= intern_msg( T )`),
+# never modified in place. Note that the translation only accepts such
+# constants of bitstructs without list fields (e.g., the data/predicate
+# types, but not the ctrl packets).
+
+_msg_const_pool = {}
+
+def intern_msg( MsgType, *args ):
+  key = ( MsgType, args )
+  try:
+    return _msg_const_pool[ key ]
+  except KeyError:
+    msg = _msg_const_pool[ key ] = MsgType( *args )
+    return msg
+
 #=========================================================================
 # Generic data message
 #=========================================================================
 
+@memoize_msg_type
 def mk_data( payload_nbits=16, predicate_nbits=1, bypass_nbits=1,
              prefix="CGRAData" ):
 
@@ -42,6 +92,7 @@ def mk_data( payload_nbits=16, predicate_nbits=1, bypass_nbits=1,
 # Predicate signal
 #=========================================================================
 
+@memoize_msg_type
 def mk_predicate( payload_nbits=1, predicate_nbits=1, prefix="CGRAData" ):
 
   PayloadType   = mk_bits( payload_nbits   )
@@ -63,6 +114,7 @@ def mk_predicate( payload_nbits=1, predicate_nbits=1, prefix="CGRAData" ):
 # Generic config message
 #=========================================================================
 
+@memoize_msg_type
 def mk_ctrl(num_fu_in = 2, num_inports = 5, num_outports = 5,
             prefix = "CGRAConfig"):
 
@@ -144,6 +196,7 @@ def mk_ctrl(num_fu_in = 2, num_inports = 5, num_outports = 5,
   )
 
 
+@memoize_msg_type
 def mk_separate_ctrl(num_operations = 7,
                      num_fu_inports = 4,
                      num_fu_outports = 2,
@@ -245,6 +298,7 @@ def mk_separate_ctrl(num_operations = 7,
     namespace = { '__str__': str_func }
   )
 
+@memoize_msg_type
 def mk_separate_reg_ctrl(num_operations = 7,
                          num_fu_inports = 4,
                          num_fu_outports = 2,
@@ -387,6 +441,7 @@ def mk_separate_reg_ctrl(num_operations = 7,
 # Cmd message
 #=========================================================================
 
+@memoize_msg_type
 def mk_cmd(cmd_nbits = 6,
            prefix="CommandMessage"):
 
@@ -407,6 +462,7 @@ def mk_cmd(cmd_nbits = 6,
 # Ring multi-CGRA data/config/cmd packet
 #=========================================================================
 
+@memoize_msg_type
 def mk_ring_multi_cgra_pkt(nrouters = 4, opaque_nbits = 8, vc = 2,
                            cmd_nbits = 6, addr_nbits = 16,
                            data_nbits = 16, predicate_nbits = 1,
@@ -463,6 +519,7 @@ def mk_ring_multi_cgra_pkt(nrouters = 4, opaque_nbits = 8, vc = 2,
 # Mesh multi-CGRA data/config/cmd packet
 #=========================================================================
 
+@memoize_msg_type
 def mk_multi_cgra_noc_pkt(ncols = 2, nrows = 2, opaque_nbits = 8, vc = 2,
                           cmd_nbits = 6, addr_nbits = 16,
                           data_nbits = 16, predicate_nbits = 1,
@@ -535,6 +592,7 @@ def mk_multi_cgra_noc_pkt(ncols = 2, nrows = 2, opaque_nbits = 8, vc = 2,
 # that required by FU.
 #=========================================================================
 
+@memoize_msg_type
 def mk_ring_across_tiles_pkt(nrouters = 4,
                              ctrl_actions = 8,
                              ctrl_mem_size = 4,
@@ -684,6 +742,7 @@ def mk_ring_across_tiles_pkt(nrouters = 4,
 # Crossbar (tiles <-> SRAM) packet
 #=========================================================================
 
+@memoize_msg_type
 def mk_tile_sram_xbar_pkt(number_src = 5, number_dst = 5,
                           mem_size_global = 64,
                           prefix="TileSramXbarPacket"):
@@ -705,11 +764,41 @@ def mk_tile_sram_xbar_pkt(number_src = 5, number_dst = 5,
     namespace = {'__str__': str_func}
   )
 
+# The read request additionally carries the atomic operation (one of the
+# ATOMIC_* in lib/cmd_type.py) and its operand.
+@memoize_msg_type
+def mk_tile_sram_xbar_rd_pkt(number_src = 5, number_dst = 5,
+                             mem_size_global = 64, DataType = None,
+                             atomic_nbits = 2,
+                             prefix="TileSramXbarRdPacket"):
+
+  SrcType = mk_bits(clog2(number_src))
+  DstType = mk_bits(clog2(number_dst))
+  AddrType = mk_bits(clog2(mem_size_global))
+  AtomicType = mk_bits(atomic_nbits)
+
+  new_name = f"{prefix}_{number_src}_{number_dst}_{mem_size_global}_" \
+             f"{DataType.__name__}_{atomic_nbits}"
+
+  def str_func(s):
+    return f"{s.src}>{s.dst}:{s.addr}:{s.atomic}.{s.data}"
+
+  return mk_bitstruct(new_name, {
+      'src': SrcType,
+      'dst': DstType,
+      'addr': AddrType,
+      'atomic': AtomicType,
+      'data': DataType,
+    },
+    namespace = {'__str__': str_func}
+  )
+
 
 #=========================================================================
 # Ring for delivering ctrl and data signals and commands across CGRAs
 #=========================================================================
 
+@memoize_msg_type
 def mk_intra_cgra_pkt(nrouters = 4,
                      ctrl_actions = 8,
                      ctrl_mem_size = 4,
@@ -720,6 +809,7 @@ def mk_intra_cgra_pkt(nrouters = 4,
                      ctrl_tile_outports = 5,
                      ctrl_registers_per_reg_bank = 16,
                      data_nbits = 16,
+                     multicast = False,
                      prefix="IntraCgraPacket"):
 
   IdType = mk_bits(clog2(nrouters))
@@ -748,6 +838,8 @@ def mk_intra_cgra_pkt(nrouters = 4,
              f"{ctrl_mem_size}_{ctrl_operations}_{ctrl_fu_inports}_" \
              f"{ctrl_fu_outports}_{ctrl_tile_inports}_" \
              f"{ctrl_tile_outports}_{ctrl_registers_per_reg_bank}"
+  if multicast:
+    new_name += "_multicast"
 
   def str_func(s):
     out_str = '(ctrl_operation)' + str(s.ctrl_operation)
@@ -810,7 +902,11 @@ def mk_intra_cgra_pkt(nrouters = 4,
         out_str += '-'
       out_str += str(int(s.ctrl_read_reg_idx[i]))
 
-    return f"{s.src}>{s.dst}:{s.opaque}:{s.ctrl_action}.{s.ctrl_addr}." \
+    dst_str = f"{s.dst}"
+    if multicast:
+      if s.dst_mask != 0:
+        dst_str = f"{{{s.dst_mask}}}"
+    return f"{s.src}>{dst_str}:{s.opaque}:{s.ctrl_action}.{s.ctrl_addr}." \
            f"{out_str}"
 
   field_dict = {}
@@ -858,6 +954,11 @@ def mk_intra_cgra_pkt(nrouters = 4,
   field_dict['ctrl_read_reg_from'] = [b1 for _ in range(ctrl_fu_inports)]
   field_dict['ctrl_read_reg_idx'] = [CtrlRegIdxType for _ in range(ctrl_fu_inports)]
 
+  # Given `multicast`, a non-zero `dst_mask` delivers the packet to every
+  # tile of its set bits (instead of `dst`), see controller/ControllerRTL.py.
+  if multicast:
+    field_dict['dst_mask'] = mk_bits(nrouters)
+
   return mk_bitstruct(new_name, field_dict,
     namespace = {'__str__': str_func}
   )
\ No newline at end of file
@@ -57,6 +57,10 @@ OPT_FINC                  = Bits6( 40 )
 OPT_FMUL                  = Bits6( 41 )
 OPT_FMUL_CONST            = Bits6( 42 )
 
+OPT_ATOMIC_ADD            = Bits6( 43 )
+OPT_ATOMIC_MIN            = Bits6( 44 )
+OPT_ATOMIC_MAX            = Bits6( 45 )
+
 OPT_VEC_ADD          = Bits6( 50 )
 OPT_VEC_INC          = Bits6( 51 )
 OPT_VEC_ADD_CONST    = Bits6( 52 )
@@ -116,6 +120,10 @@ OPT_SYMBOL_DICT = {
   OPT_FMUL           : "(f*)",
   OPT_FMUL_CONST     : "(f*')",
 
+  OPT_ATOMIC_ADD     : "(atomic+)",
+  OPT_ATOMIC_MIN     : "(atomic_min)",
+  OPT_ATOMIC_MAX     : "(atomic_max)",
+
   OPT_VEC_ADD         : "(v1+)",
   OPT_VEC_INC         : "(v1++)",
   OPT_VEC_ADD_CONST   : "(v1+')",
@@ -0,0 +1,34 @@
+"""
+==========================================================================
+messages_test.py
+==========================================================================
+Test cases for the memoized message type factories and the interned
+message constants.
+
+Author : agent
+  Date : Oct 18, 2026
+
+"""
+
+from pymtl3 import *
+from ..messages import *
+
+def test_memoized_factories():
+  DataType = mk_data( 32, 1 )
+  assert mk_data( 32, 1 ) is DataType
+  # Default-filled and keyword arguments hit the same entry.
+  assert mk_data( 32 ) is DataType
+  assert mk_data( payload_nbits = 32, predicate_nbits = 1 ) is DataType
+  assert mk_data( 16, 1 ) is not DataType
+
+  CtrlPktType = mk_intra_cgra_pkt( 4, 8, 4, 7, 4, 2, 8, 8, 4, 4 )
+  assert mk_intra_cgra_pkt( 4, 8, 4, 7, 4, 2, 8, 8, 4, 4 ) is CtrlPktType
+  assert mk_intra_cgra_pkt( 4, 8, 4, 7, 4, 2, 8, 8, 4, 5 ) is not CtrlPktType
+
+def test_intern_msg():
+  DataType = mk_data( 16, 1 )
+  zero = intern_msg( DataType )
+  assert intern_msg( DataType ) is zero
+  assert zero == DataType()
+  assert intern_msg( DataType, 5, 1 ) == DataType( 5, 1 )
+  assert intern_msg( DataType, 5, 1 ) is not zero
@@ -0,0 +1,269 @@
+"""
+==========================================================================
+build_cache.py
+==========================================================================
+Persistent, content-addressed cache of the translated Verilog and the
+Verilator-built shared libraries of the models under --test-verilog.
+
+A cache entry is keyed by a hash of the component hierarchy of the DUT
+(class and constructor parameters of every component, including FuList
+and bitstruct types), the source files of the involved classes, the
+translation/import metadata set on the DUT, and the pymtl3/Verilator
+versions. The entry holds the artifacts that the translation-import pass
+leaves in the working directory (`<top>__pickled.v`, the Verilator obj
+dir, the C/Python wrappers, the shared library and the import config).
+Restoring them before the translation-import lets pymtl3 find an
+identical translation result and skip verilating/compiling the model.
+
+`config_model_with_cmdline_opts()` is a drop-in replacement of the one in
+pymtl3.stdlib.test_utils. The cache lives in ~/.cache/vectorcgra/build
+unless VECTORCGRA_BUILD_CACHE points elsewhere (or is set to "off"), and
+is trimmed down to VECTORCGRA_BUILD_CACHE_MAX_MB megabytes and
+VECTORCGRA_BUILD_CACHE_MAX_DAYS days of not being used.
+
+Author : agent
+  Date : Oct 18, 2026
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import subprocess
+import time
+from functools import lru_cache
+
+from pymtl3 import *
+from pymtl3.datatypes import is_bitstruct_class
+from pymtl3.dsl import MetadataKey
+from pymtl3.passes.backends.verilog import (VerilogTranslationPass,
+                                            VerilogVerilatorImportPass)
+from .mem_image import config_model_with_mem_images
+
+#-------------------------------------------------------------------------
+# Cache key
+#-------------------------------------------------------------------------
+
+def _stable_repr( obj ):
+  if isinstance( obj, type ):
+    if issubclass( obj, Bits ):
+      return f"Bits{obj.nbits}"
+    if is_bitstruct_class( obj ):
+      fields = ",".join( f"{name}:{_stable_repr( type_ )}" for name, type_
+                         in obj.__bitstruct_fields__.items() )
+      return f"{obj.__name__}{{{fields}}}"
+    return f"{obj.__module__}.{obj.__qualname__}"
+  if isinstance( obj, ( list, tuple ) ):
+    return "[" + ",".join( _stable_repr( x ) for x in obj ) + "]"
+  if isinstance( obj, dict ):
+    return "{" + ",".join( f"{_stable_repr( k )}:{_stable_repr( v )}"
+                           for k, v in obj.items() ) + "}"
+  if callable( obj ) and hasattr( obj, '__qualname__' ):
+    return f"{obj.__module__}.{obj.__qualname__}"
+  return repr( obj )
+
+def _metadata_keys( *passes ):
+  return { key: f"{p.__name__}.{name}" for p in passes
+           for name, key in vars( p ).items()
+           if isinstance( key, MetadataKey ) }
+
+_METADATA_KEYS = _metadata_keys( VerilogTranslationPass,
+                                 VerilogVerilatorImportPass )
+
+@lru_cache( maxsize = None )
+def _versions():
+  try:
+    from importlib.metadata import version
+    pymtl3_version = version( 'pymtl3' )
+  except Exception:
+    pymtl3_version = ''
+  try:
+    verilator_version = subprocess.run( [ 'verilator', '--version' ],
+                                        capture_output = True,
+                                        text = True ).stdout.strip()
+  except OSError:
+    verilator_version = ''
+  return pymtl3_version, verilator_version
+
+def cache_key( dut, *extra ):
+  h = hashlib.sha256()
+  sources = set()
+  components = dut.get_all_object_filter( lambda x: isinstance( x, Component ) )
+  for m in sorted( components, key = repr ):
+    h.update( repr( m ).encode() )
+    h.update( _stable_repr( type( m ) ).encode() )
+    h.update( _stable_repr( m._dsl.args ).encode() )
+    h.update( _stable_repr( m._dsl.kwargs ).encode() )
+    for cls in type( m ).__mro__:
+      if cls.__module__.startswith( 'pymtl3' ) or cls is object:
+        continue
+      sources.add( inspect.getsourcefile( cls ) )
+  sources.discard( None )
+  for path in sorted( sources ):
+    with open( path, 'rb' ) as fd:
+      h.update( fd.read() )
+  for key, name in sorted( _METADATA_KEYS.items(), key = lambda x: x[1] ):
+    if dut.has_metadata( key ):
+      h.update( f"{name}={_stable_repr( dut.get_metadata( key ) )}".encode() )
+  h.update( _stable_repr( extra ).encode() )
+  h.update( repr( _versions() ).encode() )
+  return h.hexdigest()
+
+#-------------------------------------------------------------------------
+# BuildCache
+#-------------------------------------------------------------------------
+
+class BuildCache:
+
+  def __init__( s, root, max_bytes = 4 << 30, max_age = 30 * 24 * 3600 ):
+    s.root      = root
+    s.max_bytes = max_bytes
+    s.max_age   = max_age
+    s.hits      = []
+    s.misses    = []
+    os.makedirs( root, exist_ok = True )
+
+  def entry_dir( s, key ):
+    return os.path.join( s.root, key )
+
+  def manifest_path( s, key ):
+    return os.path.join( s.entry_dir( key ), 'manifest.json' )
+
+  def read_manifest( s, key ):
+    try:
+      with open( s.manifest_path( key ) ) as fd:
+        return json.load( fd )
+    except ( OSError, ValueError ):
+      return None
+
+  def write_manifest( s, key, manifest ):
+    tmp = s.manifest_path( key ) + '.tmp'
+    with open( tmp, 'w' ) as fd:
+      json.dump( manifest, fd )
+    os.replace( tmp, s.manifest_path( key ) )
+
+  # Copies the artifacts of the entry into `dst_dir`. Returns whether the
+  # entry exists.
+  def fetch( s, key, dst_dir = '.', name = '' ):
+    manifest = s.read_manifest( key )
+    if manifest is None:
+      s.misses.append( name or key )
+      return False
+    for f in manifest[ 'files' ]:
+      src = os.path.join( s.entry_dir( key ), f )
+      dst = os.path.join( dst_dir, f )
+      if os.path.isdir( src ):
+        # Replaces a stale copy (copytree has no dirs_exist_ok before 3.8).
+        shutil.rmtree( dst, ignore_errors = True )
+        shutil.copytree( src, dst )
+      else:
+        shutil.copy2( src, dst )
+    manifest[ 'last_used' ] = time.time()
+    s.write_manifest( key, manifest )
+    s.hits.append( name or key )
+    return True
+
+  # Copies `files` (relative to `src_dir`) into a new entry.
+  def store( s, key, files, src_dir = '.', name = '' ):
+    entry = s.entry_dir( key )
+    tmp   = f"{entry}.tmp{os.getpid()}"
+    shutil.rmtree( tmp, ignore_errors = True )
+    os.makedirs( tmp )
+    size = 0
+    for f in files:
+      src = os.path.join( src_dir, f )
+      dst = os.path.join( tmp, f )
+      if os.path.isdir( src ):
+        shutil.copytree( src, dst )
+        size += sum( os.path.getsize( os.path.join( d, x ) )
+                     for d, _, xs in os.walk( dst ) for x in xs )
+      else:
+        shutil.copy2( src, dst )
+        size += os.path.getsize( dst )
+    now = time.time()
+    with open( os.path.join( tmp, 'manifest.json' ), 'w' ) as fd:
+      json.dump( { 'name': name, 'files': list( files ), 'size': size,
+                   'created': now, 'last_used': now }, fd )
+    shutil.rmtree( entry, ignore_errors = True )
+    os.replace( tmp, entry )
+    s.evict()
+
+  # Drops the entries not used for `max_age` seconds, then the least
+  # recently used ones until the cache fits in `max_bytes`.
+  def evict( s ):
+    now = time.time()
+    entries = []
+    for key in os.listdir( s.root ):
+      manifest = s.read_manifest( key )
+      if manifest is None:
+        continue
+      if now - manifest[ 'last_used' ] > s.max_age:
+        shutil.rmtree( s.entry_dir( key ), ignore_errors = True )
+      else:
+        entries.append( ( manifest[ 'last_used' ], manifest[ 'size' ], key ) )
+    total = sum( size for _, size, _ in entries )
+    for _, size, key in sorted( entries ):
+      if total <= s.max_bytes:
+        break
+      shutil.rmtree( s.entry_dir( key ), ignore_errors = True )
+      total -= size
+
+  def report( s ):
+    lines = [ f"build cache {s.root}: {len( s.hits )} hit(s), "
+              f"{len( s.misses )} miss(es)" ]
+    lines += [ f"  hit  {name}" for name in s.hits ]
+    lines += [ f"  miss {name}" for name in s.misses ]
+    return "\n".join( lines )
+
+#-------------------------------------------------------------------------
+# Default cache and config_model_with_cmdline_opts
+#-------------------------------------------------------------------------
+
+_default_cache = None
+
+def get_default_cache():
+  global _default_cache
+  root = os.environ.get( 'VECTORCGRA_BUILD_CACHE',
+                         os.path.join( os.path.expanduser( '~' ), '.cache',
+                                       'vectorcgra', 'build' ) )
+  if root == 'off':
+    return None
+  if _default_cache is None or _default_cache.root != root:
+    max_mb   = float( os.environ.get( 'VECTORCGRA_BUILD_CACHE_MAX_MB', 4096 ) )
+    max_days = float( os.environ.get( 'VECTORCGRA_BUILD_CACHE_MAX_DAYS', 30 ) )
+    _default_cache = BuildCache( root, int( max_mb * ( 1 << 20 ) ),
+                                 max_days * 24 * 3600 )
+  return _default_cache
+
+def _artifacts( top_module ):
+  return [ f for f in ( f"{top_module}__pickled.v",
+                        f"obj_dir_{top_module}",
+                        f"{top_module}_v.cpp",
+                        f"{top_module}_v.py",
+                        f"lib{top_module}_v.so",
+                        f"pymtl_import_config_{top_module}.json" )
+           if os.path.exists( f ) ]
+
+def config_model_with_cmdline_opts( top, cmdline_opts, duts ):
+  cache = get_default_cache()
+  if cache is None or not cmdline_opts.get( 'test_verilog', False ):
+    return config_model_with_mem_images( top, cmdline_opts, duts )
+
+  top.elaborate()
+  dut_objs = [ eval( f'top.{dut}' ) for dut in duts ] if duts else [ top ]
+  # The xinit/trace options also end up in the verilated model.
+  opts = { k: cmdline_opts.get( k ) for k in ( 'test_verilog', 'dump_vcd',
+                                              'on_demand_vcd_portname' ) }
+  keys = []
+  for dut in dut_objs:
+    key = cache_key( dut, opts )
+    keys.append( ( key, cache.fetch( key, name = type( dut ).__name__ ) ) )
+
+  top = config_model_with_mem_images( top, cmdline_opts, duts )
+
+  for dut, ( key, hit ) in zip( dut_objs, keys ):
+    if not hit and dut.has_metadata( VerilogTranslationPass.translated_top_module ):
+      top_module = dut.get_metadata( VerilogTranslationPass.translated_top_module )
+      cache.store( key, _artifacts( top_module ), name = type( dut ).__name__ )
+  return top
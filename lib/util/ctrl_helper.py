@@ -12,6 +12,7 @@ Author : Cheng Tan
 
 
 from .map_helper import *
+from ..cmd_type import *
 from ..messages import *
 from ...fu.flexible.FlexibleFuRTL import FlexibleFuRTL
 import json
@@ -115,3 +116,96 @@ class CGRACtrl:
 def wrap_ctrl_signals(CtrlType, raw_ctrls):
   pass
 
+
+# Merges the ctrl packets that only differ in their dst (e.g., the same
+# config of the tiles of a homogeneous array) into multicast packets
+# (see `multicast` in mk_intra_cgra_pkt), where a packet only joins an
+# earlier one if its dst has received nothing since, which keeps the
+# packets of each tile in order.
+def merge_multicast_ctrl_pkts( pkts ):
+  merged = []
+  masks = []
+  keys = []
+  last_idx = {}
+  for pkt in pkts:
+    key = pkt.clone()
+    key.dst = type( pkt.dst )( 0 )
+    key.dst_mask = type( pkt.dst_mask )( 0 )
+    key = int( key.to_bits() )
+    dst = int( pkt.dst )
+    for i in range( last_idx.get( dst, -1 ) + 1, len( merged ) ):
+      if keys[ i ] == key and not ( masks[ i ] >> dst ) & 1:
+        break
+    else:
+      i = len( merged )
+      merged.append( pkt )
+      masks.append( 0 )
+      keys.append( key )
+    masks[ i ] |= 1 << dst
+    last_idx[ dst ] = i
+
+  for i in range( len( merged ) ):
+    # The packets of a single tile stay unicast.
+    if masks[ i ] & ( masks[ i ] - 1 ):
+      merged[ i ] = merged[ i ].clone()
+      merged[ i ].dst_mask = type( pkt.dst_mask )( masks[ i ] )
+  return merged
+
+# Compresses the CMD_CONFIG packets of each tile into the dictionary
+# format of its ctrl memory (see `ctrl_dict_size` in
+# mem/ctrl/CtrlMemDynamicRTL.py and lib/cmd_type.py): every distinct ctrl
+# signal of the tile is sent once as a CMD_CONFIG_DICT packet, and each
+# run of consecutive ctrl addresses of the same ctrl signal as a single
+# CMD_CONFIG_RUN packet. The pending configs of a tile are sent right
+# before its next packet of another kind (e.g., CMD_LAUNCH), so the
+# packets of each tile stay in order, and the dictionary entries sent
+# earlier are reused. The result can be merged into multicast packets by
+# merge_multicast_ctrl_pkts(), which then share the dictionary entries
+# (and the runs) common to the tiles.
+def compress_ctrl_pkts( pkts, ctrl_dict_size ):
+  idx_nbits = max( clog2( ctrl_dict_size ), 1 )
+  compressed = []
+  dicts = {}
+  pending = {}
+
+  def flush( dst ):
+    configs = pending.pop( dst, {} )
+    entries = dicts.setdefault( dst, {} )
+    runs = []
+    for addr in sorted( configs ):
+      pkt = configs[ addr ]
+      key = pkt.clone()
+      key.dst = type( pkt.dst )( 0 )
+      key.ctrl_addr = type( pkt.ctrl_addr )( 0 )
+      key.data = type( pkt.data )( 0 )
+      key = int( key.to_bits() )
+      if key not in entries:
+        assert len( entries ) < ctrl_dict_size, \
+               f"tile {dst} has more than {ctrl_dict_size} distinct ctrl signals"
+        entries[ key ] = len( entries )
+        entry = pkt.clone()
+        entry.ctrl_action = type( pkt.ctrl_action )( CMD_CONFIG_DICT )
+        entry.ctrl_addr = type( pkt.ctrl_addr )( entries[ key ] )
+        entry.data = type( pkt.data )( 0 )
+        compressed.append( entry )
+      idx = entries[ key ]
+      if runs and runs[ -1 ][ 0 ] + runs[ -1 ][ 1 ] == addr and \
+         runs[ -1 ][ 2 ] == idx:
+        runs[ -1 ][ 1 ] += 1
+      else:
+        runs.append( [ addr, 1, idx, pkt ] )
+    for addr, length, idx, pkt in runs:
+      compressed.append( type( pkt )( pkt.src, pkt.dst, pkt.opaque,
+                                      pkt.vc_id, CMD_CONFIG_RUN, addr,
+                                      data = ( ( length - 1 ) << idx_nbits ) | idx ) )
+
+  for pkt in pkts:
+    dst = int( pkt.dst )
+    if pkt.ctrl_action == CMD_CONFIG:
+      pending.setdefault( dst, {} )[ int( pkt.ctrl_addr ) ] = pkt
+    else:
+      flush( dst )
+      compressed.append( pkt )
+  for dst in list( pending ):
+    flush( dst )
+  return compressed
@@ -14,6 +14,7 @@ from .map_helper import *
 from ..messages import *
 import json
 
+NodeDataType = mk_data( 16, 1 )
 
 class Node:
 
@@ -24,20 +25,21 @@ class Node:
     s.opt                  = opt
     s.opt_predicate        = opt_predicate
     s.layer                = 0
+    s.height               = 0
+    s.slack                = 0
     s.const_index          = const_index
     s.num_const            = len( const_index )
     s.num_input            = len( input_node  )
-    DataType               = mk_data( 16, 1 )
     s.input_node           = input_node
     s.input_predicate_node = input_predicate_node
-    s.input_value          = [ DataType( 0, 0 ) ] * s.num_input
+    s.input_value          = [ NodeDataType( 0, 0 ) ] * s.num_input
     s.input_predicate      = 1
 
     # 2D array for output since there will be multiple results generated,
     # and each of them will route to different successors.
     s.output_node  = output_node
     s.num_output   = [ len( array ) for array in output_node ]
-    s.output_value = [ [ DataType( 0, 0 ) for _ in array ]
+    s.output_value = [ [ NodeDataType( 0, 0 ) for _ in array ]
                          for array in output_node ]
 
     # We manually or automatically pick one BRH node to insert a live_out_ctrl
@@ -75,57 +77,181 @@ def get_node( node_id, nodes ):
       return node
   return None
 
+#-------------------------------------------------------------------------
+# Streaming JSON loader
+#-------------------------------------------------------------------------
+# Yields the node objects of a JSON array one by one without materializing
+# the whole document, so that huge DFGs emitted by the compiler can be
+# consumed incrementally.
+
+def iter_dfg_json( json_file, chunk_size = 1 << 16 ):
+  decoder = json.JSONDecoder()
+  buf     = json_file.read( chunk_size )
+  pos     = 0
+  eof     = False
+  started = False
+
+  while True:
+    # Skips whitespace and separators.
+    while True:
+      while pos < len( buf ) and buf[pos] in ' \t\r\n,':
+        pos += 1
+      if pos < len( buf ) or eof:
+        break
+      buf = json_file.read( chunk_size )
+      pos = 0
+      eof = not buf
+
+    if pos >= len( buf ):
+      raise ValueError( "unexpected end of DFG json" )
+
+    if not started:
+      if buf[pos] != '[':
+        raise ValueError( "DFG json must be an array of nodes" )
+      started = True
+      pos += 1
+      continue
+
+    if buf[pos] == ']':
+      return
+
+    while True:
+      try:
+        obj, end = decoder.raw_decode( buf, pos )
+        break
+      except json.JSONDecodeError:
+        if eof:
+          raise
+        more = json_file.read( chunk_size )
+        eof  = not more
+        buf  = buf[pos:] + more
+        pos  = 0
+
+    yield obj
+    pos = end
+    if pos > chunk_size:
+      buf = buf[pos:]
+      pos = 0
+
+#-------------------------------------------------------------------------
+# DFG
+#-------------------------------------------------------------------------
+# Nodes are kept in the json order (which is also the evaluation order of
+# CgraFL) and indexed by id. Edges from a node to one that appears later
+# in the json are forward edges; the others are loop-carried back edges.
+# layer is the longest forward path from any source, height the longest
+# forward path to any sink, and nodes with zero slack lie on the critical
+# path.
+
 class DFG:
 
   def __init__( s, json_file_name, const_list, data_spm ):
-    s.nodes       = []
-    s.num_const   = 0
-    s.num_input   = 0
+    s.nodes        = []
+    s.id2node      = {}
+    s.id2index     = {}
+    s.successors   = {}
+    s.predecessors = {}
+    s.num_const    = 0
+    s.num_input    = 0
 #    s.num_output  = 0
     # We assume single liveout for now
     s.num_liveout = 1
     s.const_list  = const_list
     s.data_spm    = data_spm
     with open(json_file_name) as json_file:
-      dfg = json.load(json_file)
-      for i in range( len(dfg) ):
-        node = Node( dfg[i]['id'],
-                     getUnitType(dfg[i]['fu']),
-                     getOptType(dfg[i]['opt']),
-                     dfg[i]['opt_predicate'],
-                     dfg[i]['in_const'],
-                     dfg[i]['in'],
-                     dfg[i]['in_predicate'],
-                     dfg[i]['out'] )
-        s.nodes.append( node )
-        max_layer = -1
-        print("cur_node: ", node.id, " pre: ", (node.input_node+node.input_predicate_node))
-        for input_node in (node.input_node+node.input_predicate_node):
-          pre_node = get_node( input_node, s.nodes )
-          if( pre_node != None ):
-            if pre_node.layer > max_layer:
-              max_layer = pre_node.layer
-        node.layer = max_layer + 1
-          
-        s.num_const  += node.num_const
-        s.num_input  += node.num_input
-#        s.num_output += node.num_output
-        if 'live_out_ctrl' in dfg[i].keys():
-          node.live_out_ctrl = 1
-        if 'live_out_val' in dfg[i].keys():
-          node.live_out_val = 1
+      for item in iter_dfg_json( json_file ):
+        s.add_node( item )
+    s.annotate()
+
+  def add_node( s, item ):
+    node = Node( item['id'],
+                 getUnitType(item['fu']),
+                 getOptType(item['opt']),
+                 item['opt_predicate'],
+                 item['in_const'],
+                 item['in'],
+                 item['in_predicate'],
+                 item['out'] )
+    s.id2node.setdefault( node.id, node )
+    s.id2index.setdefault( node.id, len( s.nodes ) )
+    s.nodes.append( node )
 
+    # Duplicated edges are dropped while keeping the json order.
+    s.predecessors.setdefault( node.id, list( dict.fromkeys(
+        node.input_node + node.input_predicate_node ) ) )
+    s.successors.setdefault( node.id, list( dict.fromkeys(
+        succ_id for array in node.output_node for succ_id in array ) ) )
+
+    # Only predecessors that are already loaded contribute to the layer.
+    max_layer = -1
+    for pre_id in node.input_node + node.input_predicate_node:
+      pre_node = s.id2node.get( pre_id )
+      if pre_node != None:
+        if pre_node.layer > max_layer:
+          max_layer = pre_node.layer
+    node.layer = max_layer + 1
+
+    s.num_const  += node.num_const
+    s.num_input  += node.num_input
+    if 'live_out_ctrl' in item.keys():
+      node.live_out_ctrl = 1
+    if 'live_out_val' in item.keys():
+      node.live_out_val = 1
+    return node
+
+  def annotate( s ):
     s.layer_diff_list = [ 0 ] * s.num_input
     channel_index= 0
     for node in s.nodes:
       for node_id in node.input_node:
-        layer_diff = node.layer - get_node( node_id, s.nodes ).layer
+        layer_diff = node.layer - s.id2node[node_id].layer
         if layer_diff > 0:
           s.layer_diff_list[channel_index] = layer_diff
         else:
           s.layer_diff_list[channel_index] = 1
         channel_index += 1
 
+    # Longest forward path to a sink, computed in reverse json order.
+    for index in range( len( s.nodes ) - 1, -1, -1 ):
+      node = s.nodes[index]
+      node.height = 0
+      for succ_id in s.successors[node.id]:
+        succ_index = s.id2index.get( succ_id )
+        if succ_index != None and succ_index > index:
+          node.height = max( node.height, s.id2node[succ_id].height + 1 )
+
+    s.critical_path_length = 0
+    for node in s.nodes:
+      s.critical_path_length = max( s.critical_path_length,
+                                    node.layer + node.height + 1 )
+    for node in s.nodes:
+      node.slack = s.critical_path_length - 1 - node.layer - node.height
+
   def get_node( s, node_id ):
-    return get_node( node_id, s.nodes)
+    return s.id2node.get( node_id )
+
+  def get_successors( s, node_id ):
+    return s.successors.get( node_id, [] )
+
+  def get_predecessors( s, node_id ):
+    return s.predecessors.get( node_id, [] )
 
+  def get_critical_path( s ):
+    path = []
+    node = None
+    for candidate in s.nodes:
+      if candidate.slack == 0 and candidate.layer == 0:
+        node = candidate
+        break
+    while node != None:
+      path.append( node.id )
+      index = s.id2index[node.id]
+      next_node = None
+      for succ_id in s.successors[node.id]:
+        succ = s.id2node.get( succ_id )
+        if succ != None and s.id2index[succ_id] > index and \
+           succ.slack == 0 and succ.height == node.height - 1:
+          next_node = succ
+          break
+      node = next_node
+    return path
@@ -0,0 +1,373 @@
+"""
+==========================================================================
+mem_image.py
+==========================================================================
+Memory images to preload the data memories with, without walking the
+memory one word per cycle after reset, and NumPy views of the simulated
+memories to check them against golden arrays.
+
+An image is given as a list of messages/ints, a NumPy array, or the path
+of an image file, and is normalized into a list of ints by
+`load_mem_image()`:
+
+  list/tuple      DataType messages or their packed ints
+  NumPy array     shape (n,) of payloads (predicate 1), or shape (n, 2)
+                  of payload/predicate pairs
+  "*.hex/*.mem"   $readmemh format, one packed word per line (`//`
+                  comments and `@<hex address>` directives allowed)
+  other paths     raw little-endian payloads (predicate 1), each of
+                  ceil(payload_nbits / 8) bytes
+
+A memory holding images implements `mem_images()`, which returns a list
+of (RegisterFile, words) pairs:
+ - In the Python simulation, `preload_sim_memories()` writes the words
+   into the registers of the RegisterFiles right after reset, so no
+   per-word wires or cycles are spent on the preload.
+ - In the translated Verilog, MemImageTranslationPass gives every such
+   RegisterFile its own module whose registers are initialized by
+   `$readmemh` from a hex file written into the working directory, where
+   the translation result is written and the Verilated model runs.
+   MemImageTranslationImportPass is the translation-import pass using it,
+   which `config_model_with_mem_images()` applies under --test-verilog
+   (and so does `config_model_with_cmdline_opts()` of build_cache.py).
+   The stock VerilogTranslationPass raises on such memories rather than
+   dropping their images.
+
+SRAM banks built with a macro (see mem/data/SramBankRTL.py) are
+black-boxed by SramMacroTranslationPass, which translates them into
+instances of the macro instead of their behavioral model (and leaves
+their preload to the macro).
+
+The memories (DataMemWithCrossbarRTL, DataMemRTL, DataMemCL,
+CtrlMemDynamicRTL and ConstQueueDynamicRTL) return their contents by
+`to_array()` as a NumPy structured array built by `mem_to_array()`, with
+one field per field of the message (e.g., `mem['payload']` and
+`mem['predicate']` are separate views), and compare them against a golden
+array by `diff_array()` (see `diff_mem()`), which returns the mismatching
+addresses.
+
+Author : agent
+  Date : Oct 18, 2026
+"""
+
+import hashlib
+import os
+import re
+
+from pymtl3 import *
+from pymtl3.datatypes import is_bitstruct_class
+from pymtl3.passes.backends.verilog import (VerilogPlaceholderPass,
+                                            VerilogTranslationImportPass,
+                                            VerilogTranslationPass,
+                                            VerilogVerilatorImportPass)
+from pymtl3.passes.backends.verilog.translation.VTranslator import VTranslator
+from pymtl3.passes.tracing import VcdGenerationPass
+from pymtl3.stdlib import test_utils
+from pymtl3.stdlib.test_utils.test_helpers import _recursive_set_vl_trace
+
+#-------------------------------------------------------------------------
+# Image loading
+#-------------------------------------------------------------------------
+
+def _pack( DataType, payload, predicate ):
+  return int( DataType( payload, predicate ).to_bits() )
+
+def read_hex_image( path ):
+  words = {}
+  addr  = 0
+  with open( path ) as fd:
+    for line in fd:
+      for token in line.split( '//' )[0].split():
+        if token.startswith( '@' ):
+          addr = int( token[1:], 16 )
+        else:
+          words[ addr ] = int( token.replace( '_', '' ), 16 )
+          addr += 1
+  return [ words.get( i, 0 ) for i in range( max( words, default = -1 ) + 1 ) ]
+
+def read_bin_image( path, DataType ):
+  payload_nbits = DataType.get_field_type( 'payload' ).nbits
+  nbytes = ( payload_nbits + 7 ) // 8
+  with open( path, 'rb' ) as fd:
+    raw = fd.read()
+  assert len( raw ) % nbytes == 0, \
+         f"{path} is not a multiple of {nbytes}-byte words"
+  return [ _pack( DataType, int.from_bytes( raw[ i : i + nbytes ], 'little' )
+                            & ( ( 1 << payload_nbits ) - 1 ), 1 )
+           for i in range( 0, len( raw ), nbytes ) ]
+
+def load_mem_image( image, DataType, num_words = None ):
+  if isinstance( image, ( str, os.PathLike ) ):
+    path = os.fspath( image )
+    if path.endswith( ( '.hex', '.mem' ) ):
+      words = read_hex_image( path )
+    else:
+      words = read_bin_image( path, DataType )
+
+  elif type( image ).__module__ == 'numpy':
+    if image.ndim == 1:
+      words = [ _pack( DataType, int( x ), 1 ) for x in image.tolist() ]
+    else:
+      assert image.ndim == 2 and image.shape[1] == 2, \
+             "expects an array of payloads or of payload/predicate pairs"
+      words = [ _pack( DataType, int( x ), int( p ) )
+                for x, p in image.tolist() ]
+
+  else:
+    words = [ int( x.to_bits() ) if isinstance( x, DataType ) else int( x )
+              for x in image ]
+
+  assert num_words is None or len( words ) <= num_words, \
+         f"the image of {len( words )} words exceeds {num_words} words"
+  return words
+
+def write_hex_image( path, words, nbits ):
+  ndigits = ( nbits + 3 ) // 4
+  with open( path, 'w' ) as fd:
+    for word in words:
+      fd.write( f"{word:0{ndigits}x}\n" )
+
+#-------------------------------------------------------------------------
+# Simulation
+#-------------------------------------------------------------------------
+
+def _image_holders( top ):
+  holders = top.get_all_object_filter(
+              lambda x: isinstance( x, Component ) and
+                        hasattr( x, 'mem_images' ) and x.mem_images() )
+  if hasattr( top, 'mem_images' ) and top.mem_images():
+    holders.add( top )
+  return sorted( holders, key = repr )
+
+# Writes the images into the registers of a model prepared for the
+# Python simulation. Registers are not touched by reset, so this can be
+# done either before or after sim_reset(). Memories imported from Verilog
+# are skipped, as they are initialized by $readmemh.
+def preload_sim_memories( top ):
+  for mem in _image_holders( top ):
+    for reg_file, words in mem.mem_images():
+      Type = type( reg_file.regs[0] )
+      for i, word in enumerate( words ):
+        data = Type.from_bits( mk_bits( Type.nbits )( word ) ) \
+               if is_bitstruct_class( Type ) else Type( word )
+        # Both the current and the next value of the flip-flops are
+        # written, otherwise the next posedge flips the stale value back.
+        reg_file.regs[i] @= data
+        reg_file.regs[i] <<= data
+
+#-------------------------------------------------------------------------
+# Inspection
+#-------------------------------------------------------------------------
+
+def _to_int( value ):
+  return int( value.to_bits() ) if is_bitstruct_class( type( value ) ) \
+         else int( value )
+
+def _dtype( np, Type ):
+  return np.uint64 if Type.nbits <= 64 else object
+
+# Returns the messages (or Bits) as a NumPy array, which is a structured
+# array of one field per field of the bitstruct (list fields become
+# subarrays), or a plain array for Bits.
+def mem_to_array( msgs ):
+  import numpy as np
+  msgs = list( msgs )
+  if not msgs or not is_bitstruct_class( type( msgs[0] ) ):
+    return np.array( [ _to_int( x ) for x in msgs ], dtype = np.uint64 )
+
+  fields = type( msgs[0] ).__bitstruct_fields__
+  dtype  = [ ( name, _dtype( np, Type[0] ), ( len( Type ), ) )
+             if isinstance( Type, list ) else ( name, _dtype( np, Type ) )
+             for name, Type in fields.items() ]
+  array  = np.zeros( len( msgs ), dtype = dtype )
+  for name, Type in fields.items():
+    if isinstance( Type, list ):
+      array[ name ] = [ [ _to_int( v ) for v in getattr( x, name ) ]
+                        for x in msgs ]
+    else:
+      array[ name ] = [ _to_int( getattr( x, name ) ) for x in msgs ]
+  return array
+
+# Returns the addresses at which `mem` (from to_array()) differs from
+# `golden`, which is compared against `mem[base : base + len(golden)]`.
+# A golden structured array (or list of messages) is compared on its
+# `fields` (default all of them), and a plain one (or list of ints) on
+# the payloads.
+def diff_mem( mem, golden, base = 0, fields = None ):
+  import numpy as np
+  if isinstance( golden, ( list, tuple ) ):
+    golden = mem_to_array( golden ) if golden and \
+             is_bitstruct_class( type( golden[0] ) ) else np.array( golden )
+  assert base + len( golden ) <= len( mem ), \
+         f"{len( golden )} words at {base} exceed the {len( mem )}-word memory"
+  mem = mem[ base : base + len( golden ) ]
+
+  if golden.dtype.names:
+    mismatch = np.zeros( len( golden ), dtype = bool )
+    for name in fields or golden.dtype.names:
+      ne = mem[ name ] != golden[ name ]
+      mismatch |= ne.reshape( len( golden ), -1 ).any( axis = 1 )
+  else:
+    mismatch = ( mem[ 'payload' ] if mem.dtype.names else mem ) != golden
+  return np.flatnonzero( mismatch ) + base
+
+#-------------------------------------------------------------------------
+# Translation
+#-------------------------------------------------------------------------
+
+def _module_name( module, words, nbits ):
+  digest = hashlib.sha1( repr( ( module, nbits, words ) ).encode() )
+  return f"{module.split( '__' )[0]}__image_{digest.hexdigest()[:12]}"
+
+def _module_block( src, module ):
+  return re.search( rf"\nmodule {module}\b.*?\nendmodule\n", src, re.DOTALL )
+
+# Instantiates a copy of the module of the `inst` RegisterFile in `parent`
+# as `name`, whose registers are initialized from `hex_file`.
+def add_readmemh( src, module, parent, inst, name, hex_file ):
+  if not _module_block( src, name ):
+    block = _module_block( src, module ).group()
+    block = block.replace( f"module {module}", f"module {name}", 1 )
+    init  = f'\n  initial $readmemh( "{hex_file}", regs );\n\nendmodule\n'
+    src  += block[ : -len( "endmodule\n" ) ].rstrip( '\n' ) + '\n' + init
+  parent_block = _module_block( src, parent ).group()
+  new_block = parent_block.replace( f"\n  {module} {inst}\n",
+                                    f"\n  {name} {inst}\n", 1 )
+  return src.replace( parent_block, new_block, 1 )
+
+def _macro_banks( top ):
+  banks = top.get_all_object_filter(
+            lambda x: isinstance( x, Component ) and
+                      getattr( x, 'sram_macro', None ) )
+  if getattr( top, 'sram_macro', None ):
+    banks.add( top )
+  return sorted( banks, key = repr )
+
+# Replaces the body of the `module` of an SRAM bank by an instance of its
+# macro, whose ports are named as listed in mem/data/SramBankRTL.py.
+def add_sram_macro( src, module, macro, rd_ports, wr_ports ):
+  block  = _module_block( src, module ).group()
+  header = block[ : block.index( "\n);\n" ) + len( "\n);\n" ) ]
+  conns  = [ ".clk( clk )" ]
+  for p in range( rd_ports ):
+    conns += [ f".raddr{p}( raddr[{p}] )", f".rdata{p}( rdata[{p}] )" ]
+  for p in range( wr_ports ):
+    conns += [ f".waddr{p}( waddr[{p}] )", f".wdata{p}( wdata[{p}] )",
+               f".wen{p}( wen[{p}] )" ]
+  body = f"  {macro} macro\n  (\n" + \
+         ",\n".join( f"    {conn}" for conn in conns ) + "\n  );\n"
+  return src.replace( block, f"{header}{body}\nendmodule\n", 1 )
+
+class MemImageTranslationPass( VerilogTranslationPass ):
+
+  # Whether the SRAM banks built with a macro are black-boxed.
+  black_box_sram_macros = False
+
+  def __call__( s, top ):
+    macro_banks = _macro_banks( top ) if s.black_box_sram_macros else []
+    images = [ image for mem in _image_holders( top )
+                     for image in mem.mem_images()
+                     if image[0] not in macro_banks ]
+
+    s.top = top
+    s.translator = VTranslator( s.top )
+    translate = s.translator.translate
+
+    # RegisterFiles of the same parameters share one module, so every
+    # image gets a copy of it that initializes the registers.
+    def translate_with_images( m, cfgs ):
+      translate( m, cfgs )
+      src   = s.translator.hierarchy.src
+      names = s.translator.structural.component_unique_name
+      for reg_file, words in images:
+        if reg_file not in names:
+          continue
+        nbits    = reg_file.regs[0].get_type().nbits
+        name     = _module_name( names[ reg_file ], words, nbits )
+        hex_file = f"{name}.hex"
+        inst     = re.sub( r"\[(\d+)\]", r"__\1", repr( reg_file ).split( '.' )[-1] )
+        parent   = reg_file.get_parent_object()
+        write_hex_image( hex_file, words, nbits )
+        src = add_readmemh( src, names[ reg_file ],
+                            s.translator._top_module_full_name
+                            if parent is m else names[ parent ],
+                            inst, name, hex_file )
+      for bank in macro_banks:
+        if bank is m or bank in names:
+          src = add_sram_macro( src, s.translator._top_module_full_name
+                                     if bank is m else names[ bank ],
+                                bank.sram_macro, len( bank.raddr ),
+                                len( bank.wen ) )
+      s.translator.hierarchy.src = src
+
+    s.translator.translate = translate_with_images
+    s.traverse_hierarchy( top )
+
+class SramMacroTranslationPass( MemImageTranslationPass ):
+
+  black_box_sram_macros = True
+
+class MemImageTranslationImportPass( VerilogTranslationImportPass ):
+
+  @staticmethod
+  def get_translation_pass():
+    return MemImageTranslationPass
+
+# The stock VerilogTranslationPass would silently translate the memories
+# holding images into uninitialized ones, so it refuses them instead.
+# This module is imported by every memory implementing mem_images(),
+# hence the guard is in place whenever there are images to be dropped.
+_stock_traverse_hierarchy = VerilogTranslationPass.traverse_hierarchy
+
+def _traverse_hierarchy( s, m ):
+  if not isinstance( s, MemImageTranslationPass ) and \
+     m.has_metadata( s.enable ) and m.get_metadata( s.enable ):
+    dropped = _image_holders( m )
+    assert not dropped, \
+           f"{type( s ).__name__} drops the memory images of " \
+           f"{', '.join( repr( x ) for x in dropped )}, translate them by " \
+           f"MemImageTranslationPass (or MemImageTranslationImportPass) instead"
+  _stock_traverse_hierarchy( s, m )
+
+VerilogTranslationPass.traverse_hierarchy = _traverse_hierarchy
+
+#-------------------------------------------------------------------------
+# config_model_with_mem_images
+#-------------------------------------------------------------------------
+# Same as config_model_with_cmdline_opts() in pymtl3.stdlib.test_utils,
+# except that the models holding images are translated and imported by
+# MemImageTranslationImportPass under --test-verilog.
+
+def config_model_with_mem_images( top, cmdline_opts, duts ):
+  top.elaborate()
+  if not cmdline_opts.get( 'test_verilog', False ) or \
+     not _image_holders( top ):
+    return test_utils.config_model_with_cmdline_opts( top, cmdline_opts,
+                                                      duts )
+
+  assert not cmdline_opts.get( 'test_yosys_verilog', False ), \
+         "memory images are not supported by the yosys backend"
+  dump_vcd = cmdline_opts.get( 'dump_vcd', False )
+  on_demand_vcd_portname = cmdline_opts.get( 'on_demand_vcd_portname', '' )
+  if dump_vcd:
+    _recursive_set_vl_trace( top, dump_vcd )
+
+  dut_objs = [ eval( f'top.{dut}' ) for dut in duts ] if duts else [ top ]
+  for dut in dut_objs:
+    dut.set_metadata( VerilogTranslationImportPass.enable, True )
+    dut.set_metadata( VerilogVerilatorImportPass.vl_xinit,
+                      cmdline_opts[ 'test_verilog' ] )
+    if dump_vcd:
+      dut.set_metadata( VerilogVerilatorImportPass.vl_trace, True )
+      dut.set_metadata( VerilogVerilatorImportPass.vl_trace_filename, dump_vcd )
+    if on_demand_vcd_portname:
+      dut.set_metadata( VerilogVerilatorImportPass.vl_trace_on_demand, True )
+      dut.set_metadata( VerilogVerilatorImportPass.vl_trace_on_demand_portname,
+                        on_demand_vcd_portname )
+
+  top.apply( VerilogPlaceholderPass() )
+  top = MemImageTranslationImportPass()( top )
+
+  if dump_vcd:
+    top.set_metadata( VcdGenerationPass.vcd_file_name, dump_vcd )
+  return top
@@ -0,0 +1,121 @@
+"""
+==========================================================================
+sim_snapshot.py
+==========================================================================
+Checkpoint/restore of the simulation state of a PyMTL3 model (e.g., a
+CgraRTL test harness right after its configuration phase), so that many
+input data sets can be run from a single configuration point without
+paying elaboration and ctrl packet delivery every time.
+
+A snapshot captures, by hierarchical name, the value of every signal of
+the model (the RegisterFiles of the ctrl/const/data memories, the
+register banks, queue entries and pointers, channel registers, the
+controller queues, ...) along with the plain int/bool/str attributes of
+the components (e.g., the cursors of the test sources/sinks). It only
+holds native Python values, so it can be pickled to disk and restored
+into another instance of the same model in another process.
+
+Only the Python simulation is supported, as the state of a Verilator
+imported model is not visible from PyMTL3.
+
+Author : agent
+  Date : Oct 18, 2026
+"""
+
+import multiprocessing
+
+from pymtl3 import *
+from pymtl3.datatypes import is_bitstruct_inst
+
+_PY_STATE_TYPES = ( bool, int, float, str )
+
+#-------------------------------------------------------------------------
+# Helpers
+#-------------------------------------------------------------------------
+
+def _signal_values( top ):
+  assert hasattr( top, '_sim' ) and \
+         hasattr( top._sim, 'signal_object_mapping' ), \
+    "snapshot/restore requires a model prepared for Python simulation"
+  for signal, ( _, _, _, value ) in top._sim.signal_object_mapping.items():
+    # Skips the nets driven by plain Python constants.
+    if isinstance( value, Bits ) or is_bitstruct_inst( value ):
+      yield repr( signal ), value
+
+def _components( top ):
+  return top.get_all_object_filter( lambda x: isinstance( x, Component ) )
+
+def _to_int( value ):
+  if isinstance( value, Bits ):
+    return int( value )
+  return int( value.to_bits() )
+
+def _from_int( value, v ):
+  if isinstance( value, Bits ):
+    return v
+  return value.__class__.from_bits( mk_bits( value.nbits )( v ) )
+
+#-------------------------------------------------------------------------
+# snapshot
+#-------------------------------------------------------------------------
+# Returns a dict with the 'signals', 'attrs' and 'cycle' of the model.
+
+def snapshot( top ):
+  signals = { name: _to_int( value ) for name, value in _signal_values( top ) }
+  attrs = {}
+  for component in _components( top ):
+    for attr, value in component.__dict__.items():
+      if attr[0] != '_' and type( value ) in _PY_STATE_TYPES:
+        attrs[ ( repr( component ), attr ) ] = value
+  return { 'signals' : signals,
+           'attrs'   : attrs,
+           'cycle'   : top.sim_cycle_count() }
+
+#-------------------------------------------------------------------------
+# restore
+#-------------------------------------------------------------------------
+# Restores a snapshot into the same model or into a freshly elaborated
+# (and reset) instance of the same model.
+
+def restore( top, snap ):
+  signals = snap[ 'signals' ]
+  for name, value in _signal_values( top ):
+    if name in signals:
+      v = _from_int( value, signals[ name ] )
+      # Both the current and the next value of the flip-flops are written,
+      # otherwise the next posedge flips the stale value back.
+      value @= v
+      value <<= v
+
+  components = { repr( component ): component
+                 for component in _components( top ) }
+  for ( name, attr ), value in snap[ 'attrs' ].items():
+    if name in components:
+      setattr( components[ name ], attr, value )
+
+  top._sim.simulated_cycles = snap[ 'cycle' ]
+  top.sim_eval_combinational()
+
+#-------------------------------------------------------------------------
+# fork_map
+#-------------------------------------------------------------------------
+# Takes a snapshot of `top` and evaluates `fn( top, arg )` for each arg in
+# `args` in forked worker processes, each of them starting from the
+# snapshot. Returns the (picklable) results in order.
+
+_fork_context = None
+
+def _run_forked( arg ):
+  top, fn, snap = _fork_context
+  restore( top, snap )
+  return fn( top, arg )
+
+def fork_map( top, fn, args, num_workers = None ):
+  global _fork_context
+  _fork_context = ( top, fn, snapshot( top ) )
+  try:
+    ctx = multiprocessing.get_context( 'fork' )
+    with ctx.Pool( num_workers ) as pool:
+      return pool.map( _run_forked, args )
+  finally:
+    _fork_context = None
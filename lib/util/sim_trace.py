@@ -0,0 +1,188 @@
+"""
+==========================================================================
+sim_trace.py
+==========================================================================
+Low-overhead structured tracing of the Python simulation, as opposed to
+the per-cycle line_trace() strings of the whole CGRA.
+
+Components opt in by implementing `trace_fields()`, which returns a dict
+of the few ints worth recording in the current cycle (e.g., the ctrl
+address and the done signals of a tile). A SimTracer samples the
+components selected by its masks right before every sim_tick() into a
+binary ring buffer (one 64-bit column per field) of the last `depth`
+cycles, and optionally streams every cycle as a JSON line. The ring
+buffer is dumped as JSON lines when the simulation fails (e.g., on an
+assertion), so the failure comes with the history that led to it.
+
+A mask matches a component by its class name (e.g., "TileRTL") or by a
+glob on its hierarchical name (e.g., "s.dut.tile[0]*"). Nothing is
+installed, and nothing is paid, unless tracing is enabled:
+
+  VECTORCGRA_TRACE        comma-separated masks, e.g. "TileRTL,data_mem"
+  VECTORCGRA_TRACE_DEPTH  cycles kept in the ring buffer (default 1024)
+  VECTORCGRA_TRACE_JSONL  file streaming every cycle as a JSON line
+  VECTORCGRA_TRACE_DUMP   file the ring buffer is dumped to on failure
+                          (default trace_dump.jsonl)
+  VECTORCGRA_LINE_TRACE   set to 1 to print the line traces in run_sim()
+
+Author : agent
+  Date : Oct 18, 2026
+"""
+
+import fnmatch
+import json
+import os
+import re
+from array import array
+
+from pymtl3 import *
+from pymtl3.stdlib import test_utils
+from pymtl3.stdlib.test_utils.test_helpers import finalize_verilator
+from .mem_image import preload_sim_memories
+
+_MASK64 = ( 1 << 64 ) - 1
+
+def _match( mask, component ):
+  if mask == type( component ).__name__:
+    return True
+  # Brackets are list indices in the hierarchical names, not glob sets.
+  pattern = re.sub( r'[\[\]]', lambda m: f"[{m.group()}]", mask )
+  return fnmatch.fnmatchcase( repr( component ), pattern )
+
+#-------------------------------------------------------------------------
+# SimTracer
+#-------------------------------------------------------------------------
+
+class SimTracer:
+
+  def __init__( s, top, masks = ( '*', ), depth = 1024, jsonl = None ):
+    s.top   = top
+    s.depth = depth
+    s.count = 0
+
+    components = top.get_all_object_filter(
+      lambda x: isinstance( x, Component ) and hasattr( x, 'trace_fields' ) )
+    s.sources = [ x for x in sorted( components, key = repr )
+                  if any( _match( mask, x ) for mask in masks ) ]
+    # Columns are fixed by the fields each component reports up front.
+    s.columns = [ ( repr( x ), list( x.trace_fields().keys() ) )
+                  for x in s.sources ]
+    s.ncols   = sum( len( fields ) for _, fields in s.columns )
+    s.cycles  = array( 'Q', [ 0 ] ) * depth
+    s.buf     = array( 'Q', [ 0 ] ) * ( depth * s.ncols )
+    s.jsonl   = open( jsonl, 'w' ) if jsonl else None
+
+  # Records the current cycle.
+  def sample( s ):
+    row = s.count % s.depth
+    s.cycles[ row ] = s.top.sim_cycle_count()
+    base = row * s.ncols
+    for x in s.sources:
+      for value in x.trace_fields().values():
+        s.buf[ base ] = int( value ) & _MASK64
+        base += 1
+    s.count += 1
+    if s.jsonl:
+      s.jsonl.write( json.dumps( s.record( row ) ) + '\n' )
+
+  def record( s, row ):
+    rec  = { 'cycle': s.cycles[ row ] }
+    base = row * s.ncols
+    for name, fields in s.columns:
+      rec[ name ] = dict( zip( fields, s.buf[ base : base + len( fields ) ] ) )
+      base += len( fields )
+    return rec
+
+  # Returns the records kept in the ring buffer, oldest first.
+  def records( s ):
+    first = max( 0, s.count - s.depth )
+    return [ s.record( i % s.depth ) for i in range( first, s.count ) ]
+
+  def dump( s, path ):
+    with open( path, 'w' ) as fd:
+      for rec in s.records():
+        fd.write( json.dumps( rec ) + '\n' )
+
+  # Samples every cycle from now on by wrapping the sim_tick() of the
+  # model, which must have been prepared for Python simulation.
+  def install( s ):
+    tick = s.top.sim_tick
+    def traced_sim_tick():
+      s.sample()
+      tick()
+    s.top.sim_tick = traced_sim_tick
+    return s
+
+  def close( s ):
+    if s.jsonl:
+      s.jsonl.close()
+      s.jsonl = None
+
+#-------------------------------------------------------------------------
+# Tracing enabled through the environment
+#-------------------------------------------------------------------------
+
+def get_tracer( top ):
+  masks = os.environ.get( 'VECTORCGRA_TRACE', '' )
+  if not masks:
+    return None
+  depth = int( os.environ.get( 'VECTORCGRA_TRACE_DEPTH', 1024 ) )
+  return SimTracer( top, [ m.strip() for m in masks.split( ',' ) if m.strip() ],
+                    depth, os.environ.get( 'VECTORCGRA_TRACE_JSONL' ) )
+
+#-------------------------------------------------------------------------
+# run_sim
+#-------------------------------------------------------------------------
+# Drop-in replacement of run_sim() in pymtl3.stdlib.test_utils, which
+# only prints the line traces if asked to (or VECTORCGRA_LINE_TRACE is
+# set), records the structured trace if VECTORCGRA_TRACE is set, and
+# preloads the memory images (see mem_image.py) after reset.
+
+def run_sim( model, cmdline_opts = None, print_line_trace = None,
+             duts = None ):
+
+  cmdline_opts = cmdline_opts or { 'dump_textwave'      : False,
+                                   'dump_vcd'           : False,
+                                   'test_verilog'       : False,
+                                   'test_yosys_verilog' : False,
+                                   'max_cycles'         : None,
+                                   'dump_vtb'           : '' }
+  if print_line_trace is None:
+    print_line_trace = os.environ.get( 'VECTORCGRA_LINE_TRACE', '' ) == '1'
+
+  max_cycles = cmdline_opts[ 'max_cycles' ] or 10000
+
+  model = test_utils.config_model_with_cmdline_opts( model, cmdline_opts,
+                                                     duts )
+  tracer = None
+  try:
+    model.apply( DefaultPassGroup( linetrace = print_line_trace ) )
+    model.sim_reset()
+    preload_sim_memories( model )
+
+    tracer = get_tracer( model )
+    if tracer:
+      tracer.install()
+
+    while not model.done() and model.sim_cycle_count() < max_cycles:
+      model.sim_tick()
+
+    assert model.sim_cycle_count() < max_cycles
+
+    model.sim_tick()
+    model.sim_tick()
+    model.sim_tick()
+
+  except BaseException:
+    if tracer:
+      path = os.environ.get( 'VECTORCGRA_TRACE_DUMP', 'trace_dump.jsonl' )
+      tracer.dump( path )
+      print( f"last {len( tracer.records() )} traced cycles dumped to {path}" )
+    raise
+
+  finally:
+    if tracer:
+      tracer.close()
+    if cmdline_opts[ 'dump_textwave' ]:
+      model.print_textwave()
+    finalize_verilator( model )
@@ -0,0 +1,83 @@
+"""
+==========================================================================
+build_cache_test.py
+==========================================================================
+Test cases for the content-addressed translation/Verilator build cache.
+
+Author : agent
+  Date : Oct 18, 2026
+
+"""
+
+import os
+import time
+
+from pymtl3 import *
+from ..build_cache import *
+from ...messages import *
+
+class Inner( Component ):
+
+  def construct( s, DataType, num_ports ):
+    s.in_ = [ InPort( DataType ) for _ in range( num_ports ) ]
+
+class Outer( Component ):
+
+  def construct( s, DataType, num_ports, FuList = [ Inner ] ):
+    s.inner = Inner( DataType, num_ports )
+
+def mk_key( *args, **kwargs ):
+  m = Outer( *args, **kwargs )
+  m.elaborate()
+  return cache_key( m )
+
+def test_cache_key():
+  key = mk_key( mk_data( 16, 1 ), 2 )
+  assert key == mk_key( mk_data( 16, 1 ), 2 )
+  assert key != mk_key( mk_data( 32, 1 ), 2 )
+  assert key != mk_key( mk_data( 16, 1 ), 4 )
+  assert key != mk_key( mk_data( 16, 1 ), 2, FuList = [ Outer ] )
+
+  m = Outer( mk_data( 16, 1 ), 2 )
+  m.elaborate()
+  assert cache_key( m, { 'dump_vcd': True } ) != key
+
+def mk_artifacts( path, top_module, size ):
+  os.makedirs( path / f"obj_dir_{top_module}" )
+  ( path / f"obj_dir_{top_module}" / "V.mk" ).write_text( top_module )
+  ( path / f"lib{top_module}_v.so" ).write_bytes( b'x' * size )
+  return [ f"obj_dir_{top_module}", f"lib{top_module}_v.so" ]
+
+def test_store_fetch( tmp_path ):
+  cache = BuildCache( str( tmp_path / "cache" ) )
+  src, dst = tmp_path / "src", tmp_path / "dst"
+  os.makedirs( src )
+  os.makedirs( dst )
+  files = mk_artifacts( src, "Top", 100 )
+
+  assert not cache.fetch( "k0", str( dst ), name = "Top" )
+  cache.store( "k0", files, str( src ), name = "Top" )
+  assert cache.fetch( "k0", str( dst ), name = "Top" )
+  assert ( dst / "libTop_v.so" ).read_bytes() == b'x' * 100
+  assert ( dst / "obj_dir_Top" / "V.mk" ).read_text() == "Top"
+  assert ( cache.hits, cache.misses ) == ( [ "Top" ], [ "Top" ] )
+  assert "1 hit(s), 1 miss(es)" in cache.report()
+
+def test_evict( tmp_path ):
+  cache = BuildCache( str( tmp_path / "cache" ), max_bytes = 250,
+                      max_age = 3600 )
+  src = tmp_path / "src"
+  os.makedirs( src )
+  for i in range( 3 ):
+    files = mk_artifacts( src, f"Top{i}", 100 )
+    cache.store( f"k{i}", files, str( src ) )
+    # Makes k0 the most recently used one.
+    cache.fetch( "k0", str( src ) )
+  # k1 is evicted as the least recently used one.
+  assert sorted( os.listdir( cache.root ) ) == [ "k0", "k2" ]
+
+  manifest = cache.read_manifest( "k2" )
+  manifest[ 'last_used' ] = time.time() - 7200
+  cache.write_manifest( "k2", manifest )
+  cache.evict()
+  assert os.listdir( cache.root ) == [ "k0" ]
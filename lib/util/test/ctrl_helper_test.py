@@ -0,0 +1,82 @@
+"""
+==========================================================================
+ctrl_helper_test.py
+==========================================================================
+Test cases for merging the ctrl packets into multicast ones, and for
+compressing them into the dictionary format.
+
+Author : agent
+  Date : Oct 18, 2026
+
+"""
+
+from pymtl3 import *
+from ..ctrl_helper import compress_ctrl_pkts, merge_multicast_ctrl_pkts
+from ...cmd_type import *
+from ...messages import *
+from ...opt_type import *
+
+CtrlPktType = mk_intra_cgra_pkt( 4, 8, 4, 64, 4, 2, 4, 4, 16, 16,
+                                 multicast = True )
+# The dictionary commands need a 5-bit ctrl_action.
+DictCtrlPktType = mk_intra_cgra_pkt( 4, 32, 16, 64, 4, 2, 4, 4, 16, 16,
+                                     multicast = True )
+
+def test_merge_multicast_ctrl_pkts():
+  # Tile 1 has its own op at addr 1, and tile 3 has no config at all.
+  pkts = []
+  for tile in range( 3 ):
+    for addr in range( 3 ):
+      opt = OPT_MUL if ( tile, addr ) == ( 1, 1 ) else OPT_ADD
+      pkts.append( CtrlPktType( 0, tile, 0, 0, CMD_CONFIG, addr, opt ) )
+  for tile in range( 3 ):
+    pkts.append( CtrlPktType( 0, tile, 0, 0, CMD_LAUNCH ) )
+
+  merged = merge_multicast_ctrl_pkts( pkts )
+  assert [ ( int( pkt.dst_mask ), int( pkt.ctrl_addr ), pkt.ctrl_operation )
+           for pkt in merged[ :-1 ] ] == [ ( 0b111, 0, OPT_ADD ),
+                                           ( 0b101, 1, OPT_ADD ),
+                                           ( 0b101, 2, OPT_ADD ),
+                                           ( 0,     1, OPT_MUL ),
+                                           ( 0,     2, OPT_ADD ) ]
+  # Tile 1 cannot join the config of addr 2 above, which would go ahead
+  # of its own config of addr 1.
+  assert [ int( pkt.dst ) for pkt in merged[ 3:5 ] ] == [ 1, 1 ]
+  assert merged[ -1 ].ctrl_action == CMD_LAUNCH
+  assert merged[ -1 ].dst_mask == 0b111
+
+def test_compress_ctrl_pkts():
+  # 16 ctrl signals per tile, mostly NAH ones, where tile 1 has its own op
+  # at addr 5.
+  pkts = []
+  golden = {}
+  for tile in range( 4 ):
+    for addr in range( 16 ):
+      opt = OPT_ADD if addr < 4 else OPT_MUL if addr >= 12 else OPT_NAH
+      if ( tile, addr ) == ( 1, 5 ):
+        opt = OPT_SUB
+      pkts.append( DictCtrlPktType( 0, tile, 0, 0, CMD_CONFIG, addr, opt ) )
+      golden[ tile, addr ] = opt
+  for tile in range( 4 ):
+    pkts.append( DictCtrlPktType( 0, tile, 0, 0, CMD_LAUNCH ) )
+
+  merged = merge_multicast_ctrl_pkts( compress_ctrl_pkts( pkts, 4 ) )
+  assert len( merged ) == 15
+
+  # Decodes the packets the way the ctrl memory of each tile does.
+  entries = {}
+  ctrls = {}
+  for pkt in merged:
+    mask = int( pkt.dst_mask ) or 1 << int( pkt.dst )
+    for tile in range( 4 ):
+      if not ( mask >> tile ) & 1:
+        continue
+      if pkt.ctrl_action == CMD_CONFIG_DICT:
+        entries[ tile, int( pkt.ctrl_addr ) ] = pkt.ctrl_operation
+      elif pkt.ctrl_action == CMD_CONFIG_RUN:
+        idx = int( pkt.data ) & 0b11
+        for addr in range( int( pkt.ctrl_addr ),
+                           int( pkt.ctrl_addr ) + ( int( pkt.data ) >> 2 ) + 1 ):
+          ctrls[ tile, addr ] = entries[ tile, idx ]
+  assert ctrls == golden
+  assert merged[ -1 ].ctrl_action == CMD_LAUNCH
@@ -0,0 +1,67 @@
+"""
+==========================================================================
+dfg_helper_test.py
+==========================================================================
+Test cases for the indexed DFG and its streaming json loader.
+
+Author : agent
+  Date : Oct 18, 2026
+
+"""
+
+import io
+import json
+import os
+
+from ..dfg_helper import *
+
+fir_json = os.path.join( os.path.dirname( __file__ ), "..", "..", "..",
+                         "cgra", "test", "dfg_fir.json" )
+
+def mk_chain( num_nodes ):
+  dfg = []
+  for i in range( num_nodes ):
+    dfg.append( { 'fu': 'Adder', 'id': i, 'opt': 'OPT_ADD',
+                  'opt_predicate': 0, 'in_const': [ 0 ],
+                  'in': [ i - 1 ] if i > 0 else [],
+                  'in_predicate': [],
+                  'out': [ [ i + 1 ] ] if i < num_nodes - 1 else [ [] ] } )
+  return dfg
+
+def test_streaming_loader():
+  dfg  = mk_chain( 50 )
+  text = json.dumps( dfg, indent = 2 )
+  # A tiny chunk size makes the objects straddle the chunk boundaries.
+  assert list( iter_dfg_json( io.StringIO( text ), chunk_size = 7 ) ) == dfg
+  assert list( iter_dfg_json( io.StringIO( "[ ]" ) ) ) == []
+
+def test_fir_index():
+  dfg = DFG( fir_json, [], [ 0 ] * 8 )
+  assert [ node.id for node in dfg.nodes ] == \
+         [ 0, 2, 3, 4, 5, 6, 7, 8, 9, 10, 1 ]
+  for node in dfg.nodes:
+    assert dfg.get_node( node.id ) is get_node( node.id, dfg.nodes )
+  assert dfg.get_node( 42 ) == None
+  assert dfg.get_successors( 8 ) == [ 9, 0 ]
+  assert dfg.get_predecessors( 1 ) == [ 7, 10 ]
+  assert dfg.get_node( 10 ).live_out_ctrl == 1
+  assert dfg.get_node( 1 ).live_out_val == 1
+  # Edges to nodes that appear earlier in the json are back edges.
+  assert [ dfg.get_node( i ).layer for i in [ 0, 8, 9, 10, 1 ] ] == \
+         [ 0, 1, 2, 3, 5 ]
+  assert dfg.critical_path_length == 6
+  assert dfg.get_critical_path() == [ 0, 2, 3, 6, 7, 1 ]
+  assert dfg.get_node( 8 ).slack == 1
+  for node_id in dfg.get_critical_path():
+    assert dfg.get_node( node_id ).slack == 0
+
+def test_large_chain( tmp_path ):
+  num_nodes = 20000
+  path = tmp_path / "chain.json"
+  path.write_text( json.dumps( mk_chain( num_nodes ) ) )
+  dfg = DFG( str( path ), [], [] )
+  assert len( dfg.nodes ) == num_nodes
+  assert dfg.get_node( num_nodes - 1 ).layer == num_nodes - 1
+  assert dfg.critical_path_length == num_nodes
+  assert dfg.get_critical_path() == list( range( num_nodes ) )
+  assert dfg.layer_diff_list == [ 1 ] * ( num_nodes - 1 )
@@ -0,0 +1,143 @@
+"""
+==========================================================================
+mem_image_test.py
+==========================================================================
+Test cases for the memory images.
+
+Author : agent
+  Date : Oct 18, 2026
+
+"""
+
+import os
+import numpy as np
+import pytest
+
+from pymtl3 import *
+from pymtl3.passes.backends.verilog import VerilogTranslationPass
+from ..mem_image import *
+from ...messages import *
+
+DataType = mk_data( 16, 1 )
+
+#-------------------------------------------------------------------------
+# Memory of two banks holding images
+#-------------------------------------------------------------------------
+
+class Bank( Component ):
+
+  def construct( s, nregs ):
+    s.raddr = InPort( mk_bits( clog2( nregs ) ) )
+    s.rdata = OutPort( DataType )
+    s.regs  = [ Wire( DataType ) for _ in range( nregs ) ]
+
+    @update
+    def up_read():
+      s.rdata @= s.regs[ s.raddr ]
+
+class Mem( Component ):
+
+  def construct( s, images ):
+    s.raddr = InPort( Bits3 )
+    s.rdata = [ OutPort( DataType ) for _ in range( 2 ) ]
+    s.bank  = [ Bank( 8 ) for _ in range( 2 ) ]
+    for b in range( 2 ):
+      s.bank[b].raddr //= s.raddr
+      s.rdata[b] //= s.bank[b].rdata
+    s._images = [ load_mem_image( image, DataType, 8 ) for image in images ]
+
+  def mem_images( s ):
+    return list( zip( s.bank, s._images ) )
+
+class TestHarness( Component ):
+
+  def construct( s, images ):
+    s.mem = Mem( images )
+    s.mem.raddr //= 5
+
+images = [ [ DataType( 0x10 + i, 1 ) for i in range( 8 ) ],
+           np.arange( 8, dtype = np.uint16 ) + 0x20 ]
+
+def test_load_mem_image( tmp_path ):
+  words = load_mem_image( images[0], DataType )
+  assert words[3] == int( DataType( 0x13, 1 ).to_bits() )
+  assert load_mem_image( images[1], DataType )[3] == \
+         int( DataType( 0x23, 1 ).to_bits() )
+  assert load_mem_image( np.array( [ [ 7, 0 ] ] ), DataType ) == \
+         [ int( DataType( 7, 0 ).to_bits() ) ]
+
+  write_hex_image( tmp_path / 'image.hex', words, DataType.nbits )
+  assert load_mem_image( tmp_path / 'image.hex', DataType ) == words
+  ( tmp_path / 'sparse.hex' ).write_text( '// comment\n@2 1_0001\n' )
+  assert read_hex_image( tmp_path / 'sparse.hex' ) == [ 0, 0, 0x10001 ]
+
+  images[1].astype( '<u2' ).tofile( tmp_path / 'image.bin' )
+  assert load_mem_image( tmp_path / 'image.bin', DataType ) == \
+         load_mem_image( images[1], DataType )
+
+  with pytest.raises( AssertionError ):
+    load_mem_image( images[0], DataType, 4 )
+
+def test_preload_sim_memories():
+  th = TestHarness( images )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+  preload_sim_memories( th )
+  th.sim_tick()
+  assert th.mem.rdata[0] == DataType( 0x15, 1 )
+  assert th.mem.rdata[1] == DataType( 0x25, 1 )
+
+def test_readmemh( tmp_path, monkeypatch ):
+  monkeypatch.chdir( tmp_path )
+  th = TestHarness( images )
+  th.elaborate()
+  th.mem.set_metadata( VerilogTranslationPass.enable, True )
+  th.apply( MemImageTranslationPass() )
+
+  src = open( th.mem.get_metadata(
+                VerilogTranslationPass.translated_filename ) ).read()
+  # Both banks share the module of the same parameters, so each of them
+  # is instantiated as a copy initialized from its own image.
+  for b, ( _, words ) in enumerate( th.mem.mem_images() ):
+    hex_file = [ f for f in os.listdir( tmp_path )
+                 if f.endswith( '.hex' ) and
+                    read_hex_image( f ) == words ][0]
+    name = hex_file[ : -len( '.hex' ) ]
+    assert f'initial $readmemh( "{hex_file}", regs );' in src
+    assert f"\n  {name} bank__{b}\n" in src
+
+def test_stock_translation_refuses_images( tmp_path, monkeypatch ):
+  monkeypatch.chdir( tmp_path )
+  th = TestHarness( images )
+  th.elaborate()
+  th.set_metadata( VerilogTranslationPass.enable, True )
+  with pytest.raises( AssertionError, match = "drops the memory images" ):
+    th.apply( VerilogTranslationPass() )
+
+  # Memories without images are translated as usual.
+  th = TestHarness( [] )
+  th.elaborate()
+  th.set_metadata( VerilogTranslationPass.enable, True )
+  th.apply( VerilogTranslationPass() )
+  assert th.get_metadata( VerilogTranslationPass.translated )
+
+def test_mem_to_array():
+  CtrlType = mk_separate_reg_ctrl( 4, 4, 2, 4, 4, 4 )
+  ctrls = [ CtrlType() for _ in range( 3 ) ]
+  ctrls[1].ctrl = 2
+  ctrls[1].fu_in[3] = 1
+  mem = mem_to_array( ctrls )
+  assert list( mem[ 'ctrl' ] ) == [ 0, 2, 0 ]
+  assert mem[ 'fu_in' ].shape == ( 3, 4 )
+  assert list( diff_mem( mem, ctrls[1:] ) ) == [ 0, 1 ]
+  assert list( diff_mem( mem, ctrls[1:], base = 1 ) ) == []
+  assert list( diff_mem( mem, ctrls[:1] * 3, fields = [ 'fu_in' ] ) ) == [ 1 ]
+
+  mem = mem_to_array( images[0] )
+  # Payload and predicate are views into the same array.
+  mem[ 'predicate' ][2] = 0
+  assert list( diff_mem( mem, images[0] ) ) == [ 2 ]
+  assert list( diff_mem( mem, images[1] - 0x10, fields = [ 'payload' ] ) ) == []
+  with pytest.raises( AssertionError ):
+    diff_mem( mem, images[0], base = 1 )
@@ -0,0 +1,95 @@
+"""
+==========================================================================
+sim_snapshot_test.py
+==========================================================================
+Test cases for the simulation checkpoint/restore/fork facility.
+
+Author : agent
+  Date : Oct 18, 2026
+
+"""
+
+import pickle
+
+from pymtl3 import *
+from ..sim_snapshot import *
+from ...basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
+from ...basic.val_rdy.SourceRTL import SourceRTL as TestSrcRTL
+from ...messages import *
+
+DataType = mk_data( 16, 1 )
+
+#-------------------------------------------------------------------------
+# Accumulator with a history of the last received data
+#-------------------------------------------------------------------------
+
+class Accumulator( Component ):
+
+  def construct( s, depth ):
+
+    s.recv    = RecvIfcRTL( DataType )
+    s.acc     = Wire( Bits16 )
+    s.history = [ Wire( DataType ) for _ in range( depth ) ]
+
+    s.recv.rdy //= 1
+
+    @update_ff
+    def update_acc():
+      if s.reset:
+        s.acc <<= 0
+      elif s.recv.val:
+        s.acc <<= s.acc + s.recv.msg.payload
+        s.history[0] <<= s.recv.msg
+        for i in range( 1, depth ):
+          s.history[i] <<= s.history[i - 1]
+
+class TestHarness( Component ):
+
+  def construct( s, msgs ):
+    s.src = TestSrcRTL( DataType, msgs )
+    s.acc = Accumulator( 4 )
+    s.src.send //= s.acc.recv
+
+def mk_th( msgs ):
+  th = TestHarness( msgs )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+  return th
+
+msgs = [ DataType( i, 1 ) for i in range( 1, 21 ) ]
+
+def run( th, ncycles ):
+  for _ in range( ncycles ):
+    th.sim_tick()
+  return int( th.acc.acc )
+
+def run_to_end( th, ncycles ):
+  return run( th, ncycles ), [ int( x.payload ) for x in th.acc.history ]
+
+def test_restore_into_fresh_model():
+  th = mk_th( msgs )
+  run( th, 8 )
+  snap = pickle.loads( pickle.dumps( snapshot( th ) ) )
+  golden = run_to_end( th, 30 )
+  assert golden == ( sum( range( 1, 21 ) ), [ 20, 19, 18, 17 ] )
+
+  fresh = mk_th( msgs )
+  restore( fresh, snap )
+  assert fresh.src.idx == snap[ 'attrs' ][ ( 's.src', 'idx' ) ]
+  assert fresh.sim_cycle_count() == snap[ 'cycle' ]
+  assert run_to_end( fresh, 30 ) == golden
+
+  # Restores the very same model back to the checkpoint.
+  restore( th, snap )
+  assert run_to_end( th, 30 ) == golden
+
+def test_fork_map():
+  th = mk_th( msgs )
+  run( th, 8 )
+  partial = int( th.acc.acc )
+  results = fork_map( th, run, [ 0, 1, 2, 30 ], num_workers = 2 )
+  assert results[0] == partial
+  assert results[1] < results[2] < results[3] == sum( range( 1, 21 ) )
+  # The parent model is left untouched.
+  assert int( th.acc.acc ) == partial
@@ -0,0 +1,95 @@
+"""
+==========================================================================
+sim_trace_test.py
+==========================================================================
+Test cases for the structured simulation tracing.
+
+Author : agent
+  Date : Oct 18, 2026
+
+"""
+
+import json
+import pytest
+
+from pymtl3 import *
+from ..sim_trace import *
+from ...basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
+from ...basic.val_rdy.SourceRTL import SourceRTL as TestSrcRTL
+from ...messages import *
+
+DataType = mk_data( 16, 1 )
+
+#-------------------------------------------------------------------------
+# Accumulator reporting its trace fields
+#-------------------------------------------------------------------------
+
+class Accumulator( Component ):
+
+  def construct( s ):
+
+    s.recv = RecvIfcRTL( DataType )
+    s.acc  = Wire( Bits16 )
+
+    s.recv.rdy //= 1
+
+    @update_ff
+    def update_acc():
+      if s.reset:
+        s.acc <<= 0
+      elif s.recv.val:
+        s.acc <<= s.acc + s.recv.msg.payload
+
+  def trace_fields( s ):
+    return { 'val': s.recv.val, 'acc': s.acc }
+
+class TestHarness( Component ):
+
+  def construct( s, msgs, total ):
+    s.src   = TestSrcRTL( DataType, msgs )
+    s.acc   = [ Accumulator() for _ in range( 2 ) ]
+    s.total = total
+    s.src.send //= s.acc[0].recv
+    s.acc[1].recv.val //= 0
+    s.acc[1].recv.msg //= DataType()
+
+  def done( s ):
+    return s.acc[0].acc == s.total
+
+msgs = [ DataType( i, 1 ) for i in range( 1, 11 ) ]
+
+def test_ring_buffer():
+  th = TestHarness( msgs, 55 )
+  th.elaborate()
+  th.apply( DefaultPassGroup() )
+  th.sim_reset()
+
+  tracer = SimTracer( th, [ 's.acc[0]' ], depth = 4 ).install()
+  assert tracer.columns == [ ( 's.acc[0]', [ 'val', 'acc' ] ) ]
+  for _ in range( 6 ):
+    th.sim_tick()
+
+  records = tracer.records()
+  assert [ rec[ 'cycle' ] for rec in records ] == [ 5, 6, 7, 8 ]
+  assert [ rec[ 's.acc[0]' ][ 'acc' ] for rec in records ] == [ 1, 3, 6, 10 ]
+
+def test_run_sim_dump( tmp_path, monkeypatch ):
+  monkeypatch.setenv( 'VECTORCGRA_TRACE', 'Accumulator' )
+  monkeypatch.setenv( 'VECTORCGRA_TRACE_DEPTH', '3' )
+  monkeypatch.setenv( 'VECTORCGRA_TRACE_JSONL', str( tmp_path / 'all.jsonl' ) )
+  monkeypatch.setenv( 'VECTORCGRA_TRACE_DUMP', str( tmp_path / 'dump.jsonl' ) )
+
+  run_sim( TestHarness( msgs, 55 ) )
+  lines = ( tmp_path / 'all.jsonl' ).read_text().splitlines()
+  assert json.loads( lines[-1] )[ 's.acc[0]' ][ 'acc' ] == 55
+  assert json.loads( lines[-1] )[ 's.acc[1]' ] == { 'val': 0, 'acc': 0 }
+  assert not ( tmp_path / 'dump.jsonl' ).exists()
+
+  # Never done, so the ring buffer is dumped on the timeout.
+  with pytest.raises( AssertionError ):
+    run_sim( TestHarness( msgs, 56 ), { 'dump_textwave' : False,
+                                        'test_verilog'  : False,
+                                        'max_cycles'    : 20 } )
+  lines = ( tmp_path / 'dump.jsonl' ).read_text().splitlines()
+  assert len( lines ) == 3
+  assert json.loads( lines[-1] )[ 's.acc[0]' ][ 'acc' ] == 55
@@ -14,6 +14,7 @@ from pymtl3.stdlib.primitive import RegisterFile
 from ...lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ...lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
 from ...lib.opt_type import *
+from ...lib.util.mem_image import diff_mem, mem_to_array
 
 
 class ConstQueueDynamicRTL(Component):
@@ -30,6 +31,8 @@ class ConstQueueDynamicRTL(Component):
     # Makes write cursor type 1 bit more than mem addr type as need compare with const_mem_size,
     # otherwise, number will be back to 000 when 111 + 1 (given const_mem_size = 8)
     WrCurType = mk_bits(clog2(const_mem_size + 1))
+    s.DataType = DataType
+    s.const_mem_size = const_mem_size
 
     # write cursor and read cursor
     s.wr_cur = Wire(WrCurType)
@@ -88,6 +91,31 @@ class ConstQueueDynamicRTL(Component):
           s.rd_cur <<= 0
 
 
+  # Simulation-only backdoor that has the same effect on the state as
+  # receiving the const through recv_const, without spending the cycles.
+  def backdoor_push(s, payload, predicate = 1):
+    assert s.wr_cur < s.const_mem_size, "const queue is full"
+    data = s.DataType()
+    data.payload = payload
+    data.predicate = predicate
+    wr_cur = int(s.wr_cur)
+    # Both the current and the next value of the flip-flops are written,
+    # otherwise the next posedge flips the stale value back.
+    s.reg_file.regs[wr_cur] @= data
+    s.reg_file.regs[wr_cur] <<= data
+    s.wr_cur @= wr_cur + 1
+    s.wr_cur <<= wr_cur + 1
+
+  # Simulation-only contents as a NumPy array (see lib/util/mem_image.py),
+  # of which the first `wr_cur` entries are valid.
+  def to_array(s):
+    return mem_to_array(s.reg_file.regs)
+
+  # Returns the addresses whose const differs from `golden`.
+  def diff_array(s, golden, base = 0, fields = None):
+    return diff_mem(s.to_array(), golden, base, fields)
+
+
   def line_trace(s, verbosity = 0):
     if verbosity == 0:
       const_mem_str  = "|".join([str(data) for data in s.reg_file.regs])
@@ -5,6 +5,40 @@ CtrlMemDynamicRTL.py
 Control memory with dynamic reconfigurability (e.g., receiving control
 signals, halt/terminate signals) for each CGRA tile.
 
+If `shadow_ctrl` is set, the memory holds two contexts of ctrl signals:
+the active one is iterated, while the CMD_CONFIG packets received after
+the first launch (even if the kernel is paused or terminated since then)
+write into the other (shadow) one, so the next kernel is loaded without
+stopping the current one. A CMD_SWAP_CTRL packet then
+makes the shadow context the active one at the end of an iteration (or
+right away if the kernel is done or not launched), which starts over
+from its first ctrl signal without any reconfiguration gap.
+
+Otherwise, `num_contexts` > 1 makes the memory hold as many named
+contexts (e.g., the kernels run in rotation), each of which has its own
+`ctrl_count_per_iter`/`total_ctrl_steps` if these are given as lists.
+The data field of a CMD_CONFIG packet indicates the context it writes
+into, and the one of a CMD_LAUNCH packet the context to be iterated,
+which starts over unless it is the active one being paused.
+
+If `loop_ctrl` is set, the ctrl signals are iterated as a hardware loop
+whose descriptor (i.e., the prologue/steady-state/epilogue lengths and
+the trip counts of `num_loop_levels` nested levels, see lib/cmd_type.py)
+is set up at runtime by the CMD_LOOP_* packets, so the same ctrl signals
+serve different trip counts. The kernel is done once the outermost level
+finishes, or once the epilogue following the `recv_loop_exit` (early
+exit) is done, rather than at `total_ctrl_steps` (which still bounds the
+kernel unless being 0). A CMD_LAUNCH packet then starts the loop over.
+Without any descriptor, the ctrl signals are iterated as they are
+otherwise.
+
+If `ctrl_dict_size` is given, the register file only holds that many
+distinct ctrl signals (the dictionary, written by CMD_CONFIG_DICT
+packets), and each ctrl address a dictionary index (written in runs by
+CMD_CONFIG_RUN packets, one address per cycle, see lib/cmd_type.py),
+which the ctrl signal is looked up by. The CMD_CONFIG packets are then
+dropped.
+
 Author : Cheng Tan
   Date : Dec 20, 2024
 """
@@ -17,13 +51,16 @@ from ...lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
 from ...lib.basic.val_rdy.queues import NormalQueueRTL
 from ...lib.cmd_type import *
 from ...lib.opt_type import *
+from ...lib.util.mem_image import diff_mem, mem_to_array
 
 class CtrlMemDynamicRTL(Component):
 
   def construct(s, CtrlPktType, CtrlSignalType, ctrl_mem_size,
                 num_fu_inports, num_fu_outports, num_tile_inports,
                 num_tile_outports, ctrl_count_per_iter = 4,
-                total_ctrl_steps = 4):
+                total_ctrl_steps = 4, shadow_ctrl = False,
+                num_contexts = 1, loop_ctrl = False, num_loop_levels = 2,
+                ctrl_dict_size = 0):
 
     # The total_ctrl_steps indicates the number of steps the ctrl
     # signals should proceed. For example, if the number of ctrl
@@ -32,32 +69,376 @@ class CtrlMemDynamicRTL(Component):
     # assert( ctrl_mem_size <= total_ctrl_steps )
 
     # Constant
-    CtrlAddrType = mk_bits(clog2(max(ctrl_mem_size, ctrl_count_per_iter + 1)))
-    PCType = mk_bits(clog2(ctrl_count_per_iter + 1))
-    TimeType = mk_bits(clog2(total_ctrl_steps + 1))
+    if shadow_ctrl:
+      assert num_contexts == 1, "The shadow context is not a named one"
+      num_contexts = 2
+    if not isinstance(ctrl_count_per_iter, list):
+      ctrl_count_per_iter = [ctrl_count_per_iter] * num_contexts
+    if not isinstance(total_ctrl_steps, list):
+      total_ctrl_steps = [total_ctrl_steps] * num_contexts
+    assert len(ctrl_count_per_iter) == num_contexts
+    assert len(total_ctrl_steps) == num_contexts
+    named_contexts = num_contexts > 1 and not shadow_ctrl
+    if loop_ctrl:
+      assert num_contexts == 1, "The loop descriptor is kept for a single context"
+    CtrlAddrType = mk_bits(clog2(max(ctrl_mem_size, max(ctrl_count_per_iter) + 1)))
+    TimeType = mk_bits(max(clog2(max(total_ctrl_steps) + 1), 1))
     num_routing_outports = num_tile_outports + num_fu_inports
+    # The contexts are stored one after another in the register file.
+    CtxType = mk_bits(max(clog2(num_contexts), 1))
+    RegAddrType = mk_bits(max(clog2(num_contexts * ctrl_mem_size), 1))
+    CtrlActionType = CtrlPktType.get_field_type('ctrl_action')
+    if shadow_ctrl:
+      assert CtrlActionType.nbits >= clog2(CMD_SWAP_CTRL + 1), \
+             "Swapping requires a ctrl_action field of at least 5 bits"
+    if loop_ctrl:
+      assert CtrlActionType.nbits >= clog2(CMD_LOOP_TRIP_COUNT + 1), \
+             "The loop descriptor requires a ctrl_action field of at least 5 bits"
+      assert num_loop_levels <= ctrl_mem_size, \
+             "The ctrl_addr field indicates the loop level"
+      # The ends of the phases may be right after the last ctrl signal.
+      LoopAddrType = mk_bits(max(CtrlAddrType.nbits, clog2(ctrl_mem_size + 1)))
+      TripCountType = CtrlPktType.get_field_type('data')
+      LevelType = CtrlPktType.get_field_type('ctrl_addr')
+    dict_ctrl = ctrl_dict_size > 0
+    if dict_ctrl:
+      assert num_contexts == 1, "The dictionary is kept for a single context"
+      assert ctrl_dict_size <= ctrl_mem_size, \
+             "The ctrl_addr field indicates the dictionary entry"
+      assert CtrlActionType.nbits >= clog2(CMD_CONFIG_RUN + 1), \
+             "The dictionary requires a ctrl_action field of at least 5 bits"
+      DictAddrType = mk_bits(max(clog2(ctrl_dict_size), 1))
+      # The number of addresses of a run minus one.
+      RunType = CtrlPktType.get_field_type('ctrl_addr')
+      run_lsb = DictAddrType.nbits
+      run_msb = run_lsb + RunType.nbits
+      assert run_msb <= CtrlPktType.get_field_type('data').nbits, \
+             "The data field carries both the dictionary index and the run"
+      # The register file holds the dictionary.
+      ConfigAddrType = DictAddrType
+    else:
+      ConfigAddrType = RegAddrType
+    # The ctrl signals only come along with the CMD_CONFIG_DICT packets
+    # given the dictionary.
+    config_action = CMD_CONFIG_DICT if dict_ctrl else CMD_CONFIG
+    CtrlPktAddrType = CtrlPktType.get_field_type('ctrl_addr')
+    s.CtrlSignalType = CtrlSignalType
+    s.num_fu_inports = num_fu_inports
+    s.num_routing_outports = num_routing_outports
+    s.num_tile_inports = num_tile_inports
+    s.ctrl_mem_size = ctrl_mem_size
+    s.shadow_ctrl = shadow_ctrl
+    s.named_contexts = named_contexts
+    s.loop_ctrl = loop_ctrl
+    s.dict_ctrl = dict_ctrl
 
     # Interface
     s.send_ctrl = SendIfcRTL(CtrlSignalType)
     s.recv_pkt = RecvIfcRTL(CtrlPktType)
+    # Early exit of the hardware loop (only used if `loop_ctrl` is set).
+    s.recv_loop_exit = InPort(b1)
 
     # Component
-    s.reg_file = RegisterFile(CtrlSignalType, ctrl_mem_size, 1, 1)
+    if dict_ctrl:
+      s.reg_file = RegisterFile(CtrlSignalType, ctrl_dict_size, 1, 1)
+      s.idx_file = RegisterFile(DictAddrType, ctrl_mem_size, 1, 1)
+    else:
+      s.reg_file = RegisterFile(CtrlSignalType, num_contexts * ctrl_mem_size,
+                                1, 1)
     s.recv_pkt_queue = NormalQueueRTL(CtrlPktType)
     s.times = Wire(TimeType)
     s.start_iterate_ctrl = Wire(b1)
+    # Address of the current ctrl signal within the active context.
+    s.pc = Wire(CtrlAddrType)
+    s.next_pc = Wire(CtrlAddrType)
+    s.pc_reg_addr = Wire(RegAddrType)
+    s.ctx = Wire(CtxType)
+    s.config_ctx = Wire(CtxType)
+    s.swap_cmd = Wire(b1)
+    s.swap_ready = Wire(b1)
+    # Whether any kernel has been launched since reset.
+    s.launched = Wire(b1)
+    # The lengths of the active context.
+    s.count_per_iter = Wire(CtrlAddrType)
+    s.total_steps = Wire(TimeType)
+    s.kernel_done = Wire(b1)
+    # Whether the received CMD_LAUNCH starts over (the named) `launch_ctx`.
+    s.launch_ctx = Wire(CtxType)
+    s.restart = Wire(b1)
+    # Whether the received packet sets up the loop descriptor, and
+    # whether the loop is done.
+    s.loop_cmd = Wire(b1)
+    s.loop_done = Wire(b1)
+    # Entry of the register file the received ctrl signal is written
+    # into, and whether the received packet fills the dictionary (and
+    # is done with it).
+    s.config_addr = Wire(ConfigAddrType)
+    s.dict_cmd = Wire(b1)
+    s.dict_cmd_done = Wire(b1)
 
     # Connections
     s.send_ctrl.msg //= s.reg_file.rdata[0]
     # s.recv_pkt.rdy //= s.recv_pkt_queue.enq_rdy
     s.recv_pkt //= s.recv_pkt_queue.recv
 
+    if num_contexts > 1:
+      s.ctx_count_per_iter = [Wire(CtrlAddrType) for _ in range(num_contexts)]
+      s.ctx_total_steps = [Wire(TimeType) for _ in range(num_contexts)]
+      for c in range(num_contexts):
+        s.ctx_count_per_iter[c] //= CtrlAddrType(ctrl_count_per_iter[c])
+        s.ctx_total_steps[c] //= TimeType(total_ctrl_steps[c])
+
+      @update
+      def update_ctx_lengths():
+        s.count_per_iter @= s.ctx_count_per_iter[s.ctx]
+        s.total_steps @= s.ctx_total_steps[s.ctx]
+    else:
+      s.count_per_iter //= CtrlAddrType(ctrl_count_per_iter[0])
+      s.total_steps //= TimeType(total_ctrl_steps[0])
+
+    @update
+    def update_kernel_done():
+      s.kernel_done @= ((s.total_steps != TimeType(0)) & \
+                        (s.times == s.total_steps)) | s.loop_done
+
+    if shadow_ctrl:
+      @update
+      def update_swap_cmd():
+        s.swap_cmd @= s.recv_pkt_queue.send.msg.ctrl_action == CtrlActionType(CMD_SWAP_CTRL)
+        # The packets configure the shadow context once launched, i.e.,
+        # not depending on whether the kernel still runs.
+        s.config_ctx @= s.ctx ^ zext(s.launched, CtxType)
+        # Swaps at the end of an iteration, i.e., once the last ctrl
+        # signal of the iteration is taken.
+        s.swap_ready @= ~s.start_iterate_ctrl | s.kernel_done | \
+                        (s.send_ctrl.rdy & \
+                         ((s.pc + CtrlAddrType(1)) == s.count_per_iter))
+
+      @update_ff
+      def update_launched():
+        if s.reset:
+          s.launched <<= 0
+        elif s.recv_pkt_queue.send.val & \
+             (s.recv_pkt_queue.send.msg.ctrl_action == CMD_LAUNCH):
+          s.launched <<= 1
+    else:
+      s.swap_cmd //= 0
+      s.swap_ready //= 0
+      s.launched //= 0
+
+    if named_contexts:
+      @update
+      def update_ctx_cmd():
+        s.config_ctx @= trunc(s.recv_pkt_queue.send.msg.data, CtxType)
+        s.launch_ctx @= trunc(s.recv_pkt_queue.send.msg.data, CtxType)
+        s.restart @= s.recv_pkt_queue.send.val & \
+                     (s.recv_pkt_queue.send.msg.ctrl_action == CMD_LAUNCH) & \
+                     (s.launch_ctx <= CtxType(num_contexts - 1)) & \
+                     ((s.launch_ctx != s.ctx) | s.kernel_done)
+    else:
+      s.launch_ctx //= 0
+      if not shadow_ctrl:
+        s.config_ctx //= 0
+      if loop_ctrl:
+        @update
+        def update_loop_restart():
+          # Launching the done loop starts it over.
+          s.restart @= s.recv_pkt_queue.send.val & \
+                       (s.recv_pkt_queue.send.msg.ctrl_action == CMD_LAUNCH) & \
+                       s.loop_done
+      else:
+        s.restart //= 0
+
+    if loop_ctrl:
+      # Descriptor.
+      s.loop_prologue = Wire(LoopAddrType)
+      s.loop_steady = Wire(LoopAddrType)
+      s.loop_epilogue = Wire(LoopAddrType)
+      s.loop_trip_count = [Wire(TripCountType) for _ in range(num_loop_levels)]
+      # Iterations done at each level, and the early exit being raised.
+      s.loop_iter = [Wire(TripCountType) for _ in range(num_loop_levels)]
+      s.loop_exit = Wire(b1)
+
+      s.loop_steady_begin = Wire(LoopAddrType)
+      s.loop_steady_end = Wire(LoopAddrType)
+      s.loop_epilogue_end = Wire(LoopAddrType)
+      s.loop_pc_inc = Wire(LoopAddrType)
+      s.loop_exiting = Wire(b1)
+      s.loop_outer = Wire(b1)
+      s.loop_carry = Wire(b1)
+      s.loop_next_iter = [Wire(TripCountType) for _ in range(num_loop_levels)]
+      s.loop_next_done = Wire(b1)
+
+      @update
+      def update_loop_cmd():
+        s.loop_cmd @= (s.recv_pkt_queue.send.msg.ctrl_action >= CtrlActionType(CMD_LOOP_PROLOGUE)) & \
+                      (s.recv_pkt_queue.send.msg.ctrl_action <= CtrlActionType(CMD_LOOP_TRIP_COUNT))
+
+      @update
+      def update_loop_bounds():
+        s.loop_steady_begin @= s.loop_prologue
+        s.loop_steady_end @= s.loop_prologue + s.loop_steady
+        s.loop_epilogue_end @= s.loop_prologue + s.loop_steady + s.loop_epilogue
+        s.loop_pc_inc @= zext(s.pc, LoopAddrType) + LoopAddrType(1)
+        s.loop_exiting @= s.loop_exit | s.recv_loop_exit
+
+      # The prologue and the epilogue are passed through once, whereas the
+      # steady state goes back to its beginning until the innermost level
+      # finishes, and the outer levels start over from the prologue.
+      @update
+      def update_loop_next():
+        s.next_pc @= trunc(s.loop_pc_inc, CtrlAddrType)
+        s.loop_outer @= 0
+        s.loop_carry @= 0
+        s.loop_next_done @= s.loop_done
+        for l in range(num_loop_levels):
+          s.loop_next_iter[l] @= s.loop_iter[l]
+
+        if s.loop_pc_inc == s.loop_steady_end:
+          s.loop_next_iter[0] @= s.loop_iter[0] + TripCountType(1)
+          if s.loop_exiting | \
+             ((s.loop_trip_count[0] != TripCountType(0)) & \
+              (s.loop_iter[0] + TripCountType(1) == s.loop_trip_count[0])):
+            s.loop_next_iter[0] @= 0
+            s.loop_outer @= s.loop_epilogue == LoopAddrType(0)
+          else:
+            s.next_pc @= trunc(s.loop_steady_begin, CtrlAddrType)
+        elif s.loop_pc_inc == s.loop_epilogue_end:
+          s.loop_outer @= 1
+
+        if s.loop_outer:
+          s.next_pc @= 0
+          s.loop_carry @= 1
+          for l in range(1, num_loop_levels):
+            if s.loop_carry:
+              if s.loop_iter[l] + TripCountType(1) < s.loop_trip_count[l]:
+                s.loop_next_iter[l] @= s.loop_iter[l] + TripCountType(1)
+                s.loop_carry @= 0
+              else:
+                s.loop_next_iter[l] @= 0
+          s.loop_next_done @= s.loop_carry | s.loop_exiting
+
+        if s.loop_done:
+          s.next_pc @= s.pc
+
+      @update_ff
+      def update_loop_desc():
+        if s.reset:
+          s.loop_prologue <<= 0
+          s.loop_steady <<= LoopAddrType(ctrl_count_per_iter[0])
+          s.loop_epilogue <<= 0
+          for l in range(num_loop_levels):
+            s.loop_trip_count[l] <<= 0
+        elif s.recv_pkt_queue.send.val:
+          if s.recv_pkt_queue.send.msg.ctrl_action == CtrlActionType(CMD_LOOP_PROLOGUE):
+            s.loop_prologue <<= trunc(s.recv_pkt_queue.send.msg.data, LoopAddrType)
+          elif s.recv_pkt_queue.send.msg.ctrl_action == CtrlActionType(CMD_LOOP_STEADY):
+            s.loop_steady <<= trunc(s.recv_pkt_queue.send.msg.data, LoopAddrType)
+          elif s.recv_pkt_queue.send.msg.ctrl_action == CtrlActionType(CMD_LOOP_EPILOGUE):
+            s.loop_epilogue <<= trunc(s.recv_pkt_queue.send.msg.data, LoopAddrType)
+          elif s.recv_pkt_queue.send.msg.ctrl_action == CtrlActionType(CMD_LOOP_TRIP_COUNT):
+            for l in range(num_loop_levels):
+              if s.recv_pkt_queue.send.msg.ctrl_addr == LevelType(l):
+                s.loop_trip_count[l] <<= s.recv_pkt_queue.send.msg.data
+
+      @update_ff
+      def update_loop_state():
+        if s.reset | s.restart:
+          s.loop_done <<= 0
+          s.loop_exit <<= 0
+          for l in range(num_loop_levels):
+            s.loop_iter[l] <<= 0
+        elif s.start_iterate_ctrl & ~s.loop_done:
+          if s.recv_loop_exit:
+            s.loop_exit <<= 1
+          if s.send_ctrl.rdy:
+            s.loop_done <<= s.loop_next_done
+            for l in range(num_loop_levels):
+              s.loop_iter[l] <<= s.loop_next_iter[l]
+
+    else:
+      s.loop_cmd //= 0
+      s.loop_done //= 0
+
+      @update
+      def update_next_pc():
+        if (s.pc + 1) == s.count_per_iter:
+          s.next_pc @= CtrlAddrType(0)
+        else:
+          s.next_pc @= s.pc + CtrlAddrType(1)
+
+    if dict_ctrl:
+      # Writes of the CMD_CONFIG_RUN packet done so far.
+      s.run_offset = Wire(RunType)
+      s.run_last = Wire(RunType)
+
+      @update
+      def update_dict_cmd():
+        s.dict_cmd @= (s.recv_pkt_queue.send.msg.ctrl_action == CtrlActionType(CMD_CONFIG_DICT)) | \
+                      (s.recv_pkt_queue.send.msg.ctrl_action == CtrlActionType(CMD_CONFIG_RUN))
+        s.run_last @= s.recv_pkt_queue.send.msg.data[run_lsb:run_msb]
+        s.dict_cmd_done @= (s.recv_pkt_queue.send.msg.ctrl_action != CtrlActionType(CMD_CONFIG_RUN)) | \
+                           (s.run_offset == s.run_last)
+
+      @update
+      def update_idx_file():
+        s.idx_file.wen[0] @= s.recv_pkt_queue.send.val & \
+                             (s.recv_pkt_queue.send.msg.ctrl_action == CtrlActionType(CMD_CONFIG_RUN))
+        s.idx_file.waddr[0] @= zext(s.recv_pkt_queue.send.msg.ctrl_addr + s.run_offset, RegAddrType)
+        s.idx_file.wdata[0] @= s.recv_pkt_queue.send.msg.data[0:run_lsb]
+
+      @update_ff
+      def update_run_offset():
+        if s.reset:
+          s.run_offset <<= 0
+        elif s.recv_pkt_queue.send.val & \
+             (s.recv_pkt_queue.send.msg.ctrl_action == CtrlActionType(CMD_CONFIG_RUN)):
+          if s.dict_cmd_done:
+            s.run_offset <<= 0
+          else:
+            s.run_offset <<= s.run_offset + RunType(1)
+    else:
+      s.dict_cmd //= 0
+      s.dict_cmd_done //= 0
+
+    if CtrlPktAddrType.nbits > ConfigAddrType.nbits:
+      s.config_addr //= s.recv_pkt_queue.send.msg.ctrl_addr[0:ConfigAddrType.nbits]
+    else:
+      @update
+      def update_config_addr():
+        s.config_addr @= zext(s.recv_pkt_queue.send.msg.ctrl_addr, ConfigAddrType)
+
+    # The pc is wider than the address of the register file if the last
+    # ctrl signal of an iteration is the last one of the memory.
+    if CtrlAddrType.nbits > RegAddrType.nbits:
+      s.pc_reg_addr //= s.pc[0:RegAddrType.nbits]
+    else:
+      @update
+      def update_pc_reg_addr():
+        s.pc_reg_addr @= zext(s.pc, RegAddrType)
+
+    if dict_ctrl:
+      @update
+      def update_raddr_dict():
+        s.idx_file.raddr[0] @= s.pc_reg_addr
+        s.reg_file.raddr[0] @= s.idx_file.rdata[0]
+    else:
+      @update
+      def update_raddr_ctx():
+        s.reg_file.raddr[0] @= s.pc_reg_addr
+        for c in range(1, num_contexts):
+          if s.ctx == CtxType(c):
+            s.reg_file.raddr[0] @= s.pc_reg_addr + RegAddrType(c * ctrl_mem_size)
+
     @update
     def update_msg():
 
       s.recv_pkt_queue.send.rdy @= 0
       s.reg_file.wen[0] @= 0
-      s.reg_file.waddr[0] @= s.recv_pkt_queue.send.msg.ctrl_addr
+      s.reg_file.waddr[0] @= s.config_addr
+      for c in range(1, num_contexts):
+        if s.config_ctx == CtxType(c):
+          s.reg_file.waddr[0] @= s.config_addr + ConfigAddrType(c * ctrl_mem_size)
       # Initializes the fields of the control signal.
       # s.reg_file.wdata[0] @= CtrlSignalType()
       s.reg_file.wdata[0].ctrl @= 0
@@ -70,9 +451,10 @@ class CtrlMemDynamicRTL(Component):
       for i in range(num_tile_inports):
         s.reg_file.wdata[0].routing_predicate_in[i] @= 0
 
-      if s.recv_pkt_queue.send.val & (s.recv_pkt_queue.send.msg.ctrl_action == CMD_CONFIG):
+      # The packets towards a context beyond the named ones are dropped.
+      if s.recv_pkt_queue.send.val & (s.recv_pkt_queue.send.msg.ctrl_action == config_action) & \
+         (s.config_ctx <= CtxType(num_contexts - 1)):
         s.reg_file.wen[0] @= 1 # s.recv_pkt_queue.deq_en
-        s.reg_file.waddr[0] @= s.recv_pkt_queue.send.msg.ctrl_addr
         # Fills the fields of the control signal.
         s.reg_file.wdata[0].ctrl @= s.recv_pkt_queue.send.msg.ctrl_operation
         s.reg_file.wdata[0].predicate @= s.recv_pkt_queue.send.msg.ctrl_predicate
@@ -93,8 +475,13 @@ class CtrlMemDynamicRTL(Component):
       if (s.recv_pkt_queue.send.msg.ctrl_action == CMD_CONFIG) | \
          (s.recv_pkt_queue.send.msg.ctrl_action == CMD_LAUNCH) | \
          (s.recv_pkt_queue.send.msg.ctrl_action == CMD_TERMINATE) | \
-         (s.recv_pkt_queue.send.msg.ctrl_action == CMD_PAUSE):
+         (s.recv_pkt_queue.send.msg.ctrl_action == CMD_PAUSE) | \
+         s.loop_cmd:
         s.recv_pkt_queue.send.rdy @= 1
+      if s.swap_cmd:
+        s.recv_pkt_queue.send.rdy @= s.swap_ready
+      if s.dict_cmd:
+        s.recv_pkt_queue.send.rdy @= s.dict_cmd_done
       # TODO: Extend for the other commands. Maybe another queue to
       # handle complicated actions.
       # else:
@@ -104,8 +491,7 @@ class CtrlMemDynamicRTL(Component):
     def update_send_out_signal():
       s.send_ctrl.val @= 0
       if s.start_iterate_ctrl == b1(1):
-        if ((total_ctrl_steps > 0) & \
-             (s.times == TimeType(total_ctrl_steps))) | \
+        if s.kernel_done | \
            (s.reg_file.rdata[0].ctrl == OPT_START):
           s.send_ctrl.val @= b1(0)
         else:
@@ -131,16 +517,150 @@ class CtrlMemDynamicRTL(Component):
 
     @update_ff
     def update_raddr():
-      if s.start_iterate_ctrl == b1(1):
-        if (total_ctrl_steps == 0) | \
-           (s.times < TimeType(total_ctrl_steps)):
+      if s.reset:
+        s.pc <<= CtrlAddrType(0)
+        s.ctx <<= CtxType(0)
+      elif s.recv_pkt_queue.send.val & s.swap_cmd & s.swap_ready:
+        # The swapped-in kernel runs from scratch.
+        s.times <<= TimeType(0)
+        s.pc <<= CtrlAddrType(0)
+        s.ctx <<= s.ctx ^ CtxType(1)
+      elif s.restart:
+        # Another kernel is launched, or the done one again.
+        s.times <<= TimeType(0)
+        s.pc <<= CtrlAddrType(0)
+        s.ctx <<= s.launch_ctx
+      elif s.start_iterate_ctrl == b1(1):
+        if (s.total_steps == TimeType(0)) | \
+           (s.times < s.total_steps):
           s.times <<= s.times + TimeType(1)
         # Reads the next ctrl signal only when the current one is done.
         if s.send_ctrl.rdy:
-          if (s.reg_file.raddr[0] + 1)  == CtrlAddrType(ctrl_count_per_iter):
-            s.reg_file.raddr[0] <<= CtrlAddrType(0)
-          else:
-            s.reg_file.raddr[0] <<= s.reg_file.raddr[0] + CtrlAddrType(1)
+          s.pc <<= s.next_pc
+
+  # Simulation-only backdoor that has the same effect on the state as a
+  # CMD_CONFIG (or CMD_CONFIG_DICT given the dictionary) packet going
+  # through recv_pkt, without spending the cycles.
+  def backdoor_config(s, pkt):
+    if s.dict_ctrl != (int(pkt.ctrl_action) == CMD_CONFIG_DICT):
+      return
+    ctrl = s.CtrlSignalType()
+    ctrl.ctrl = pkt.ctrl_operation
+    ctrl.predicate = pkt.ctrl_predicate
+    for i in range(s.num_fu_inports):
+      ctrl.fu_in[i] = pkt.ctrl_fu_in[i]
+      ctrl.write_reg_from[i] = pkt.ctrl_write_reg_from[i]
+      ctrl.write_reg_idx[i] = pkt.ctrl_write_reg_idx[i]
+      ctrl.read_reg_from[i] = pkt.ctrl_read_reg_from[i]
+      ctrl.read_reg_idx[i] = pkt.ctrl_read_reg_idx[i]
+    for i in range(s.num_routing_outports):
+      ctrl.routing_xbar_outport[i] = pkt.ctrl_routing_xbar_outport[i]
+      ctrl.fu_xbar_outport[i] = pkt.ctrl_fu_xbar_outport[i]
+    for i in range(s.num_tile_inports):
+      ctrl.routing_predicate_in[i] = pkt.ctrl_routing_predicate_in[i]
+    ctrl.vector_factor_power = pkt.ctrl_vector_factor_power
+    ctrl.is_last_ctrl = pkt.ctrl_is_last_ctrl
+    # Both the current and the next value of the flip-flops are written,
+    # otherwise the next posedge flips the stale value back.
+    ctx = 0
+    if s.shadow_ctrl:
+      ctx = int(s.ctx) ^ int(s.launched)
+    elif s.named_contexts:
+      ctx = int(pkt.data)
+    addr = ctx * s.ctrl_mem_size + int(pkt.ctrl_addr)
+    s.reg_file.regs[addr] @= ctrl
+    s.reg_file.regs[addr] <<= ctrl
+
+  # Simulation-only backdoor for CMD_CONFIG_RUN.
+  def backdoor_config_run(s, pkt):
+    nbits = s.idx_file.regs[0].nbits
+    idx = int(pkt.data) & ((1 << nbits) - 1)
+    run = (int(pkt.data) >> nbits) & ((1 << pkt.ctrl_addr.nbits) - 1)
+    for addr in range(int(pkt.ctrl_addr), int(pkt.ctrl_addr) + run + 1):
+      s.idx_file.regs[addr] @= idx
+      s.idx_file.regs[addr] <<= idx
+
+  # Simulation-only backdoor for CMD_LAUNCH (start = 1) of the named
+  # context `ctx` and CMD_PAUSE/CMD_TERMINATE (start = 0).
+  def backdoor_launch(s, start = 1, ctx = 0):
+    s.start_iterate_ctrl @= start
+    s.start_iterate_ctrl <<= start
+    if start and s.shadow_ctrl:
+      s.launched @= 1
+      s.launched <<= 1
+    if start and s.loop_ctrl and int(s.loop_done):
+      s.loop_done @= 0
+      s.loop_done <<= 0
+      s.loop_exit @= 0
+      s.loop_exit <<= 0
+      for l in range(len(s.loop_iter)):
+        s.loop_iter[l] @= 0
+        s.loop_iter[l] <<= 0
+      s.pc @= 0
+      s.pc <<= 0
+      s.times @= 0
+      s.times <<= 0
+    if start and s.named_contexts and \
+       (ctx != int(s.ctx) or int(s.kernel_done)):
+      s.ctx @= ctx
+      s.ctx <<= ctx
+      s.pc @= 0
+      s.pc <<= 0
+      s.times @= 0
+      s.times <<= 0
+
+  # Simulation-only backdoor for the CMD_LOOP_* packets.
+  def backdoor_loop(s, pkt):
+    if pkt.ctrl_action == CMD_LOOP_TRIP_COUNT:
+      field = s.loop_trip_count[int(pkt.ctrl_addr)]
+      value = pkt.data
+    else:
+      field = {CMD_LOOP_PROLOGUE: s.loop_prologue,
+               CMD_LOOP_STEADY: s.loop_steady,
+               CMD_LOOP_EPILOGUE: s.loop_epilogue}[int(pkt.ctrl_action)]
+      value = trunc(pkt.data, mk_bits(field.nbits))
+    field @= value
+    field <<= value
+
+  # Simulation-only backdoor for CMD_SWAP_CTRL on a kernel that is done
+  # or not launched.
+  def backdoor_swap(s):
+    ctx = int(s.ctx) ^ 1
+    s.ctx @= ctx
+    s.ctx <<= ctx
+    s.pc @= 0
+    s.pc <<= 0
+    s.times @= 0
+    s.times <<= 0
+
+  # Simulation-only contents (of the active context) as a NumPy array of
+  # one field per field of CtrlSignalType, e.g., `ctrl` and `predicate`
+  # (see lib/util/mem_image.py).
+  def to_array(s):
+    if s.dict_ctrl:
+      return mem_to_array([s.reg_file.regs[int(idx)]
+                           for idx in s.idx_file.regs])
+    base = int(s.ctx) * s.ctrl_mem_size
+    return mem_to_array(s.reg_file.regs[base : base + s.ctrl_mem_size])
+
+  # Returns the addresses whose ctrl signal differs from `golden`.
+  def diff_array(s, golden, base = 0, fields = None):
+    return diff_mem(s.to_array(), golden, base, fields)
+
+  # Per-cycle fields recorded by lib/util/sim_trace.py, instead of the
+  # whole ctrl register file stringified by line_trace().
+  def trace_fields(s):
+    fields = {'raddr': s.pc,
+              'times': s.times,
+              'start': s.start_iterate_ctrl,
+              'recv_pkt_val': s.recv_pkt.val,
+              'recv_pkt_rdy': s.recv_pkt.rdy}
+    if s.shadow_ctrl:
+      fields['ctx'] = s.ctx
+    if s.loop_ctrl:
+      fields['loop_iter'] = s.loop_iter[0]
+      fields['loop_done'] = s.loop_done
+    return fields
 
   def line_trace(s):
     config_mem_str  = "|".join([str(data) for data in s.reg_file.regs])
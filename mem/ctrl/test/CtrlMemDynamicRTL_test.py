@@ -131,3 +131,250 @@ def test_Ctrl():
                    src_ctrl_pkt, sink_out)
   run_sim(th)
 
+
+def test_shadow_ctrl():
+  num_fu_inports = 2
+  num_tile_inports = 4
+  ctrl_mem_size = 4
+  CtrlPktType = mk_intra_cgra_pkt(4, 32, ctrl_mem_size, 64, num_fu_inports,
+                                  2, num_tile_inports, 4, 16, 16)
+  CtrlSignalType = mk_separate_reg_ctrl(64, num_fu_inports, 2,
+                                        num_tile_inports, 4, 16)
+  dut = CtrlMemDynamicRTL(CtrlPktType, CtrlSignalType, ctrl_mem_size,
+                          num_fu_inports, 2, num_tile_inports, 4,
+                          ctrl_count_per_iter = 2, total_ctrl_steps = 100,
+                          shadow_ctrl = True)
+  dut.elaborate()
+  dut.apply(DefaultPassGroup())
+  dut.sim_reset()
+  dut.send_ctrl.rdy @= 1
+
+  # The next kernel is loaded and swapped in while the first one runs.
+  pkts = [CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 0, OPT_ADD),
+          CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 1, OPT_SUB),
+          CtrlPktType(0, 0, 0, 0, CMD_LAUNCH),
+          CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 0, OPT_MUL),
+          CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 1, OPT_MUL),
+          CtrlPktType(0, 0, 0, 0, CMD_SWAP_CTRL)]
+  opts = []
+  for cycle in range(16):
+    dut.recv_pkt.val @= len(pkts) > 0
+    if pkts:
+      dut.recv_pkt.msg @= pkts[0]
+    dut.sim_eval_combinational()
+    if dut.recv_pkt.val & dut.recv_pkt.rdy:
+      pkts.pop(0)
+    if dut.send_ctrl.val:
+      opts.append(int(dut.send_ctrl.msg.ctrl))
+    dut.sim_tick()
+
+  assert not pkts
+  # The first kernel is not disturbed by the loading, and is swapped out
+  # at the end of an iteration, i.e., a ctrl signal is sent out in every
+  # cycle since the launch.
+  assert opts == [OPT_ADD, OPT_SUB] * 2 + [OPT_MUL] * 8
+
+def test_shadow_ctrl_paused():
+  num_fu_inports = 2
+  num_tile_inports = 4
+  ctrl_mem_size = 4
+  CtrlPktType = mk_intra_cgra_pkt(4, 32, ctrl_mem_size, 64, num_fu_inports,
+                                  2, num_tile_inports, 4, 16, 16)
+  CtrlSignalType = mk_separate_reg_ctrl(64, num_fu_inports, 2,
+                                        num_tile_inports, 4, 16)
+  dut = CtrlMemDynamicRTL(CtrlPktType, CtrlSignalType, ctrl_mem_size,
+                          num_fu_inports, 2, num_tile_inports, 4,
+                          ctrl_count_per_iter = 2, total_ctrl_steps = 0,
+                          shadow_ctrl = True)
+  dut.elaborate()
+  dut.apply(DefaultPassGroup())
+  dut.sim_reset()
+  dut.send_ctrl.rdy @= 1
+
+  opts = []
+  def send(pkts, ncycles):
+    for cycle in range(ncycles):
+      dut.recv_pkt.val @= len(pkts) > 0
+      if pkts:
+        dut.recv_pkt.msg @= pkts[0]
+      dut.sim_eval_combinational()
+      if dut.recv_pkt.val & dut.recv_pkt.rdy:
+        pkts.pop(0)
+      if dut.send_ctrl.val:
+        opts.append(int(dut.send_ctrl.msg.ctrl))
+      dut.sim_tick()
+    assert not pkts
+
+  send([CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 0, OPT_ADD),
+        CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 1, OPT_SUB),
+        CtrlPktType(0, 0, 0, 0, CMD_LAUNCH)], 6)
+  send([CtrlPktType(0, 0, 0, 0, CMD_PAUSE)], 4)
+  assert opts[:2] == [OPT_ADD, OPT_SUB]
+
+  # The next kernel still goes into the shadow context while the first
+  # one is paused, and is swapped in right away.
+  opts.clear()
+  send([CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 0, OPT_MUL),
+        CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 1, OPT_MUL),
+        CtrlPktType(0, 0, 0, 0, CMD_SWAP_CTRL),
+        CtrlPktType(0, 0, 0, 0, CMD_LAUNCH)], 10)
+  assert opts and all(opt == OPT_MUL for opt in opts)
+
+  # The first kernel is still intact in the other context.
+  opts.clear()
+  send([CtrlPktType(0, 0, 0, 0, CMD_SWAP_CTRL)], 8)
+  first = opts.index(OPT_ADD)
+  assert all(opt == OPT_MUL for opt in opts[:first])
+  assert opts[first:first + 4] == [OPT_ADD, OPT_SUB] * 2
+
+def test_named_contexts():
+  num_fu_inports = 2
+  num_tile_inports = 4
+  ctrl_mem_size = 4
+  CtrlPktType = mk_intra_cgra_pkt(4, 32, ctrl_mem_size, 64, num_fu_inports,
+                                  2, num_tile_inports, 4, 16, 16)
+  CtrlSignalType = mk_separate_reg_ctrl(64, num_fu_inports, 2,
+                                        num_tile_inports, 4, 16)
+  # Three contexts, each of which has its own lengths.
+  dut = CtrlMemDynamicRTL(CtrlPktType, CtrlSignalType, ctrl_mem_size,
+                          num_fu_inports, 2, num_tile_inports, 4,
+                          ctrl_count_per_iter = [2, 1, 3],
+                          total_ctrl_steps = [4, 3, 3], num_contexts = 3)
+  dut.elaborate()
+  dut.apply(DefaultPassGroup())
+  dut.sim_reset()
+  dut.send_ctrl.rdy @= 1
+
+  opts = []
+  def send(pkts, ncycles):
+    for cycle in range(ncycles):
+      dut.recv_pkt.val @= len(pkts) > 0
+      if pkts:
+        dut.recv_pkt.msg @= pkts[0]
+      dut.sim_eval_combinational()
+      if dut.recv_pkt.val & dut.recv_pkt.rdy:
+        pkts.pop(0)
+      if dut.send_ctrl.val:
+        opts.append(int(dut.send_ctrl.msg.ctrl))
+      dut.sim_tick()
+    assert not pkts
+
+  # The data field indicates the context.
+  send([CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 0, OPT_ADD, data = 0),
+        CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 1, OPT_SUB, data = 0),
+        CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 0, OPT_MUL, data = 1),
+        # Beyond the contexts, which is dropped.
+        CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 0, OPT_MUL, data = 3),
+        CtrlPktType(0, 0, 0, 0, CMD_LAUNCH, data = 0)], 12)
+  assert opts == [OPT_ADD, OPT_SUB] * 2
+
+  # Switching between the resident kernels takes a CMD_LAUNCH only.
+  opts.clear()
+  send([CtrlPktType(0, 0, 0, 0, CMD_LAUNCH, data = 1)], 8)
+  assert opts == [OPT_MUL] * 3
+  opts.clear()
+  send([CtrlPktType(0, 0, 0, 0, CMD_LAUNCH, data = 0)], 8)
+  assert opts == [OPT_ADD, OPT_SUB] * 2
+
+def test_loop_ctrl():
+  num_fu_inports = 2
+  num_tile_inports = 4
+  ctrl_mem_size = 4
+  CtrlPktType = mk_intra_cgra_pkt(4, 32, ctrl_mem_size, 64, num_fu_inports,
+                                  2, num_tile_inports, 4, 16, 16)
+  CtrlSignalType = mk_separate_reg_ctrl(64, num_fu_inports, 2,
+                                        num_tile_inports, 4, 16)
+  dut = CtrlMemDynamicRTL(CtrlPktType, CtrlSignalType, ctrl_mem_size,
+                          num_fu_inports, 2, num_tile_inports, 4,
+                          ctrl_count_per_iter = 4, total_ctrl_steps = 100,
+                          loop_ctrl = True)
+  dut.elaborate()
+  dut.apply(DefaultPassGroup())
+  dut.sim_reset()
+  dut.send_ctrl.rdy @= 1
+  dut.recv_loop_exit @= 0
+
+  opts = []
+  def send(pkts, ncycles, exit_at = None):
+    for cycle in range(ncycles):
+      dut.recv_pkt.val @= len(pkts) > 0
+      if pkts:
+        dut.recv_pkt.msg @= pkts[0]
+      # Raises the early exit once as many ctrl signals are sent out.
+      dut.recv_loop_exit @= len(opts) == exit_at
+      dut.sim_eval_combinational()
+      if dut.recv_pkt.val & dut.recv_pkt.rdy:
+        pkts.pop(0)
+      if dut.send_ctrl.val:
+        opts.append(int(dut.send_ctrl.msg.ctrl))
+      dut.sim_tick()
+    assert not pkts
+
+  # One ctrl signal of prologue, two of steady state and one of epilogue,
+  # whose steady state repeats twice, and the whole loop twice.
+  send([CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 0, OPT_ADD),
+        CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 1, OPT_MUL),
+        CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 2, OPT_SUB),
+        CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 3, OPT_INC),
+        CtrlPktType(0, 0, 0, 0, CMD_LOOP_PROLOGUE, data = 1),
+        CtrlPktType(0, 0, 0, 0, CMD_LOOP_STEADY, data = 2),
+        CtrlPktType(0, 0, 0, 0, CMD_LOOP_EPILOGUE, data = 1),
+        CtrlPktType(0, 0, 0, 0, CMD_LOOP_TRIP_COUNT, 0, data = 2),
+        CtrlPktType(0, 0, 0, 0, CMD_LOOP_TRIP_COUNT, 1, data = 2),
+        CtrlPktType(0, 0, 0, 0, CMD_LAUNCH)], 30)
+  once = [OPT_ADD, OPT_MUL, OPT_SUB, OPT_MUL, OPT_SUB, OPT_INC]
+  assert opts == once * 2
+  assert dut.kernel_done == 1
+
+  # The same ctrl signals run until the early exit, which finishes the
+  # steady-state iteration and the epilogue.
+  opts.clear()
+  send([CtrlPktType(0, 0, 0, 0, CMD_LOOP_TRIP_COUNT, 0, data = 0),
+        CtrlPktType(0, 0, 0, 0, CMD_LAUNCH)], 30, exit_at = 6)
+  assert opts == [OPT_ADD] + [OPT_MUL, OPT_SUB] * 3 + [OPT_INC]
+
+def test_ctrl_dict():
+  num_fu_inports = 2
+  num_tile_inports = 4
+  ctrl_mem_size = 8
+  CtrlPktType = mk_intra_cgra_pkt(4, 32, ctrl_mem_size, 64, num_fu_inports,
+                                  2, num_tile_inports, 4, 16, 16)
+  CtrlSignalType = mk_separate_reg_ctrl(64, num_fu_inports, 2,
+                                        num_tile_inports, 4, 16)
+  dut = CtrlMemDynamicRTL(CtrlPktType, CtrlSignalType, ctrl_mem_size,
+                          num_fu_inports, 2, num_tile_inports, 4,
+                          ctrl_count_per_iter = 8, total_ctrl_steps = 8,
+                          ctrl_dict_size = 4)
+  dut.elaborate()
+  dut.apply(DefaultPassGroup())
+  dut.sim_reset()
+  dut.send_ctrl.rdy @= 1
+  dut.recv_loop_exit @= 0
+
+  # Three distinct ctrl signals, whose indices are written in runs (the
+  # index in the lower 2 bits of data, the run length minus one above),
+  # while the plain CMD_CONFIG packet is dropped.
+  pkts = [CtrlPktType(0, 0, 0, 0, CMD_CONFIG_DICT, 0, OPT_ADD),
+          CtrlPktType(0, 0, 0, 0, CMD_CONFIG_DICT, 1, OPT_MUL),
+          CtrlPktType(0, 0, 0, 0, CMD_CONFIG_DICT, 2, OPT_SUB),
+          CtrlPktType(0, 0, 0, 0, CMD_CONFIG_RUN, 0, data = (2 << 2) | 0),
+          CtrlPktType(0, 0, 0, 0, CMD_CONFIG_RUN, 3, data = (0 << 2) | 1),
+          CtrlPktType(0, 0, 0, 0, CMD_CONFIG_RUN, 4, data = (3 << 2) | 2),
+          CtrlPktType(0, 0, 0, 0, CMD_CONFIG, 3, OPT_INC),
+          CtrlPktType(0, 0, 0, 0, CMD_LAUNCH)]
+  opts = []
+  for cycle in range(30):
+    dut.recv_pkt.val @= len(pkts) > 0
+    if pkts:
+      dut.recv_pkt.msg @= pkts[0]
+    dut.sim_eval_combinational()
+    if dut.recv_pkt.val & dut.recv_pkt.rdy:
+      pkts.pop(0)
+    if dut.send_ctrl.val:
+      opts.append(int(dut.send_ctrl.msg.ctrl))
+    dut.sim_tick()
+  assert not pkts
+
+  golden = [OPT_ADD] * 3 + [OPT_MUL] + [OPT_SUB] * 4
+  assert opts == golden
+  assert list(dut.to_array()['ctrl']) == golden
@@ -13,6 +13,7 @@ from pymtl3 import *
 from ...lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ...lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
 from ...lib.opt_type import *
+from ...lib.util.mem_image import diff_mem, mem_to_array
 
 class DataMemCL(Component):
 
@@ -55,6 +56,14 @@ class DataMemCL(Component):
         s.recv_waddr[i].rdy @= Bits1(1)
         s.recv_wdata[i].rdy @= Bits1(1)
 
+  # Contents as a NumPy array (see lib/util/mem_image.py).
+  def to_array(s):
+    return mem_to_array(s.sram)
+
+  # Returns the addresses whose data differs from `golden`.
+  def diff_array(s, golden, base = 0, fields = None):
+    return diff_mem(s.to_array(), golden, base, fields)
+
   def line_trace(s):
     recv_str = "|".join([str(data.msg) for data in s.recv_wdata])
     out_str  = "|".join([str(data)     for data in s.sram])
@@ -13,6 +13,7 @@ from pymtl3.stdlib.primitive import RegisterFile
 from ...lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ...lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
 from ...lib.opt_type import *
+from ...lib.util.mem_image import diff_mem, mem_to_array
 
 class DataMemRTL(Component):
 
@@ -95,6 +96,19 @@ class DataMemRTL(Component):
         s.recv_waddr[i].rdy @= Bits1(1)
         s.recv_wdata[i].rdy @= Bits1(1)
 
+  # Simulation-only contents as a NumPy array (see lib/util/mem_image.py),
+  # where the preloaded data stands for the addresses not accessed yet.
+  def to_array(s):
+    if hasattr(s, 'preloadData'):
+      return mem_to_array([s.preloadData[i] if s.initWrites[i] == 0
+                           else s.reg_file.regs[i]
+                           for i in range(len(s.reg_file.regs))])
+    return mem_to_array(s.reg_file.regs)
+
+  # Returns the addresses whose data differs from `golden`.
+  def diff_array(s, golden, base = 0, fields = None):
+    return diff_mem(s.to_array(), golden, base, fields)
+
   def line_trace(s):
     recv_raddr_str = "recv_read_addr: " + "|".join([str(data.msg) for data in s.recv_raddr])
     recv_waddr_str = "recv_write_addr: " + "|".join([str(data.msg) for data in s.recv_waddr])
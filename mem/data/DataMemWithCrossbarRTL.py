@@ -14,20 +14,82 @@ which can be used for multi-CGRA fabric.
 In addition, it contains a crossbar to handle multi-bank conflicts.
  - Crossbar contains an arbitor, i.e., stall may happen on certain port.
    - Therefore, bypass queue is leveraged on the input port.
- - [ ] https://github.com/tancheng/VectorCGRA/issues/26:
+ - [x] https://github.com/tancheng/VectorCGRA/issues/26:
      Blocking vs. non-blocking should be configured/propagated here.
-   - Non-blocking:
-     - Immediate return data though it is not ready:
-       - Bank conflicted lower priority access.
-       - Remote accessed data.
+   - Non-blocking (i.e., `num_mshr_entries` > 0):
+     - A remote load allocates an MSHR entry, whose index is carried by
+       the opaque field of the request and of its response, and releases
+       the crossbar right away, so up to `num_mshr_entries` remote loads
+       (from different tile ports) are in flight.
+     - The responses come back via `recv_from_noc_load_response_pkt` in
+       any order, and are routed to the tile port recorded in the entry.
+     - A tile port waiting for a remote load does not accept other
+       requests, which keeps the responses of a port in order.
    - Blocking and non-blocking might be configurabled in a dynamic way.
 
+The addresses are interleaved across the banks by one of the
+INTERLEAVE_SCHEMES below, and the per-bank conflict/stall statistics are
+exposed via `bank_conflicts` and `bank_stalls`.
+
+With `read_combining`, the tile loads of the same address arriving in the
+same cycle (e.g., the boundary tiles of a systolic mapping loading the
+same weight) are served by one bank access, whose data is multicast to
+all of them. The lowest tile port of such a group goes through the
+crossbar, and the others wait for its bank access without entering the
+crossbar. The bank accesses saved are exposed via `bank_reads_saved`.
+
+Each bank is an SramBankRTL of `rd_ports_per_bank` read ports and
+`wr_ports_per_bank` write ports, each of which is an output of the
+crossbar statically assigned to the tile ports `i` of
+`i % rd_ports_per_bank` (or `i % wr_ports_per_bank`), so that the
+requests of different port groups to the same bank are served in the same
+cycle. Given `read_latency` > 0, the banks are pipelined, and the read
+data is routed back by the tile port (or the multicast ports, see
+`read_combining`) recorded in the tag pipeline alongside the bank,
+bypassing the one-entry response queue of the port unless it is not
+taken. A port is then blocked until its response is taken. Given
+`sram_macro`, the banks are black-boxed as the macro in translation (see
+mem/data/SramBankRTL.py).
+
+Given `store_buffer_entries` > 0, the local stores bypass the write
+crossbar into a StoreBufferRTL per bank, which accepts the stores of all
+the tile ports in the same cycle, combines the ones to the same address
+(e.g., an accumulator updated by several tiles) and drains them into the
+first write port of the bank in the cycles without incoming stores. The
+loads of the bank are forwarded the data of the pending stores, and the
+stores combined are exposed via `bank_writes_combined`.
+
+A read request tagged with an atomic operation (`recv_atomic_op`, along
+with its operand `recv_atomic_data`, see lib/cmd_type.py) carries them
+through the crossbar. Given `atomics`, the bank access returns the old
+data and writes back the result in the same cycle, stalling the crossbar
+writes to the bank in that cycle, which keeps the read-modify-write
+atomic w.r.t. the other requests. The atomic requests towards remote
+memory are sent as CMD_ATOMIC_*_REQUEST with the operand.
+
+Given `double_buffered`, the local memory is split into two halves by
+its top address bit (i.e., two sets of banks for "high_order"
+interleaving), where the tile ports access one of them (`buffer_sel`)
+and the port of the controller (NoC requests and DMA reads) accesses the
+other one, both of which appear as the lower half of the local address
+space to their side. `swap_buffer` exchanges the halves at the end of
+the cycle, so the data transferred in the last phase is computed on in
+the next one at the same addresses, while the results are transferred
+out (see CMD_SWAP_BUFFER in lib/cmd_type.py). The requests are mapped
+once entering the crossbar, i.e., the ones in flight are not affected.
+
+The banks are preloaded from lists, NumPy arrays or image files (see
+lib/util/mem_image.py) without any per-word wires or init cycles: the
+registers are written directly in simulation and by `$readmemh` in the
+translated Verilog.
+
 Author : Cheng Tan
   Date : Dec 5, 2024
 """
 
 from pymtl3 import *
-from pymtl3.stdlib.primitive import RegisterFile
+from .SramBankRTL import SramBankRTL
+from .StoreBufferRTL import StoreBufferRTL
 from ...noc.PyOCN.pymtl3_net.xbar.XbarBypassQueueRTL import XbarBypassQueueRTL
 from ...lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ...lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
@@ -35,12 +97,68 @@ from ...lib.basic.val_rdy.queues import BypassQueueRTL
 from ...lib.cmd_type import *
 from ...lib.opt_type import *
 from ...lib.messages import *
+from ...lib.util.mem_image import (diff_mem, load_mem_image, mem_to_array,
+                                   preload_sim_memories)
+
+# Address interleaving schemes across the local banks:
+#  - "high_order":   an address goes to bank `addr >> per_bank_addr_nbits`,
+#                    i.e., a bank is filled up before the next one.
+#  - "low_order":    consecutive addresses go to consecutive banks.
+#  - "xor":          as "low_order", but the bank index is XOR-ed with the
+#                    next higher address bits, so that strided accesses
+#                    are spread across the banks as well.
+#  - "block_cyclic": consecutive blocks of `interleave_block_size`
+#                    addresses go to consecutive banks.
+INTERLEAVE_SCHEMES = ["high_order", "low_order", "xor", "block_cyclic"]
+
+# Returns the constants that map an address within the local banks to its
+# bank and its offset within the bank:
+#   bank   = ((addr >> bank_shift) ^ ((addr >> xor_shift) & xor_mask)) & bank_mask
+#   offset = (((addr >> hi_shift) & hi_mask) << lo_nbits) | (addr & lo_mask)
+def mk_interleave_params(interleave, num_banks, data_mem_size_per_bank,
+                         interleave_block_size = 1):
+  assert(interleave in INTERLEAVE_SCHEMES)
+  bank_nbits = clog2(num_banks)
+  per_bank_addr_nbits = clog2(data_mem_size_per_bank)
+  bank_mask = (1 << bank_nbits) - 1
+  if interleave == "high_order":
+    return (per_bank_addr_nbits, 0, 0, bank_mask,
+            0, 0, 0, data_mem_size_per_bank - 1)
+
+  # The other schemes rely on the bank index being the low address bits.
+  assert(2 ** bank_nbits == num_banks)
+  if interleave == "low_order":
+    return (0, 0, 0, bank_mask,
+            bank_nbits, data_mem_size_per_bank - 1, 0, 0)
+  if interleave == "xor":
+    return (0, bank_nbits, bank_mask, bank_mask,
+            bank_nbits, data_mem_size_per_bank - 1, 0, 0)
+  block_nbits = clog2(interleave_block_size)
+  assert(2 ** block_nbits == interleave_block_size)
+  assert(interleave_block_size <= data_mem_size_per_bank)
+  return (block_nbits, 0, 0, bank_mask,
+          block_nbits + bank_nbits, data_mem_size_per_bank - 1,
+          block_nbits, interleave_block_size - 1)
+
+# Maps an (integer) address within the local banks to (bank, offset).
+def interleave_addr(addr, interleave_params):
+  bank_shift, xor_shift, xor_mask, bank_mask, \
+      hi_shift, hi_mask, lo_nbits, lo_mask = interleave_params
+  bank = ((addr >> bank_shift) ^ ((addr >> xor_shift) & xor_mask)) & bank_mask
+  offset = (((addr >> hi_shift) & hi_mask) << lo_nbits) | (addr & lo_mask)
+  return bank, offset
 
 class DataMemWithCrossbarRTL(Component):
 
   def construct(s, NocPktType, DataType, data_mem_size_global,
                 data_mem_size_per_bank, num_banks = 4, num_rd_tiles = 4,
-                num_wr_tiles = 4, preload_data_per_bank = None):
+                num_wr_tiles = 4, preload_data_per_bank = None,
+                interleave = "high_order", interleave_block_size = 1,
+                num_mshr_entries = 0, read_combining = False,
+                rd_ports_per_bank = 1, wr_ports_per_bank = 1,
+                read_latency = 0, sram_macro = None,
+                store_buffer_entries = 0, atomics = False,
+                double_buffered = False):
 
     # Constant
     global_addr_nbits = clog2(data_mem_size_global)
@@ -50,24 +168,68 @@ class DataMemWithCrossbarRTL(Component):
     AddrType = mk_bits(global_addr_nbits)
     PerBankAddrType = mk_bits(per_bank_addr_nbits)
     s.num_banks = num_banks
-    LocalBankIndexType = mk_bits(clog2(num_banks))
+    s.data_mem_size_per_bank = data_mem_size_per_bank
+    s.per_bank_addr_nbits = per_bank_addr_nbits
     s.num_rd_tiles = num_rd_tiles
     s.num_wr_tiles = num_wr_tiles
     RdTileIdType = mk_bits(clog2(num_rd_tiles))
     num_xbar_in_rd_ports = num_rd_tiles + 1
     num_xbar_in_wr_ports = num_wr_tiles + 1
-    num_xbar_out_rd_ports = num_banks + 1
-    num_xbar_out_wr_ports = num_banks + 1
+    # The crossbar outputs towards the bank ports, where the port `p` of
+    # bank `b` is the output `b * ports_per_bank + p`.
+    num_rd_bank_ports = num_banks * rd_ports_per_bank
+    num_wr_bank_ports = num_banks * wr_ports_per_bank
+    num_xbar_out_rd_ports = num_rd_bank_ports + 1
+    num_xbar_out_wr_ports = num_wr_bank_ports + 1
     XbarOutRdType = mk_bits(clog2(num_xbar_out_rd_ports))
     XbarOutWrType = mk_bits(clog2(num_xbar_out_wr_ports))
+    RdBankPortType = mk_bits(max(clog2(num_rd_bank_ports), 1))
     TileSramXbarRdPktType = \
-        mk_tile_sram_xbar_pkt(num_xbar_in_rd_ports,
-                              num_xbar_out_rd_ports,
-                              data_mem_size_global)
+        mk_tile_sram_xbar_rd_pkt(num_xbar_in_rd_ports,
+                                 num_xbar_out_rd_ports,
+                                 data_mem_size_global, DataType,
+                                 ATOMIC_OP_NBITS)
     TileSramXbarWrPktType = \
         mk_tile_sram_xbar_pkt(num_xbar_in_wr_ports,
                               num_xbar_out_wr_ports,
                               data_mem_size_global)
+    ReqCountType = mk_bits(clog2(max(num_xbar_in_rd_ports,
+                                     num_xbar_in_wr_ports) + 1))
+    StatType = b32
+    non_blocking_load = num_mshr_entries > 0
+    blocking_load = num_mshr_entries == 0
+    num_mshr_slots = max(num_mshr_entries, 1)
+    MshrIdType = mk_bits(max(clog2(num_mshr_slots), 1))
+    OpaqueType = NocPktType.get_field_type('opaque')
+    assert(num_mshr_slots <= 2 ** OpaqueType.nbits)
+    combinational_read = read_latency == 0
+    pipelined_read = read_latency > 0
+    num_tag_stages = max(read_latency, 1)
+    RdPortMaskType = mk_bits(num_xbar_in_rd_ports)
+    buffered_store = store_buffer_entries > 0
+    WrCountType = mk_bits(clog2(num_xbar_in_wr_ports + 1))
+    s.store_buffer_entries = store_buffer_entries
+    AtomicOpType = mk_bits(ATOMIC_OP_NBITS)
+    if atomics:
+      # The result is written back along with the (only) read port of the
+      # bank, whose data is neither delayed nor pending in a store buffer.
+      assert rd_ports_per_bank == 1 and read_latency == 0 and \
+             store_buffer_entries == 0, \
+             "atomics require single-ported, combinational, unbuffered banks"
+    local_mem_size = data_mem_size_per_bank * num_banks
+    if double_buffered:
+      assert 2 ** clog2(local_mem_size) == local_mem_size, \
+             "double buffering requires a power-of-2 local memory size"
+    # The top address bit of the local memory, flipped by the side
+    # accessing the upper half.
+    buffer_flip = AddrType(local_mem_size // 2)
+
+    s.interleave_params = \
+        mk_interleave_params(interleave, num_banks, data_mem_size_per_bank,
+                             interleave_block_size)
+    bank_shift, xor_shift, xor_mask, bank_mask, \
+        hi_shift, hi_mask, lo_nbits, lo_mask = \
+        [AddrType(x) for x in s.interleave_params]
 
     # Interface
     # [0, ..., num_rd_tiles - 1] indicate the requests from/to the tiles,
@@ -76,25 +238,50 @@ class DataMemWithCrossbarRTL(Component):
     s.recv_waddr = [RecvIfcRTL(AddrType) for _ in range(num_xbar_in_wr_ports)]
     s.recv_wdata = [RecvIfcRTL(DataType) for _ in range(num_xbar_in_wr_ports)]
     s.send_rdata = [SendIfcRTL(DataType) for _ in range(num_rd_tiles)]
+    # The atomic operation (and its operand) of the read request, if any.
+    s.recv_atomic_op = [InPort(AtomicOpType) for _ in range(num_xbar_in_rd_ports)]
+    s.recv_atomic_data = [InPort(DataType) for _ in range(num_xbar_in_rd_ports)]
+
+    # Exchanges the halves of the double-buffered memory, where
+    # `buffer_sel` indicates the half being accessed by the tiles.
+    s.swap_buffer = InPort(b1)
+    s.buffer_sel = OutPort(b1)
 
     s.send_to_noc_load_response_pkt = SendIfcRTL(NocPktType)
 
     # Response that is from a remote SRAM.
     s.recv_from_noc_rdata = RecvIfcRTL(DataType)
+    # Response that is from a remote SRAM tagged with the MSHR entry, used
+    # instead of the above if the remote loads are non-blocking.
+    s.recv_from_noc_load_response_pkt = RecvIfcRTL(NocPktType)
 
     # Requests that targets remote SRAMs.
     s.send_to_noc_load_request_pkt = SendIfcRTL(NocPktType)
     s.send_to_noc_store_pkt = SendIfcRTL(NocPktType)
 
+    # Per bank, the cycles in which more than one read (or write) request
+    # targets it, and the accumulated number of the requests stalled on it.
+    s.bank_conflicts = [OutPort(StatType) for _ in range(num_banks)]
+    s.bank_stalls = [OutPort(StatType) for _ in range(num_banks)]
+    # Per bank, the accumulated number of the reads served by the access
+    # of another read to the same address.
+    s.bank_reads_saved = [OutPort(StatType) for _ in range(num_banks)]
+    # Per bank, the accumulated number of the stores combined into a
+    # pending store to the same address in the store buffer.
+    s.bank_writes_combined = [OutPort(StatType) for _ in range(num_banks)]
+
     # Component
     # As we include xbar and multi-bank for the memory hierarchy,
-    # we prefer as few as possible number of ports.
-    rd_ports_per_bank = 1
-    wr_ports_per_bank = 1
-
-    s.reg_file = [RegisterFile(DataType, data_mem_size_per_bank,
-                               rd_ports_per_bank, wr_ports_per_bank)
+    # we prefer as few as possible number of ports by default.
+    s.reg_file = [SramBankRTL(DataType, data_mem_size_per_bank,
+                              rd_ports_per_bank, wr_ports_per_bank,
+                              read_latency, sram_macro)
                   for _ in range(num_banks)]
+    if buffered_store:
+      s.store_buffer = [StoreBufferRTL(DataType, PerBankAddrType,
+                                       store_buffer_entries,
+                                       num_xbar_in_wr_ports, rd_ports_per_bank)
+                        for _ in range(num_banks)]
     # The additional 1 on inports indicates the read/write from NoC.
     # The additional 1 on outports indicates the request out of bound of
     # local memory space that would be forwarded to NoC.
@@ -102,10 +289,7 @@ class DataMemWithCrossbarRTL(Component):
                                          num_xbar_out_rd_ports)
     s.write_crossbar = XbarBypassQueueRTL(TileSramXbarWrPktType, num_xbar_in_wr_ports,
                                           num_xbar_out_wr_ports)
-    s.initWrites = [[Wire(b1) for _ in range(data_mem_size_per_bank)]
-                    for _ in range(num_banks)]
     s.init_mem_done = Wire(b1)
-    s.init_mem_addr = Wire(PerBankAddrType)
 
     s.rd_pkt = [Wire(TileSramXbarRdPktType) for _ in range(num_xbar_in_rd_ports)]
     s.wr_pkt = [Wire(TileSramXbarWrPktType) for _ in range(num_xbar_in_wr_ports)]
@@ -114,41 +298,235 @@ class DataMemWithCrossbarRTL(Component):
 
     s.send_to_noc_load_pending = Wire(b1)
 
-    if preload_data_per_bank != None:
-      preload_data_per_bank_size = data_mem_size_per_bank
-      s.preload_data_per_bank = [[Wire(DataType) for _ in range(data_mem_size_per_bank)]
-                                 for _ in range(num_banks)]
-      for b in range(num_banks):
-        for i in range(len(preload_data_per_bank[b])):
-          s.preload_data_per_bank[b][i] //= preload_data_per_bank[b][i]
-    else:
-      preload_data_per_bank_size = 1
-      s.preload_data_per_bank = [[Wire(DataType) for _ in range(preload_data_per_bank_size)]
-                                 for _ in range(num_banks)]
-      for b in range(num_banks):
-        s.preload_data_per_bank[b][0] //= DataType()
-    PreloadDataPerBankSizeType = mk_bits(max(1, clog2(preload_data_per_bank_size)))
+    # The addresses of the requests mapped onto the half of the memory of
+    # each port, see `double_buffered`.
+    s.rd_addr = [Wire(AddrType) for _ in range(num_xbar_in_rd_ports)]
+    s.wr_addr = [Wire(AddrType) for _ in range(num_xbar_in_wr_ports)]
+    s.noc_buffer_flip = Wire(AddrType)
+
+    # The read address and data of each bank port.
+    s.bank_raddr = [Wire(PerBankAddrType) for _ in range(num_rd_bank_ports)]
+    s.bank_rdata = [Wire(DataType) for _ in range(num_rd_bank_ports)]
+
+    # Pipelined reads, i.e., the ports to route the read data of each bank
+    # port to (`rd_tag_mask`), the port blocked on its response
+    # (`rd_port_busy`), its one-entry response queue (`resp_val`,
+    # `resp_data`), and the response arriving from the banks in this cycle
+    # (`arrive_val`, `arrive_data`).
+    s.rd_tag_val = [[Wire(b1) for _ in range(num_tag_stages)]
+                    for _ in range(num_rd_bank_ports)]
+    s.rd_tag_mask = [[Wire(RdPortMaskType) for _ in range(num_tag_stages)]
+                     for _ in range(num_rd_bank_ports)]
+    s.rd_issue_mask = [Wire(RdPortMaskType) for _ in range(num_rd_bank_ports)]
+    s.rd_port_busy = [Wire(b1) for _ in range(num_xbar_in_rd_ports)]
+    s.resp_val = [Wire(b1) for _ in range(num_xbar_in_rd_ports)]
+    s.resp_data = [Wire(DataType) for _ in range(num_xbar_in_rd_ports)]
+    s.arrive_val = [Wire(b1) for _ in range(num_xbar_in_rd_ports)]
+    s.arrive_data = [Wire(DataType) for _ in range(num_xbar_in_rd_ports)]
+    s.resp_taken = [Wire(b1) for _ in range(num_xbar_in_rd_ports)]
+    # The address of the pipelined read from the NoC, sent back with its
+    # response.
+    s.noc_rd_addr = Wire(AddrType)
+
+    # Buffered stores, i.e., the local stores bypassing the write crossbar
+    # (`wr_buffered`) into the store buffer of their bank at `wr_offset`,
+    # and the signals of the store buffers, where `sb_lookup_*` is the
+    # data forwarded to each bank port, which travels alongside the tags
+    # (`rd_fwd_*`) for the pipelined reads.
+    s.wr_buffered = [Wire(b1) for _ in range(num_xbar_in_wr_ports)]
+    s.wr_offset = [Wire(PerBankAddrType) for _ in range(num_xbar_in_wr_ports)]
+    s.sb_recv_val = [[Wire(b1) for _ in range(num_xbar_in_wr_ports)]
+                     for _ in range(num_banks)]
+    s.sb_recv_rdy = [[Wire(b1) for _ in range(num_xbar_in_wr_ports)]
+                     for _ in range(num_banks)]
+    s.sb_drain_val = [Wire(b1) for _ in range(num_banks)]
+    s.sb_drain_addr = [Wire(PerBankAddrType) for _ in range(num_banks)]
+    s.sb_drain_data = [Wire(DataType) for _ in range(num_banks)]
+    s.sb_combined = [Wire(WrCountType) for _ in range(num_banks)]
+    s.sb_lookup_hit = [Wire(b1) for _ in range(num_rd_bank_ports)]
+    s.sb_lookup_data = [Wire(DataType) for _ in range(num_rd_bank_ports)]
+    s.rd_fwd_val = [[Wire(b1) for _ in range(num_tag_stages)]
+                    for _ in range(num_rd_bank_ports)]
+    s.rd_fwd_data = [[Wire(DataType) for _ in range(num_tag_stages)]
+                     for _ in range(num_rd_bank_ports)]
+
+    # The requests towards each bank port.
+    s.bank_rd_reqs = [Wire(ReqCountType) for _ in range(num_rd_bank_ports)]
+    s.bank_wr_reqs = [Wire(ReqCountType) for _ in range(num_wr_bank_ports)]
+    s.bank_stalled_reqs = [Wire(ReqCountType) for _ in range(num_banks)]
+    s.bank_conflicted = [Wire(b1) for _ in range(num_banks)]
+    s.bank_combined_reqs = [Wire(ReqCountType) for _ in range(num_banks)]
+
+    # The result of the atomic operation written back into each bank.
+    s.atomic_wen = [Wire(b1) for _ in range(num_banks)]
+    s.atomic_wdata = [Wire(DataType) for _ in range(num_banks)]
+
+    # Read combining, i.e., the tile port waiting for the bank access of a
+    # lower port loading the same address (`rd_follower`), and being served
+    # by it in this cycle (`rd_combined`).
+    s.rd_follower = [Wire(b1) for _ in range(num_xbar_in_rd_ports)]
+    s.rd_combined = [Wire(b1) for _ in range(num_xbar_in_rd_ports)]
+    s.rd_combined_port = [Wire(RdBankPortType) for _ in range(num_xbar_in_rd_ports)]
+
+    # MSHR, each valid entry of which indicates the tile port waiting for
+    # the response of a remote load.
+    s.mshr_valid = [Wire(b1) for _ in range(num_mshr_slots)]
+    s.mshr_port = [Wire(RdTileIdType) for _ in range(num_mshr_slots)]
+    s.mshr_free_val = Wire(b1)
+    s.mshr_free_idx = Wire(MshrIdType)
+    s.mshr_resp_idx = Wire(MshrIdType)
+    s.mshr_port_pending = [Wire(b1) for _ in range(num_xbar_in_rd_ports)]
+
+    # The preloaded image of each bank (see mem_images()), which is either
+    # a list per bank, whose `preload_data_per_bank[b][i]` is the data at
+    # the address `b * data_mem_size_per_bank + i`, or a NumPy array/image
+    # file of the whole local memory (see lib/util/mem_image.py). The data
+    # is placed into the bank indicated by the interleaving scheme.
+    # Connections
+    for b in range(num_banks):
+      for p in range(rd_ports_per_bank):
+        s.reg_file[b].raddr[p] //= s.bank_raddr[b * rd_ports_per_bank + p]
+      if buffered_store:
+        for i in range(num_xbar_in_wr_ports):
+          s.store_buffer[b].recv_val[i] //= s.sb_recv_val[b][i]
+          s.store_buffer[b].recv_addr[i] //= s.wr_offset[i]
+          s.store_buffer[b].recv_data[i] //= s.recv_wdata_bypass_q[i].send.msg
+          s.store_buffer[b].recv_rdy[i] //= s.sb_recv_rdy[b][i]
+        s.store_buffer[b].drain_val //= s.sb_drain_val[b]
+        s.store_buffer[b].drain_addr //= s.sb_drain_addr[b]
+        s.store_buffer[b].drain_data //= s.sb_drain_data[b]
+        s.store_buffer[b].num_combined //= s.sb_combined[b]
+        for p in range(rd_ports_per_bank):
+          s.store_buffer[b].lookup_addr[p] //= s.bank_raddr[b * rd_ports_per_bank + p]
+          s.store_buffer[b].lookup_hit[p] //= s.sb_lookup_hit[b * rd_ports_per_bank + p]
+          s.store_buffer[b].lookup_data[p] //= s.sb_lookup_data[b * rd_ports_per_bank + p]
+      else:
+        # The data is only used once valid.
+        for i in range(num_xbar_in_wr_ports):
+          s.sb_recv_rdy[b][i] //= 0
+        s.sb_drain_val[b] //= 0
+        s.sb_drain_addr[b] //= 0
+        s.sb_combined[b] //= 0
+        for p in range(rd_ports_per_bank):
+          s.sb_lookup_hit[b * rd_ports_per_bank + p] //= 0
+
+    s._preload_image = None
+    if preload_data_per_bank is not None:
+      if isinstance(preload_data_per_bank, (list, tuple)):
+        words = {}
+        for b in range(len(preload_data_per_bank)):
+          for i, word in enumerate(load_mem_image(preload_data_per_bank[b], DataType,
+                                                  data_mem_size_per_bank)):
+            words[b * data_mem_size_per_bank + i] = word
+      else:
+        words = dict(enumerate(load_mem_image(preload_data_per_bank, DataType,
+                                              num_banks * data_mem_size_per_bank)))
+      s._preload_image = [[0] * data_mem_size_per_bank for _ in range(num_banks)]
+      for addr, word in words.items():
+        bank, offset = interleave_addr(addr, s.interleave_params)
+        s._preload_image[bank][offset] = word
+
+    # Maps the local addresses of each port onto its half of the memory,
+    # i.e., the tiles flip the top address bit once they access the upper
+    # half (`buffer_sel`), and the controller's port otherwise.
+    @update
+    def update_buffer_addr():
+      s.noc_buffer_flip @= 0
+      if double_buffered:
+        if ~s.buffer_sel:
+          s.noc_buffer_flip @= buffer_flip
+      for i in range(num_xbar_in_rd_ports):
+        s.rd_addr[i] @= s.recv_raddr[i].msg
+      for i in range(num_xbar_in_wr_ports):
+        s.wr_addr[i] @= s.recv_waddr[i].msg
+      if double_buffered:
+        for i in range(num_rd_tiles):
+          if s.buffer_sel & (s.recv_raddr[i].msg < local_mem_size):
+            s.rd_addr[i] @= s.recv_raddr[i].msg ^ buffer_flip
+        for i in range(num_wr_tiles):
+          if s.buffer_sel & (s.recv_waddr[i].msg < local_mem_size):
+            s.wr_addr[i] @= s.recv_waddr[i].msg ^ buffer_flip
+        if s.recv_raddr[num_rd_tiles].msg < local_mem_size:
+          s.rd_addr[num_rd_tiles] @= s.recv_raddr[num_rd_tiles].msg ^ s.noc_buffer_flip
+        if s.recv_waddr[num_wr_tiles].msg < local_mem_size:
+          s.wr_addr[num_wr_tiles] @= s.recv_waddr[num_wr_tiles].msg ^ s.noc_buffer_flip
 
     @update
     def assemble_xbar_pkt():
       if s.init_mem_done != b1(0):
         for i in range(num_xbar_in_rd_ports):
           # Calculates the target bank.
-          if s.recv_raddr[i].msg < data_mem_size_per_bank * num_banks:
-            bank_index = trunc(s.recv_raddr[i].msg >> per_bank_addr_nbits, XbarOutRdType)
+          if s.rd_addr[i] < data_mem_size_per_bank * num_banks:
+            bank_index = trunc(((s.rd_addr[i] >> bank_shift) ^
+                                ((s.rd_addr[i] >> xor_shift) & xor_mask)) &
+                               bank_mask, XbarOutRdType) * XbarOutRdType(rd_ports_per_bank) + \
+                         XbarOutRdType(i % rd_ports_per_bank)
           else:
-            bank_index = XbarOutRdType(num_banks)
-          s.rd_pkt[i] @= TileSramXbarRdPktType(i, bank_index, s.recv_raddr[i].msg)
+            bank_index = XbarOutRdType(num_rd_bank_ports)
+          s.rd_pkt[i] @= TileSramXbarRdPktType(i, bank_index, s.rd_addr[i],
+                                               s.recv_atomic_op[i],
+                                               s.recv_atomic_data[i])
 
         for i in range(num_xbar_in_wr_ports):
           # Calculates the target bank.
-          if s.recv_waddr[i].msg < data_mem_size_per_bank * num_banks:
-            bank_index = trunc(s.recv_waddr[i].msg >> per_bank_addr_nbits, XbarOutWrType)
+          if s.wr_addr[i] < data_mem_size_per_bank * num_banks:
+            bank_index = trunc(((s.wr_addr[i] >> bank_shift) ^
+                                ((s.wr_addr[i] >> xor_shift) & xor_mask)) &
+                               bank_mask, XbarOutWrType) * XbarOutWrType(wr_ports_per_bank) + \
+                         XbarOutWrType(i % wr_ports_per_bank)
           else:
-            bank_index = XbarOutWrType(num_banks)
-          s.wr_pkt[i] @= TileSramXbarWrPktType(i, bank_index, s.recv_waddr[i].msg)
+            bank_index = XbarOutWrType(num_wr_bank_ports)
+          s.wr_pkt[i] @= TileSramXbarWrPktType(i, bank_index, s.wr_addr[i])
 
 
+    # The local stores go to the store buffers instead of the crossbar.
+    @update
+    def update_wr_buffered():
+      for i in range(num_xbar_in_wr_ports):
+        s.wr_offset[i] @= \
+            trunc((((s.wr_addr[i] >> hi_shift) & hi_mask) << lo_nbits) |
+                  (s.wr_addr[i] & lo_mask), PerBankAddrType)
+        s.wr_buffered[i] @= 0
+        if buffered_store:
+          s.wr_buffered[i] @= s.wr_pkt[i].dst < XbarOutWrType(num_wr_bank_ports)
+
+    # The read data of each bank port, unless forwarded from a pending
+    # store.
+    @update
+    def update_bank_rdata():
+      for b in range(num_banks):
+        for p in range(rd_ports_per_bank):
+          s.bank_rdata[b * rd_ports_per_bank + p] @= s.reg_file[b].rdata[p]
+          if buffered_store:
+            if combinational_read:
+              if s.sb_lookup_hit[b * rd_ports_per_bank + p]:
+                s.bank_rdata[b * rd_ports_per_bank + p] @= \
+                    s.sb_lookup_data[b * rd_ports_per_bank + p]
+            elif s.rd_fwd_val[b * rd_ports_per_bank + p][num_tag_stages - 1]:
+              s.bank_rdata[b * rd_ports_per_bank + p] @= \
+                  s.rd_fwd_data[b * rd_ports_per_bank + p][num_tag_stages - 1]
+
+    # Computes the result of the atomic operation on the data read by each
+    # bank in this cycle.
+    @update
+    def update_atomic():
+      for b in range(num_banks):
+        s.atomic_wen[b] @= 0
+        s.atomic_wdata[b] @= s.read_crossbar.send[b].msg.data
+        if atomics:
+          if s.read_crossbar.send[b].val & \
+             (s.read_crossbar.send[b].msg.atomic != AtomicOpType(ATOMIC_NONE)):
+            s.atomic_wen[b] @= 1
+          if s.read_crossbar.send[b].msg.atomic == AtomicOpType(ATOMIC_ADD):
+            s.atomic_wdata[b].payload @= s.bank_rdata[b].payload + \
+                                         s.read_crossbar.send[b].msg.data.payload
+          elif s.read_crossbar.send[b].msg.atomic == AtomicOpType(ATOMIC_MIN):
+            if s.bank_rdata[b].payload < s.read_crossbar.send[b].msg.data.payload:
+              s.atomic_wdata[b].payload @= s.bank_rdata[b].payload
+          elif s.read_crossbar.send[b].msg.atomic == AtomicOpType(ATOMIC_MAX):
+            if s.bank_rdata[b].payload > s.read_crossbar.send[b].msg.data.payload:
+              s.atomic_wdata[b].payload @= s.bank_rdata[b].payload
+
     # Connects xbar with the sram.
     @update
     def update_all():
@@ -162,16 +540,21 @@ class DataMemWithCrossbarRTL(Component):
       for i in range(num_rd_tiles):
         s.send_rdata[i].val @= 0
       s.send_to_noc_load_response_pkt.val @= 0
+      s.recv_from_noc_load_response_pkt.rdy @= 0
 
       for i in range(num_xbar_in_wr_ports):
         s.recv_wdata[i].rdy @= 0
         s.recv_wdata_bypass_q[i].recv.val @= 0
+        if buffered_store:
+          for b in range(num_banks):
+            s.sb_recv_val[b][i] @= 0
 
       if s.init_mem_done == 0:
         for b in range(num_banks):
-          s.reg_file[b].waddr[0] @= trunc(s.init_mem_addr, PerBankAddrType)
-          s.reg_file[b].wdata[0] @= s.preload_data_per_bank[b][trunc(s.init_mem_addr, PreloadDataPerBankSizeType)]
-          s.reg_file[b].wen[0] @= b1(1)
+          for p in range(wr_ports_per_bank):
+            s.reg_file[b].waddr[p] @= PerBankAddrType(0)
+            s.reg_file[b].wdata[p] @= DataType()
+            s.reg_file[b].wen[p] @= b1(0)
 
       else:
         for i in range(num_xbar_in_wr_ports):
@@ -180,55 +563,116 @@ class DataMemWithCrossbarRTL(Component):
           s.recv_wdata_bypass_q[i].recv.msg @= s.recv_wdata[i].msg
 
         for i in range(num_xbar_in_rd_ports):
-          s.read_crossbar.recv[i].val @= s.recv_raddr[i].val
+          s.read_crossbar.recv[i].val @= s.recv_raddr[i].val & ~s.mshr_port_pending[i] & \
+                                         ~s.rd_follower[i] & ~s.rd_port_busy[i]
           s.read_crossbar.recv[i].msg @= s.rd_pkt[i]
-          s.recv_raddr[i].rdy @= s.read_crossbar.recv[i].rdy
+          s.recv_raddr[i].rdy @= (s.read_crossbar.recv[i].rdy & ~s.mshr_port_pending[i] &
+                                  ~s.rd_follower[i] & ~s.rd_port_busy[i]) | s.rd_combined[i]
   
         for i in range(num_xbar_in_wr_ports):
-          s.write_crossbar.recv[i].val @= s.recv_waddr[i].val
+          s.write_crossbar.recv[i].val @= s.recv_waddr[i].val & ~s.wr_buffered[i]
           s.write_crossbar.recv[i].msg @= s.wr_pkt[i]
-          s.recv_waddr[i].rdy @= s.write_crossbar.recv[i].rdy
+          s.recv_waddr[i].rdy @= s.write_crossbar.recv[i].rdy & ~s.wr_buffered[i]
+          # The store is accepted once its data arrives as well.
+          if buffered_store:
+            for b in range(num_banks):
+              if s.wr_buffered[i] & \
+                 (s.wr_pkt[i].dst == XbarOutWrType(b * wr_ports_per_bank + i % wr_ports_per_bank)):
+                s.sb_recv_val[b][i] @= s.recv_waddr[i].val & \
+                                       s.recv_wdata_bypass_q[i].send.val
+                s.recv_waddr[i].rdy @= s.sb_recv_rdy[b][i] & \
+                                       s.recv_wdata_bypass_q[i].send.val
 
         # Connects the read ports towards SRAM and NoC from the xbar.
         for b in range(num_banks):
-          s.read_crossbar.send[b].rdy @= 1
-          s.reg_file[b].raddr[0] @= trunc(s.read_crossbar.send[b].msg.addr % data_mem_size_per_bank, PerBankAddrType)
+          for p in range(rd_ports_per_bank):
+            s.read_crossbar.send[b * rd_ports_per_bank + p].rdy @= 1
+            s.bank_raddr[b * rd_ports_per_bank + p] @= \
+                trunc((((s.read_crossbar.send[b * rd_ports_per_bank + p].msg.addr >> hi_shift) & hi_mask) << lo_nbits) |
+                      (s.read_crossbar.send[b * rd_ports_per_bank + p].msg.addr & lo_mask), PerBankAddrType)
 
         for i in range(num_xbar_in_rd_ports):
           if (s.read_crossbar.send[s.read_crossbar.packet_on_input_units[i].dst].msg.src == i) & \
-             (s.read_crossbar.packet_on_input_units[i].dst < num_banks):
-            if i <= s.num_rd_tiles:
-              s.send_rdata[RdTileIdType(i)].msg @= s.reg_file[trunc(s.read_crossbar.packet_on_input_units[i].dst, LocalBankIndexType)].rdata[0]
-              s.send_rdata[RdTileIdType(i)].val @= s.read_crossbar.send[s.read_crossbar.packet_on_input_units[i].dst].val
-            # TODO: Check the translated Verilog to make sure the loop is flattened correctly with special out (NocPktType) towards NoC.
-            else:
-              s.send_to_noc_load_response_pkt.msg @= \
-                  NocPktType(
-                      0, 0, 0, 0, 0, 0, 0, 0, CMD_LOAD_RESPONSE,
-                      s.read_crossbar.send[s.read_crossbar.packet_on_input_units[i].dst].msg.addr,
-                      s.reg_file[trunc(s.read_crossbar.packet_on_input_units[i].dst, LocalBankIndexType)].rdata[0].payload,
-                      s.reg_file[trunc(s.read_crossbar.packet_on_input_units[i].dst, LocalBankIndexType)].rdata[0].predicate,
-                      0
-                  )
-              s.send_to_noc_load_response_pkt.val @= \
-                  s.read_crossbar.send[s.read_crossbar.packet_on_input_units[i].dst].val
+             (s.read_crossbar.packet_on_input_units[i].dst < num_rd_bank_ports):
+            # The pipelined read data is routed back by the tag pipeline below.
+            if combinational_read:
+              if i < s.num_rd_tiles:
+                s.send_rdata[RdTileIdType(i)].msg @= s.bank_rdata[trunc(s.read_crossbar.packet_on_input_units[i].dst, RdBankPortType)]
+                s.send_rdata[RdTileIdType(i)].val @= s.read_crossbar.send[s.read_crossbar.packet_on_input_units[i].dst].val
+              # TODO: Check the translated Verilog to make sure the loop is flattened correctly with special out (NocPktType) towards NoC.
+              else:
+                s.send_to_noc_load_response_pkt.msg @= \
+                    NocPktType(
+                        0, 0, 0, 0, 0, 0, 0, 0, CMD_LOAD_RESPONSE,
+                        # The address as requested, see `double_buffered`.
+                        s.read_crossbar.send[s.read_crossbar.packet_on_input_units[i].dst].msg.addr ^
+                        s.noc_buffer_flip,
+                        s.bank_rdata[trunc(s.read_crossbar.packet_on_input_units[i].dst, RdBankPortType)].payload,
+                        s.bank_rdata[trunc(s.read_crossbar.packet_on_input_units[i].dst, RdBankPortType)].predicate,
+                        0
+                    )
+                s.send_to_noc_load_response_pkt.val @= \
+                    s.read_crossbar.send[s.read_crossbar.packet_on_input_units[i].dst].val
 
           # Handles the case the load requests going through the NoC towards remote SRAMs.
           elif (s.read_crossbar.send[s.read_crossbar.packet_on_input_units[i].dst].msg.src == i) & \
-               (s.read_crossbar.packet_on_input_units[i].dst >= num_banks):
+               (s.read_crossbar.packet_on_input_units[i].dst >= num_rd_bank_ports):
             # Request from NoC would never target a remote access, i.e., as long
             # as the request can come from the NoC, it meant to access this local
             # SRAM, which should be guarded by the controller and NoC routers.
             # assert(i < num_banks)
-            s.send_rdata[RdTileIdType(i)].msg @= s.recv_from_noc_rdata.msg
-            # TODO: https://github.com/tancheng/VectorCGRA/issues/26 -- Modify this part for non-blocking access.
-            s.send_rdata[RdTileIdType(i)].val @= \
-                s.read_crossbar.send[s.read_crossbar.packet_on_input_units[i].dst].val & \
-                s.recv_from_noc_rdata.val
-                # FIXME: The msg would come back one by one in order, so no
-                # need to check the src_tile, which can be improved.
-                # s.recv_from_noc_rdata.en & \
-                # (s.recv_from_noc_rdata.msg.src_tile == i)
+            # The non-blocking responses are delivered via the MSHR below.
+            if blocking_load:
+              s.send_rdata[RdTileIdType(i)].msg @= s.recv_from_noc_rdata.msg
+              s.send_rdata[RdTileIdType(i)].val @= \
+                  s.read_crossbar.send[s.read_crossbar.packet_on_input_units[i].dst].val & \
+                  s.recv_from_noc_rdata.val
+                  # FIXME: The msg would come back one by one in order, so no
+                  # need to check the src_tile, which can be improved.
+                  # s.recv_from_noc_rdata.en & \
+                  # (s.recv_from_noc_rdata.msg.src_tile == i)
+
+        # Multicasts the data of a bank access to the combined reads.
+        if combinational_read:
+          for i in range(num_rd_tiles):
+            if s.rd_combined[i]:
+              s.send_rdata[i].msg @= s.bank_rdata[s.rd_combined_port[i]]
+              s.send_rdata[i].val @= 1
+
+        # Sends the pipelined read data arriving in this cycle, or queued
+        # as it was not taken yet.
+        if pipelined_read:
+          for i in range(num_rd_tiles):
+            if s.resp_val[i] | s.arrive_val[i]:
+              s.send_rdata[i].val @= 1
+              if s.resp_val[i]:
+                s.send_rdata[i].msg @= s.resp_data[i]
+              else:
+                s.send_rdata[i].msg @= s.arrive_data[i]
+          s.send_to_noc_load_response_pkt.msg @= \
+              NocPktType(0, 0, 0, 0, 0, 0, 0, 0, CMD_LOAD_RESPONSE,
+                         s.noc_rd_addr,
+                         s.arrive_data[num_rd_tiles].payload,
+                         s.arrive_data[num_rd_tiles].predicate,
+                         0)
+          if s.resp_val[num_rd_tiles]:
+            s.send_to_noc_load_response_pkt.msg.data @= s.resp_data[num_rd_tiles].payload
+            s.send_to_noc_load_response_pkt.msg.predicate @= s.resp_data[num_rd_tiles].predicate
+          s.send_to_noc_load_response_pkt.val @= s.resp_val[num_rd_tiles] | \
+                                                 s.arrive_val[num_rd_tiles]
+
+        # Routes the response of a non-blocking remote load to the tile
+        # port recorded in its MSHR entry, in whatever order they come back.
+        if non_blocking_load:
+          for i in range(num_rd_tiles):
+            if s.recv_from_noc_load_response_pkt.val & \
+               s.mshr_valid[s.mshr_resp_idx] & \
+               (s.mshr_port[s.mshr_resp_idx] == RdTileIdType(i)):
+              s.send_rdata[i].msg @= \
+                  DataType(s.recv_from_noc_load_response_pkt.msg.data,
+                           s.recv_from_noc_load_response_pkt.msg.predicate, 0, 0)
+              s.send_rdata[i].val @= 1
+              s.recv_from_noc_load_response_pkt.rdy @= s.send_rdata[i].rdy
 
 
         # Handles the request (not response) towards the others via the NoC.
@@ -239,40 +683,77 @@ class DataMemWithCrossbarRTL(Component):
                        0, # src_y
                        0, # dst_x
                        0, # dst_y
-                       0, # opaque
+                       zext(s.mshr_free_idx, OpaqueType), # opaque
                        0, # vc_id
                        CMD_LOAD_REQUEST,
-                       s.read_crossbar.send[num_banks].msg.addr,
+                       s.read_crossbar.send[num_rd_bank_ports].msg.addr,
                        0, # data
                        1, # predicate
                        0) # payload
-        # 'send_to_noc_load_pending' avoids sending pending request multiple times.
-        s.send_to_noc_load_request_pkt.val @= s.read_crossbar.send[num_banks].val & \
-                                              s.recv_from_noc_rdata.val
-                                              # ~s.send_to_noc_load_pending
-                                              # s.send_to_noc_load_request_pkt.rdy & \
-        # Outstanding remote read access would block the inport (for read request) of the NoC. 
-        # TODO: https://github.com/tancheng/VectorCGRA/issues/26 -- Modify this part for non-blocking access.
-        # 'val` indicates the data is arbitrated successfully.
-        s.recv_from_noc_rdata.rdy @= s.read_crossbar.send[num_banks].val
-        # Only allows releasing the pending request until the required load data is back,
-        # i.e., though the request already sent out to NoC (the port is still blocked until
-        # response is back).
-        s.read_crossbar.send[num_banks].rdy @= s.recv_from_noc_rdata.val
+        if atomics:
+          if s.read_crossbar.send[num_rd_bank_ports].msg.atomic != AtomicOpType(ATOMIC_NONE):
+            if s.read_crossbar.send[num_rd_bank_ports].msg.atomic == AtomicOpType(ATOMIC_ADD):
+              s.send_to_noc_load_request_pkt.msg.cmd @= CMD_ATOMIC_ADD_REQUEST
+            elif s.read_crossbar.send[num_rd_bank_ports].msg.atomic == AtomicOpType(ATOMIC_MIN):
+              s.send_to_noc_load_request_pkt.msg.cmd @= CMD_ATOMIC_MIN_REQUEST
+            else:
+              s.send_to_noc_load_request_pkt.msg.cmd @= CMD_ATOMIC_MAX_REQUEST
+            s.send_to_noc_load_request_pkt.msg.data @= \
+                s.read_crossbar.send[num_rd_bank_ports].msg.data.payload
+            s.send_to_noc_load_request_pkt.msg.predicate @= \
+                s.read_crossbar.send[num_rd_bank_ports].msg.data.predicate
+        if non_blocking_load:
+          # The request is sent out as long as there is a free MSHR entry,
+          # which releases the crossbar for the following requests.
+          s.send_to_noc_load_request_pkt.val @= s.read_crossbar.send[num_rd_bank_ports].val & \
+                                                s.mshr_free_val
+          s.recv_from_noc_rdata.rdy @= 0
+          s.read_crossbar.send[num_rd_bank_ports].rdy @= s.mshr_free_val & \
+                                                 s.send_to_noc_load_request_pkt.rdy
+        else:
+          # 'send_to_noc_load_pending' avoids sending pending request multiple times.
+          s.send_to_noc_load_request_pkt.val @= s.read_crossbar.send[num_rd_bank_ports].val & \
+                                                s.recv_from_noc_rdata.val
+                                                # ~s.send_to_noc_load_pending
+                                                # s.send_to_noc_load_request_pkt.rdy & \
+          # Outstanding remote read access would block the inport (for read request) of the NoC.
+          # 'val` indicates the data is arbitrated successfully.
+          s.recv_from_noc_rdata.rdy @= s.read_crossbar.send[num_rd_bank_ports].val
+          # Only allows releasing the pending request until the required load data is back,
+          # i.e., though the request already sent out to NoC (the port is still blocked until
+          # response is back).
+          s.read_crossbar.send[num_rd_bank_ports].rdy @= s.recv_from_noc_rdata.val
 
         # Connects the write ports towards SRAM and NoC from the xbar.
         for b in range(num_banks):
-          s.reg_file[b].wen[0] @= b1(0)
-          s.reg_file[b].waddr[0] @= trunc(s.write_crossbar.send[b].msg.addr % data_mem_size_per_bank, PerBankAddrType)
-          s.reg_file[b].wdata[0] @= s.recv_wdata_bypass_q[s.write_crossbar.send[b].msg.src].send.msg
-          s.write_crossbar.send[b].rdy @= 1
-          s.reg_file[b].wen[0] @= s.write_crossbar.send[b].val
+          for p in range(wr_ports_per_bank):
+            s.reg_file[b].wen[p] @= b1(0)
+            s.reg_file[b].waddr[p] @= \
+                trunc((((s.write_crossbar.send[b * wr_ports_per_bank + p].msg.addr >> hi_shift) & hi_mask) << lo_nbits) |
+                      (s.write_crossbar.send[b * wr_ports_per_bank + p].msg.addr & lo_mask), PerBankAddrType)
+            s.reg_file[b].wdata[p] @= s.recv_wdata_bypass_q[s.write_crossbar.send[b * wr_ports_per_bank + p].msg.src].send.msg
+            s.write_crossbar.send[b * wr_ports_per_bank + p].rdy @= ~s.atomic_wen[b]
+            s.reg_file[b].wen[p] @= s.write_crossbar.send[b * wr_ports_per_bank + p].val & \
+                                    ~s.atomic_wen[b]
+          # No local store goes through the crossbar with the store buffer.
+          if buffered_store:
+            s.reg_file[b].waddr[0] @= s.sb_drain_addr[b]
+            s.reg_file[b].wdata[0] @= s.sb_drain_data[b]
+            s.reg_file[b].wen[0] @= s.sb_drain_val[b]
+          if atomics:
+            if s.atomic_wen[b]:
+              s.reg_file[b].waddr[0] @= s.bank_raddr[b]
+              s.reg_file[b].wdata[0] @= s.atomic_wdata[b]
+              s.reg_file[b].wen[0] @= 1
 
         for i in range(num_xbar_in_wr_ports):
           # s.recv_wdata_bypass_q[i].deq_en @= s.recv_wdata_bypass_q[i].deq_rdy & \
           #         s.write_crossbar.send[s.write_crossbar.packet_on_input_units[i].dst].val
           s.recv_wdata_bypass_q[i].send.rdy @= \
-                  s.write_crossbar.send[s.write_crossbar.packet_on_input_units[i].dst].val
+                  s.write_crossbar.send[s.write_crossbar.packet_on_input_units[i].dst].val & \
+                  s.write_crossbar.send[s.write_crossbar.packet_on_input_units[i].dst].rdy
+          if s.wr_buffered[i]:
+            s.recv_wdata_bypass_q[i].send.rdy @= s.recv_waddr[i].val & s.recv_waddr[i].rdy
 
         # Handles the one connecting to the NoC.
         s.send_to_noc_store_pkt.msg @= \
@@ -285,35 +766,296 @@ class DataMemWithCrossbarRTL(Component):
                        0, # opaque
                        0, # vc_id
                        CMD_STORE_REQUEST,
-                       s.write_crossbar.send[num_banks].msg.addr,
-                       s.recv_wdata_bypass_q[s.write_crossbar.send[num_banks].msg.src].send.msg.payload,
-                       s.recv_wdata_bypass_q[s.write_crossbar.send[num_banks].msg.src].send.msg.predicate,
+                       s.write_crossbar.send[num_wr_bank_ports].msg.addr,
+                       s.recv_wdata_bypass_q[s.write_crossbar.send[num_wr_bank_ports].msg.src].send.msg.payload,
+                       s.recv_wdata_bypass_q[s.write_crossbar.send[num_wr_bank_ports].msg.src].send.msg.predicate,
                        0)
-        s.send_to_noc_store_pkt.val @= s.write_crossbar.send[num_banks].val # & s.send_to_noc_store_pkt.rdy
-        s.write_crossbar.send[num_banks].rdy @= s.send_to_noc_store_pkt.rdy
-
-    if preload_data_per_bank != None:
-      # Preloads data.
-      @update_ff
-      def update_init_index_increment():
-        if (s.init_mem_done == b1(0)) & (s.init_mem_addr < data_mem_size_per_bank - 1):
-          s.init_mem_addr <<= s.init_mem_addr + PerBankAddrType(1)
-        else:
-          s.init_mem_done <<= b1(1)
-          s.init_mem_addr <<= PerBankAddrType(0)
+        s.send_to_noc_store_pkt.val @= s.write_crossbar.send[num_wr_bank_ports].val # & s.send_to_noc_store_pkt.rdy
+        s.write_crossbar.send[num_wr_bank_ports].rdy @= s.send_to_noc_store_pkt.rdy
+
+    # The banks hold the preloaded image from the beginning (written by
+    # preload_sim_memories() in simulation, or by $readmemh in Verilog),
+    # so the memory is ready right after the first cycle.
+    @update_ff
+    def update_init_mem_done():
+      s.init_mem_done <<= b1(1)
 
-    else:
-      @update_ff
-      def update_init_index_once():
-          if s.init_mem_done == b1(0):
-            s.init_mem_done <<= b1(1)
-            s.init_mem_addr <<= PerBankAddrType(0)
+    @update_ff
+    def update_buffer_sel():
+      if s.reset:
+        s.buffer_sel <<= 0
+      elif double_buffered:
+        if s.swap_buffer:
+          s.buffer_sel <<= ~s.buffer_sel
 
     # Indicates whether the remote (towards others via NoC) load is pending on response.
     @update_ff
     def update_remote_load_pending():
       s.send_to_noc_load_pending <<= s.recv_from_noc_rdata.val
 
+    @update
+    def update_mshr_status():
+      # Picks the first free entry for the next remote load.
+      s.mshr_free_val @= 0
+      s.mshr_free_idx @= 0
+      for e in range(num_mshr_slots):
+        if ~s.mshr_valid[e] & ~s.mshr_free_val:
+          s.mshr_free_val @= 1
+          s.mshr_free_idx @= MshrIdType(e)
+      s.mshr_resp_idx @= trunc(s.recv_from_noc_load_response_pkt.msg.opaque, MshrIdType)
+      # The request from NoC never targets a remote SRAM.
+      s.mshr_port_pending[num_rd_tiles] @= 0
+      for i in range(num_rd_tiles):
+        s.mshr_port_pending[i] @= 0
+        for e in range(num_mshr_slots):
+          if s.mshr_valid[e] & (s.mshr_port[e] == RdTileIdType(i)):
+            s.mshr_port_pending[i] @= 1
+
+    @update_ff
+    def update_mshr():
+      if s.reset:
+        for e in range(num_mshr_slots):
+          s.mshr_valid[e] <<= 0
+          s.mshr_port[e] <<= 0
+      elif non_blocking_load:
+        for e in range(num_mshr_slots):
+          if s.send_to_noc_load_request_pkt.val & s.send_to_noc_load_request_pkt.rdy & \
+             (s.mshr_free_idx == MshrIdType(e)):
+            s.mshr_valid[e] <<= 1
+            s.mshr_port[e] <<= trunc(s.read_crossbar.send[num_rd_bank_ports].msg.src, RdTileIdType)
+          elif s.recv_from_noc_load_response_pkt.val & s.recv_from_noc_load_response_pkt.rdy & \
+               (s.mshr_resp_idx == MshrIdType(e)):
+            s.mshr_valid[e] <<= 0
+
+    # A tile port follows the lowest other tile port loading the same local
+    # address in this cycle, as long as neither has a request queued in the
+    # crossbar (which keeps the responses of a port in order) nor is an
+    # atomic one.
+    @update
+    def update_rd_follower():
+      for i in range(num_xbar_in_rd_ports):
+        s.rd_follower[i] @= 0
+      if read_combining:
+        for i in range(num_rd_tiles):
+          for j in range(num_rd_tiles):
+            if (j < i) & s.recv_raddr[i].val & s.read_crossbar.recv[i].rdy & ~s.mshr_port_pending[i] & \
+               s.recv_raddr[j].val & s.read_crossbar.recv[j].rdy & ~s.mshr_port_pending[j] & \
+               ~s.rd_port_busy[i] & ~s.rd_port_busy[j] & \
+               (s.recv_raddr[i].msg == s.recv_raddr[j].msg) & \
+               (s.rd_pkt[i].atomic == AtomicOpType(ATOMIC_NONE)) & \
+               (s.rd_pkt[j].atomic == AtomicOpType(ATOMIC_NONE)) & \
+               (s.rd_pkt[i].dst < XbarOutRdType(num_rd_bank_ports)):
+              s.rd_follower[i] @= 1
+
+    # A follower is served once a port of its bank is accessed at the same
+    # address.
+    @update
+    def update_rd_combined():
+      for i in range(num_xbar_in_rd_ports):
+        s.rd_combined[i] @= 0
+        s.rd_combined_port[i] @= 0
+      if read_combining:
+        for i in range(num_rd_tiles):
+          for o in range(num_rd_bank_ports):
+            if s.rd_follower[i] & s.read_crossbar.send[o].val & \
+               (s.read_crossbar.send[o].msg.addr == s.rd_addr[i]):
+              s.rd_combined[i] @= 1
+              s.rd_combined_port[i] @= RdBankPortType(o)
+
+    # The ports to route the data read by each bank port in this cycle to,
+    # i.e., the requesting port and the reads combined with it.
+    @update
+    def update_rd_issue_mask():
+      for o in range(num_rd_bank_ports):
+        s.rd_issue_mask[o] @= 0
+        if s.read_crossbar.send[o].val:
+          s.rd_issue_mask[o][s.read_crossbar.send[o].msg.src] @= 1
+        for i in range(num_rd_tiles):
+          if s.rd_combined[i] & (s.rd_combined_port[i] == RdBankPortType(o)):
+            s.rd_issue_mask[o][i] @= 1
+
+    # The pipelined read data arriving at each port in this cycle.
+    @update
+    def update_rd_arrival():
+      for i in range(num_xbar_in_rd_ports):
+        s.arrive_val[i] @= 0
+        s.arrive_data[i] @= DataType()
+        if pipelined_read:
+          for o in range(num_rd_bank_ports):
+            if s.rd_tag_val[o][num_tag_stages - 1] & \
+               s.rd_tag_mask[o][num_tag_stages - 1][i]:
+              s.arrive_val[i] @= 1
+              s.arrive_data[i] @= s.bank_rdata[o]
+
+    @update
+    def update_resp_taken():
+      for i in range(num_rd_tiles):
+        s.resp_taken[i] @= s.send_rdata[i].val & s.send_rdata[i].rdy
+      s.resp_taken[num_rd_tiles] @= s.send_to_noc_load_response_pkt.val & \
+                                    s.send_to_noc_load_response_pkt.rdy
+
+    # The tags travel alongside the read data in the bank pipeline.
+    @update_ff
+    def update_rd_tags():
+      if s.reset:
+        for o in range(num_rd_bank_ports):
+          for k in range(num_tag_stages):
+            s.rd_tag_val[o][k] <<= 0
+            s.rd_tag_mask[o][k] <<= 0
+            s.rd_fwd_val[o][k] <<= 0
+            s.rd_fwd_data[o][k] <<= DataType()
+      elif pipelined_read:
+        for o in range(num_rd_bank_ports):
+          s.rd_tag_val[o][0] <<= s.read_crossbar.send[o].val
+          s.rd_tag_mask[o][0] <<= s.rd_issue_mask[o]
+          for k in range(1, num_tag_stages):
+            s.rd_tag_val[o][k] <<= s.rd_tag_val[o][k - 1]
+            s.rd_tag_mask[o][k] <<= s.rd_tag_mask[o][k - 1]
+          if buffered_store:
+            s.rd_fwd_val[o][0] <<= s.sb_lookup_hit[o]
+            s.rd_fwd_data[o][0] <<= s.sb_lookup_data[o]
+            for k in range(1, num_tag_stages):
+              s.rd_fwd_val[o][k] <<= s.rd_fwd_val[o][k - 1]
+              s.rd_fwd_data[o][k] <<= s.rd_fwd_data[o][k - 1]
+
+    # A port accepting a pipelined read is blocked until its response is
+    # taken, which is queued if it arrives while not being taken.
+    @update_ff
+    def update_rd_resp():
+      if s.reset:
+        for i in range(num_xbar_in_rd_ports):
+          s.rd_port_busy[i] <<= 0
+          s.resp_val[i] <<= 0
+          s.resp_data[i] <<= DataType()
+      elif pipelined_read:
+        for i in range(num_xbar_in_rd_ports):
+          if s.resp_taken[i]:
+            s.rd_port_busy[i] <<= 0
+          elif s.recv_raddr[i].val & s.recv_raddr[i].rdy:
+            s.rd_port_busy[i] <<= 1
+          if s.arrive_val[i] & ~s.resp_taken[i]:
+            s.resp_val[i] <<= 1
+            s.resp_data[i] <<= s.arrive_data[i]
+          elif s.resp_taken[i]:
+            s.resp_val[i] <<= 0
+        if s.recv_raddr[num_rd_tiles].val & s.recv_raddr[num_rd_tiles].rdy:
+          s.noc_rd_addr <<= s.recv_raddr[num_rd_tiles].msg
+
+    # Counts the requests targeting each bank port in the current cycle,
+    # where the followers do not access the bank, and the ports waiting for
+    # their pipelined reads do not request yet. A bank conflicts if any of
+    # its ports is requested more than once.
+    @update
+    def update_bank_reqs():
+      for b in range(num_banks):
+        s.bank_stalled_reqs[b] @= 0
+        s.bank_combined_reqs[b] @= 0
+        s.bank_conflicted[b] @= 0
+        for p in range(rd_ports_per_bank):
+          s.bank_rd_reqs[b * rd_ports_per_bank + p] @= 0
+          for i in range(num_xbar_in_rd_ports):
+            if s.recv_raddr[i].val & ~s.rd_port_busy[i] & \
+               (s.rd_pkt[i].dst == XbarOutRdType(b * rd_ports_per_bank + p)):
+              if ~s.rd_follower[i]:
+                s.bank_rd_reqs[b * rd_ports_per_bank + p] @= \
+                    s.bank_rd_reqs[b * rd_ports_per_bank + p] + ReqCountType(1)
+              if s.rd_combined[i]:
+                s.bank_combined_reqs[b] @= s.bank_combined_reqs[b] + ReqCountType(1)
+              if ~s.recv_raddr[i].rdy:
+                s.bank_stalled_reqs[b] @= s.bank_stalled_reqs[b] + ReqCountType(1)
+          if s.bank_rd_reqs[b * rd_ports_per_bank + p] > ReqCountType(1):
+            s.bank_conflicted[b] @= 1
+        for p in range(wr_ports_per_bank):
+          s.bank_wr_reqs[b * wr_ports_per_bank + p] @= 0
+          for i in range(num_xbar_in_wr_ports):
+            if s.recv_waddr[i].val & \
+               (s.wr_pkt[i].dst == XbarOutWrType(b * wr_ports_per_bank + p)):
+              s.bank_wr_reqs[b * wr_ports_per_bank + p] @= \
+                  s.bank_wr_reqs[b * wr_ports_per_bank + p] + ReqCountType(1)
+              if ~s.recv_waddr[i].rdy:
+                s.bank_stalled_reqs[b] @= s.bank_stalled_reqs[b] + ReqCountType(1)
+          if s.bank_wr_reqs[b * wr_ports_per_bank + p] > ReqCountType(1):
+            s.bank_conflicted[b] @= 1
+
+    @update_ff
+    def update_bank_stats():
+      if s.reset:
+        for b in range(num_banks):
+          s.bank_conflicts[b] <<= 0
+          s.bank_stalls[b] <<= 0
+          s.bank_reads_saved[b] <<= 0
+          s.bank_writes_combined[b] <<= 0
+      elif s.init_mem_done:
+        for b in range(num_banks):
+          if s.bank_conflicted[b]:
+            s.bank_conflicts[b] <<= s.bank_conflicts[b] + StatType(1)
+          s.bank_stalls[b] <<= s.bank_stalls[b] + zext(s.bank_stalled_reqs[b], StatType)
+          s.bank_reads_saved[b] <<= s.bank_reads_saved[b] + zext(s.bank_combined_reqs[b], StatType)
+          s.bank_writes_combined[b] <<= s.bank_writes_combined[b] + zext(s.sb_combined[b], StatType)
+
+  # Pairs of each bank and its preloaded image, used by
+  # lib/util/mem_image.py to initialize the banks.
+  def mem_images(s):
+    if s._preload_image is None:
+      return []
+    return list(zip(s.reg_file, s._preload_image))
+
+  # Simulation-only backdoor that writes the preloaded image into the
+  # banks, so that the memory is ready for the tiles right away.
+  def backdoor_preload(s):
+    preload_sim_memories(s)
+    # Both the current and the next value of the flip-flops are written,
+    # otherwise the next posedge flips the stale value back.
+    s.init_mem_done @= 1
+    s.init_mem_done <<= 1
+
+  # Simulation-only backdoor that writes `data` at the global `addr`
+  # (within the local banks).
+  def backdoor_write(s, addr, data):
+    assert addr < s.num_banks * s.data_mem_size_per_bank, \
+           f"address {addr} is out of the local banks"
+    bank, offset = interleave_addr(addr, s.interleave_params)
+    s.reg_file[bank].regs[offset] @= data
+    s.reg_file[bank].regs[offset] <<= data
+    if s.store_buffer_entries > 0:
+      s.store_buffer[bank].backdoor_write(offset, data)
+
+  # Simulation-only contents of the local banks as a NumPy array indexed
+  # by the address (see lib/util/mem_image.py), including the pending
+  # stores.
+  def to_array(s):
+    import numpy as np
+    banks = []
+    for b in range(s.num_banks):
+      words = list(s.reg_file[b].regs)
+      if s.store_buffer_entries > 0:
+        for offset, data in s.store_buffer[b].pending():
+          words[offset] = data
+      banks.append(mem_to_array(words))
+    banks = np.stack(banks)
+    bank, offset = interleave_addr(
+        np.arange(s.num_banks * s.data_mem_size_per_bank), s.interleave_params)
+    return banks[bank, offset]
+
+  # Returns the addresses whose data differs from `golden`.
+  def diff_array(s, golden, base = 0, fields = None):
+    return diff_mem(s.to_array(), golden, base, fields)
+
+  # Per-cycle fields recorded by lib/util/sim_trace.py.
+  def trace_fields(s):
+    return {'raddr_val': sum(int(x.val) << i for i, x in enumerate(s.recv_raddr)),
+            'raddr_rdy': sum(int(x.rdy) << i for i, x in enumerate(s.recv_raddr)),
+            'waddr_val': sum(int(x.val) << i for i, x in enumerate(s.recv_waddr)),
+            'waddr_rdy': sum(int(x.rdy) << i for i, x in enumerate(s.recv_waddr)),
+            'rdata_val': sum(int(x.val) << i for i, x in enumerate(s.send_rdata)),
+            'init_mem_done': s.init_mem_done,
+            'buffer_sel': s.buffer_sel,
+            'bank_stalls': sum(int(x) for x in s.bank_stalls),
+            'bank_reads_saved': sum(int(x) for x in s.bank_reads_saved),
+            'bank_writes_combined': sum(int(x) for x in s.bank_writes_combined),
+            'noc_load_pending': s.send_to_noc_load_pending,
+            'mshr_valid': sum(int(x) << e for e, x in enumerate(s.mshr_valid))}
+
   def line_trace(s):
     recv_raddr_str = "recv_from_tile_read_addr: {"
     recv_waddr_str = "recv_from_tile_write_addr: {"
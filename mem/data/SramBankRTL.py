@@ -0,0 +1,77 @@
+"""
+==========================================================================
+SramBankRTL.py
+==========================================================================
+SRAM bank of the data memory, which has `rd_ports` read ports and
+`wr_ports` write ports of the same interface as RegisterFile. The read
+data of an address driven on `raddr[p]` shows up on `rdata[p]` after
+`read_latency` cycles (combinationally if it is 0), and a new read can be
+issued on every port in every cycle, i.e., the bank is pipelined.
+
+The registers are a behavioral model of the SRAM. Given `macro`, the name
+of an SRAM macro module, the bank is black-boxed in the translated
+Verilog (see lib/util/mem_image.py), i.e., its module only instantiates
+`macro`, whose ports are expected to be:
+
+  clk, raddr<p>, rdata<p> (for each read port p),
+  waddr<p>, wdata<p>, wen<p> (for each write port p),
+
+and whose read latency is expected to be `read_latency`. The behavioral
+model is still used in the Python simulation.
+
+Author : agent
+  Date : Oct 18, 2026
+"""
+
+from pymtl3 import *
+
+
+class SramBankRTL(Component):
+
+  def construct(s, DataType, num_entries, rd_ports = 1, wr_ports = 1,
+                read_latency = 0, macro = None):
+
+    # Constant
+    AddrType = mk_bits(max(clog2(num_entries), 1))
+    combinational_read = read_latency == 0
+    pipelined_read = read_latency > 0
+    num_stages = max(read_latency, 1)
+    s.sram_macro = macro
+
+    # Interface
+    s.raddr = [InPort(AddrType) for _ in range(rd_ports)]
+    s.rdata = [OutPort(DataType) for _ in range(rd_ports)]
+    s.waddr = [InPort(AddrType) for _ in range(wr_ports)]
+    s.wdata = [InPort(DataType) for _ in range(wr_ports)]
+    s.wen = [InPort(b1) for _ in range(wr_ports)]
+
+    # Component
+    s.regs = [Wire(DataType) for _ in range(num_entries)]
+    # The read data in flight of each read port.
+    s.rdata_pipe = [[Wire(DataType) for _ in range(num_stages)]
+                    for _ in range(rd_ports)]
+
+    @update
+    def up_read():
+      for p in range(rd_ports):
+        if combinational_read:
+          s.rdata[p] @= s.regs[s.raddr[p]]
+        else:
+          s.rdata[p] @= s.rdata_pipe[p][num_stages - 1]
+
+    @update_ff
+    def up_read_pipe():
+      if pipelined_read:
+        for p in range(rd_ports):
+          s.rdata_pipe[p][0] <<= s.regs[s.raddr[p]]
+          for k in range(1, num_stages):
+            s.rdata_pipe[p][k] <<= s.rdata_pipe[p][k - 1]
+
+    @update_ff
+    def up_write():
+      for p in range(wr_ports):
+        if s.wen[p]:
+          s.regs[s.waddr[p]] <<= s.wdata[p]
+
+  def line_trace(s):
+    return "|".join([str(data) for data in s.regs])
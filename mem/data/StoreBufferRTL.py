@@ -0,0 +1,167 @@
+"""
+==========================================================================
+StoreBufferRTL.py
+==========================================================================
+Store buffer in front of an SRAM bank. It accepts a store from each of
+its `num_inports` ports in the same cycle: a store to the address of a
+pending entry is combined into it (i.e., the later store wins), and the
+others take the free entries, where a port is only stalled once the
+buffer runs out of entries.
+
+An entry is drained into the write port of the bank in the cycles
+without any incoming store (or once the buffer is full), so that the
+repeated stores to the same address (e.g., an accumulator) are combined
+while the stores keep coming. At most one entry is pending for an
+address, which is looked up by the loads of the bank (`lookup_*`) to
+forward its data, as the bank is not updated yet.
+
+Author : agent
+  Date : Oct 18, 2026
+"""
+
+from pymtl3 import *
+
+
+class StoreBufferRTL(Component):
+
+  def construct(s, DataType, AddrType, num_entries = 4, num_inports = 1,
+                num_lookups = 1):
+
+    # Constant
+    EntryIdType = mk_bits(max(clog2(num_entries), 1))
+    CountType = mk_bits(clog2(num_inports + 1))
+
+    # Interface
+    s.recv_val = [InPort(b1) for _ in range(num_inports)]
+    s.recv_addr = [InPort(AddrType) for _ in range(num_inports)]
+    s.recv_data = [InPort(DataType) for _ in range(num_inports)]
+    s.recv_rdy = [OutPort(b1) for _ in range(num_inports)]
+
+    # The entry drained into the bank in this cycle.
+    s.drain_val = OutPort(b1)
+    s.drain_addr = OutPort(AddrType)
+    s.drain_data = OutPort(DataType)
+
+    s.lookup_addr = [InPort(AddrType) for _ in range(num_lookups)]
+    s.lookup_hit = [OutPort(b1) for _ in range(num_lookups)]
+    s.lookup_data = [OutPort(DataType) for _ in range(num_lookups)]
+
+    # The stores combined into pending entries in this cycle.
+    s.num_combined = OutPort(CountType)
+
+    # Component
+    s.valid = [Wire(b1) for _ in range(num_entries)]
+    s.addr = [Wire(AddrType) for _ in range(num_entries)]
+    s.data = [Wire(DataType) for _ in range(num_entries)]
+
+    s.next_valid = [Wire(b1) for _ in range(num_entries)]
+    s.next_addr = [Wire(AddrType) for _ in range(num_entries)]
+    s.next_data = [Wire(DataType) for _ in range(num_entries)]
+
+    s.any_recv = Wire(b1)
+    s.full = Wire(b1)
+    s.drain_idx = Wire(EntryIdType)
+
+    s.hit = [Wire(b1) for _ in range(num_inports)]
+    s.hit_idx = [Wire(EntryIdType) for _ in range(num_inports)]
+    s.free = [Wire(b1) for _ in range(num_inports)]
+    s.free_idx = [Wire(EntryIdType) for _ in range(num_inports)]
+
+    # Drains the first pending entry on idle cycles, or when the buffer
+    # is full, which does not depend on the ready of the inports.
+    @update
+    def update_drain():
+      s.any_recv @= 0
+      for i in range(num_inports):
+        if s.recv_val[i]:
+          s.any_recv @= 1
+      s.full @= 1
+      for e in range(num_entries):
+        if ~s.valid[e]:
+          s.full @= 0
+
+      s.drain_val @= 0
+      s.drain_idx @= 0
+      if ~s.any_recv | s.full:
+        for e in range(num_entries):
+          if s.valid[e] & ~s.drain_val:
+            s.drain_val @= 1
+            s.drain_idx @= EntryIdType(e)
+      s.drain_addr @= s.addr[s.drain_idx]
+      s.drain_data @= s.data[s.drain_idx]
+
+    # Accepts the stores one port after another, each of which is either
+    # combined into the entry of its address (unless being drained) or
+    # takes a free entry, including the ones of the previous ports.
+    @update
+    def update_next():
+      for e in range(num_entries):
+        s.next_valid[e] @= s.valid[e] & ~(s.drain_val & (s.drain_idx == EntryIdType(e)))
+        s.next_addr[e] @= s.addr[e]
+        s.next_data[e] @= s.data[e]
+      s.num_combined @= 0
+
+      for i in range(num_inports):
+        s.hit[i] @= 0
+        s.hit_idx[i] @= 0
+        s.free[i] @= 0
+        s.free_idx[i] @= 0
+        for e in range(num_entries):
+          if s.next_valid[e] & (s.next_addr[e] == s.recv_addr[i]):
+            s.hit[i] @= 1
+            s.hit_idx[i] @= EntryIdType(e)
+          # The entry being drained is not taken until the next cycle.
+          if ~s.valid[e] & ~s.next_valid[e] & ~s.free[i]:
+            s.free[i] @= 1
+            s.free_idx[i] @= EntryIdType(e)
+
+        s.recv_rdy[i] @= s.hit[i] | s.free[i]
+        if s.recv_val[i]:
+          if s.hit[i]:
+            s.next_data[s.hit_idx[i]] @= s.recv_data[i]
+            s.num_combined @= s.num_combined + CountType(1)
+          elif s.free[i]:
+            s.next_valid[s.free_idx[i]] @= 1
+            s.next_addr[s.free_idx[i]] @= s.recv_addr[i]
+            s.next_data[s.free_idx[i]] @= s.recv_data[i]
+
+    @update
+    def update_lookup():
+      for k in range(num_lookups):
+        s.lookup_hit[k] @= 0
+        s.lookup_data[k] @= DataType()
+        for e in range(num_entries):
+          if s.valid[e] & (s.addr[e] == s.lookup_addr[k]):
+            s.lookup_hit[k] @= 1
+            s.lookup_data[k] @= s.data[e]
+
+    @update_ff
+    def update_entries():
+      if s.reset:
+        for e in range(num_entries):
+          s.valid[e] <<= 0
+          s.addr[e] <<= 0
+          s.data[e] <<= DataType()
+      else:
+        for e in range(num_entries):
+          s.valid[e] <<= s.next_valid[e]
+          s.addr[e] <<= s.next_addr[e]
+          s.data[e] <<= s.next_data[e]
+
+  # Simulation-only pending stores as pairs of (address, data).
+  def pending(s):
+    return [(int(s.addr[e]), s.data[e]) for e in range(len(s.valid))
+            if s.valid[e]]
+
+  # Simulation-only backdoor that overwrites the data of the entry
+  # pending at `addr` (if any), which would be drained over a backdoor
+  # write to the bank otherwise.
+  def backdoor_write(s, addr, data):
+    for e in range(len(s.valid)):
+      if s.valid[e] and int(s.addr[e]) == addr:
+        s.data[e] @= data
+        s.data[e] <<= data
+
+  def line_trace(s):
+    return "|".join([f"{int(s.addr[e])}:{s.data[e]}" if s.valid[e] else "-"
+                     for e in range(len(s.valid))])
@@ -81,3 +81,14 @@ def test_const_queue():
                    read_data, write_addr, write_data, preloadData)
   run_sim(th)
 
+
+  # The whole SRAM is checked against the golden data at once.
+  golden = [DataType(i, 1) for i in range(100)]
+  golden[12] = DataType(33, 1)
+  golden[23] = DataType(44, 1)
+  assert len(th.dataMem.diff_array(golden)) == 0
+  golden[50] = DataType(50, 0)
+  assert list(th.dataMem.diff_array(golden)) == [50]
+  # Only the payloads are compared against a plain array.
+  assert list(th.dataMem.diff_array([int(x.payload) for x in golden])) == []
+  assert list(th.dataMem.to_array()['payload'][10:14]) == [10, 11, 33, 13]
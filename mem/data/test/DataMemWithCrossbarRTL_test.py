@@ -8,16 +8,18 @@ Author : Cheng Tan
   Date : Dec 6, 2024
 """
 
+import pytest
 from pymtl3 import *
 from pymtl3.passes.backends.verilog import (VerilogTranslationPass,
                                             VerilogVerilatorImportPass)
-from pymtl3.stdlib.test_utils import config_model_with_cmdline_opts
-from ..DataMemWithCrossbarRTL import DataMemWithCrossbarRTL
+from ..DataMemWithCrossbarRTL import *
 from ....lib.basic.val_rdy.SourceRTL import SourceRTL as TestSrcRTL
 from ....lib.basic.val_rdy.SinkRTL import SinkRTL as TestSinkRTL
 from ....lib.cmd_type import *
 from ....lib.messages import *
 from ....lib.opt_type import *
+from ....lib.util.build_cache import config_model_with_cmdline_opts
+from ....lib.util.mem_image import preload_sim_memories, write_hex_image
 
 #-------------------------------------------------------------------------
 # Test harness
@@ -31,12 +33,21 @@ class TestHarness(Component):
                 # noc_send_read_addr, noc_recv_read_data,
                 # noc_send_write_addr, noc_send_write_data,
                 noc_recv_load_data, send_to_noc_load_request_pkt,
-                send_to_noc_store_pkt, preload_data_per_bank):
+                send_to_noc_store_pkt, preload_data_per_bank,
+                interleave = "high_order", interleave_block_size = 1,
+                num_mshr_entries = 0, noc_recv_load_response_pkts = [],
+                read_initial_delays = None, read_combining = False,
+                rd_ports_per_bank = 1, read_latency = 0,
+                store_buffer_entries = 0, read_atomics = None,
+                atomics = False):
+
+    if read_initial_delays == None:
+      read_initial_delays = [0 for _ in range(rd_tiles)]
 
     s.num_banks = num_banks
     s.rd_tiles = rd_tiles
     s.wr_tiles = wr_tiles
-    s.recv_raddr = [TestSrcRTL(AddrType, read_addr[i])
+    s.recv_raddr = [TestSrcRTL(AddrType, read_addr[i], read_initial_delays[i])
                     for i in range(rd_tiles)]
     s.send_rdata = [TestSinkRTL(DataType, read_data[i])
                     for i in range(rd_tiles)]
@@ -47,6 +58,10 @@ class TestHarness(Component):
                     for i in range(wr_tiles)]
 
     s.recv_from_noc_rdata = TestSrcRTL(DataType, noc_recv_load_data)
+    # The responses are sent once the requests are out.
+    s.recv_from_noc_load_response_pkt = TestSrcRTL(NocPktType,
+                                                   noc_recv_load_response_pkts,
+                                                   8)
 
     s.send_to_noc_load_request_pkt = TestSinkRTL(NocPktType, send_to_noc_load_request_pkt)
     s.send_to_noc_store_pkt = TestSinkRTL(NocPktType, send_to_noc_store_pkt)
@@ -55,7 +70,19 @@ class TestHarness(Component):
                                         data_mem_size_global,
                                         data_mem_size_per_bank,
                                         num_banks, rd_tiles, wr_tiles,
-                                        preload_data_per_bank)
+                                        preload_data_per_bank,
+                                        interleave, interleave_block_size,
+                                        num_mshr_entries, read_combining,
+                                        rd_ports_per_bank,
+                                        read_latency = read_latency,
+                                        store_buffer_entries = store_buffer_entries,
+                                        atomics = atomics)
+
+    # Each tile port tags all its reads with the atomic (op, operand).
+    if read_atomics is not None:
+      for i in range(rd_tiles):
+        s.data_mem.recv_atomic_op[i] //= read_atomics[i][0]
+        s.data_mem.recv_atomic_data[i] //= read_atomics[i][1]
 
     for i in range(rd_tiles):
       s.data_mem.recv_raddr[i] //= s.recv_raddr[i].send
@@ -68,6 +95,7 @@ class TestHarness(Component):
     s.data_mem.recv_from_noc_rdata //= s.recv_from_noc_rdata.send
     s.data_mem.send_to_noc_load_request_pkt //= s.send_to_noc_load_request_pkt.recv
     s.data_mem.send_to_noc_store_pkt //= s.send_to_noc_store_pkt.recv
+    s.data_mem.recv_from_noc_load_response_pkt //= s.recv_from_noc_load_response_pkt.send
 
   def done(s):
     for i in range(s.rd_tiles):
@@ -80,7 +108,8 @@ class TestHarness(Component):
 
     if not s.send_to_noc_load_request_pkt.done() or \
        not s.send_to_noc_store_pkt.done() or \
-       not s.recv_from_noc_rdata.done():
+       not s.recv_from_noc_rdata.done() or \
+       not s.recv_from_noc_load_response_pkt.done():
       return False
 
     return True
@@ -91,6 +120,7 @@ class TestHarness(Component):
 def run_sim(test_harness, max_cycles = 40):
   test_harness.apply(DefaultPassGroup())
   test_harness.sim_reset()
+  preload_sim_memories(test_harness)
 
   # Run simulation
 
@@ -199,3 +229,478 @@ def test_const_queue(cmdline_opts):
 
   run_sim(th)
 
+
+@pytest.mark.parametrize('interleave', INTERLEAVE_SCHEMES)
+def test_interleave(cmdline_opts, interleave):
+  data_nbits = 16
+  predicate_nbits = 1
+  DataType = mk_data(data_nbits, predicate_nbits)
+  data_mem_size_global = 64
+  data_mem_size_per_bank = 16
+  num_banks = 2
+  nterminals = 4
+  addr_nbits = clog2(data_mem_size_global)
+  AddrType = mk_bits(addr_nbits)
+
+  NocPktType = \
+      mk_multi_cgra_noc_pkt(nterminals, 1,
+                            addr_nbits = addr_nbits,
+                            data_nbits = data_nbits,
+                            predicate_nbits = predicate_nbits)
+
+  # The preloaded data is indexed by the (high-order) address, i.e.,
+  # data 0x100 + addr is at addr whatever the interleaving is.
+  preload_data_per_bank = [[DataType(0x100 + j * data_mem_size_per_bank + i, 1)
+                            for i in range(data_mem_size_per_bank)]
+                           for j in range(num_banks)]
+
+  rd_tiles = 2
+  wr_tiles = 2
+  # Two tiles streaming through the same array, one element apart.
+  read_addr = [
+               [AddrType(0), AddrType(1), AddrType(2), AddrType(3)],
+               [AddrType(1), AddrType(2), AddrType(3), AddrType(4)]
+              ]
+  read_data = [[DataType(0x100 + int(addr), 1) for addr in read_addr[i]]
+               for i in range(rd_tiles)]
+  write_addr = [[AddrType(20)], []]
+  write_data = [[DataType(0xd020, 1)], []]
+
+  th = TestHarness(NocPktType, DataType, AddrType, data_mem_size_global,
+                   data_mem_size_per_bank, num_banks, rd_tiles, wr_tiles,
+                   read_addr, read_data, write_addr, write_data,
+                   [], [], [], preload_data_per_bank,
+                   interleave, 4)
+
+  th.elaborate()
+  th.data_mem.set_metadata(VerilogTranslationPass.explicit_module_name,
+                           f'DataMemWithCrossbarRTL_{interleave}_translation')
+  th = config_model_with_cmdline_opts( th, cmdline_opts, duts=['data_mem'] )
+
+  run_sim(th)
+
+  conflicts = sum(int(x) for x in th.data_mem.bank_conflicts)
+  stalls = sum(int(x) for x in th.data_mem.bank_stalls)
+  if interleave == "high_order":
+    # Both streams target bank 0.
+    assert conflicts > 0
+    assert stalls > 0
+  elif interleave == "low_order":
+    # The streams alternate between the two banks in lock step.
+    assert conflicts == 0
+    assert stalls == 0
+
+  # The store lands where the interleaving maps its address.
+  if not (cmdline_opts['test_verilog'] or cmdline_opts['test_yosys_verilog']):
+    bank, offset = interleave_addr(20, th.data_mem.interleave_params)
+    assert th.data_mem.reg_file[bank].regs[offset] == DataType(0xd020, 1)
+
+def test_non_blocking_remote_load(cmdline_opts):
+  data_nbits = 16
+  predicate_nbits = 1
+  DataType = mk_data(data_nbits, predicate_nbits)
+  data_mem_size_global = 64
+  data_mem_size_per_bank = 16
+  num_banks = 2
+  nterminals = 4
+  addr_nbits = clog2(data_mem_size_global)
+  AddrType = mk_bits(addr_nbits)
+
+  NocPktType = \
+      mk_multi_cgra_noc_pkt(nterminals, 1,
+                            addr_nbits = addr_nbits,
+                            data_nbits = data_nbits,
+                            predicate_nbits = predicate_nbits)
+
+  rd_tiles = 2
+  wr_tiles = 2
+  # Tile 1 requests after tile 0, so that MSHR entry 0 is for address 40
+  # and entry 1 is for address 50. Tile 0 only proceeds to its local load
+  # once its remote load is back.
+  read_addr = [[AddrType(40), AddrType(0)], [AddrType(50)]]
+  read_data = [[DataType(0x40, 1), DataType(0, 0)], [DataType(0x50, 1)]]
+  read_initial_delays = [0, 2]
+
+  send_to_noc_load_request_pkt = [
+             #   src  dst src_x src_y dst_x dst_y opq vc cmd                addr data predicate
+      NocPktType(0,   0,  0,    0,    0,    0,    0,  0, CMD_LOAD_REQUEST,  40,  0,   1),
+      NocPktType(0,   0,  0,    0,    0,    0,    1,  0, CMD_LOAD_REQUEST,  50,  0,   1),
+  ]
+  # The responses come back out of order.
+  noc_recv_load_response_pkts = [
+             #   src  dst src_x src_y dst_x dst_y opq vc cmd                addr data  predicate
+      NocPktType(0,   0,  0,    0,    0,    0,    1,  0, CMD_LOAD_RESPONSE, 50,  0x50, 1),
+      NocPktType(0,   0,  0,    0,    0,    0,    0,  0, CMD_LOAD_RESPONSE, 40,  0x40, 1),
+  ]
+
+  th = TestHarness(NocPktType, DataType, AddrType, data_mem_size_global,
+                   data_mem_size_per_bank, num_banks, rd_tiles, wr_tiles,
+                   read_addr, read_data, [[], []], [[], []],
+                   [], send_to_noc_load_request_pkt, [], None,
+                   num_mshr_entries = 2,
+                   noc_recv_load_response_pkts = noc_recv_load_response_pkts,
+                   read_initial_delays = read_initial_delays)
+
+  th.elaborate()
+  th.data_mem.set_metadata(VerilogTranslationPass.explicit_module_name,
+                           f'DataMemWithCrossbarRTL_mshr_translation')
+  th = config_model_with_cmdline_opts( th, cmdline_opts, duts=['data_mem'] )
+
+  run_sim(th)
+
+@pytest.mark.parametrize('image', ['numpy', 'hex', 'bin'])
+def test_preload_image(cmdline_opts, tmp_path, monkeypatch, image):
+  import numpy as np
+  data_nbits = 16
+  predicate_nbits = 1
+  DataType = mk_data(data_nbits, predicate_nbits)
+  data_mem_size_global = 64
+  data_mem_size_per_bank = 16
+  num_banks = 2
+  nterminals = 4
+  addr_nbits = clog2(data_mem_size_global)
+  AddrType = mk_bits(addr_nbits)
+
+  NocPktType = \
+      mk_multi_cgra_noc_pkt(nterminals, 1,
+                            addr_nbits = addr_nbits,
+                            data_nbits = data_nbits,
+                            predicate_nbits = predicate_nbits)
+
+  # The image of the whole local memory, i.e., data 0x300 + addr at addr.
+  payloads = np.arange(num_banks * data_mem_size_per_bank, dtype = np.uint16) + 0x300
+  if image == 'numpy':
+    preload_data = payloads
+  elif image == 'hex':
+    preload_data = str(tmp_path / 'image.hex')
+    write_hex_image(preload_data,
+                    [int(DataType(int(x), 1).to_bits()) for x in payloads],
+                    DataType.nbits)
+  else:
+    preload_data = str(tmp_path / 'image.bin')
+    payloads.astype('<u2').tofile(preload_data)
+
+  rd_tiles = 2
+  wr_tiles = 2
+  read_addr = [[AddrType(0), AddrType(17)], [AddrType(31), AddrType(5)]]
+  read_data = [[DataType(0x300 + int(addr), 1) for addr in read_addr[i]]
+               for i in range(rd_tiles)]
+
+  th = TestHarness(NocPktType, DataType, AddrType, data_mem_size_global,
+                   data_mem_size_per_bank, num_banks, rd_tiles, wr_tiles,
+                   read_addr, read_data, [[], []], [[], []],
+                   [], [], [], preload_data, "low_order")
+
+  # The hex files of the banks are written into the working directory.
+  monkeypatch.chdir(tmp_path)
+  th.elaborate()
+  th.data_mem.set_metadata(VerilogTranslationPass.explicit_module_name,
+                           f'DataMemWithCrossbarRTL_{image}_translation')
+  th = config_model_with_cmdline_opts( th, cmdline_opts, duts=['data_mem'] )
+
+  run_sim(th)
+
+@pytest.mark.parametrize('read_latency', [0, 2])
+def test_read_combining(cmdline_opts, read_latency):
+  data_nbits = 16
+  predicate_nbits = 1
+  DataType = mk_data(data_nbits, predicate_nbits)
+  data_mem_size_global = 64
+  data_mem_size_per_bank = 16
+  num_banks = 2
+  nterminals = 4
+  addr_nbits = clog2(data_mem_size_global)
+  AddrType = mk_bits(addr_nbits)
+
+  NocPktType = \
+      mk_multi_cgra_noc_pkt(nterminals, 1,
+                            addr_nbits = addr_nbits,
+                            data_nbits = data_nbits,
+                            predicate_nbits = predicate_nbits)
+
+  preload_data_per_bank = [[DataType(0x100 + j * data_mem_size_per_bank + i, 1)
+                            for i in range(data_mem_size_per_bank)]
+                           for j in range(num_banks)]
+
+  rd_tiles = 3
+  wr_tiles = 3
+  # Tiles 0 and 1 load the same weights in lock step, while tile 2 loads
+  # from the other bank.
+  read_addr = [
+               [AddrType(0), AddrType(1), AddrType(2), AddrType(3)],
+               [AddrType(0), AddrType(1), AddrType(2), AddrType(3)],
+               [AddrType(16), AddrType(17), AddrType(18), AddrType(19)]
+              ]
+  read_data = [[DataType(0x100 + int(addr), 1) for addr in read_addr[i]]
+               for i in range(rd_tiles)]
+
+  th = TestHarness(NocPktType, DataType, AddrType, data_mem_size_global,
+                   data_mem_size_per_bank, num_banks, rd_tiles, wr_tiles,
+                   read_addr, read_data, [[], [], []], [[], [], []],
+                   [], [], [], preload_data_per_bank,
+                   read_combining = True, read_latency = read_latency)
+
+  th.elaborate()
+  th.data_mem.set_metadata(VerilogTranslationPass.explicit_module_name,
+                           f'DataMemWithCrossbarRTL_combining_{read_latency}_translation')
+  th = config_model_with_cmdline_opts( th, cmdline_opts, duts=['data_mem'] )
+
+  run_sim(th)
+
+  # Each load of tile 1 is served by the bank access of tile 0.
+  assert [int(x) for x in th.data_mem.bank_reads_saved] == [4, 0]
+  assert sum(int(x) for x in th.data_mem.bank_conflicts) == 0
+  assert sum(int(x) for x in th.data_mem.bank_stalls) == 0
+
+@pytest.mark.parametrize('rd_ports_per_bank, read_latency',
+                         [(1, 0), (2, 0), (1, 1), (2, 2)])
+def test_sram_bank_ports(cmdline_opts, rd_ports_per_bank, read_latency):
+  data_nbits = 16
+  predicate_nbits = 1
+  DataType = mk_data(data_nbits, predicate_nbits)
+  data_mem_size_global = 64
+  data_mem_size_per_bank = 16
+  num_banks = 2
+  nterminals = 4
+  addr_nbits = clog2(data_mem_size_global)
+  AddrType = mk_bits(addr_nbits)
+
+  NocPktType = \
+      mk_multi_cgra_noc_pkt(nterminals, 1,
+                            addr_nbits = addr_nbits,
+                            data_nbits = data_nbits,
+                            predicate_nbits = predicate_nbits)
+
+  preload_data_per_bank = [[DataType(0x100 + j * data_mem_size_per_bank + i, 1)
+                            for i in range(data_mem_size_per_bank)]
+                           for j in range(num_banks)]
+
+  rd_tiles = 2
+  wr_tiles = 2
+  # Both tiles keep loading from bank 0.
+  read_addr = [
+               [AddrType(0), AddrType(1), AddrType(2), AddrType(3)],
+               [AddrType(4), AddrType(5), AddrType(6), AddrType(7)]
+              ]
+  read_data = [[DataType(0x100 + int(addr), 1) for addr in read_addr[i]]
+               for i in range(rd_tiles)]
+
+  th = TestHarness(NocPktType, DataType, AddrType, data_mem_size_global,
+                   data_mem_size_per_bank, num_banks, rd_tiles, wr_tiles,
+                   read_addr, read_data, [[], []], [[], []],
+                   [], [], [], preload_data_per_bank,
+                   rd_ports_per_bank = rd_ports_per_bank,
+                   read_latency = read_latency)
+
+  th.elaborate()
+  th.data_mem.set_metadata(VerilogTranslationPass.explicit_module_name,
+                           f'DataMemWithCrossbarRTL_{rd_ports_per_bank}r_{read_latency}_translation')
+  th = config_model_with_cmdline_opts( th, cmdline_opts, duts=['data_mem'] )
+
+  run_sim(th)
+
+  # The tiles are served by different ports of a dual-ported bank.
+  if rd_ports_per_bank == 2:
+    assert sum(int(x) for x in th.data_mem.bank_conflicts) == 0
+  else:
+    assert int(th.data_mem.bank_conflicts[0]) > 0
+
+@pytest.mark.parametrize('store_buffer_entries, read_latency',
+                         [(0, 0), (4, 0), (4, 2)])
+def test_store_buffer(cmdline_opts, store_buffer_entries, read_latency):
+  data_nbits = 16
+  predicate_nbits = 1
+  DataType = mk_data(data_nbits, predicate_nbits)
+  data_mem_size_global = 64
+  data_mem_size_per_bank = 16
+  num_banks = 2
+  nterminals = 4
+  addr_nbits = clog2(data_mem_size_global)
+  AddrType = mk_bits(addr_nbits)
+
+  NocPktType = \
+      mk_multi_cgra_noc_pkt(nterminals, 1,
+                            addr_nbits = addr_nbits,
+                            data_nbits = data_nbits,
+                            predicate_nbits = predicate_nbits)
+
+  preload_data_per_bank = [[DataType(0x100 + j * data_mem_size_per_bank + i, 1)
+                            for i in range(data_mem_size_per_bank)]
+                           for j in range(num_banks)]
+
+  rd_tiles = 2
+  wr_tiles = 2
+  # Both tiles keep updating their accumulators in bank 0, which are
+  # loaded back afterwards, i.e., right after the last stores given the
+  # store buffer, which forwards the pending ones.
+  write_addr = [[AddrType(2)] * 4, [AddrType(3)] * 4]
+  write_data = [[DataType(0x10 + i, 1) for i in range(4)],
+                [DataType(0x20 + i, 1) for i in range(4)]]
+  read_addr = [[AddrType(2), AddrType(3), AddrType(2), AddrType(3)], []]
+  read_data = [[DataType(0x13, 1), DataType(0x23, 1),
+                DataType(0x13, 1), DataType(0x23, 1)], []]
+
+  read_initial_delays = [4 if store_buffer_entries > 0 else 10, 0]
+
+  th = TestHarness(NocPktType, DataType, AddrType, data_mem_size_global,
+                   data_mem_size_per_bank, num_banks, rd_tiles, wr_tiles,
+                   read_addr, read_data, write_addr, write_data,
+                   [], [], [], preload_data_per_bank,
+                   read_initial_delays = read_initial_delays,
+                   read_latency = read_latency,
+                   store_buffer_entries = store_buffer_entries)
+
+  th.elaborate()
+  th.data_mem.set_metadata(VerilogTranslationPass.explicit_module_name,
+                           f'DataMemWithCrossbarRTL_sb{store_buffer_entries}_{read_latency}_translation')
+  th = config_model_with_cmdline_opts( th, cmdline_opts, duts=['data_mem'] )
+
+  run_sim(th)
+
+  assert list(th.data_mem.diff_array([0x13, 0x23], base = 2)) == []
+  # The stores of both tiles are accepted in the same cycle, and the
+  # later ones to an address are combined into its pending store.
+  if store_buffer_entries > 0:
+    assert sum(int(x) for x in th.data_mem.bank_stalls) == 0
+    assert int(th.data_mem.bank_writes_combined[0]) == 6
+  else:
+    assert int(th.data_mem.bank_stalls[0]) > 0
+
+def test_atomics(cmdline_opts):
+  data_nbits = 16
+  predicate_nbits = 1
+  DataType = mk_data(data_nbits, predicate_nbits)
+  data_mem_size_global = 64
+  data_mem_size_per_bank = 16
+  num_banks = 2
+  nterminals = 4
+  addr_nbits = clog2(data_mem_size_global)
+  AddrType = mk_bits(addr_nbits)
+
+  NocPktType = \
+      mk_multi_cgra_noc_pkt(nterminals, 1,
+                            addr_nbits = addr_nbits,
+                            data_nbits = data_nbits,
+                            predicate_nbits = predicate_nbits)
+
+  preload_data_per_bank = [[DataType(0x100 + j * data_mem_size_per_bank + i, 1)
+                            for i in range(data_mem_size_per_bank)]
+                           for j in range(num_banks)]
+
+  rd_tiles = 2
+  wr_tiles = 2
+  # Tile 0 keeps incrementing a counter (and a remote one), while tile 1
+  # keeps updating a maximum in the same bank, and tile 1 stores to the
+  # counter's bank in the meantime.
+  read_atomics = [(ATOMIC_ADD, DataType(1, 1)), (ATOMIC_MAX, DataType(0x200, 1))]
+  read_addr = [[AddrType(2)] * 4 + [AddrType(40)], [AddrType(3)] * 3]
+  read_data = [[DataType(0x102 + i, 1) for i in range(4)] + [DataType(0x77, 1)],
+               [DataType(0x103, 1), DataType(0x200, 1), DataType(0x200, 1)]]
+  write_addr = [[], [AddrType(4), AddrType(5)]]
+  write_data = [[], [DataType(0x44, 1), DataType(0x55, 1)]]
+
+  noc_recv_load_data = [DataType(0x77, 1)]
+  send_to_noc_load_request_pkt = [
+      # src dst src_x src_y dst_x dst_y opq vc cmd                     addr data pred
+      NocPktType(0,   0,  0,    0,    0,    0,    0,  0, CMD_ATOMIC_ADD_REQUEST, 40,  1,   1),
+  ]
+
+  th = TestHarness(NocPktType, DataType, AddrType, data_mem_size_global,
+                   data_mem_size_per_bank, num_banks, rd_tiles, wr_tiles,
+                   read_addr, read_data, write_addr, write_data,
+                   noc_recv_load_data, send_to_noc_load_request_pkt, [],
+                   preload_data_per_bank, read_atomics = read_atomics,
+                   atomics = True)
+
+  th.elaborate()
+  th.data_mem.set_metadata(VerilogTranslationPass.explicit_module_name,
+                           'DataMemWithCrossbarRTL_atomics_translation')
+  th = config_model_with_cmdline_opts( th, cmdline_opts, duts=['data_mem'] )
+
+  run_sim(th)
+
+  assert list(th.data_mem.diff_array([0x106, 0x200, 0x44, 0x55], base = 2)) == []
+
+def test_double_buffered():
+  data_nbits = 16
+  predicate_nbits = 1
+  DataType = mk_data(data_nbits, predicate_nbits)
+  data_mem_size_global = 64
+  data_mem_size_per_bank = 16
+  num_banks = 2
+  nterminals = 4
+  addr_nbits = clog2(data_mem_size_global)
+
+  NocPktType = \
+      mk_multi_cgra_noc_pkt(nterminals, 1,
+                            addr_nbits = addr_nbits,
+                            data_nbits = data_nbits,
+                            predicate_nbits = predicate_nbits)
+
+  # Bank 0 is the lower half of the local memory, and bank 1 the upper.
+  preload_data_per_bank = [[DataType(0x100 + j * data_mem_size_per_bank + i, 1)
+                            for i in range(data_mem_size_per_bank)]
+                           for j in range(num_banks)]
+
+  rd_tiles = 2
+  wr_tiles = 2
+  dut = DataMemWithCrossbarRTL(NocPktType, DataType, data_mem_size_global,
+                               data_mem_size_per_bank, num_banks, rd_tiles,
+                               wr_tiles, preload_data_per_bank,
+                               double_buffered = True)
+  dut.elaborate()
+  dut.apply(DefaultPassGroup())
+  dut.sim_reset()
+  dut.backdoor_preload()
+  for i in range(rd_tiles):
+    dut.send_rdata[i].rdy @= 1
+  dut.send_to_noc_load_response_pkt.rdy @= 1
+
+  # Port `rd_tiles` (or `wr_tiles`) is the one of the controller.
+  def load(port, addr):
+    dut.recv_raddr[port].val @= 1
+    dut.recv_raddr[port].msg @= addr
+    dut.sim_eval_combinational()
+    if port < rd_tiles:
+      assert dut.send_rdata[port].val
+      data = int(dut.send_rdata[port].msg.payload)
+    else:
+      assert dut.send_to_noc_load_response_pkt.val
+      assert dut.send_to_noc_load_response_pkt.msg.addr == addr
+      data = int(dut.send_to_noc_load_response_pkt.msg.data)
+    dut.sim_tick()
+    dut.recv_raddr[port].val @= 0
+    return data
+
+  def store(port, addr, data):
+    dut.recv_waddr[port].val @= 1
+    dut.recv_waddr[port].msg @= addr
+    dut.recv_wdata[port].val @= 1
+    dut.recv_wdata[port].msg @= DataType(data, 1)
+    dut.sim_eval_combinational()
+    assert dut.recv_waddr[port].rdy
+    dut.sim_tick()
+    dut.recv_waddr[port].val @= 0
+    dut.recv_wdata[port].val @= 0
+
+  # The tiles compute on the lower half, while the controller fills the
+  # upper one, both of which appear at addresses [0, 16).
+  assert load(0, 3) == 0x103
+  assert load(rd_tiles, 3) == 0x113
+  store(wr_tiles, 5, 0x55)
+  store(1, 6, 0x66)
+  assert load(0, 5) == 0x105
+
+  dut.swap_buffer @= 1
+  dut.sim_tick()
+  dut.swap_buffer @= 0
+  assert dut.buffer_sel == 1
+
+  # The data filled in the last phase is loaded by the tiles, while the
+  # results of the last phase are read out by the controller.
+  assert load(1, 5) == 0x55
+  assert load(rd_tiles, 6) == 0x66
+  assert load(0, 16 + 3) == 0x103
+  # The halves as placed in the banks.
+  assert list(dut.diff_array([0x66], base = 6)) == []
+  assert list(dut.diff_array([0x55], base = 16 + 5)) == []
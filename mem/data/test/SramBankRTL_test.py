@@ -0,0 +1,72 @@
+"""
+==========================================================================
+SramBankRTL_test.py
+==========================================================================
+Test cases for the SRAM bank model.
+
+Author : agent
+  Date : Oct 18, 2026
+"""
+
+import pytest
+from pymtl3 import *
+from pymtl3.passes.backends.verilog import VerilogTranslationPass
+from ..SramBankRTL import SramBankRTL
+from ....lib.messages import *
+from ....lib.util.mem_image import (MemImageTranslationPass,
+                                    SramMacroTranslationPass)
+
+DataType = mk_data(16, 1)
+
+@pytest.mark.parametrize('read_latency', [0, 1, 3])
+def test_read_latency(read_latency):
+  bank = SramBankRTL(DataType, 8, rd_ports = 2, wr_ports = 2,
+                     read_latency = read_latency)
+  bank.elaborate()
+  bank.apply(DefaultPassGroup())
+  bank.sim_reset()
+
+  # Both write ports write in the same cycle.
+  for p in range(2):
+    bank.wen[p] @= 1
+    bank.waddr[p] @= 2 + p
+    bank.wdata[p] @= DataType(0x20 + p, 1)
+  bank.sim_tick()
+  for p in range(2):
+    bank.wen[p] @= 0
+
+  # A new read is issued on both read ports in every cycle.
+  rdata = [[], []]
+  for cycle in range(4 + read_latency):
+    for p in range(2):
+      bank.raddr[p] @= (2 + p + cycle) % 4
+    bank.sim_eval_combinational()
+    for p in range(2):
+      rdata[p].append(int(bank.rdata[p].payload))
+    bank.sim_tick()
+
+  expected = [0x20, 0x21, 0, 0]
+  for p in range(2):
+    assert rdata[p][read_latency : read_latency + 4] == \
+           [expected[(p + cycle) % 4] for cycle in range(4)]
+
+def test_sram_macro(tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+  bank = SramBankRTL(DataType, 8, rd_ports = 1, wr_ports = 1,
+                     read_latency = 1, macro = 'sram_8x17_1r1w')
+  bank.elaborate()
+  bank.set_metadata(VerilogTranslationPass.enable, True)
+  bank.apply(SramMacroTranslationPass())
+  src = open(bank.get_metadata(VerilogTranslationPass.translated_filename)).read()
+  assert "sram_8x17_1r1w macro" in src
+  assert ".rdata0( rdata[0] )" in src
+  assert "regs" not in src
+
+  # The behavioral model is kept unless the macros are black-boxed.
+  bank = SramBankRTL(DataType, 8, macro = 'sram_8x17_1r1w')
+  bank.elaborate()
+  bank.set_metadata(VerilogTranslationPass.enable, True)
+  bank.apply(MemImageTranslationPass())
+  src = open(bank.get_metadata(VerilogTranslationPass.translated_filename)).read()
+  assert "sram_8x17_1r1w macro" not in src
+  assert "regs" in src
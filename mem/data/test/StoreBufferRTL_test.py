@@ -0,0 +1,58 @@
+"""
+==========================================================================
+StoreBufferRTL_test.py
+==========================================================================
+Test cases for the store buffer.
+
+Author : agent
+  Date : Oct 18, 2026
+"""
+
+from pymtl3 import *
+from ..StoreBufferRTL import StoreBufferRTL
+from ....lib.messages import *
+
+DataType = mk_data(16, 1)
+AddrType = mk_bits(4)
+
+def test_write_combining():
+  sb = StoreBufferRTL(DataType, AddrType, num_entries = 2, num_inports = 3,
+                      num_lookups = 1)
+  sb.elaborate()
+  sb.apply(DefaultPassGroup())
+  sb.sim_reset()
+
+  # Issues the stores of {port: (addr, payload)} in one cycle, and
+  # returns the rdy of the ports storing, the drained (addr, payload),
+  # num_combined and the payload forwarded to address 1.
+  def cycle(stores):
+    for i in range(3):
+      sb.recv_val[i] @= 0
+    for i, (addr, payload) in stores.items():
+      sb.recv_val[i] @= 1
+      sb.recv_addr[i] @= addr
+      sb.recv_data[i] @= DataType(payload, 1)
+    sb.lookup_addr[0] @= 1
+    sb.sim_eval_combinational()
+    result = ([int(sb.recv_rdy[i]) for i in stores],
+              (int(sb.drain_addr), int(sb.drain_data.payload))
+              if sb.drain_val else None,
+              int(sb.num_combined),
+              int(sb.lookup_data[0].payload) if sb.lookup_hit[0] else None)
+    sb.sim_tick()
+    return result
+
+  # Ports 0 and 1 store to the same address in the same cycle.
+  assert cycle({0: (1, 10), 1: (1, 11), 2: (2, 12)}) == \
+         ([1, 1, 1], None, 1, None)
+  assert sb.pending() == [(1, DataType(11, 1)), (2, DataType(12, 1))]
+  # The buffer is full, so the first entry is drained, which the stores
+  # (including the one to its address) wait for.
+  assert cycle({0: (1, 13), 1: (3, 14)}) == ([0, 0], (1, 11), 0, 11)
+  assert cycle({0: (1, 13), 1: (3, 14)}) == ([1, 0], None, 0, None)
+  assert cycle({1: (3, 14)}) == ([0], (1, 13), 0, 13)
+  assert cycle({1: (3, 14)}) == ([1], None, 0, None)
+  # The entries are drained on the idle cycles.
+  assert cycle({}) == ([], (3, 14), 0, None)
+  assert cycle({}) == ([], (2, 12), 0, None)
+  assert sb.pending() == []
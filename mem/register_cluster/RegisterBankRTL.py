@@ -16,6 +16,7 @@ from pymtl3 import *
 from pymtl3.stdlib.primitive import RegisterFile
 from ...lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ...lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
+from ...lib.messages import intern_msg
 from ...lib.opt_type import *
 
 class RegisterBankRTL(Component):
@@ -38,13 +39,15 @@ class RegisterBankRTL(Component):
     s.reg_file = RegisterFile(DataType, num_registers, rd_ports = 1,
                               wr_ports = 1)
 
+    default_data = intern_msg(DataType)
+
     @update
     def access_registers():
       # Initializes signals.
       s.reg_file.raddr[0] @= AddrType()
-      s.send_data_to_fu.msg @= DataType()
+      s.send_data_to_fu.msg @= default_data
       s.reg_file.waddr[0] @= AddrType()
-      s.reg_file.wdata[0] @= DataType()
+      s.reg_file.wdata[0] @= default_data
       s.reg_file.wen[0] @= 0
 
       if s.inport_opt.read_reg_from[reg_bank_id]:
@@ -13,6 +13,7 @@ from pymtl3.stdlib.primitive import RegisterFile
 from .RegisterBankRTL import RegisterBankRTL
 from ...lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ...lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
+from ...lib.messages import intern_msg
 from ...lib.opt_type import *
 from ...lib.util.common import *
 
@@ -42,11 +43,13 @@ class RegisterClusterRTL(Component):
       s.reg_bank[i].inport_valid[PORT_FU_CROSSBAR] //= s.recv_data_from_fu_crossbar[i].val
       s.reg_bank[i].inport_valid[PORT_CONST] //= s.recv_data_from_const[i].val
 
+    default_data = intern_msg(DataType)
+
     @update
     def update_msgs_signals():
       # Initializes signals.
       for i in range(num_reg_banks):
-        s.send_data_to_fu[i].msg @= DataType()
+        s.send_data_to_fu[i].msg @= default_data
         s.recv_data_from_routing_crossbar[i].rdy @= 0
         s.recv_data_from_fu_crossbar[i].rdy @= 0
         s.recv_data_from_const[i].rdy @= 0
@@ -12,6 +12,7 @@ Author : Cheng Tan
 from pymtl3 import *
 from ..lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ..lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
+from ..lib.messages import intern_msg
 from ..lib.opt_type import *
 
 class CrossbarRTL(Component):
@@ -39,6 +40,9 @@ class CrossbarRTL(Component):
     s.recv_required_vector = Wire(num_inports)
     s.send_required_vector = Wire(num_outports)
 
+    default_predicate = intern_msg(PredicateType)
+    default_data = intern_msg(DataType)
+
     # Routing logic
     @update
     def update_signal():
@@ -46,12 +50,12 @@ class CrossbarRTL(Component):
       s.recv_predicate_vector @= 0
       s.send_predicate.val @= 0
       # s.recv_blocked_vector @= 0
-      s.send_predicate.msg @= PredicateType()
+      s.send_predicate.msg @= default_predicate
       for i in range(num_inports):
         s.recv_data[i].rdy @= 0
       for i in range(num_outports):
         s.send_data[i].val @= 0
-        s.send_data[i].msg @= DataType()
+        s.send_data[i].msg @= default_data
 
       # For predication register update. 'predicate' and 'predicate_in' no need
       # to be active at the same time. Specifically, the 'predicate' is for
@@ -15,6 +15,7 @@ Author : Cheng Tan
 from pymtl3 import *
 from ..lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ..lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
+from ..lib.messages import intern_msg
 
 class LinkOrRTL(Component):
 
@@ -25,10 +26,12 @@ class LinkOrRTL(Component):
     s.recv_xbar = RecvIfcRTL(DataType)
     s.send = SendIfcRTL(DataType)
 
+    default_data = intern_msg(DataType)
+
     @update
     def process():
       # Initializes the delivered message.
-      s.send.msg @= DataType()
+      s.send.msg @= default_data
 
       # The messages from two sources (i.e., xbar and FU) won't be valid
       # simultaneously (confliction would be caused if they both are valid),
@@ -69,6 +69,11 @@ class MeshMultiCgraRTL(Component):
       s.cgra[i].recv_from_cpu_ctrl_pkt.val //= 0
       s.cgra[i].recv_from_cpu_ctrl_pkt.msg //= CtrlPktType()
 
+    # The CGRAs are built without perf counters, so there is no response
+    # towards CPU.
+    for i in range(s.num_terminals):
+      s.cgra[i].send_to_cpu_ctrl_pkt.rdy //= 0
+
     # Connects the tiles on the boundary of each two ajacent CGRAs.
     for cgra_row in range(cgra_rows):
       for cgra_col in range(cgra_columns):
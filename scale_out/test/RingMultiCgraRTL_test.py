@@ -9,8 +9,6 @@ Author : Cheng Tan
 """
 
 from pymtl3 import *
-from pymtl3.stdlib.test_utils import (run_sim,
-                                      config_model_with_cmdline_opts)
 from pymtl3.passes.backends.verilog import (VerilogTranslationPass,
                                             VerilogVerilatorImportPass)
 from ..RingMultiCgraRTL import RingMultiCgraRTL
@@ -22,6 +20,8 @@ from ...lib.messages import *
 from ...lib.opt_type import *
 from ...lib.cmd_type import *
 from ...lib.basic.val_rdy.SourceRTL import SourceRTL as TestSrcRTL
+from ...lib.util.build_cache import config_model_with_cmdline_opts
+from ...lib.util.sim_trace import run_sim
 
 #-------------------------------------------------------------------------
 # Test harness
@@ -29,7 +29,7 @@ class CgraSystolicArrayRTL(Component):
                 data_mem_size_per_bank, num_banks_per_cgra,
                 num_registers_per_reg_bank, num_ctrl,
                 total_steps, FunctionUnit, FuList, controller2addr_map,
-                preload_data = None):
+                preload_data = None, mem_read_combining = False):
 
     # Other topology can simply modify the tiles connections, or
     # leverage the template for modeling.
@@ -67,16 +67,16 @@ class CgraSystolicArrayRTL(Component):
                       data_mem_size_global, num_ctrl,
                       total_steps, 4, 2, s.num_mesh_ports,
                       s.num_mesh_ports, num_registers_per_reg_bank,
-                      FuList = FuList,
-                      id = i)
-              for i in range(s.num_tiles)]
+                      FuList = FuList)
+              for _ in range(s.num_tiles)]
     s.data_mem = DataMemWithCrossbarRTL(NocPktType, DataType,
                                         data_mem_size_global,
                                         data_mem_size_per_bank,
                                         num_banks_per_cgra,
                                         # 4 read/write from tiles and 1 read/write from NoC.
                                         4, 4,
-                                        preload_data)
+                                        preload_data,
+                                        read_combining = mem_read_combining)
     idTo2d_map = {0: [0, 0]}
     s.controller = ControllerRTL(ControllerIdType, CmdType, CtrlPktType,
                                  NocPktType, DataType, DataAddrType,
@@ -91,6 +91,7 @@ class CgraSystolicArrayRTL(Component):
     s.data_mem.recv_waddr[4] //= s.controller.send_to_tile_store_request_addr
     s.data_mem.recv_wdata[4] //= s.controller.send_to_tile_store_request_data
     s.data_mem.recv_from_noc_rdata //= s.controller.send_to_tile_load_response_data
+    s.data_mem.recv_from_noc_load_response_pkt //= s.controller.send_to_tile_load_response_pkt
     s.data_mem.send_to_noc_load_request_pkt //= s.controller.recv_from_tile_load_request_pkt
     s.data_mem.send_to_noc_load_response_pkt //= s.controller.recv_from_tile_load_response_pkt
     s.data_mem.send_to_noc_store_pkt //= s.controller.recv_from_tile_store_request_pkt
@@ -110,6 +111,17 @@ class CgraSystolicArrayRTL(Component):
       s.ctrl_ring.recv[i].val //= 0
       s.ctrl_ring.recv[i].msg //= CtrlPktType()
 
+    # The tiles are built without perf counters, so no ctrl packet goes
+    # back to the controller.
+    for i in range(s.num_tiles):
+      s.tile[i].send_ctrl_pkt.rdy //= 0
+    # Nor the hardware loop (i.e., the early exit) is used.
+    for i in range(s.num_tiles):
+      s.tile[i].recv_loop_exit //= 0
+    s.controller.recv_from_ctrl_ring_ctrl_pkt.val //= 0
+    s.controller.recv_from_ctrl_ring_ctrl_pkt.msg //= CtrlPktType()
+    s.controller.send_to_cpu_ctrl_pkt.rdy //= 0
+
     for i in range(s.num_tiles):
 
       if i // width > 0:
@@ -11,8 +11,7 @@ Author : Cheng Tan
 
 from pymtl3 import *
 from pymtl3.passes.backends.verilog import VerilogTranslationPass
-from pymtl3.stdlib.test_utils import (run_sim,
-                                      config_model_with_cmdline_opts)
+from pymtl3.stdlib.test_utils import run_sim
 from ..CgraSystolicArrayRTL import CgraSystolicArrayRTL
 from ...fu.flexible.FlexibleFuRTL import FlexibleFuRTL
 from ...fu.single.AdderRTL import AdderRTL
@@ -29,6 +28,8 @@ from ...lib.basic.val_rdy.SourceRTL import SourceRTL as TestSrcRTL
 from ...lib.cmd_type import *
 from ...lib.messages import *
 from ...lib.opt_type import *
+from ...lib.util.build_cache import config_model_with_cmdline_opts
+from ...lib.util.mem_image import diff_mem, preload_sim_memories
 
 #-------------------------------------------------------------------------
 # Test harness
@@ -48,6 +49,7 @@ class TestHarness(Component):
 
     s.DataType = DataType
     s.num_tiles = width * height
+    s.data_mem_size_per_bank = data_mem_size_per_bank
     s.src_ctrl_pkt = TestSrcRTL(CtrlPktType, src_ctrl_pkt)
     s.expected_out = expected_out
 
@@ -86,11 +88,12 @@ class TestHarness(Component):
 
   # Checks the output parity.
   def check_parity(s):
+    mem = s.dut.data_mem.to_array()
     for i in range(len(s.expected_out)):
-      for j in range(len(s.expected_out[i])):
-        # Outputs are stored in bank 2 and bank 3.
-        if s.dut.data_mem.reg_file[2+i].regs[j] != s.expected_out[i][j]:
-            return False
+      # Outputs are stored in bank 2 and bank 3.
+      if len(diff_mem(mem, s.expected_out[i],
+                      base = (2 + i) * s.data_mem_size_per_bank)) > 0:
+        return False
     return True
 
   def done(s):
@@ -107,6 +110,7 @@ def run_sim(test_harness, enable_verification_pymtl,
   # many signals. For example, the credit-based virtual channel
   # needs to be initialized with number of supported credits.
   test_harness.sim_reset()
+  preload_sim_memories(test_harness)
 
   # Run simulation
   ncycles = 0
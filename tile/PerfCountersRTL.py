@@ -0,0 +1,83 @@
+"""
+=========================================================================
+PerfCountersRTL.py
+=========================================================================
+Performance counters of a tile. Each counter accumulates the cycles its
+event is asserted (see PERF_* in lib/cmd_type.py). A
+CMD_PERF_READ_REQUEST packet (whose data field indicates the counter)
+is answered with a CMD_PERF_READ_RESPONSE packet towards the controller
+(i.e., ring router 0), carrying the counter value in its data field.
+
+Author : agent
+  Date : Oct 18, 2026
+"""
+
+from pymtl3 import *
+from ..lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
+from ..lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
+from ..lib.cmd_type import *
+
+
+class PerfCountersRTL(Component):
+
+  def construct(s, CtrlPktType, num_counters = NUM_PERF_COUNTERS):
+
+    # The counters are as wide as the data field of the packet, so that
+    # each of them is read out by one response.
+    CounterType = CtrlPktType.get_field_type('data')
+    assert CtrlPktType.get_field_type('ctrl_action').nbits >= \
+           clog2(CMD_PERF_READ_RESPONSE + 1), \
+           "perf counters require a ctrl_action field of at least 4 bits"
+
+    # Interface
+    s.events = [InPort(b1) for _ in range(num_counters)]
+    s.recv_pkt = RecvIfcRTL(CtrlPktType)
+    s.send_pkt = SendIfcRTL(CtrlPktType)
+
+    # Components
+    s.counters = [Wire(CounterType) for _ in range(num_counters)]
+    s.resp = Wire(CtrlPktType)
+    s.resp_next = Wire(CtrlPktType)
+    s.resp_val = Wire(b1)
+
+    # Connections
+    s.send_pkt.msg //= s.resp
+    s.send_pkt.val //= s.resp_val
+
+    @update
+    def update_rdy():
+      # Only one response is kept, which can be replaced once it is sent.
+      s.recv_pkt.rdy @= ~s.resp_val | s.send_pkt.rdy
+
+    @update
+    def update_resp_next():
+      # The other fields are don't-cares of the response.
+      s.resp_next @= s.recv_pkt.msg
+      s.resp_next.src @= s.recv_pkt.msg.dst
+      s.resp_next.dst @= 0
+      s.resp_next.ctrl_action @= CMD_PERF_READ_RESPONSE
+      s.resp_next.data @= 0
+      for i in range(num_counters):
+        if s.recv_pkt.msg.data == CounterType(i):
+          s.resp_next.data @= s.counters[i]
+
+    @update_ff
+    def update_counters():
+      if s.reset:
+        for i in range(num_counters):
+          s.counters[i] <<= 0
+        s.resp_val <<= 0
+      else:
+        for i in range(num_counters):
+          if s.events[i]:
+            s.counters[i] <<= s.counters[i] + CounterType(1)
+
+        if s.recv_pkt.val & s.recv_pkt.rdy:
+          s.resp_val <<= 1
+          s.resp <<= s.resp_next
+        elif s.send_pkt.rdy:
+          s.resp_val <<= 0
+
+  def line_trace(s):
+    counters_str = "|".join([str(int(x)) for x in s.counters])
+    return f'perf_counters: [{counters_str}], resp: {s.send_pkt.msg}, val: {s.send_pkt.val}'
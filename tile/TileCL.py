@@ -0,0 +1,457 @@
+"""
+=========================================================================
+TileCL.py
+=========================================================================
+Cycle-approximate model of TileRTL on native Python ints. The tile keeps
+the same architectural state as the RTL (control memory with its PC and
+step counter, constant queue, input channels, register banks, predicate
+register), and each cycle tries to retire the current control signal the
+way TileRTL does: the routing crossbar, the FU and the FU crossbar may
+finish in different cycles (tracked with the same "done" flags), and the
+PC only proceeds once all of them are done.
+
+Data is represented as ( payload, predicate ) tuples.
+
+Author : agent
+  Date : Oct 18, 2026
+"""
+
+from collections import deque
+
+from ..fu.flexible.FuFL import IntOps, OPT_SEMANTICS
+from ..lib.cmd_type import *
+from ..lib.opt_type import *
+
+#-------------------------------------------------------------------------
+# Operand/outport usage of the opcodes in the FU RTL models
+#-------------------------------------------------------------------------
+# ( consumes a const, number of fu_in operands, number of outports )
+
+OPT_USAGE = {}
+
+def _usage( opts, const, num_inputs, num_outputs ):
+  for opt in opts:
+    OPT_USAGE[int( opt )] = ( const, num_inputs, num_outputs )
+
+_usage( [ OPT_NAH ], 0, 0, 0 )
+_usage( [ OPT_ADD, OPT_SUB, OPT_MUL, OPT_DIV, OPT_LLS, OPT_LRS, OPT_OR,
+          OPT_XOR, OPT_AND, OPT_EQ, OPT_LT, OPT_GTE, OPT_GT, OPT_LTE,
+          OPT_FADD, OPT_FSUB, OPT_FMUL, OPT_VEC_ADD, OPT_VEC_SUB,
+          OPT_VEC_MUL, OPT_PHI ], 0, 2, 1 )
+_usage( [ OPT_INC, OPT_PAS, OPT_RET, OPT_NOT, OPT_LD, OPT_FINC,
+          OPT_VEC_INC, OPT_VEC_REDUCE_ADD, OPT_VEC_REDUCE_MUL ], 0, 1, 1 )
+_usage( [ OPT_ADD_CONST, OPT_SUB_CONST, OPT_MUL_CONST, OPT_EQ_CONST,
+          OPT_FADD_CONST, OPT_FMUL_CONST, OPT_VEC_ADD_CONST,
+          OPT_VEC_SUB_CONST, OPT_PHI_CONST ], 1, 1, 1 )
+_usage( [ OPT_LD_CONST ], 1, 0, 1 )
+_usage( [ OPT_STR ], 0, 2, 0 )
+_usage( [ OPT_ATOMIC_ADD, OPT_ATOMIC_MIN, OPT_ATOMIC_MAX ], 0, 2, 1 )
+_usage( [ OPT_STR_CONST ], 1, 1, 0 )
+_usage( [ OPT_BRH, OPT_BRH_START ], 0, 1, 2 )
+_usage( [ OPT_SEL, OPT_MUL_ADD, OPT_MUL_SUB, OPT_MUL_LLS, OPT_MUL_LRS ],
+        0, 3, 1 )
+_usage( [ OPT_MUL_CONST_ADD ], 1, 2, 1 )
+_usage( [ OPT_MUL_ADD_LLS, OPT_MUL_SUB_LLS, OPT_MUL_SUB_LRS ], 0, 4, 1 )
+
+#-------------------------------------------------------------------------
+# CtrlWord
+#-------------------------------------------------------------------------
+# Native-int image of one CtrlSignalType entry of CtrlMemDynamicRTL.
+
+class CtrlWord:
+
+  __slots__ = ( 'ctrl', 'predicate', 'fu_in', 'routing_xbar_outport',
+                'fu_xbar_outport', 'routing_predicate_in',
+                'vector_factor_power', 'is_last_ctrl', 'write_reg_from',
+                'write_reg_idx', 'read_reg_from', 'read_reg_idx' )
+
+  def __init__( s, ctrl = 0, predicate = 0, fu_in = (),
+                routing_xbar_outport = (), fu_xbar_outport = (),
+                routing_predicate_in = (), vector_factor_power = 0,
+                is_last_ctrl = 0, write_reg_from = (), write_reg_idx = (),
+                read_reg_from = (), read_reg_idx = () ):
+    s.ctrl                 = ctrl
+    s.predicate            = predicate
+    s.fu_in                = fu_in
+    s.routing_xbar_outport = routing_xbar_outport
+    s.fu_xbar_outport      = fu_xbar_outport
+    s.routing_predicate_in = routing_predicate_in
+    s.vector_factor_power  = vector_factor_power
+    s.is_last_ctrl         = is_last_ctrl
+    s.write_reg_from       = write_reg_from
+    s.write_reg_idx        = write_reg_idx
+    s.read_reg_from        = read_reg_from
+    s.read_reg_idx         = read_reg_idx
+
+  @classmethod
+  def from_pkt( cls, pkt ):
+    # Mirrors the CMD_CONFIG write in CtrlMemDynamicRTL.
+    field = lambda name: tuple( int( x ) for x in getattr( pkt, name, () ) )
+    return cls( int( pkt.ctrl_operation ), int( pkt.ctrl_predicate ),
+                field( 'ctrl_fu_in' ),
+                field( 'ctrl_routing_xbar_outport' ),
+                field( 'ctrl_fu_xbar_outport' ),
+                field( 'ctrl_routing_predicate_in' ),
+                int( getattr( pkt, 'ctrl_vector_factor_power', 0 ) ),
+                int( getattr( pkt, 'ctrl_is_last_ctrl', 0 ) ),
+                field( 'ctrl_write_reg_from' ),
+                field( 'ctrl_write_reg_idx' ),
+                field( 'ctrl_read_reg_from' ),
+                field( 'ctrl_read_reg_idx' ) )
+
+CTRL_START = CtrlWord()
+
+_SYMBOL = { int( opt ): sym for opt, sym in OPT_SYMBOL_DICT.items() }
+
+_ATOMIC = { int( OPT_ATOMIC_ADD ), int( OPT_ATOMIC_MIN ),
+            int( OPT_ATOMIC_MAX ) }
+
+def _get( seq, i ):
+  return seq[i] if i < len( seq ) else 0
+
+#-------------------------------------------------------------------------
+# TileCL
+#-------------------------------------------------------------------------
+
+class TileCL:
+
+  def __init__( s, data_nbits, ctrl_mem_size, num_ctrl, total_steps,
+                num_fu_inports = 4, num_fu_outports = 2,
+                num_tile_inports = 4, num_tile_outports = 4,
+                num_registers_per_reg_bank = 16, const_mem_size = 8,
+                channel_depth = 2, num_lanes = 4, id = 0 ):
+
+    s.id                = id
+    s.ops               = IntOps( data_nbits )
+    s.mask              = s.ops.mask
+    s.num_lanes         = num_lanes
+    s.ctrl_mem_size     = ctrl_mem_size
+    s.num_ctrl          = num_ctrl
+    s.total_steps       = total_steps
+    s.num_fu_inports    = num_fu_inports
+    s.num_fu_outports   = num_fu_outports
+    s.num_tile_inports  = num_tile_inports
+    s.num_tile_outports = num_tile_outports
+    s.channel_depth     = channel_depth
+
+    # Control memory (CtrlMemDynamicRTL).
+    s.ctrl_mem    = [ CTRL_START ] * ctrl_mem_size
+    s.pkt_queue   = deque()
+    s.pc          = 0
+    s.times       = 0
+    s.started     = False
+
+    # Constant queue (ConstQueueDynamicRTL).
+    s.const_mem   = [ ( 0, 0 ) ] * const_mem_size
+    s.const_size  = 0
+    s.const_rd    = 0
+
+    # Input channels, register banks and the predicate register.
+    s.in_channel  = [ deque() for _ in range( num_tile_inports ) ]
+    s.in_len      = [ 0 ] * num_tile_inports
+    s.in_pending  = [ [] for _ in range( num_tile_inports ) ]
+    s.reg_bank    = [ [ ( 0, 0 ) ] * num_registers_per_reg_bank
+                      for _ in range( num_fu_inports ) ]
+    s.reg_predicate = None
+    s.first_brh   = True
+    s.first_phi   = True
+
+    # Sub-modules that already retired the current control signal.
+    s.routing_done = False
+    s.element_done = False
+    s.fu_xbar_done = False
+
+    # Outport targets: ( tile, inport ) for links, a list for an open
+    # boundary sink, or None for a boundary whose rdy is tied to 0.
+    s.send_to = [ None ] * num_tile_outports
+    # Data memory port (set by CgraCL for the tiles attached to it).
+    s.mem = None
+
+    # Retired FU operations: ( cycle, opt, outputs ).
+    s.record = False
+    s.fired  = []
+
+  #-----------------------------------------------------------------------
+  # Control packets
+  #-----------------------------------------------------------------------
+
+  def recv_ctrl_pkt( s, pkt ):
+    action = int( pkt.ctrl_action )
+    if action == CMD_CONST:
+      if s.const_size < len( s.const_mem ):
+        s.const_mem[s.const_size] = ( int( pkt.data ) & s.mask, 1 )
+        s.const_size += 1
+    else:
+      s.pkt_queue.append( pkt )
+
+  def update_ctrl( s ):
+    # Mirrors the update_ff blocks of CtrlMemDynamicRTL: the head of the
+    # packet queue is consumed at the end of each cycle.
+    if s.started and ( s.total_steps == 0 or s.times < s.total_steps ):
+      s.times += 1
+    if s.pkt_queue:
+      pkt    = s.pkt_queue.popleft()
+      action = int( pkt.ctrl_action )
+      if action == CMD_CONFIG:
+        s.ctrl_mem[int( pkt.ctrl_addr )] = CtrlWord.from_pkt( pkt )
+      elif action == CMD_LAUNCH:
+        s.started = True
+      elif action == CMD_TERMINATE or action == CMD_PAUSE:
+        s.started = False
+
+  def ctrl_valid( s ):
+    if not s.started:
+      return False
+    if s.total_steps > 0 and s.times == s.total_steps:
+      return False
+    if s.ctrl_mem[s.pc].ctrl == int( OPT_START ):
+      return False
+    if s.pkt_queue:
+      action = int( s.pkt_queue[0].ctrl_action )
+      if action == CMD_PAUSE or action == CMD_TERMINATE:
+        return False
+    return True
+
+  #-----------------------------------------------------------------------
+  # Channels
+  #-----------------------------------------------------------------------
+
+  def snapshot_channels( s ):
+    for i in range( s.num_tile_inports ):
+      s.in_len[i] = len( s.in_channel[i] )
+
+  def has_space( s, outport ):
+    target = s.send_to[outport]
+    if target is None:
+      return False
+    if isinstance( target, list ):
+      return True
+    tile, port = target
+    return tile.in_len[port] + len( tile.in_pending[port] ) < \
+           tile.channel_depth
+
+  def send( s, outport, data ):
+    target = s.send_to[outport]
+    if isinstance( target, list ):
+      target.append( data )
+    else:
+      tile, port = target
+      tile.in_pending[port].append( data )
+
+  def commit_channels( s ):
+    for i in range( s.num_tile_inports ):
+      if s.in_pending[i]:
+        s.in_channel[i].extend( s.in_pending[i] )
+        s.in_pending[i] = []
+
+  #-----------------------------------------------------------------------
+  # One cycle of the datapath
+  #-----------------------------------------------------------------------
+
+  def tick( s, cycle ):
+    if not s.ctrl_valid():
+      return
+
+    word = s.ctrl_mem[s.pc]
+    T    = s.num_tile_outports
+    F    = s.num_fu_inports
+
+    # Routing crossbar: ( outport, inport ) pairs.
+    routes = [ ( o, k - 1 ) for o, k in enumerate( word.routing_xbar_outport )
+               if k > 0 ]
+    routes_valid = all( s.in_len[i] > 0 for _, i in routes )
+    routes_tile  = [ ( o, i ) for o, i in routes if o < T ]
+    routes_fu    = [ ( o - T, i ) for o, i in routes if o >= T ]
+    tile_space   = all( s.has_space( o ) for o, _ in routes_tile )
+
+    # FU crossbar: ( outport, fu outport ) pairs.
+    xroutes = [ ( o, k - 1 ) for o, k in enumerate( word.fu_xbar_outport )
+                if k > 0 ]
+
+    fire_routing = False
+    fire_element = False
+    outs = []
+
+    # Operands seen by the FU: routed data has priority over registers.
+    fu_inport = [ None ] * F
+    if routes_valid:
+      for port, i in routes_fu:
+        fu_inport[port] = s.in_channel[i][0]
+    for port in range( F ):
+      if fu_inport[port] is None and _get( word.read_reg_from, port ):
+        fu_inport[port] = s.reg_bank[port][_get( word.read_reg_idx, port )]
+
+    if not s.element_done:
+      opt = word.ctrl
+      const, num_inputs, num_outputs = OPT_USAGE.get( opt, ( 0, 0, 0 ) )
+      idx  = [ _get( word.fu_in, j ) - 1 if _get( word.fu_in, j ) else 0
+               for j in range( num_inputs ) ]
+      ready = all( fu_inport[i] is not None for i in idx )
+      ready = ready and ( not const or s.const_rd < s.const_size )
+      gate  = 1
+      if word.predicate and not ( opt == int( OPT_PHI_CONST ) and
+                                  s.first_phi ):
+        ready = ready and s.reg_predicate is not None
+        gate  = s.reg_predicate if s.reg_predicate is not None else 0
+      # Every produced output has to be taken by the FU crossbar.
+      xsrc  = set( k for _, k in xroutes )
+      ready = ready and all( k in xsrc for k in range( num_outputs ) ) and \
+              all( k < num_outputs for k in xsrc )
+      ready = ready and all( s.has_space( o ) for o, _ in xroutes if o < T )
+      # The routing crossbar can only hand data to the FU inports the FU
+      # consumes in the same cycle.
+      if routes_fu:
+        ready = ready and not s.routing_done and routes_valid and \
+                tile_space and all( port in idx for port, _ in routes_fu )
+      if ready:
+        v = [ fu_inport[i] for i in idx ]
+        if const:
+          v = [ s.const_mem[s.const_rd] ] + v
+        outs = s.execute( opt, v, gate )
+        if outs is not None:
+          fire_element = True
+          if const:
+            s.const_rd = s.const_rd + 1 \
+                         if s.const_rd < s.const_size - 1 else 0
+          if word.predicate and opt != int( OPT_BRH_START ):
+            s.reg_predicate = None
+          if s.record and opt != int( OPT_NAH ):
+            s.fired.append( ( cycle, opt, tuple( outs ) ) )
+
+    if not s.routing_done:
+      if routes_fu:
+        fire_routing = fire_element
+      else:
+        fire_routing = routes_valid and tile_space
+
+    # Performs the writes of the retired sub-modules.
+    out_data = {}
+    if fire_routing:
+      data = [ s.in_channel[i][0] for _, i in routes ]
+      for ( o, i ), d in zip( routes, data ):
+        if o < T:
+          out_data[o] = d
+      for port, i in routes_fu:
+        if _get( word.write_reg_from, port ) == 1:
+          s.reg_bank[port][_get( word.write_reg_idx, port )] = \
+              s.in_channel[i][0]
+      pred_in = [ i for i, en in enumerate( word.routing_predicate_in ) if en ]
+      if pred_in:
+        s.reg_predicate = 1 if any( s.in_channel[i][0][1]
+                                    for i in pred_in
+                                    if s.in_channel[i] ) else 0
+      for i in set( i for _, i in routes ):
+        s.in_channel[i].popleft()
+      s.routing_done = True
+
+    fire_xbar = fire_element and bool( xroutes )
+    if fire_element:
+      for o, k in xroutes:
+        if o < T:
+          d = outs[k]
+          if o in out_data:
+            p = out_data[o]
+            d = ( d[0] | p[0], d[1] | p[1] )
+          out_data[o] = d
+        elif _get( word.write_reg_from, o - T ) == 2:
+          s.reg_bank[o - T][_get( word.write_reg_idx, o - T )] = outs[k]
+      s.element_done = True
+    if not xroutes:
+      s.fu_xbar_done = True
+    elif fire_xbar:
+      s.fu_xbar_done = True
+
+    for o, d in out_data.items():
+      s.send( o, d )
+
+    if s.routing_done and s.element_done and s.fu_xbar_done:
+      s.routing_done = s.element_done = s.fu_xbar_done = False
+      s.pc = 0 if s.pc + 1 == s.num_ctrl else s.pc + 1
+
+  #-----------------------------------------------------------------------
+  # FU semantics
+  #-----------------------------------------------------------------------
+  # Returns the list of outputs, or None if the op cannot retire in this
+  # cycle (i.e., the data memory is not accessible).
+
+  def execute( s, opt, v, gate ):
+    mask = s.mask
+    if opt == int( OPT_NAH ):
+      return []
+
+    pred = gate
+    for _, p in v:
+      pred &= p
+    pay = [ d for d, _ in v ]
+
+    if opt == int( OPT_PHI ):
+      if v[0][1]:
+        return [ ( v[0][0], gate ) ]
+      if v[1][1]:
+        return [ ( v[1][0], gate ) ]
+      return [ ( v[0][0], 0 ) ]
+
+    if opt == int( OPT_PHI_CONST ):
+      # Operands are [ const, in0 ].
+      res = v[1][0] if v[1][1] else v[0][0]
+      if s.first_phi:
+        s.first_phi = False
+        return [ ( res, 1 ) ]
+      return [ ( res, v[1][1] & gate ) ]
+
+    if opt == int( OPT_BRH ):
+      taken = gate if pay[0] == 0 else 0
+      other = 0 if pay[0] == 0 else gate
+      return [ ( 0, taken ), ( 0, other ) ]
+
+    if opt == int( OPT_BRH_START ):
+      first = s.first_brh
+      s.first_brh = False
+      return [ ( 0, 1 if first else 0 ), ( 0, 0 if first else 1 ) ]
+
+    if opt == int( OPT_LD ) or opt == int( OPT_LD_CONST ):
+      if s.mem is None:
+        return None
+      data = s.mem.load( s, pay[0] )
+      if data is None:
+        return None
+      # The predicate of the address is ignored for LD_CONST.
+      addr_pred = gate & ( v[0][1] if opt == int( OPT_LD ) else 1 )
+      return [ ( data[0] & mask, data[1] & addr_pred ) ]
+
+    if opt == int( OPT_STR ) or opt == int( OPT_STR_CONST ):
+      if s.mem is None or not s.mem.store( s, pay[0], v[1] ):
+        return None
+      return []
+
+    if opt in _ATOMIC:
+      # Operands are [ addr, operand ]. The memory writes back the result
+      # with the predicate of the operands and the old data is sent out.
+      if s.mem is None:
+        return None
+      fn = OPT_SEMANTICS[opt]
+      data = s.mem.atomic( s, pay[0], lambda old:
+               ( fn( s.ops, [ old[0], pay[1] ], s.num_lanes ) & mask, pred ) )
+      if data is None:
+        return None
+      return [ ( data[0] & mask, data[1] & gate & v[0][1] ) ]
+
+    fn = OPT_SEMANTICS.get( opt )
+    if fn is None:
+      # Opcode not supported by any FU: the tile stalls like the RTL.
+      return None
+    if opt == int( OPT_SEL ):
+      pred = gate & v[0][1] & ( v[1][1] if pay[0] == 1 else v[2][1] )
+    return [ ( fn( s.ops, pay, s.num_lanes ) & mask, pred ) ]
+
+  #-----------------------------------------------------------------------
+  # Line trace
+  #-----------------------------------------------------------------------
+
+  def line_trace( s ):
+    word = s.ctrl_mem[s.pc]
+    opt  = _SYMBOL.get( word.ctrl, str( word.ctrl ) )
+    ins  = "|".join( str( list( ch ) ) for ch in s.in_channel )
+    return f"[tile{s.id}] pc:{s.pc} times:{s.times} opt:{opt} " \
+           f"done:{int(s.routing_done)}{int(s.element_done)}" \
+           f"{int(s.fu_xbar_done)} in:{ins}"
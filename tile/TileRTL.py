@@ -24,6 +24,8 @@ from ..fu.single.PhiRTL import PhiRTL
 from ..lib.basic.val_rdy.ifcs import ValRdyRecvIfcRTL as RecvIfcRTL
 from ..lib.basic.val_rdy.ifcs import ValRdySendIfcRTL as SendIfcRTL
 from ..lib.cmd_type import *
+from ..lib.messages import intern_msg
+from ..lib.opt_type import *
 from ..mem.const.ConstQueueDynamicRTL import ConstQueueDynamicRTL
 from ..mem.ctrl.CtrlMemDynamicRTL import CtrlMemDynamicRTL
 from ..mem.register_cluster.RegisterClusterRTL import RegisterClusterRTL
@@ -31,6 +33,7 @@ from ..noc.CrossbarRTL import CrossbarRTL
 from ..noc.LinkOrRTL import LinkOrRTL
 from ..noc.PyOCN.pymtl3_net.channel.ChannelRTL import ChannelRTL
 from ..rf.RegisterRTL import RegisterRTL
+from .PerfCountersRTL import PerfCountersRTL
 
 
 class TileRTL(Component):
@@ -41,7 +44,14 @@ class TileRTL(Component):
                 num_tile_outports, num_registers_per_reg_bank = 16,
                 Fu = FlexibleFuRTL,
                 FuList = [PhiRTL, AdderRTL, CompRTL, MulRTL, BranchRTL, MemUnitRTL],
-                id = 0):
+                perf_counters = False, shadow_ctrl = False,
+                num_ctrl_contexts = 1, loop_ctrl = False,
+                ctrl_dict_size = 0):
+
+    # Note that the tile does not take its index in the array as a
+    # parameter, so that the tiles of the same parameterization (e.g.,
+    # FuList, number of ports) share one translated module that gets
+    # instantiated repeatedly, rather than one module per tile.
 
     # Constants.
     num_routing_xbar_inports = num_tile_inports
@@ -61,12 +71,23 @@ class TileRTL(Component):
 
     # Ctrl.
     s.recv_ctrl_pkt = RecvIfcRTL(CtrlPktType)
+    # Responses (i.e., perf counters) towards the controller.
+    s.send_ctrl_pkt = SendIfcRTL(CtrlPktType)
+    # Early exit of the hardware loop, raised by this tile performing
+    # OPT_RET with a true predicate and broadcast to all the tiles (see
+    # mem/ctrl/CtrlMemDynamicRTL.py).
+    s.send_loop_exit = OutPort(b1)
+    s.recv_loop_exit = InPort(b1)
 
     # Data.
     s.to_mem_raddr = SendIfcRTL(DataAddrType)
     s.from_mem_rdata = RecvIfcRTL(DataType)
     s.to_mem_waddr = SendIfcRTL(DataAddrType)
     s.to_mem_wdata = SendIfcRTL(DataType)
+    # The atomic operation along with `to_mem_raddr` (see
+    # fu/single/MemUnitRTL.py).
+    s.to_mem_atomic_op = OutPort(mk_bits(ATOMIC_OP_NBITS))
+    s.to_mem_atomic_data = OutPort(DataType)
 
     # Components.
     s.element = FlexibleFuRTL(DataType, PredicateType, CtrlSignalType,
@@ -80,7 +101,7 @@ class TileRTL(Component):
     s.fu_crossbar = CrossbarRTL(DataType, PredicateType,
                                 CtrlSignalType,
                                 num_fu_xbar_inports,
-                                num_fu_xbar_outports, id)
+                                num_fu_xbar_outports)
     s.register_cluster = \
         RegisterClusterRTL(DataType, CtrlSignalType, num_fu_inports,
                            num_registers_per_reg_bank)
@@ -88,7 +109,9 @@ class TileRTL(Component):
                                    ctrl_mem_size,
                                    num_fu_inports, num_fu_outports,
                                    num_tile_inports, num_tile_outports,
-                                   num_ctrl, total_steps)
+                                   num_ctrl, total_steps, shadow_ctrl,
+                                   num_ctrl_contexts, loop_ctrl,
+                                   ctrl_dict_size = ctrl_dict_size)
 
     # The `tile_in_channel` indicates the outport channels that are
     # connected to the next tiles.
@@ -108,6 +131,16 @@ class TileRTL(Component):
     s.fu_crossbar_done = Wire(1)
     s.routing_crossbar_done = Wire(1)
 
+    # Whether the perf counters accept the received ctrl packet.
+    s.perf_pkt_rdy = Wire(1)
+
+    # Whether the received ctrl packet swaps the ctrl contexts.
+    s.swap_ctrl_pkt = Wire(1)
+    # Whether the received ctrl packet sets up the loop descriptor.
+    s.loop_ctrl_pkt = Wire(1)
+    # Whether the received ctrl packet fills the ctrl dictionary.
+    s.dict_ctrl_pkt = Wire(1)
+
     # Constant queue.
     s.element.recv_const //= s.const_mem.send_const
 
@@ -117,6 +150,8 @@ class TileRTL(Component):
         s.from_mem_rdata //= s.element.from_mem_rdata[i]
         s.to_mem_waddr //= s.element.to_mem_waddr[i]
         s.to_mem_wdata //= s.element.to_mem_wdata[i]
+        s.to_mem_atomic_op //= s.element.to_mem_atomic_op[i]
+        s.to_mem_atomic_data //= s.element.to_mem_atomic_data[i]
       else:
         s.element.to_mem_raddr[i].rdy //= 0
         s.element.from_mem_rdata[i].val //= 0
@@ -173,17 +208,52 @@ class TileRTL(Component):
           s.element.recv_in[i]
       s.register_cluster.inport_opt //= s.ctrl_mem.send_ctrl.msg
 
+    # Default message shared by the update blocks below, instead of being
+    # constructed in every evaluation.
+    default_data = intern_msg(DataType)
+
+    if shadow_ctrl:
+      @update
+      def update_swap_ctrl_pkt():
+        s.swap_ctrl_pkt @= s.recv_ctrl_pkt.msg.ctrl_action == CMD_SWAP_CTRL
+    else:
+      s.swap_ctrl_pkt //= 0
+
+    s.ctrl_mem.recv_loop_exit //= s.recv_loop_exit
+    if loop_ctrl:
+      @update
+      def update_loop_ctrl_pkt():
+        s.loop_ctrl_pkt @= (s.recv_ctrl_pkt.msg.ctrl_action >= CMD_LOOP_PROLOGUE) & \
+                           (s.recv_ctrl_pkt.msg.ctrl_action <= CMD_LOOP_TRIP_COUNT)
+
+      @update
+      def update_send_loop_exit():
+        s.send_loop_exit @= s.element.recv_opt.val & s.element.recv_opt.rdy & \
+                            (s.element.recv_opt.msg.ctrl == OPT_RET) & \
+                            s.element.send_out[0].msg.predicate
+    else:
+      s.loop_ctrl_pkt //= 0
+      s.send_loop_exit //= 0
+
+    if ctrl_dict_size > 0:
+      @update
+      def update_dict_ctrl_pkt():
+        s.dict_ctrl_pkt @= (s.recv_ctrl_pkt.msg.ctrl_action == CMD_CONFIG_DICT) | \
+                           (s.recv_ctrl_pkt.msg.ctrl_action == CMD_CONFIG_RUN)
+    else:
+      s.dict_ctrl_pkt //= 0
+
     @update
     def feed_pkt():
-        s.ctrl_mem.recv_pkt.msg @= CtrlPktType(0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
-        s.const_mem.recv_const.msg @= DataType(0, 0, 0, 0)
+        # The packet is gated by val only, so it fits any CtrlPktType.
+        s.ctrl_mem.recv_pkt.msg @= s.recv_ctrl_pkt.msg
+        s.const_mem.recv_const.msg @= default_data
         s.ctrl_mem.recv_pkt.val @= 0
         s.const_mem.recv_const.val @= 0
-        s.recv_ctrl_pkt.rdy @= 0
+        s.recv_ctrl_pkt.rdy @= s.perf_pkt_rdy
 
-        if s.recv_ctrl_pkt.val & ((s.recv_ctrl_pkt.msg.ctrl_action == CMD_CONFIG) | (s.recv_ctrl_pkt.msg.ctrl_action == CMD_LAUNCH)):
+        if s.recv_ctrl_pkt.val & ((s.recv_ctrl_pkt.msg.ctrl_action == CMD_CONFIG) | (s.recv_ctrl_pkt.msg.ctrl_action == CMD_LAUNCH) | s.swap_ctrl_pkt | s.loop_ctrl_pkt | s.dict_ctrl_pkt):
             s.ctrl_mem.recv_pkt.val @= 1
-            s.ctrl_mem.recv_pkt.msg @= s.recv_ctrl_pkt.msg
             s.recv_ctrl_pkt.rdy @= s.ctrl_mem.recv_pkt.rdy
         elif s.recv_ctrl_pkt.val & (s.recv_ctrl_pkt.msg.ctrl_action == CMD_CONST):
             s.const_mem.recv_const.val @= 1
@@ -227,6 +297,76 @@ class TileRTL(Component):
         elif s.routing_crossbar.recv_opt.rdy:
           s.routing_crossbar_done <<= 1
 
+    # Optional perf counters, read out by CMD_PERF_READ_REQUEST packets
+    # (which requires a 4-bit ctrl_action). Without them, the tile never
+    # sends ctrl packets back.
+    if perf_counters:
+      s.perf_counters = PerfCountersRTL(CtrlPktType)
+      s.perf_counters.recv_pkt.msg //= s.recv_ctrl_pkt.msg
+      s.perf_counters.send_pkt //= s.send_ctrl_pkt
+
+      @update
+      def feed_perf_pkt():
+        if s.recv_ctrl_pkt.msg.ctrl_action == CMD_PERF_READ_REQUEST:
+          s.perf_counters.recv_pkt.val @= s.recv_ctrl_pkt.val
+          s.perf_pkt_rdy @= s.perf_counters.recv_pkt.rdy
+        else:
+          s.perf_counters.recv_pkt.val @= 0
+          s.perf_pkt_rdy @= 0
+
+      @update
+      def update_perf_events():
+        s.perf_counters.events[PERF_CTRL_VALID] @= s.ctrl_mem.send_ctrl.val
+        s.perf_counters.events[PERF_ELEMENT_FIRED] @= \
+            s.element.recv_opt.val & s.element.recv_opt.rdy
+        s.perf_counters.events[PERF_OPT_STALL] @= \
+            s.element.recv_opt.val & ~s.element.recv_opt.rdy
+        s.perf_counters.events[PERF_XBAR_BACKPRESSURE] @= 0
+        for i in range(num_routing_xbar_outports):
+          if s.routing_crossbar.send_data[i].val & ~s.routing_crossbar.send_data[i].rdy:
+            s.perf_counters.events[PERF_XBAR_BACKPRESSURE] @= 1
+        s.perf_counters.events[PERF_MEM_STALL] @= \
+            (s.to_mem_raddr.val & ~s.to_mem_raddr.rdy) | \
+            (s.to_mem_waddr.val & ~s.to_mem_waddr.rdy)
+
+    else:
+      s.perf_pkt_rdy //= 0
+      s.send_ctrl_pkt.val //= 0
+      s.send_ctrl_pkt.msg //= CtrlPktType()
+
+  # Simulation-only backdoor that applies a ctrl packet to the ctrl/const
+  # memory the same way feed_pkt would, without spending the cycles.
+  def backdoor_ctrl_pkt(s, pkt):
+    # Compared as ints, as the commands may not fit a narrow ctrl_action.
+    action = int(pkt.ctrl_action)
+    if action in (CMD_CONFIG, CMD_CONFIG_DICT):
+      s.ctrl_mem.backdoor_config(pkt)
+    elif action == CMD_CONFIG_RUN:
+      s.ctrl_mem.backdoor_config_run(pkt)
+    elif action == CMD_CONST:
+      s.const_mem.backdoor_push(pkt.data)
+    elif action == CMD_LAUNCH:
+      s.ctrl_mem.backdoor_launch(1, int(pkt.data))
+    elif action in (CMD_PAUSE, CMD_TERMINATE):
+      s.ctrl_mem.backdoor_launch(0)
+    elif action == CMD_SWAP_CTRL:
+      s.ctrl_mem.backdoor_swap()
+    elif CMD_LOOP_PROLOGUE <= action <= CMD_LOOP_TRIP_COUNT:
+      s.ctrl_mem.backdoor_loop(pkt)
+
+  # Per-cycle fields recorded by lib/util/sim_trace.py (only evaluated
+  # when tracing is enabled).
+  def trace_fields(s):
+    return {'ctrl_val': s.ctrl_mem.send_ctrl.val,
+            'ctrl_rdy': s.ctrl_mem.send_ctrl.rdy,
+            'opt': s.ctrl_mem.send_ctrl.msg.ctrl,
+            'element_done': s.element_done,
+            'fu_crossbar_done': s.fu_crossbar_done,
+            'routing_crossbar_done': s.routing_crossbar_done,
+            'recv_val': sum(int(x.val) << i for i, x in enumerate(s.recv_data)),
+            'send_val': sum(int(x.val) << i for i, x in enumerate(s.send_data)),
+            'send_rdy': sum(int(x.rdy) << i for i, x in enumerate(s.send_data))}
+
   # Line trace
   def line_trace(s):
     recv_str = "|".join(["(" + str(x.msg) + ", val: " + str(x.val) + ", rdy: " + str(x.rdy) + ")" for x in s.recv_data])
@@ -0,0 +1,70 @@
+"""
+==========================================================================
+PerfCountersRTL_test.py
+==========================================================================
+Test cases for the per-tile performance counters.
+
+Author : agent
+  Date : Oct 18, 2026
+"""
+
+from pymtl3 import *
+from ..PerfCountersRTL import PerfCountersRTL
+from ...lib.basic.val_rdy.SinkRTL import SinkRTL as TestSinkRTL
+from ...lib.basic.val_rdy.SourceRTL import SourceRTL as TestSrcRTL
+from ...lib.cmd_type import *
+from ...lib.messages import *
+from ...lib.util.sim_trace import run_sim
+
+#-------------------------------------------------------------------------
+# TestHarness
+#-------------------------------------------------------------------------
+
+class TestHarness(Component):
+
+  def construct(s, CtrlPktType, src_pkts, sink_pkts, initial_delay):
+
+    # The requests are delayed to let the counters accumulate first.
+    s.src = TestSrcRTL(CtrlPktType, src_pkts, initial_delay)
+    s.sink = TestSinkRTL(CtrlPktType, sink_pkts)
+    s.dut = PerfCountersRTL(CtrlPktType)
+    s.cycle = Wire(8)
+
+    s.src.send //= s.dut.recv_pkt
+    s.dut.send_pkt //= s.sink.recv
+
+    @update_ff
+    def update_cycle():
+      if s.reset:
+        s.cycle <<= 0
+      else:
+        s.cycle <<= s.cycle + 1
+
+    @update
+    def update_events():
+      for i in range(NUM_PERF_COUNTERS):
+        s.dut.events[i] @= 0
+      # Always valid, every other cycle fired, never stalled otherwise.
+      s.dut.events[PERF_CTRL_VALID] @= 1
+      s.dut.events[PERF_ELEMENT_FIRED] @= s.cycle[0]
+
+  def done(s):
+    return s.src.done() and s.sink.done()
+
+  def line_trace(s):
+    return s.dut.line_trace()
+
+def test_read(cmdline_opts):
+  CtrlPktType = mk_intra_cgra_pkt(4, 16, 4, 7, 4, 2, 4, 4, 4, 16)
+  src_pkts = [CtrlPktType(0, 2, ctrl_action = CMD_PERF_READ_REQUEST,
+                          data = counter)
+              for counter in [PERF_CTRL_VALID, PERF_ELEMENT_FIRED,
+                              PERF_OPT_STALL]]
+  # The first request is accepted once the counters accumulated for 11
+  # cycles, followed by one request per cycle.
+  sink_pkts = [CtrlPktType(2, 0, ctrl_action = CMD_PERF_READ_RESPONSE,
+                           data = value)
+               for value in [11, 6, 0]]
+  th = TestHarness(CtrlPktType, src_pkts, sink_pkts, 10)
+  th.elaborate()
+  run_sim(th, cmdline_opts, duts = ['dut'])
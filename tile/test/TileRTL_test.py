@@ -11,8 +11,6 @@ Author : Cheng Tan
 """
 
 from pymtl3.passes.backends.verilog import (VerilogVerilatorImportPass)
-from pymtl3.stdlib.test_utils import (run_sim,
-                                      config_model_with_cmdline_opts)
 
 from ..TileRTL import TileRTL
 from ...fu.flexible.FlexibleFuRTL import FlexibleFuRTL
@@ -33,6 +31,8 @@ from ...lib.basic.val_rdy.SourceRTL import SourceRTL as ValRdyTestSrcRTL
 from ...lib.cmd_type import *
 from ...lib.messages import *
 from ...lib.opt_type import *
+from ...lib.util.build_cache import config_model_with_cmdline_opts
+from ...lib.util.sim_trace import run_sim
 
 
 #-------------------------------------------------------------------------
@@ -63,6 +63,8 @@ class TestHarness(Component):
                 FunctionUnit, FuList)
 
     connect(s.src_ctrl_pkt.send, s.dut.recv_ctrl_pkt)
+    s.dut.send_ctrl_pkt.rdy //= 0
+    s.dut.recv_loop_exit //= 0
 
     for i in range(num_tile_inports):
       connect(s.src_data[i].send, s.dut.recv_data[i])